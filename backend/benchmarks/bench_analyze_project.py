@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+项目分析并行扩展性基准测试
+生成合成项目，比较不同进程数下 CodeAnalysisService.analyze_project 的耗时
+
+用法: python benchmarks/bench_analyze_project.py [文件数] [进程数列表]
+例如: python benchmarks/bench_analyze_project.py 10000 1,2,4,8
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.code_analysis_service import CodeAnalysisService
+
+SAMPLE = '''
+import os
+import json
+
+class Handler{index}:
+    """示例处理器"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def process(self, items):
+        result = []
+        for item in items:
+            if item % 2 == 0:
+                result.append(item * {index})
+            else:
+                print(item)  # TODO: 移除调试输出
+        return result
+
+def helper_{index}(value):
+    return json.dumps({{'value': value, 'cwd': os.getcwd()}})
+'''
+
+def make_project(root, file_count):
+    """生成合成项目"""
+    for i in range(file_count):
+        package = os.path.join(root, f'pkg_{i // 100:03d}')
+        os.makedirs(package, exist_ok=True)
+        with open(os.path.join(package, f'module_{i:05d}.py'), 'w', encoding='utf-8') as f:
+            f.write(SAMPLE.format(index=i) * 5)
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    worker_counts = [int(w) for w in sys.argv[2].split(',')] if len(sys.argv) > 2 else [1, 2, 4, os.cpu_count() or 1]
+
+    root = tempfile.mkdtemp(prefix='bench_analyze_')
+    try:
+        make_project(root, file_count)
+        print(f"Synthetic project: {file_count} files, cpu_count={os.cpu_count()}")
+
+        baseline = None
+        for workers in sorted(set(worker_counts)):
+            service = CodeAnalysisService()
+            try:
+                if workers > 1:
+                    # 预热进程池，排除进程启动时间
+                    service._get_executor(workers)
+                start = time.perf_counter()
+                result = service.analyze_project(root, workers=workers)
+                elapsed = time.perf_counter() - start
+            finally:
+                service.shutdown()
+
+            baseline = baseline or elapsed
+            print(f"workers={workers:>2}  files={result['files_analyzed']:>6}  "
+                  f"time={elapsed:8.2f}s  files/s={result['files_analyzed'] / elapsed:9.1f}  "
+                  f"speedup={baseline / elapsed:5.2f}x")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
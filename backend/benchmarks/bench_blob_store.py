@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+文件内容存储基准测试
+比较文件内容内联在code_file表（旧实现）与拆分到压缩去重的file_blob表后，
+文件列表查询的耗时和数据库文件大小
+
+用法: python benchmarks/bench_blob_store.py [文件数] [重复文件比例]
+例如: python benchmarks/bench_blob_store.py 5000 0.2
+"""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+from flask import Flask
+from src.models.user import db, User
+from src.models.project import Project, CodeFile
+from src.services.ingest_service import FileIngestService
+from src.services.blob_store import blob_store
+
+def make_project(root, file_count, duplicate_ratio):
+    """生成合成项目，部分文件内容相同（如vendored依赖、生成代码）"""
+    unique = max(1, int(file_count * (1 - duplicate_ratio)))
+    for i in range(file_count):
+        package = os.path.join(root, f'pkg_{i // 200:03d}')
+        os.makedirs(package, exist_ok=True)
+        n = i % unique
+        with open(os.path.join(package, f'module_{i:05d}.py'), 'w', encoding='utf-8') as f:
+            f.write(f'def func_{n}(value):\n    """Multiply value by {n}."""\n    return value * {n}\n\n' * 40)
+
+def legacy_database(path, app):
+    """按旧schema（内容内联在code_file表）构建对照数据库"""
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE code_file (id INTEGER PRIMARY KEY, file_path VARCHAR(500), file_name VARCHAR(200), '
+                 'file_type VARCHAR(50), content TEXT, size INTEGER, last_modified DATETIME, analysis_result TEXT, '
+                 'blob_sha VARCHAR(40), project_id INTEGER)')
+    with app.app_context():
+        files = CodeFile.query.all()
+        blob_store.load_contents(files)
+        rows = [(f.id, f.file_path, f.file_name, f.file_type, f.content, f.size, None, None, f.blob_sha, f.project_id)
+                for f in files]
+    conn.executemany('INSERT INTO code_file VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.execute('VACUUM')
+    return conn
+
+def time_it(func, repeat=5):
+    """多次运行取最快一次"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    duplicate_ratio = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    work_dir = tempfile.mkdtemp(prefix='bench_blob_')
+    try:
+        project_dir = os.path.join(work_dir, 'project')
+        make_project(project_dir, file_count, duplicate_ratio)
+        db_path = os.path.join(work_dir, 'app.db')
+
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(username='bench', email='bench@example.com'))
+            db.session.add(Project(name='bench', user_id=1))
+            db.session.commit()
+            FileIngestService().scan_project_files(1, project_dir)
+            stats = blob_store.get_stats()
+
+            def orm_with_content():
+                db.session.expunge_all()
+                files = CodeFile.query.filter_by(project_id=1).all()
+                blob_store.load_contents(files)
+                return [f.to_dict(include_content=True) for f in files]
+
+            orm_full = time_it(orm_with_content)
+            db.session.remove()
+            db.engine.dispose()
+        with sqlite3.connect(db_path) as conn:
+            conn.execute('VACUUM')
+
+        legacy_path = os.path.join(work_dir, 'legacy.db')
+        legacy_database(legacy_path, app).close()
+
+        mb = 1024 * 1024
+        print(f"Synthetic project: {file_count} files, duplicate_ratio={duplicate_ratio}, codec={stats['codec']}")
+        print(f"Blobs: {stats['blobs']}  raw={stats['raw_bytes'] / mb:.1f}MB  "
+              f"stored={stats['stored_bytes'] / mb:.1f}MB  ratio={stats['compression_ratio']}")
+        # 两种schema都用同一条列表查询语句（旧实现的to_dict()包含content）
+        for label, path in [('inline', legacy_path), ('blob', db_path)]:
+            conn = sqlite3.connect(path)
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(code_file)') if row[1] != 'content']
+            query = f"SELECT {', '.join(columns + (['content'] if label == 'inline' else []))} FROM code_file WHERE project_id = 1"
+            elapsed = time_it(lambda: conn.execute(query).fetchall())
+            conn.close()
+            print(f"{label:<8} list={elapsed * 1000:8.1f}ms  db_size={os.path.getsize(path) / mb:6.1f}MB")
+        print(f"blob     list with content (ORM, batched) = {orm_full * 1000:.1f}ms")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+分支列表分页基准测试
+本地桩服务器模拟每个请求的网络延迟，比较逐页串行请求与已知总页数后并发请求的总耗时
+
+用法: python benchmarks/bench_branch_listing.py [分支数] [每次请求延迟毫秒]
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.github_service import GitHubService, PER_PAGE
+from src.services.metadata_cache import MetadataCache
+
+def make_handler(branch_count, latency):
+    """生成按page参数返回分支列表的处理器"""
+    last_page = max(1, (branch_count + PER_PAGE - 1) // PER_PAGE)
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            page = int(parse_qs(urlparse(self.path).query).get('page', ['1'])[0])
+            names = [f'branch-{i:05d}' for i in range((page - 1) * PER_PAGE, min(page * PER_PAGE, branch_count))]
+            body = json.dumps([{'name': name} for name in names]).encode('utf-8')
+            base = f'http://{self.headers["Host"]}{urlparse(self.path).path}?per_page={PER_PAGE}'
+            links = []
+            if page < last_page:
+                links.append(f'<{base}&page={page + 1}>; rel="next"')
+                links.append(f'<{base}&page={last_page}>; rel="last"')
+            time.sleep(latency)
+            self.send_response(200)
+            if links:
+                self.send_header('Link', ', '.join(links))
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+def main():
+    branch_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 80) / 1000
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(branch_count, latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        for name, concurrency in [('逐页串行', 1), ('并发请求', 8)]:
+            service = GitHubService()
+            service.base_url = f'http://127.0.0.1:{server.server_address[1]}'
+            service.metadata_cache = MetadataCache(enabled=False)
+            service.page_concurrency = concurrency
+            start = time.perf_counter()
+            result = service.list_branches('owner', 'repo')
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{name:<8} 分支 {len(result['branches']):>6}  页数 {result['pages']:>4}  耗时 {elapsed:8.0f}ms")
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
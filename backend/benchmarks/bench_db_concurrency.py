@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+SQLite并发读写基准测试（gevent）
+多个greenlet混合执行文件列表读取和任务写入（写事务中有一次协作式让出，模拟推送进度等I/O），
+比较默认SQLite配置与数据库连接配置（WAL、pragma、连接池、写锁、只读连接池）的吞吐量、
+耗时分位数和 database is locked 错误数
+
+用法: python benchmarks/bench_db_concurrency.py [greenlet数] [持续秒数] [写入比例]
+例如: python benchmarks/bench_db_concurrency.py 50 10 0.2
+"""
+
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+import gevent
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+from flask import Flask
+from sqlalchemy import insert
+from src.models.user import db, User
+from src.models.project import Project, CodeFile, AnalysisTask
+from src.services.db_profile import DatabaseProfile
+
+def make_app(db_path, profiled):
+    app = Flask(f'bench_{profiled}')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    profile = None
+    if profiled:
+        profile = DatabaseProfile()
+        profile.init_app(app, db)
+    else:
+        db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', email='bench@example.com'))
+        db.session.add(Project(name='bench', user_id=1))
+        db.session.execute(insert(CodeFile), [
+            {'file_path': f'pkg/module_{i:05d}.py', 'file_name': f'module_{i:05d}.py', 'size': 100, 'project_id': 1}
+            for i in range(5000)
+        ])
+        db.session.commit()
+    return app, profile
+
+def worker(app, profile, deadline, write_ratio, results):
+    rng = random.Random()
+    while time.monotonic() < deadline:
+        is_write = rng.random() < write_ratio
+        start = time.monotonic()
+        with app.app_context():
+            try:
+                if is_write:
+                    db.session.add(AnalysisTask(task_type='analyze', status='pending', project_id=1))
+                    db.session.flush()
+                    gevent.sleep(0.002)
+                    db.session.commit()
+                else:
+                    session = profile.read_session() if profile else db.session
+                    offset = rng.randrange(4900)
+                    session.query(CodeFile.id, CodeFile.file_path).filter_by(project_id=1) \
+                        .order_by(CodeFile.file_path).offset(offset).limit(100).all()
+                    session.rollback()
+                results['write' if is_write else 'read'].append(time.monotonic() - start)
+            except Exception as e:
+                db.session.rollback()
+                results['errors'].append(str(e).splitlines()[0])
+        gevent.sleep(0)
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000 if ordered else 0.0
+
+def run(label, profiled, greenlets, duration, write_ratio, work_dir):
+    db_path = os.path.join(work_dir, f'{label}.db')
+    app, profile = make_app(db_path, profiled)
+    results = {'read': [], 'write': [], 'errors': []}
+    start = time.monotonic()
+    deadline = start + duration
+    gevent.joinall([gevent.spawn(worker, app, profile, deadline, write_ratio, results) for _ in range(greenlets)])
+    elapsed = time.monotonic() - start
+
+    ops = len(results['read']) + len(results['write'])
+    locked = sum(1 for error in results['errors'] if 'locked' in error)
+    print(f"{label:<8} ops/s={ops / elapsed:8.1f}  reads={len(results['read']):>6}  writes={len(results['write']):>5}  "
+          f"errors={len(results['errors']):>4} (locked={locked})  "
+          f"read p50/p99={percentile(results['read'], 0.5):7.1f}/{percentile(results['read'], 0.99):7.1f}ms  "
+          f"write p50/p99={percentile(results['write'], 0.5):7.1f}/{percentile(results['write'], 0.99):7.1f}ms  "
+          f"wall={elapsed:5.1f}s")
+    if profile:
+        stats = profile.get_stats()
+        print(f"{'':<8} write_lock_waits={stats['write_lock_waits']}  pragmas={stats['pragmas']}")
+
+def main():
+    greenlets = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    write_ratio = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    work_dir = tempfile.mkdtemp(prefix='bench_db_')
+    try:
+        print(f"{greenlets} greenlets, {duration}s, write_ratio={write_ratio}")
+        run('default', False, greenlets, duration, write_ratio, work_dir)
+        run('profile', True, greenlets, duration, write_ratio, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+HTTP客户端基准测试
+比较每次调用requests.get（每次新建连接）与共享连接池客户端（keep-alive）的请求延迟
+
+默认请求本地桩服务器（只体现TCP建连的开销）；传入HTTPS地址时可以看到省去TLS握手的效果
+用法: python benchmarks/bench_http_client.py [请求数] [URL]
+例如: python benchmarks/bench_http_client.py 200 https://api.github.com/zen
+"""
+
+import os
+import sys
+import time
+import threading
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.http_client import HttpClient
+
+class StubHandler(BaseHTTPRequestHandler):
+    """返回固定JSON的keep-alive服务器"""
+    protocol_version = 'HTTP/1.1'
+    # 响应头和body分两次写出，关闭Nagle避免与客户端的延迟ACK叠加出40ms等待
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"name": "main"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def percentile(values, fraction):
+    """取分位数"""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def measure(function, count):
+    """返回每次请求的耗时（毫秒）"""
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    url = sys.argv[2] if len(sys.argv) > 2 else None
+
+    server = None
+    if url is None:
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}/repos/owner/repo/branches'
+
+    client = HttpClient()
+    cases = [
+        ('requests.get（每次新建连接）', lambda: requests.get(url, timeout=10)),
+        ('HttpClient（连接池）', lambda: client.get(url)),
+    ]
+    try:
+        for name, function in cases:
+            times = measure(function, count)
+            print(f"{name:<28} p50 {percentile(times, 0.5):7.2f}ms  p95 {percentile(times, 0.95):7.2f}ms  "
+                  f"总计 {sum(times):8.0f}ms")
+    finally:
+        if server:
+            server.shutdown()
+
+if __name__ == '__main__':
+    main()
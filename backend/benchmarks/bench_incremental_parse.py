@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+编辑器按键到诊断结果的延迟基准测试
+在文件中间逐字符输入一行代码，比较每次按键都完整分析文件与语法树缓存增量重解析的耗时
+
+用法: python benchmarks/bench_incremental_parse.py [重复拼接次数]
+例如: python benchmarks/bench_incremental_parse.py 5
+"""
+
+import os
+import sys
+import glob
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.code_analysis_service import CodeAnalysisService
+from src.services.parse_tree_cache import ParseTreeCache
+
+SOURCE_PATTERN = os.path.join(os.path.dirname(__file__), '..', 'src', '**', '*.py')
+TYPED_LINE = "    result = helper(value, 'typed in the editor')  # TODO\n"
+
+def percentile(values, fraction):
+    """取分位数"""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    sources = []
+    for path in sorted(glob.glob(SOURCE_PATTERN, recursive=True)):
+        with open(path, 'r', encoding='utf-8') as f:
+            sources.append(f.read())
+    content = '\n'.join(sources) * copies
+    # 在文件中间的某一行开头输入
+    insert_at = content.index('\n', len(content) // 2) + 1
+
+    service = CodeAnalysisService()
+    cache = ParseTreeCache(analysis_service=service)
+    cache.open(1, 'bench.py', content)
+
+    full_times = []
+    incremental_times = []
+    text = content
+    for position, char in enumerate(TYPED_LINE):
+        offset = insert_at + position
+        text = text[:offset] + char + text[offset:]
+
+        start = time.perf_counter()
+        service.analyze_file('bench.py', text)
+        full_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        result = cache.apply_edits(1, 'bench.py', [{'offset': offset, 'length': 0, 'text': char}])
+        incremental_times.append(time.perf_counter() - start)
+        assert result['success']
+
+    assert cache._files[(1, 'bench.py')].text == text
+
+    print(f"Source: {len(content.encode('utf-8')) / 1024:.0f}KB, {content.count(chr(10))} lines, "
+          f"{len(TYPED_LINE)} keystrokes")
+    for name, times in [('full analyze_file', full_times), ('incremental', incremental_times)]:
+        print(f"{name:<18} p50={percentile(times, 0.5) * 1000:8.2f}ms  "
+              f"p95={percentile(times, 0.95) * 1000:8.2f}ms")
+    print(f"speedup (p50): {percentile(full_times, 0.5) / percentile(incremental_times, 0.5):.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+模型路由对冲请求基准测试
+模拟偶尔卡顿的主提供商（多数请求几十毫秒，少数卡住数秒）和一个稍慢但稳定的备用提供商，
+比较只调用主模型与开启对冲请求（超过主模型p95耗时后请求备用模型）时的延迟分位数
+
+用法: python benchmarks/bench_model_router.py [请求数] [卡顿比例]
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.model_router import ModelRouter
+
+def make_dispatch(stall_rate):
+    """主模型：30~60ms，按比例卡顿1秒；备用模型：60~90ms"""
+    def dispatch(model, prompt):
+        if model.startswith('claude'):
+            delay = 1.0 if random.random() < stall_rate else random.uniform(0.03, 0.06)
+        else:
+            delay = random.uniform(0.06, 0.09)
+        time.sleep(delay)
+        return model
+    return dispatch
+
+def percentile(values, fraction):
+    """取分位数"""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def run(name, router, count):
+    times, hedged = [], 0
+    for _ in range(count):
+        start = time.perf_counter()
+        _, model = router.call(['claude-3.7-sonnet', 'gpt-4.1-mini'], 'prompt')
+        times.append((time.perf_counter() - start) * 1000)
+        hedged += model != 'claude-3.7-sonnet'
+    slow = sum(1 for value in times if value > 500)
+    print(f"{name:<8} p50 {percentile(times, 0.5):6.0f}ms  p95 {percentile(times, 0.95):6.0f}ms  "
+          f"p99 {percentile(times, 0.99):6.0f}ms  超过500ms {slow:4d}  备用模型返回 {hedged}")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    stall_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.03
+    random.seed(7)
+
+    run('不对冲', ModelRouter(make_dispatch(stall_rate), fallback_enabled=True, hedge_enabled=False), count)
+    run('对冲', ModelRouter(make_dispatch(stall_rate), fallback_enabled=True, hedge_enabled=True,
+                          hedge_delay=0.1, hedge_min_samples=20), count)
+
+if __name__ == '__main__':
+    main()
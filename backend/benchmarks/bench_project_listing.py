@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+项目详情和文件列表接口基准测试
+比较返回全部文件内容和任务输入输出的旧实现与摘要字段+keyset分页的响应大小和耗时
+
+用法: python benchmarks/bench_project_listing.py [文件数] [任务数]
+例如: python benchmarks/bench_project_listing.py 20000 2000
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+from flask import Flask
+from sqlalchemy import insert
+from src.models.user import db, User
+from src.models.project import Project, CodeFile, AnalysisTask
+from src.services.blob_store import blob_store
+
+def populate(file_count, task_count):
+    """批量写入合成文件和任务"""
+    contents = {}
+    rows = []
+    for i in range(file_count):
+        content = f'def func_{i}(value):\n    return value * {i}\n' * 50
+        content_hash = blob_store.hash_content(content)
+        contents[content_hash] = content
+        rows.append({'file_path': f'pkg_{i // 200:03d}/module_{i:05d}.py', 'file_name': f'module_{i:05d}.py',
+                     'file_type': '.py', 'size': len(content), 'content_hash': content_hash,
+                     'analysis_result': json.dumps({'issues': ['long line'] * 20}), 'project_id': 1})
+    blob_store.put_many(contents)
+    db.session.execute(insert(CodeFile), rows)
+    db.session.execute(insert(AnalysisTask), [
+        {'task_type': 'analyze', 'input_data': json.dumps({'code': 'x' * 2000}),
+         'output_data': json.dumps({'analysis': 'y' * 8000}), 'status': 'completed', 'project_id': 1}
+        for _ in range(task_count)
+    ])
+    db.session.commit()
+
+def legacy_project(project_id):
+    """旧实现：返回所有文件（含内容）和所有任务（含输入输出）"""
+    project = db.session.get(Project, project_id)
+    code_files = CodeFile.query.filter_by(project_id=project_id).all()
+    blob_store.load_contents(code_files)
+    data = project.to_dict()
+    data['code_files'] = [file.to_dict(include_content=True) for file in code_files]
+    data['analysis_tasks'] = [task.to_dict() for task in AnalysisTask.query.filter_by(project_id=project_id).all()]
+    return json.dumps({'success': True, 'project': data}).encode('utf-8')
+
+def measure(label, func, repeat=3):
+    best, size = None, 0
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        size = len(func())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<28} time={best * 1000:9.1f}ms  response={size / 1024:10.1f}KB")
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    task_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    work_dir = tempfile.mkdtemp(prefix='bench_listing_')
+    try:
+        from src.routes.project import project_bp
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(work_dir, 'bench.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+        app.register_blueprint(project_bp, url_prefix='/api')
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(username='bench', email='bench@example.com'))
+            db.session.add(Project(name='bench', user_id=1))
+            db.session.commit()
+            populate(file_count, task_count)
+
+            client = app.test_client()
+            print(f"Synthetic project: {file_count} files, {task_count} tasks")
+            measure('legacy GET /projects/1', lambda: legacy_project(1))
+            measure('GET /projects/1', lambda: client.get('/api/projects/1').data)
+            measure('GET /projects/1/files', lambda: client.get('/api/projects/1/files').data)
+
+            # 翻到最后一页：keyset分页的每页耗时与页码无关
+            cursor, pages, start = None, 0, time.perf_counter()
+            while True:
+                data = client.get('/api/projects/1/files?fields=id,file_path&limit=1000'
+                                  + (f'&cursor={cursor}' if cursor else '')).get_json()
+                pages += 1
+                cursor = data['next_cursor']
+                if not cursor:
+                    break
+            elapsed = time.perf_counter() - start
+            print(f"{'walk all files (1000/page)':<28} time={elapsed * 1000:9.1f}ms  pages={pages}  "
+                  f"per_page={elapsed * 1000 / pages:.1f}ms")
+            db.session.remove()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
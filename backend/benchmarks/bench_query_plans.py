@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+热点查询随数据量增长的耗时基准测试
+比较迁移004之前（只有project_id单列索引）与复合索引schema下，按路径查找文件、
+文件列表第一页和任务列表第一页的耗时
+
+用法: python benchmarks/bench_query_plans.py [行数,行数,...]
+例如: python benchmarks/bench_query_plans.py 10000,100000,1000000
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import shutil
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+QUERIES = {
+    'lookup by path': ('SELECT id, content_hash FROM code_file WHERE project_id = ? AND file_path = ?', True),
+    'files first page': ('SELECT id, file_path, size FROM code_file WHERE project_id = ? '
+                         'ORDER BY file_path, id LIMIT 100', False),
+    'tasks first page': ('SELECT id, status, created_at FROM analysis_task WHERE project_id = ? '
+                         'ORDER BY created_at DESC, id DESC LIMIT 100', False),
+}
+
+def build(path, rows, migrations):
+    """按迁移脚本建表并写入合成数据（两个项目各一半）"""
+    conn = sqlite3.connect(path)
+    for migration in migrations:
+        with open(os.path.join(MIGRATIONS_DIR, migration), encoding='utf-8') as f:
+            conn.executescript(f.read())
+    conn.executemany(
+        'INSERT INTO code_file (file_path, file_name, file_type, size, content_hash, project_id) VALUES (?, ?, ?, ?, ?, ?)',
+        ((f'pkg_{i // 500:05d}/module_{i:07d}.py', f'module_{i:07d}.py', '.py', 1000, f'{i:064x}', 1 + i % 2)
+         for i in range(rows))
+    )
+    conn.executemany(
+        'INSERT INTO analysis_task (task_type, status, created_at, project_id) VALUES (?, ?, ?, ?)',
+        (('analyze', 'completed', f'2026-01-01 00:00:{i % 60:02d}.{i:06d}', 1 + i % 2) for i in range(rows // 10))
+    )
+    conn.commit()
+    conn.execute('ANALYZE')
+    return conn
+
+def measure(conn, rows, repeat=200):
+    """每条查询的平均耗时（ms）和执行计划"""
+    results = {}
+    for name, (sql, by_path) in QUERIES.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            if by_path:
+                i = random.randrange(rows)
+                params = (1 + i % 2, f'pkg_{i // 500:05d}/module_{i:07d}.py')
+            else:
+                params = (1,)
+            conn.execute(sql, params).fetchall()
+        plan = '; '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+        results[name] = ((time.perf_counter() - start) * 1000 / repeat, plan)
+    return results
+
+def main():
+    sizes = [int(size) for size in (sys.argv[1] if len(sys.argv) > 1 else '10000,100000').split(',')]
+    schemas = {
+        'legacy': ['001_initial_schema.sql', '002_code_file_blob_sha.sql', '003_file_blob_store.sql'],
+        'indexed': ['001_initial_schema.sql', '002_code_file_blob_sha.sql', '003_file_blob_store.sql',
+                    '004_composite_indexes.sql'],
+    }
+    work_dir = tempfile.mkdtemp(prefix='bench_plans_')
+    try:
+        plans = {}
+        print(f"{'rows':>9} {'schema':<8} " + ''.join(f'{name:>18}' for name in QUERIES))
+        for rows in sizes:
+            for schema, migrations in schemas.items():
+                conn = build(os.path.join(work_dir, f'{schema}_{rows}.db'), rows, migrations)
+                results = measure(conn, rows)
+                conn.close()
+                print(f'{rows:>9} {schema:<8} ' + ''.join(f'{results[name][0]:>16.3f}ms' for name in QUERIES))
+                for name in QUERIES:
+                    plans[(schema, name)] = results[name][1]
+        print()
+        for (schema, name), plan in plans.items():
+            print(f'{schema:<8} {name:<18} {plan}')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
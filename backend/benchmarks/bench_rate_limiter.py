@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+AI提供商限流基准测试
+模拟一个最多同时处理8个请求、超出即返回429的提供商，比较不限流（429后抖动退避重试）与
+ProviderLimiter（并发上限 + 429后减半、成功后逐步恢复）完成同一批请求的耗时和429次数；
+并发上限配置得比实际高时，限流器根据429自适应收敛
+
+用法: python benchmarks/bench_rate_limiter.py [请求数] [客户端线程数]
+"""
+
+import os
+import sys
+import time
+import random
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.rate_limiter import ProviderLimiter
+
+PROVIDER_CONCURRENCY = 8
+PROVIDER_LATENCY = 0.02
+
+class RateLimitError(Exception):
+    status_code = 429
+    response = SimpleNamespace(headers={'retry-after-ms': '100'})
+
+class SimulatedProvider:
+    """同时处理的请求超过上限时返回429"""
+
+    def __init__(self):
+        self.active = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def call(self):
+        with self.lock:
+            if self.active >= PROVIDER_CONCURRENCY:
+                self.rejected += 1
+                raise RateLimitError('429 Too Many Requests')
+            self.active += 1
+        try:
+            time.sleep(PROVIDER_LATENCY)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+def unlimited(provider):
+    """不限流：429后抖动退避重试"""
+    attempt = 0
+    while True:
+        try:
+            return provider.call()
+        except RateLimitError:
+            time.sleep(random.uniform(0, min(2.0, 0.1 * 2 ** attempt)))
+            attempt += 1
+
+def limited(provider, limiter):
+    """经过限流器：429时按Retry-After暂停并重新排队"""
+    while True:
+        with limiter.acquire():
+            try:
+                provider.call()
+            except RateLimitError as e:
+                limiter.record_rate_limited(e.response.headers)
+                continue
+        limiter.record_success()
+        return
+
+def run(name, function, count, workers):
+    provider = SimulatedProvider()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda _: function(provider), range(count)))
+    elapsed = time.perf_counter() - start
+    ideal = count / PROVIDER_CONCURRENCY * PROVIDER_LATENCY
+    print(f"{name:<10} 耗时 {elapsed * 1000:7.0f}ms（理想 {ideal * 1000:.0f}ms）  "
+          f"吞吐 {count / elapsed:6.1f}/s  429次数 {provider.rejected}")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    run('不限流', unlimited, count, workers)
+    # 并发上限配置正确，以及配置为实际上限的两倍（靠429自适应收敛）
+    for name, concurrency in [('限流器', PROVIDER_CONCURRENCY), ('限流器x2', PROVIDER_CONCURRENCY * 2)]:
+        limiter = ProviderLimiter('simulated', max_concurrency=concurrency, max_wait=60)
+        run(name, lambda provider: limited(provider, limiter), count, workers)
+        stats = limiter.get_stats()
+        print(f"{'':<10} 最大排队 {stats['max_queue_depth']}  平均等待 {stats['avg_wait_ms']}ms  "
+              f"结束时并发上限 {stats['max_concurrency']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+文件扫描入库基准测试
+比较逐行查询/插入的旧实现与批量入库实现的吞吐量（rows/s）
+
+用法: python benchmarks/bench_scan_project_files.py [文件数] [批大小]
+例如: python benchmarks/bench_scan_project_files.py 20000 1000
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+from flask import Flask
+from src.models.user import db, User
+from src.models.project import Project, CodeFile
+from src.services.ingest_service import FileIngestService
+
+def legacy_scan(project_id, project_path):
+    """旧实现：每个文件一次查询，逐行add"""
+    files_added = 0
+    for root, dirs, files in os.walk(project_path):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['node_modules', '__pycache__', 'venv', 'env']]
+        for file in files:
+            if file.startswith('.'):
+                continue
+            file_path = os.path.join(root, file)
+            relative_path = os.path.relpath(file_path, project_path)
+            file_ext = os.path.splitext(file)[1].lower()
+            if file_ext in ['.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.rs']:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                existing_file = CodeFile.query.filter_by(project_id=project_id, file_path=relative_path).first()
+                if not existing_file:
+                    db.session.add(CodeFile(
+                        file_path=relative_path,
+                        file_name=file,
+                        file_type=file_ext,
+                        content=content,
+                        size=len(content.encode('utf-8')),
+                        last_modified=datetime.fromtimestamp(os.path.getmtime(file_path)),
+                        project_id=project_id
+                    ))
+                    files_added += 1
+    db.session.commit()
+    return {'files_added': files_added}
+
+def make_project(root, file_count):
+    """生成合成项目"""
+    for i in range(file_count):
+        package = os.path.join(root, f'pkg_{i // 200:03d}')
+        os.makedirs(package, exist_ok=True)
+        with open(os.path.join(package, f'module_{i:05d}.py'), 'w', encoding='utf-8') as f:
+            f.write(f'def func_{i}(value):\n    return value * {i}\n' * 20)
+
+def run(label, scan, project_path, db_path):
+    """在全新的SQLite文件数据库上运行一次扫描"""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    app = Flask(label)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', email='bench@example.com'))
+        db.session.add(Project(name='bench', user_id=1))
+        db.session.commit()
+
+        timings = []
+        for attempt in ['initial', 'rescan']:
+            start = time.perf_counter()
+            scan(1, project_path)
+            timings.append((attempt, time.perf_counter() - start))
+        rows = CodeFile.query.count()
+        db.session.remove()
+        db.engine.dispose()
+
+    for attempt, elapsed in timings:
+        print(f"{label:<8} {attempt:<8} rows={rows:>6}  time={elapsed:8.2f}s  rows/s={rows / elapsed:10.1f}")
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    workdir = tempfile.mkdtemp(prefix='bench_scan_')
+    try:
+        project_path = os.path.join(workdir, 'project')
+        make_project(project_path, file_count)
+        db_path = os.path.join(workdir, 'bench.db')
+
+        print(f"Synthetic project: {file_count} files, batch_size={batch_size}")
+        run('legacy', legacy_scan, project_path, db_path)
+        run('bulk', FileIngestService(batch_size=batch_size).scan_project_files, project_path, db_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+代码检索索引基准测试
+生成合成项目，测量建立索引（三元组和符号）的耗时，以及内容检索和符号检索的延迟，
+并与逐个读取全部文件的暴力检索对比
+
+用法: python benchmarks/bench_search_index.py [文件数] [查询数]
+例如: python benchmarks/bench_search_index.py 50000 50
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+from src.services.search_index import SearchIndexService
+
+WORDS = ['user', 'order', 'payment', 'cache', 'token', 'request', 'session', 'config', 'parse', 'render',
+         'account', 'invoice', 'report', 'mirror', 'branch', 'commit', 'project', 'task', 'queue', 'worker']
+
+def synthetic_file(rng, number):
+    """生成带有若干函数和一个类的Python文件，每个文件有一个独有的标识符"""
+    lines = [f'import {rng.choice(WORDS)}', '', f'class {rng.choice(WORDS).title()}Handler{number}:']
+    for index in range(8):
+        name = f'{rng.choice(WORDS)}_{rng.choice(WORDS)}_{index}'
+        lines.append(f'    def {name}(self, {rng.choice(WORDS)}):')
+        lines.append(f'        value = self.{rng.choice(WORDS)}.get({rng.choice(WORDS)}_id)')
+        lines.append(f'        # handle {rng.choice(WORDS)} {rng.choice(WORDS)}')
+        lines.append(f'        return value')
+    lines.append(f'def unique_marker_{number:06d}():')
+    lines.append('    return None')
+    return '\n'.join(lines) + '\n'
+
+def percentile(values, fraction):
+    """取分位数"""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def timed(function, repeats):
+    """多次执行，返回(p50, p95)毫秒"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return percentile(times, 0.5), percentile(times, 0.95)
+
+def brute_force(root, paths, pattern):
+    """旧方式：逐个读取全部文件查找匹配"""
+    matches = 0
+    for path in paths:
+        with open(os.path.join(root, path), 'r', encoding='utf-8') as f:
+            if pattern.search(f.read()):
+                matches += 1
+    return matches
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    query_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rng = random.Random(42)
+
+    root = tempfile.mkdtemp()
+    index_dir = tempfile.mkdtemp()
+    try:
+        files = {}
+        for number in range(file_count):
+            path = f'pkg_{number // 500}/module_{number}.py'
+            files[path] = synthetic_file(rng, number)
+            os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(root, path), 'w', encoding='utf-8') as f:
+                f.write(files[path])
+        print(f"文件数: {file_count}, 总大小: {sum(len(c) for c in files.values()) / 1e6:.1f} MB")
+
+        service = SearchIndexService(index_dir=index_dir)
+        start = time.perf_counter()
+        paths = list(files)
+        for batch_start in range(0, len(paths), 1000):
+            batch = {path: files[path] for path in paths[batch_start:batch_start + 1000]}
+            service.update_files(1, batch, save=batch_start + 1000 >= len(paths))
+        print(f"建立索引: {time.perf_counter() - start:.1f}s, {service.get_stats(1)}")
+
+        # 重新加载（内存映射）
+        start = time.perf_counter()
+        service = SearchIndexService(index_dir=index_dir)
+        service.get_stats(1)
+        print(f"加载索引: {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        markers = [f'unique_marker_{rng.randrange(file_count):06d}' for _ in range(query_count)]
+        queries = iter(markers * 3)
+        cases = [
+            ('内容检索 罕见标识符', lambda: service.search(1, root, next(queries))),
+            ('内容检索 常见词 limit=50', lambda: service.search(1, root, 'payment_token', limit=50)),
+            ('内容检索 正则', lambda: service.search(1, root, r'def (cache|mirror)_branch_\d+', regex=True)),
+            ('符号检索 前缀', lambda: service.search_symbols(1, next(queries)[:16])),
+            ('符号检索 类+正则', lambda: service.search_symbols(1, r'^Payment\w*Handler4\d{4}$', regex=True,
+                                                            kind='class')),
+        ]
+        for name, function in cases:
+            p50, p95 = timed(function, query_count)
+            print(f"{name:<24} p50 {p50:7.2f}ms  p95 {p95:7.2f}ms")
+
+        pattern = re.compile(re.escape(markers[0]))
+        start = time.perf_counter()
+        brute_force(root, paths, pattern)
+        print(f"{'暴力读取全部文件':<24} {(time.perf_counter() - start) * 1000:7.0f}ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tree-sitter语法分析基准测试
+比较原来的递归遍历（node.children + 整段源码作为名称）与TreeCursor迭代遍历的耗时和结果大小
+
+用法: python benchmarks/bench_syntax_analysis.py [重复拼接次数] [重复次数]
+例如: python benchmarks/bench_syntax_analysis.py 50 3
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.code_analysis_service import CodeAnalysisService
+
+SOURCE_PATTERN = os.path.join(os.path.dirname(__file__), '..', 'src', '**', '*.py')
+
+def legacy_walk(tree, content):
+    """原实现：递归遍历所有子节点，名称为整个定义的源码"""
+    analysis = {'functions': [], 'classes': []}
+
+    def traverse(node):
+        if node.type == 'function_definition':
+            analysis['functions'].append({
+                'name': content[node.start_byte:node.end_byte],
+                'start_line': node.start_point[0] + 1,
+                'end_line': node.end_point[0] + 1
+            })
+        elif node.type == 'class_definition':
+            analysis['classes'].append({
+                'name': content[node.start_byte:node.end_byte],
+                'start_line': node.start_point[0] + 1,
+                'end_line': node.end_point[0] + 1
+            })
+        for child in node.children:
+            traverse(child)
+
+    traverse(tree.root_node)
+    return analysis
+
+def cursor_walk(service, tree, skip_types):
+    """TreeCursor迭代遍历"""
+    analysis = {'parse_errors': [], 'functions': [], 'classes': [], 'imports': []}
+    service._walk_tree(tree, service.parser_registry.get_spec('python'), skip_types, analysis)
+    return analysis
+
+def measure(func, repeat):
+    """返回最好一次的耗时和结果"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    sources = []
+    for path in sorted(glob.glob(SOURCE_PATTERN, recursive=True)):
+        with open(path, 'r', encoding='utf-8') as f:
+            sources.append(f.read())
+    content = '\n'.join(sources) * copies
+    service = CodeAnalysisService()
+    parser = service.parser_registry.get_parser('python')
+    parse_time, tree = measure(lambda: parser.parse(bytes(content, 'utf8')), repeat)
+    skip_types = service.parser_registry.get_spec('python')['skip']
+
+    # 只比较遍历本身，解析只做一次
+    cases = [
+        ('recursive', lambda: legacy_walk(tree, content)),
+        ('cursor (full tree)', lambda: cursor_walk(service, tree, set())),
+        ('cursor (skip subtrees)', lambda: cursor_walk(service, tree, skip_types))
+    ]
+
+    print(f"Source: {len(content.encode('utf-8')) / (1024 * 1024):.1f}MB, {content.count(chr(10))} lines, "
+          f"parse={parse_time:.3f}s")
+    baseline = None
+    for name, func in cases:
+        elapsed, result = measure(func, repeat)
+        baseline = baseline or elapsed
+        size = len(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        print(f"{name:<24} walk={elapsed:7.3f}s  speedup={baseline / elapsed:6.1f}x  "
+              f"functions={len(result['functions']):>6}  json={size / 1024:9.1f}KB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+-- Initial database schema for Coding Agent (PostgreSQL)
+-- Created: 2026-10-17
+
+-- Users table
+CREATE TABLE IF NOT EXISTS "user" (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(80) UNIQUE NOT NULL,
+    email VARCHAR(120) UNIQUE NOT NULL,
+    password_hash VARCHAR(128),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Projects table
+CREATE TABLE IF NOT EXISTS project (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    description TEXT,
+    github_url VARCHAR(500),
+    local_path VARCHAR(500),
+    status VARCHAR(20) DEFAULT 'created',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    user_id INTEGER REFERENCES "user" (id)
+);
+
+-- Analysis tasks table
+CREATE TABLE IF NOT EXISTS analysis_task (
+    id SERIAL PRIMARY KEY,
+    task_type VARCHAR(50) NOT NULL,
+    description TEXT,
+    file_path VARCHAR(500),
+    input_data TEXT,
+    output_data TEXT,
+    ai_model VARCHAR(50),
+    status VARCHAR(20) DEFAULT 'pending',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP,
+    project_id INTEGER NOT NULL REFERENCES project (id)
+);
+
+-- Code files table
+CREATE TABLE IF NOT EXISTS code_file (
+    id SERIAL PRIMARY KEY,
+    file_path VARCHAR(500) NOT NULL,
+    file_name VARCHAR(255) NOT NULL,
+    file_type VARCHAR(50),
+    content TEXT,
+    size INTEGER,
+    last_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    analysis_result TEXT,
+    project_id INTEGER NOT NULL REFERENCES project (id)
+);
+
+-- Create indexes for better performance
+CREATE INDEX IF NOT EXISTS idx_project_user_id ON project(user_id);
+CREATE INDEX IF NOT EXISTS idx_analysis_task_project_id ON analysis_task(project_id);
+CREATE INDEX IF NOT EXISTS idx_code_file_project_id ON code_file(project_id);
+CREATE INDEX IF NOT EXISTS idx_project_status ON project(status);
+CREATE INDEX IF NOT EXISTS idx_analysis_task_status ON analysis_task(status);
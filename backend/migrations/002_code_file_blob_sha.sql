@@ -0,0 +1,4 @@
+-- Track git blob SHA per code file for incremental scans
+-- Created: 2026-10-17
+
+ALTER TABLE code_file ADD COLUMN blob_sha VARCHAR(40);
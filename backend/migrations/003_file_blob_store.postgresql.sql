@@ -0,0 +1,24 @@
+-- Move code file contents into a content-addressed blob table (PostgreSQL)
+-- Created: 2026-10-17
+
+CREATE TABLE IF NOT EXISTS file_blob (
+    hash VARCHAR(64) PRIMARY KEY,
+    codec VARCHAR(10) NOT NULL,
+    size INTEGER NOT NULL,
+    data BYTEA NOT NULL
+);
+
+ALTER TABLE code_file ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+CREATE INDEX IF NOT EXISTS ix_code_file_content_hash ON code_file(content_hash);
+
+-- Store existing contents uncompressed, keyed by SHA-256 (deduplicated)
+INSERT INTO file_blob (hash, codec, size, data)
+SELECT DISTINCT encode(sha256(convert_to(content, 'UTF8')), 'hex'), 'none',
+       octet_length(convert_to(content, 'UTF8')), convert_to(content, 'UTF8')
+FROM code_file WHERE content IS NOT NULL
+ON CONFLICT (hash) DO NOTHING;
+
+UPDATE code_file SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+WHERE content IS NOT NULL;
+
+ALTER TABLE code_file DROP COLUMN content;
@@ -0,0 +1,21 @@
+-- Move code file contents into a content-addressed blob table
+-- Created: 2026-10-17
+
+CREATE TABLE IF NOT EXISTS file_blob (
+    hash VARCHAR(64) PRIMARY KEY,
+    codec VARCHAR(10) NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+
+ALTER TABLE code_file ADD COLUMN content_hash VARCHAR(64);
+CREATE INDEX IF NOT EXISTS ix_code_file_content_hash ON code_file(content_hash);
+
+-- SQLite has no SHA-256: keep existing contents uncompressed under a per-row key,
+-- the next rescan that touches the file stores it under its real hash
+INSERT INTO file_blob (hash, codec, size, data)
+SELECT 'legacy-' || id, 'none', length(CAST(content AS BLOB)), CAST(content AS BLOB)
+FROM code_file WHERE content IS NOT NULL;
+
+UPDATE code_file SET content_hash = 'legacy-' || id WHERE content IS NOT NULL;
+UPDATE code_file SET content = NULL;
@@ -0,0 +1,19 @@
+-- Composite indexes for project-scoped lookups and listings
+-- Created: 2026-10-17
+
+-- Keep the newest row for duplicated (project_id, file_path) before adding the unique index
+DELETE FROM code_file
+WHERE id NOT IN (SELECT MAX(id) FROM code_file GROUP BY project_id, file_path);
+
+DELETE FROM file_blob
+WHERE hash NOT IN (SELECT content_hash FROM code_file WHERE content_hash IS NOT NULL);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_code_file_project_path ON code_file(project_id, file_path);
+DROP INDEX IF EXISTS idx_code_file_project_id;
+
+CREATE INDEX IF NOT EXISTS idx_analysis_task_project_created ON analysis_task(project_id, created_at);
+DROP INDEX IF EXISTS idx_analysis_task_project_id;
+CREATE INDEX IF NOT EXISTS idx_analysis_task_status ON analysis_task(status);
+
+-- Refresh planner statistics
+ANALYZE;
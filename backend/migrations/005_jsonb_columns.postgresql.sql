@@ -0,0 +1,5 @@
+-- Store analysis results and task output as JSONB (PostgreSQL only, SQLite keeps TEXT)
+-- Created: 2026-10-17
+
+ALTER TABLE code_file ALTER COLUMN analysis_result TYPE JSONB USING analysis_result::jsonb;
+ALTER TABLE analysis_task ALTER COLUMN output_data TYPE JSONB USING output_data::jsonb;
@@ -2,124 +2,150 @@
 """
 数据库迁移工具
 用于管理数据库schema的版本控制和迁移
+
+按 DATABASE_URL 连接数据库（默认与 src/main.py 相同的SQLite文件），支持SQLite和PostgreSQL。
+迁移文件 NNN_name.sql 对所有数据库生效；存在 NNN_name.<方言>.sql（如 .postgresql.sql）时
+该数据库改用这个文件，只有方言文件的迁移只在该数据库上执行。迁移记录统一使用 NNN_name.sql
 """
 
 import os
-import sqlite3
+import re
 import sys
 from pathlib import Path
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+# NNN_name.sql 或 NNN_name.<方言>.sql
+MIGRATION_PATTERN = re.compile(r'^(\d+_[^.]+)(?:\.(\w+))?\.sql$')
+
+def get_database_url():
+    """获取数据库URL（与 src/main.py 的默认值一致）"""
+    project_root = Path(__file__).parent.parent
+    db_path = os.path.join(project_root, 'database', 'app.db')
+    url = os.getenv('DATABASE_URL', f'sqlite:///{db_path}')
+    parsed = make_url(url)
+    if parsed.get_backend_name() == 'sqlite' and parsed.database and parsed.database != ':memory:':
+        # 确保数据库目录存在
+        os.makedirs(os.path.dirname(os.path.abspath(parsed.database)), exist_ok=True)
+    return url
 
-def get_db_connection(db_path):
-    """获取数据库连接"""
-    return sqlite3.connect(db_path)
+def get_db_connection(database_url):
+    """获取数据库引擎"""
+    return create_engine(database_url)
 
-def create_migration_table(conn):
+def create_migration_table(engine):
     """创建迁移记录表"""
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS migrations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            filename VARCHAR(255) UNIQUE NOT NULL,
-            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-
-def get_applied_migrations(conn):
+    id_column = 'id SERIAL PRIMARY KEY' if engine.dialect.name == 'postgresql' \
+        else 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f'''
+            CREATE TABLE IF NOT EXISTS migrations (
+                {id_column},
+                filename VARCHAR(255) UNIQUE NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+def get_applied_migrations(engine):
     """获取已应用的迁移"""
-    cursor = conn.cursor()
-    cursor.execute('SELECT filename FROM migrations ORDER BY id')
-    return [row[0] for row in cursor.fetchall()]
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text('SELECT filename FROM migrations ORDER BY id'))]
 
-def get_pending_migrations(migrations_dir, applied_migrations):
-    """获取待应用的迁移"""
-    migration_files = []
+def get_pending_migrations(migrations_dir, applied_migrations, dialect='sqlite'):
+    """获取待应用的迁移，返回 [(迁移记录名, 要执行的文件名)]"""
+    migrations = {}
     for file in sorted(os.listdir(migrations_dir)):
-        if file.endswith('.sql') and file not in applied_migrations:
-            migration_files.append(file)
-    return migration_files
+        match = MIGRATION_PATTERN.match(file)
+        if not match:
+            continue
+        name, file_dialect = match.group(1), match.group(2)
+        if file_dialect is None:
+            migrations.setdefault(name, file)
+        elif file_dialect == dialect:
+            migrations[name] = file
+
+    return [
+        (f'{name}.sql', file)
+        for name, file in sorted(migrations.items())
+        if f'{name}.sql' not in applied_migrations
+    ]
 
-def apply_migration(conn, migration_file, migrations_dir):
+def apply_migration(engine, migration, migration_file, migrations_dir):
     """应用单个迁移"""
     migration_path = os.path.join(migrations_dir, migration_file)
-    
+
     print(f"Applying migration: {migration_file}")
-    
+
     with open(migration_path, 'r', encoding='utf-8') as f:
         migration_sql = f.read()
-    
-    cursor = conn.cursor()
+
     try:
-        # 执行迁移SQL
-        cursor.executescript(migration_sql)
-        
-        # 记录迁移
-        cursor.execute(
-            'INSERT INTO migrations (filename) VALUES (?)',
-            (migration_file,)
-        )
-        
-        conn.commit()
+        if engine.dialect.name == 'sqlite':
+            # sqlite3一次只能执行一条语句，脚本通过executescript执行
+            with engine.connect() as conn:
+                raw = conn.connection.dbapi_connection
+                raw.executescript(migration_sql)
+                raw.execute('INSERT INTO migrations (filename) VALUES (?)', (migration,))
+                raw.commit()
+        else:
+            # PostgreSQL的DDL支持事务，整个迁移原子执行
+            with engine.begin() as conn:
+                conn.exec_driver_sql(migration_sql)
+                conn.execute(text('INSERT INTO migrations (filename) VALUES (:filename)'), {'filename': migration})
+
         print(f"✓ Successfully applied: {migration_file}")
-        
+
     except Exception as e:
-        conn.rollback()
         print(f"✗ Failed to apply {migration_file}: {str(e)}")
         raise
 
-def main():
+def main(argv=None):
     """主函数"""
-    # 获取项目根目录
-    project_root = Path(__file__).parent.parent
-    migrations_dir = os.path.join(project_root, 'migrations')
-    db_path = os.path.join(project_root, 'src', 'database', 'app.db')
-    
-    # 确保数据库目录存在
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    
+    argv = sys.argv[1:] if argv is None else argv
+    migrations_dir = os.path.dirname(os.path.abspath(__file__))
+
     # 连接数据库
-    conn = get_db_connection(db_path)
-    
+    engine = get_db_connection(get_database_url())
+
     try:
         # 创建迁移记录表
-        create_migration_table(conn)
-        
+        create_migration_table(engine)
+
         # 获取已应用和待应用的迁移
-        applied_migrations = get_applied_migrations(conn)
-        pending_migrations = get_pending_migrations(migrations_dir, applied_migrations)
-        
+        applied_migrations = get_applied_migrations(engine)
+        pending_migrations = get_pending_migrations(migrations_dir, applied_migrations, engine.dialect.name)
+
         if not pending_migrations:
             print("No pending migrations.")
             return
-        
-        print(f"Found {len(pending_migrations)} pending migrations:")
-        for migration in pending_migrations:
-            print(f"  - {migration}")
-        
+
+        print(f"Found {len(pending_migrations)} pending migrations ({engine.dialect.name}):")
+        for _, migration_file in pending_migrations:
+            print(f"  - {migration_file}")
+
         # 确认是否继续
-        if len(sys.argv) > 1 and sys.argv[1] == '--auto':
+        if '--auto' in argv:
             proceed = True
         else:
             response = input("\nProceed with migrations? (y/N): ")
             proceed = response.lower() in ['y', 'yes']
-        
+
         if not proceed:
             print("Migration cancelled.")
             return
-        
+
         # 应用迁移
-        for migration in pending_migrations:
-            apply_migration(conn, migration, migrations_dir)
-        
+        for migration, migration_file in pending_migrations:
+            apply_migration(engine, migration, migration_file, migrations_dir)
+
         print(f"\n✓ Successfully applied {len(pending_migrations)} migrations.")
-        
+
     except Exception as e:
         print(f"\n✗ Migration failed: {str(e)}")
         sys.exit(1)
-        
+
     finally:
-        conn.close()
+        engine.dispose()
 
 if __name__ == '__main__':
     main()
-
@@ -48,11 +48,36 @@ database_path = os.path.join(os.path.dirname(__file__), '..', 'database', 'app.d
 database_url = os.getenv('DATABASE_URL', f"sqlite:///{database_path}")
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+
+# SQLite连接配置（WAL、pragma、连接池和只读连接池）
+from src.services.db_profile import db_profile
+db_profile.init_app(app, db)
 
 # 导入所有模型以确保表被创建
 from src.models.project import Project, AnalysisTask, CodeFile
 
+# 数据库连接状态
+@app.route('/api/database/stats')
+def database_stats():
+    """数据库连接池、写锁等待和pragma统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': db_profile.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# 后台任务服务（克隆、仓库分析等耗时操作）
+from src.services.job_service import job_service
+job_service.init_app(app, socketio)
+
+# 编辑器中打开文件的语法树缓存（增量重解析）
+from src.services.parse_tree_cache import parse_tree_cache
+
 # 健康检查端点
 @app.route('/api/health')
 def health_check():
@@ -132,6 +157,46 @@ def handle_analysis_progress(data):
             'message': message
         }, room=f'project_{project_id}')
 
+@socketio.on('file_open')
+def handle_file_open(data):
+    """编辑器打开文件：缓存语法树并返回整个文件的诊断"""
+    from flask_socketio import emit
+    project_id = data.get('project_id')
+    file_path = data.get('file_path')
+    if not project_id or not file_path:
+        emit('file_diagnostics', {'success': False, 'error': 'Project ID and file path are required'})
+        return
+
+    content = data.get('content')
+    if content is None:
+        code_file = CodeFile.query.filter_by(project_id=project_id, file_path=file_path).first()
+        if code_file is None or code_file.content is None:
+            emit('file_diagnostics', {'success': False, 'file_path': file_path, 'error': 'File not found'})
+            return
+        content = code_file.content
+
+    emit('file_diagnostics', parse_tree_cache.open(project_id, file_path, content, data.get('version')))
+
+@socketio.on('file_edit')
+def handle_file_edit(data):
+    """编辑器修改文件：增量重解析并只返回变更区域的诊断"""
+    from flask_socketio import emit
+    project_id = data.get('project_id')
+    file_path = data.get('file_path')
+    try:
+        result = parse_tree_cache.apply_edits(project_id, file_path, data.get('edits') or [], data.get('version'))
+    except Exception as e:
+        logger.error(f'Incremental parse failed for {file_path}: {str(e)}')
+        parse_tree_cache.close(project_id, file_path)
+        result = {'success': False, 'error': str(e), 'resync': True}
+    result.setdefault('file_path', file_path)
+    emit('file_diagnostics', result)
+
+@socketio.on('file_close')
+def handle_file_close(data):
+    """编辑器关闭文件：释放缓存的语法树"""
+    parse_tree_cache.close(data.get('project_id'), data.get('file_path'))
+
 if __name__ == '__main__':
     # 确保必要的目录存在 - 使用相对路径
     os.makedirs('database', exist_ok=True)
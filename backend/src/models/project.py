@@ -1,7 +1,38 @@
+import json
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
 from src.models.user import db
 
+class JSONText(db.TypeDecorator):
+    """JSON字符串列：PostgreSQL上保存为JSONB，其他数据库保存为TEXT，读写时都是JSON字符串"""
+    impl = db.Text
+    cache_ok = True
+    
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(JSONB(none_as_null=True))
+        return dialect.type_descriptor(db.Text())
+    
+    def process_bind_param(self, value, dialect):
+        if dialect.name == 'postgresql' and isinstance(value, str):
+            try:
+                return json.loads(value)
+            except ValueError:
+                # 不是JSON的文本按JSON字符串保存
+                return value
+        return value
+    
+    def process_result_value(self, value, dialect):
+        if dialect.name == 'postgresql' and value is not None:
+            return json.dumps(value, ensure_ascii=False)
+        return value
+
 class Project(db.Model):
+    __table_args__ = (
+        db.Index('idx_project_user_id', 'user_id'),
+        db.Index('idx_project_status', 'status'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
@@ -32,13 +63,19 @@ class Project(db.Model):
         }
 
 class AnalysisTask(db.Model):
+    __table_args__ = (
+        # 项目任务列表按创建时间倒序分页
+        db.Index('idx_analysis_task_project_created', 'project_id', 'created_at'),
+        db.Index('idx_analysis_task_status', 'status'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     task_type = db.Column(db.String(50), nullable=False)  # analyze, modify, generate, review
     description = db.Column(db.Text)
     file_path = db.Column(db.String(500))
     status = db.Column(db.String(20), default='pending')  # pending, running, completed, failed
     input_data = db.Column(db.Text)  # JSON格式的输入数据
-    output_data = db.Column(db.Text)  # JSON格式的输出数据
+    output_data = db.Column(JSONText)  # JSON格式的输出数据
     ai_model = db.Column(db.String(50))  # 使用的AI模型
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
@@ -63,29 +100,70 @@ class AnalysisTask(db.Model):
         }
 
 class CodeFile(db.Model):
+    __table_args__ = (
+        # 按 (项目, 路径) 查找文件，同一项目内路径唯一；也用于按路径排序的文件列表
+        db.Index('idx_code_file_project_path', 'project_id', 'file_path', unique=True),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     file_path = db.Column(db.String(500), nullable=False)
     file_name = db.Column(db.String(200), nullable=False)
     file_type = db.Column(db.String(50))  # python, javascript, etc.
-    content = db.Column(db.Text)
+    content_hash = db.Column(db.String(64), index=True)  # 文件内容在file_blob表中的SHA-256
     size = db.Column(db.Integer)
     last_modified = db.Column(db.DateTime)
-    analysis_result = db.Column(db.Text)  # JSON格式的分析结果
+    analysis_result = db.Column(JSONText)  # JSON格式的分析结果
+    blob_sha = db.Column(db.String(40))  # git blob SHA，用于增量扫描
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
     
     def __repr__(self):
         return f'<CodeFile {self.file_name}>'
     
-    def to_dict(self):
-        return {
+    @property
+    def content(self):
+        """文件内容，首次访问时按content_hash从blob存储加载"""
+        cached = self.__dict__.get('_loaded_content')
+        if cached is None or cached[0] != self.content_hash:
+            from src.services.blob_store import blob_store
+            self.set_loaded_content(blob_store.get(self.content_hash) if self.content_hash else None)
+            cached = self.__dict__['_loaded_content']
+        return cached[1]
+    
+    @content.setter
+    def content(self, value):
+        """写入blob存储并更新content_hash（随会话一起提交）"""
+        from src.services.blob_store import blob_store
+        self.content_hash = blob_store.put(value) if value is not None else None
+        self.set_loaded_content(value)
+    
+    def set_loaded_content(self, value):
+        """记录已加载的内容（与当前content_hash对应）"""
+        self.__dict__['_loaded_content'] = (self.content_hash, value)
+    
+    def to_dict(self, include_content=False):
+        data = {
             'id': self.id,
             'file_path': self.file_path,
             'file_name': self.file_name,
             'file_type': self.file_type,
-            'content': self.content,
+            'content_hash': self.content_hash,
             'size': self.size,
             'last_modified': self.last_modified.isoformat() if self.last_modified else None,
             'analysis_result': self.analysis_result,
+            'blob_sha': self.blob_sha,
             'project_id': self.project_id
         }
+        if include_content:
+            data['content'] = self.content
+        return data
+
+class FileBlob(db.Model):
+    """按SHA-256去重的文件内容（codec为zstd、zlib或none）"""
+    hash = db.Column(db.String(64), primary_key=True)
+    codec = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.Integer, nullable=False)  # 解压后的字节数
+    data = db.Column(db.LargeBinary, nullable=False)
+    
+    def __repr__(self):
+        return f'<FileBlob {self.hash[:12]}>'
 
@@ -1,6 +1,11 @@
 from flask import Blueprint, request, jsonify
 from src.services.ai_service import ai_service
 from src.services.code_analysis_service import code_analysis_service
+from src.services.stream_service import stream_service
+from src.services.job_service import job_service, JobQueueFull
+from src.services.mirror_cache import mirror_cache
+from src.services.context_packer import context_packer, ANALYSIS_TERMS
+from src.services.blob_store import blob_store
 from src.models.user import db
 from src.models.project import AnalysisTask, CodeFile
 import json
@@ -12,6 +17,9 @@ from datetime import datetime
 
 ai_bp = Blueprint('ai', __name__)
 
+# 项目分析提示模板和项目概览占用的token数（从上下文预算中预留）
+PROJECT_PROMPT_RESERVE = 1000
+
 @ai_bp.route('/ai/supported-languages', methods=['GET'])
 def get_supported_languages():
     """获取支持的编程语言列表"""
@@ -112,6 +120,63 @@ def get_available_models():
             'error': str(e)
         }), 500
 
+@ai_bp.route('/ai/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """获取AI响应缓存统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': ai_service.get_cache_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@ai_bp.route('/ai/rate-limits', methods=['GET'])
+def get_rate_limit_stats():
+    """获取各AI提供商的限流统计（执行中、排队数、被限流次数、当前速率）"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': ai_service.get_rate_limit_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@ai_bp.route('/ai/routing', methods=['GET'])
+def get_routing_stats():
+    """获取模型路由统计（备用切换、对冲请求、各提供商的熔断状态和耗时）"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': ai_service.get_routing_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@ai_bp.route('/ai/cache', methods=['DELETE'])
+def clear_cache():
+    """清空AI响应缓存"""
+    try:
+        ai_service.response_cache.clear()
+        return jsonify({
+            'success': True,
+            'message': 'Response cache cleared'
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @ai_bp.route('/ai/analyze-code', methods=['POST'])
 def analyze_code():
     """分析代码"""
@@ -128,11 +193,12 @@ def analyze_code():
         file_type = data.get('file_type', 'python')
         model = data.get('model', 'claude-3.7-sonnet')
         project_id = data.get('project_id')
+        use_cache = data.get('use_cache', True)
         
         print(f"分析代码请求: file_type={file_type}, model={model}, project_id={project_id}")
         
         # AI分析
-        ai_result = ai_service.analyze_code(code, file_type, model)
+        ai_result = ai_service.analyze_code(code, file_type, model, use_cache=use_cache)
         
         # 将文件类型转换为正确的文件扩展名
         file_ext_map = {
@@ -175,7 +241,7 @@ def analyze_code():
             'type': 'analysis',
             'ai_analysis': ai_result,
             'syntax_analysis': ts_result,
-            'model_used': model,
+            'model_used': ai_result['model_used'],
             'file_type': file_type
         }
         
@@ -205,9 +271,29 @@ def generate_code():
         language = data.get('language', 'python')
         model = data.get('model', 'claude-3.7-sonnet')
         project_id = data.get('project_id')
+        use_cache = data.get('use_cache', True)
+        
+        # 流式模式：分块推送到项目房间（或指定的Socket.IO客户端）
+        if data.get('stream'):
+            room = f'project_{project_id}' if project_id else data.get('sid')
+            if not room:
+                return jsonify({
+                    'success': False,
+                    'error': 'Project ID or Socket.IO sid is required for streaming'
+                }), 400
+            
+            meta = {'model_used': model, 'language': language, 'project_id': project_id}
+            stream_id = stream_service.start_socketio_stream(
+                ai_service.generate_code_stream(description, language, model, use_cache=use_cache,
+                                                on_model=stream_service.model_recorder(meta)),
+                room,
+                meta,
+                on_complete=_generation_saver(description, language, meta, project_id)
+            )
+            return jsonify(dict(meta, success=True, stream_id=stream_id, room=room)), 202
         
         # 生成代码
-        result = ai_service.generate_code(description, language, model)
+        result = ai_service.generate_code(description, language, model, use_cache=use_cache)
         
         # 如果提供了项目ID，保存分析任务
         if project_id and result['success']:
@@ -219,7 +305,7 @@ def generate_code():
                     'language': language
                 }),
                 output_data=json.dumps(result),
-                ai_model=model,
+                ai_model=result['model_used'],
                 status='completed',
                 completed_at=datetime.utcnow(),
                 project_id=project_id
@@ -235,6 +321,67 @@ def generate_code():
             'error': str(e)
         }), 500
 
+@ai_bp.route('/ai/generate-code/stream', methods=['POST'])
+def generate_code_stream():
+    """生成代码的SSE流式接口（Socket.IO不可用时使用）"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('description'):
+            return jsonify({
+                'success': False,
+                'error': 'Code description is required'
+            }), 400
+        
+        description = data['description']
+        language = data.get('language', 'python')
+        model = data.get('model', 'claude-3.7-sonnet')
+        project_id = data.get('project_id')
+        
+        meta = {'model_used': model, 'language': language, 'project_id': project_id}
+        return stream_service.sse_response(
+            ai_service.generate_code_stream(description, language, model, use_cache=data.get('use_cache', True),
+                                            on_model=stream_service.model_recorder(meta)),
+            meta=meta,
+            on_complete=_generation_saver(description, language, meta, project_id)
+        )
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def _generation_saver(description, language, meta, project_id):
+    """返回流式生成结束后保存分析任务的回调（模型取自流结束时meta中实际回答的模型）"""
+    if not project_id:
+        return None
+    
+    def save(code):
+        model = meta['model_used']
+        task = AnalysisTask(
+            task_type='generate',
+            description=f'Code generation: {description}',
+            input_data=json.dumps({
+                'description': description,
+                'language': language
+            }),
+            output_data=json.dumps({
+                'success': True,
+                'code': code,
+                'language': language,
+                'model_used': model
+            }),
+            ai_model=model,
+            status='completed',
+            completed_at=datetime.utcnow(),
+            project_id=project_id
+        )
+        db.session.add(task)
+        db.session.commit()
+    
+    return save
+
 @ai_bp.route('/ai/modify-code', methods=['POST'])
 def modify_code():
     """修改代码"""
@@ -252,9 +399,10 @@ def modify_code():
         file_type = data.get('file_type', 'python')
         model = data.get('model', 'claude-3.7-sonnet')
         project_id = data.get('project_id')
+        use_cache = data.get('use_cache', True)
         
         # 修改代码
-        result = ai_service.modify_code(original_code, modification_request, file_type, model)
+        result = ai_service.modify_code(original_code, modification_request, file_type, model, use_cache=use_cache)
         
         # 如果提供了项目ID，保存分析任务
         if project_id and result['success']:
@@ -267,7 +415,7 @@ def modify_code():
                     'file_type': file_type
                 }),
                 output_data=json.dumps(result),
-                ai_model=model,
+                ai_model=result['model_used'],
                 status='completed',
                 completed_at=datetime.utcnow(),
                 project_id=project_id
@@ -299,11 +447,12 @@ def review_code():
         file_type = data.get('file_type', 'python')
         model = data.get('model', 'claude-3.7-sonnet')
         project_id = data.get('project_id')
+        use_cache = data.get('use_cache', True)
         
         print(f"代码审查请求: file_type={file_type}, model={model}, project_id={project_id}")
         
         # 代码审查
-        ai_result = ai_service.review_code(code, file_type, model)
+        ai_result = ai_service.review_code(code, file_type, model, use_cache=use_cache)
         
         # 如果提供了项目ID，保存分析任务
         if project_id:
@@ -328,7 +477,7 @@ def review_code():
             'success': True,
             'type': 'review',
             'review_result': ai_result,
-            'model_used': model,
+            'model_used': ai_result['model_used'],
             'file_type': file_type
         }
         
@@ -358,139 +507,223 @@ def analyze_repository():
         analysis_type = data.get('analysis_type', 'overview')  # overview, security, performance, architecture
         model = data.get('model', 'claude-3.7-sonnet')
         branch = data.get('branch', 'main')
+        use_cache = data.get('use_cache', True)
+        sparse_paths = data.get('sparse_paths')  # 可选，只检出匹配的路径
+        use_mirror = data.get('use_mirror', True)  # 是否使用本地镜像缓存
         
         print(f"仓库分析请求: github_url={github_url}, analysis_type={analysis_type}, model={model}, branch={branch}")
         
-        # 导入GitHub服务
-        from src.services.github_service import GitHubService
-        github_service = GitHubService()
-        
-        # 获取仓库信息
-        try:
-            repo_info = github_service.get_repo_info(github_url)
-        except Exception as e:
-            return jsonify({
-                'success': False,
-                'error': f'Failed to get repository info: {str(e)}'
-            }), 400
-        
-        # 创建临时目录用于克隆
-        import tempfile
-        import uuid
-        temp_dir = os.path.join(tempfile.gettempdir(), f"coding_agent_{uuid.uuid4().hex[:8]}")
-        
-        try:
-            # 克隆仓库
-            clone_result = github_service.clone_repository(github_url, temp_dir, branch)
-            if not clone_result['success']:
+        # 异步模式：作为后台任务运行（任务记录需要关联项目）
+        if data.get('async'):
+            project_id = data.get('project_id')
+            if not project_id:
                 return jsonify({
                     'success': False,
-                    'error': f'Failed to clone repository: {clone_result["error"]}'
+                    'error': 'Project ID is required for async analysis'
                 }), 400
             
-            # 分析仓库结构
-            file_tree = github_service.get_file_tree(temp_dir, max_depth=5)
-            
-            # 扫描代码文件
-            code_files = []
-            total_files = 0
-            languages = {}
+            task = job_service.submit(
+                'repository_analysis',
+                project_id,
+                _repository_analysis_job,
+                input_data={
+                    'github_url': github_url,
+                    'analysis_type': analysis_type,
+                    'model': model,
+                    'branch': branch,
+                    'use_cache': use_cache,
+                    'sparse_paths': sparse_paths,
+                    'use_mirror': use_mirror
+                },
+                description=f'Repository analysis: {github_url}',
+                ai_model=model
+            )
+            return jsonify({
+                'success': True,
+                'task_id': task.id,
+                'status': task.status
+            }), 202
+        
+        result = _analyze_repository(github_url, analysis_type, model, branch, use_cache,
+                                     sparse_paths=sparse_paths, use_mirror=use_mirror)
+        if not result['success']:
+            return jsonify(result), 400
+        return jsonify(result)
+        
+    except JobQueueFull as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
+    except Exception as e:
+        print(f"仓库分析失败: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def _analyze_repository(github_url: str, analysis_type: str, model: str, branch: str,
+                        use_cache: bool = True, job=None, sparse_paths: list = None,
+                        use_mirror: bool = True) -> dict:
+    """克隆仓库到临时目录并进行AI分析，job不为空时汇报进度"""
+    # 导入GitHub服务
+    from src.services.github_service import GitHubService
+    github_service = GitHubService()
+    
+    # 获取仓库信息
+    try:
+        repo_info = github_service.get_repo_info(github_url)
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Failed to get repository info: {str(e)}'
+        }
+    
+    # 创建临时目录用于克隆
+    import tempfile
+    import uuid
+    temp_dir = os.path.join(tempfile.gettempdir(), f"coding_agent_{uuid.uuid4().hex[:8]}")
+    
+    try:
+        # 克隆仓库：优先从本地镜像缓存检出worktree，只需增量fetch
+        if job:
+            job.progress(10, 'Cloning repository')
+        clone_result = {'success': False}
+        if use_mirror:
+            clone_result = mirror_cache.checkout(github_url, temp_dir, branch, sparse_paths)
+            if clone_result['success']:
+                clone_result['stats'] = github_service._get_repo_stats(temp_dir)
+            else:
+                print(f"Mirror checkout failed, falling back to clone: {clone_result['error']}")
+                mirror_cache.release(temp_dir)
+        if not clone_result['success']:
+            # 只读取少量文件：浅克隆单个分支即可，不需要历史记录
+            clone_result = github_service.clone_repository(
+                github_url, temp_dir, branch, mode='shallow', single_branch=True, sparse_paths=sparse_paths
+            )
+        if not clone_result['success']:
+            return {
+                'success': False,
+                'error': f'Failed to clone repository: {clone_result["error"]}'
+            }
+        
+        # 分析仓库结构
+        if job:
+            job.progress(40, 'Scanning repository')
+        file_tree = github_service.get_file_tree(temp_dir, max_depth=5)
+        
+        # 扫描代码文件
+        code_files = []
+        total_files = 0
+        languages = {}
+        
+        for root, dirs, files in os.walk(temp_dir):
+            # 跳过.git目录和其他隐藏目录
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
             
-            for root, dirs, files in os.walk(temp_dir):
-                # 跳过.git目录和其他隐藏目录
-                dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for file in files:
+                if file.startswith('.'):
+                    continue
                 
-                for file in files:
-                    if file.startswith('.'):
-                        continue
-                    
-                    file_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(file_path, temp_dir)
+                file_path = os.path.join(root, file)
+                relative_path = os.path.relpath(file_path, temp_dir)
+                
+                # 检查是否为代码文件
+                if code_analysis_service._is_code_file(file):
+                    total_files += 1
                     
-                    # 检查是否为代码文件
-                    if code_analysis_service._is_code_file(file):
-                        total_files += 1
-                        
-                        # 检测语言
-                        detected_lang = code_analysis_service.detect_language_from_content('', file)
-                        if detected_lang in languages:
-                            languages[detected_lang] += 1
-                        else:
-                            languages[detected_lang] = 1
-                        
-                        # 读取文件内容（限制大小）
-                        try:
-                            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                content = f.read()
-                                if len(content) > 5000:  # 限制文件大小
-                                    content = content[:5000] + '...'
-                                
-                                code_files.append({
-                                    'path': relative_path,
-                                    'name': file,
-                                    'type': detected_lang,
-                                    'size': len(content),
-                                    'content': content
-                                })
-                        except Exception as e:
-                            print(f"Failed to read file {file_path}: {e}")
-                            continue
+                    # 检测语言
+                    detected_lang = code_analysis_service.detect_language_from_content('', file)
+                    if detected_lang in languages:
+                        languages[detected_lang] += 1
+                    else:
+                        languages[detected_lang] = 1
                     
-                    # 限制分析的文件数量
-                    if len(code_files) >= 20:
-                        break
+                    # 读取文件内容（限制大小）
+                    try:
+                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                            content = f.read()
+                            if len(content) > 5000:  # 限制文件大小
+                                content = content[:5000] + '...'
+                            
+                            code_files.append({
+                                'path': relative_path,
+                                'name': file,
+                                'type': detected_lang,
+                                'size': len(content),
+                                'content': content
+                            })
+                    except Exception as e:
+                        print(f"Failed to read file {file_path}: {e}")
+                        continue
                 
+                # 限制分析的文件数量
                 if len(code_files) >= 20:
                     break
             
-            # 构建项目概览
-            project_overview = {
-                'name': repo_info.get('name', 'Unknown'),
-                'description': repo_info.get('description', ''),
-                'github_url': github_url,
-                'branch': branch,
-                'total_files': total_files,
-                'languages': languages,
-                'file_structure': file_tree,
-                'clone_stats': clone_result.get('stats', {})
-            }
-            
-            # 选择重要文件进行AI分析
-            important_files = code_files[:10]  # 分析前10个文件
-            
-            # 调用AI服务进行项目分析
-            ai_result = ai_service.analyze_project(project_overview, important_files, analysis_type, model)
-            
-            # 构建结果
-            result = {
-                'success': True,
-                'type': 'repository_analysis',
-                'repository_info': repo_info,
-                'project_overview': project_overview,
-                'ai_analysis': ai_result,
-                'analysis_type': analysis_type,
-                'model_used': model,
-                'files_analyzed': len(important_files),
-                'total_code_files': len(code_files)
-            }
-            
-            print(f"仓库分析完成，分析了{len(important_files)}个文件")
-            return jsonify(result)
-            
-        finally:
-            # 清理临时目录
-            try:
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir)
-            except Exception as e:
-                print(f"Failed to cleanup temp directory: {e}")
+            if len(code_files) >= 20:
+                break
         
-    except Exception as e:
-        print(f"仓库分析失败: {e}")
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+        # 构建项目概览
+        project_overview = {
+            'name': repo_info.get('name', 'Unknown'),
+            'description': repo_info.get('description', ''),
+            'github_url': github_url,
+            'branch': branch,
+            'total_files': total_files,
+            'languages': languages,
+            'file_structure': file_tree,
+            'clone_stats': clone_result.get('stats', {})
+        }
+        
+        # 选择重要文件进行AI分析
+        important_files = code_files[:10]  # 分析前10个文件
+        
+        # 调用AI服务进行项目分析
+        if job:
+            job.progress(60, 'Running AI analysis')
+        ai_result = ai_service.analyze_project(project_overview, important_files, analysis_type, model, use_cache=use_cache)
+        
+        # 构建结果
+        result = {
+            'success': True,
+            'type': 'repository_analysis',
+            'repository_info': repo_info,
+            'project_overview': project_overview,
+            'ai_analysis': ai_result,
+            'analysis_type': analysis_type,
+            'model_used': ai_result['model_used'],
+            'files_analyzed': len(important_files),
+            'total_code_files': len(code_files)
+        }
+        
+        print(f"仓库分析完成，分析了{len(important_files)}个文件")
+        return result
+        
+    finally:
+        # 清理临时目录（镜像worktree需要从镜像中注销）
+        mirror_cache.release(temp_dir)
+        try:
+            if os.path.exists(temp_dir):
+                shutil.rmtree(temp_dir)
+        except Exception as e:
+            print(f"Failed to cleanup temp directory: {e}")
+
+def _repository_analysis_job(job, input_data: dict) -> dict:
+    """后台仓库分析任务"""
+    result = _analyze_repository(
+        input_data['github_url'],
+        input_data['analysis_type'],
+        input_data['model'],
+        input_data['branch'],
+        input_data.get('use_cache', True),
+        job,
+        input_data.get('sparse_paths'),
+        input_data.get('use_mirror', True)
+    )
+    if not result['success']:
+        raise Exception(result['error'])
+    return result
 
 @ai_bp.route('/ai/analyze-project', methods=['POST'])
 def analyze_project():
@@ -507,6 +740,7 @@ def analyze_project():
         project_id = data['project_id']
         analysis_type = data.get('analysis_type', 'overview')  # overview, security, performance, architecture
         model = data.get('model', 'claude-3.7-sonnet')
+        use_cache = data.get('use_cache', True)
         
         print(f"项目分析请求: project_id={project_id}, analysis_type={analysis_type}, model={model}")
         
@@ -554,18 +788,22 @@ def analyze_project():
                 'size': file.size
             })
         
-        # 选择重要文件进行AI分析（限制数量避免token过多）
-        important_files = []
-        for file in code_files[:10]:  # 只分析前10个文件
-            if file.content and len(file.content.strip()) > 0:
-                important_files.append({
-                    'path': file.file_path,
-                    'content': file.content[:2000],  # 限制内容长度
-                    'type': file.file_type
-                })
+        # 在目标模型的token预算内选择与分析类型最相关的文件或代码片段
+        blob_store.load_contents(code_files)
+        packed = context_packer.pack(
+            [{'path': file.file_path, 'type': file.file_type, 'content': file.content} for file in code_files],
+            data.get('focus', ''),
+            model,
+            reserved_tokens=PROJECT_PROMPT_RESERVE,
+            extra_terms=ANALYSIS_TERMS.get(analysis_type)
+        )
+        important_files = [
+            {'path': file['path'], 'content': file['content'], 'type': file['type']}
+            for file in packed['files']
+        ]
         
         # 调用AI服务进行项目分析
-        ai_result = ai_service.analyze_project(project_overview, important_files, analysis_type, model)
+        ai_result = ai_service.analyze_project(project_overview, important_files, analysis_type, model, use_cache=use_cache)
         
         # 保存分析任务
         try:
@@ -593,8 +831,10 @@ def analyze_project():
             'project_overview': project_overview,
             'ai_analysis': ai_result,
             'analysis_type': analysis_type,
-            'model_used': model,
-            'files_analyzed': len(important_files)
+            'model_used': ai_result['model_used'],
+            'files_analyzed': len(important_files),
+            'context_tokens': packed['tokens'],
+            'context_budget': packed['budget']
         }
         
         print(f"项目分析完成，返回结果")
@@ -1,9 +1,12 @@
 from flask import Blueprint, request, jsonify
+from sqlalchemy.orm import load_only
 from src.services.ai_service import ai_service
-from src.models.user import db
+from src.services.stream_service import stream_service
+from src.services.context_packer import context_packer, extract_terms
+from src.services.embedding_index import embedding_index_service
+from src.services.search_index import search_index_service
+from src.services.blob_store import blob_store
 from src.models.project import Project, CodeFile
-import json
-import os
 from datetime import datetime
 
 chat_bp = Blueprint('chat', __name__)
@@ -24,99 +27,37 @@ def chat_with_project(project_id):
         message = data['message']
         model = data.get('model')  # 如果没有指定，将使用智能选择
         conversation_history = data.get('history', [])
+        use_cache = data.get('use_cache', True)
         
         print(f"项目聊天请求: project_id={project_id}, message={message[:100]}...")
         
         # 获取项目信息
         project = Project.query.get_or_404(project_id)
         
-        # 获取项目的代码文件（用于上下文）
-        code_files = CodeFile.query.filter_by(project_id=project_id).limit(10).all()
-        
-        # 构建项目上下文
-        project_context = {
-            'name': project.name,
-            'description': project.description,
-            'github_url': project.github_url,
-            'files': []
-        }
-        
-        for file in code_files:
-            if file.content and len(file.content.strip()) > 0:
-                project_context['files'].append({
-                    'path': file.file_path,
-                    'name': file.file_name,
-                    'type': file.file_type,
-                    'content': file.content[:1000] if len(file.content) > 1000 else file.content  # 限制内容长度
-                })
-        
-        # 如果没有指定模型，根据消息内容智能选择
-        if model is None:
-            # 根据消息类型选择模型
-            if any(keyword in message.lower() for keyword in ['代码', 'code', '编程', 'programming', '函数', 'function', '类', 'class']):
-                model = ai_service.get_optimal_model('coding', len(message))
-            elif any(keyword in message.lower() for keyword in ['分析', 'analyze', '推理', 'reasoning', '逻辑', 'logic']):
-                model = ai_service.get_optimal_model('reasoning', len(message))
-            else:
-                # 考虑项目上下文的大小
-                context_size = sum(len(f['content']) for f in project_context['files'])
-                model = ai_service.get_optimal_model('large_context' if context_size > 10000 else 'coding', context_size)
-        
-        # 构建聊天提示
-        system_prompt = f"""
-你是一个专业的编程助手，正在帮助用户处理项目 "{project_context['name']}"。
-
-项目信息：
-- 名称：{project_context['name']}
-- 描述：{project_context['description']}
-- GitHub URL：{project_context['github_url']}
-
-项目文件结构：
-"""
-        
-        for file in project_context['files']:
-            system_prompt += f"\n文件：{file['path']} ({file['type']})\n```\n{file['content']}\n```\n"
-        
-        system_prompt += """
-
-请基于以上项目信息回答用户的问题。你可以：
-1. 分析和解释代码
-2. 提供编程建议和最佳实践
-3. 帮助调试问题
-4. 建议代码改进
-5. 回答关于项目架构的问题
-
-请保持专业、准确和有帮助。
-"""
-        
-        # 构建对话历史
-        messages = [{"role": "system", "content": system_prompt}]
+        model, full_prompt = _build_project_prompt(project, message, model)
         
-        # 添加历史对话
-        for msg in conversation_history[-10:]:  # 只保留最近10条对话
-            messages.append({
-                "role": msg.get('role', 'user'),
-                "content": msg.get('content', '')
-            })
-        
-        # 添加当前用户消息
-        messages.append({"role": "user", "content": message})
+        # 流式模式：立即返回，分块推送到项目房间
+        if data.get('stream'):
+            meta = {'model_used': model, 'project_id': project_id}
+            return _start_socketio_stream(
+                ai_service.stream_model(model, full_prompt, use_cache=use_cache, on_model=stream_service.model_recorder(meta)),
+                room=f'project_{project_id}',
+                meta=meta
+            )
         
         # 调用AI模型
         try:
-            # 构建完整的提示
-            full_prompt = system_prompt + "\n\n用户问题：" + message
-            response = ai_service._call_model(model, full_prompt)
+            response, model_used = ai_service._call_model(model, full_prompt, use_cache=use_cache)
             
             result = {
                 'success': True,
                 'response': response,
-                'model_used': model,
+                'model_used': model_used,
                 'project_id': project_id,
                 'timestamp': datetime.utcnow().isoformat()
             }
             
-            print(f"聊天响应完成，使用模型: {model}")
+            print(f"聊天响应完成，使用模型: {model_used}")
             return jsonify(result)
             
         except Exception as e:
@@ -133,6 +74,89 @@ def chat_with_project(project_id):
             'error': str(e)
         }), 500
 
+def _build_project_prompt(project, message: str, model: str = None):
+    """构建项目聊天提示，返回(模型, 完整提示)"""
+    # 先只读取文件元数据，挑选出候选文件后再加载内容
+    code_files = CodeFile.query.filter_by(project_id=project.id).options(
+        load_only(CodeFile.file_path, CodeFile.file_type, CodeFile.size, CodeFile.content_hash, CodeFile.blob_sha)
+    ).all()
+    
+    # 如果没有指定模型，根据消息内容智能选择
+    if model is None:
+        # 根据消息类型选择模型
+        if any(keyword in message.lower() for keyword in ['代码', 'code', '编程', 'programming', '函数', 'function', '类', 'class']):
+            model = ai_service.get_optimal_model('coding', len(message))
+        elif any(keyword in message.lower() for keyword in ['分析', 'analyze', '推理', 'reasoning', '逻辑', 'logic']):
+            model = ai_service.get_optimal_model('reasoning', len(message))
+        else:
+            # 考虑项目上下文的大小
+            context_size = sum(file.size or 0 for file in code_files)
+            model = ai_service.get_optimal_model('large_context' if context_size > 10000 else 'coding', context_size)
+    
+    # 构建聊天提示
+    system_prompt = f"""
+你是一个专业的编程助手，正在帮助用户处理项目 "{project.name}"。
+
+项目信息：
+- 名称：{project.name}
+- 描述：{project.description}
+- GitHub URL：{project.github_url}
+
+项目文件结构：
+"""
+    
+    instructions = """
+
+请基于以上项目信息回答用户的问题。你可以：
+1. 分析和解释代码
+2. 提供编程建议和最佳实践
+3. 帮助调试问题
+4. 建议代码改进
+5. 回答关于项目架构的问题
+
+请保持专业、准确和有帮助。
+"""
+    question = "\n\n用户问题：" + message
+    
+    # 向量检索语义相近的代码块（索引由扫描和保存文件后的后台任务更新，这里只查询）
+    retrieved = []
+    try:
+        retrieved = embedding_index_service.search(project.id, message, k=embedding_index_service.top_k)
+    except Exception as e:
+        print(f"向量检索失败: {e}")
+    
+    # 检索索引中包含问题关键词的文件
+    term_matches = {}
+    try:
+        term_matches = search_index_service.term_matches(project.id, extract_terms(message))
+    except Exception as e:
+        print(f"检索索引查询失败: {e}")
+    
+    # 按元数据预选候选文件，只加载这些文件的内容
+    reserved_tokens = context_packer.count_tokens(system_prompt + instructions + question, model)
+    candidates = context_packer.preselect(
+        [{'path': file.file_path, 'size': file.size, 'file': file} for file in code_files],
+        message, model, reserved_tokens=reserved_tokens, retrieved=retrieved, term_matches=term_matches
+    )
+    selected = [candidate['file'] for candidate in candidates]
+    blob_store.load_contents(selected)
+    files = [
+        {'path': file.file_path, 'type': file.file_type, 'content': file.content, 'version': file.blob_sha}
+        for file in selected
+        if file.content and len(file.content.strip()) > 0
+    ]
+    
+    # 在目标模型的token预算内放入与问题最相关的文件或代码片段
+    packed = context_packer.pack(files, message, model, reserved_tokens=reserved_tokens, retrieved=retrieved)
+    
+    for file in packed['files']:
+        label = '相关片段' if file['snippet'] else '完整文件'
+        system_prompt += f"\n文件：{file['path']} ({file['type']}，{label})\n```\n{file['content']}\n```\n"
+    
+    # 构建完整的提示
+    full_prompt = system_prompt + instructions + question
+    return model, full_prompt
+
 @chat_bp.route('/chat/general', methods=['POST'])
 def general_chat():
     """通用聊天（不绑定特定项目）"""
@@ -148,53 +172,40 @@ def general_chat():
         message = data['message']
         model = data.get('model')
         conversation_history = data.get('history', [])
+        use_cache = data.get('use_cache', True)
         
         print(f"通用聊天请求: message={message[:100]}...")
         
-        # 如果没有指定模型，根据消息内容智能选择
-        if model is None:
-            if any(keyword in message.lower() for keyword in ['代码', 'code', '编程', 'programming']):
-                model = ai_service.get_optimal_model('coding', len(message))
-            elif any(keyword in message.lower() for keyword in ['分析', 'analyze', '推理', 'reasoning']):
-                model = ai_service.get_optimal_model('reasoning', len(message))
-            else:
-                model = ai_service.get_optimal_model('coding', len(message))  # 默认使用编程模型
-        
-        # 构建系统提示
-        system_prompt = """
-你是一个专业的编程助手，擅长：
-1. 代码分析和生成
-2. 编程问题解答
-3. 技术架构建议
-4. 调试和优化建议
-5. 最佳实践指导
-
-请保持专业、准确和有帮助。
-"""
-        
-        # 构建完整的提示
-        full_prompt = system_prompt + "\n\n用户问题：" + message
+        model, full_prompt = _build_general_prompt(message, model, conversation_history)
         
-        # 如果有对话历史，添加上下文
-        if conversation_history:
-            context = "\n\n对话历史：\n"
-            for msg in conversation_history[-5:]:  # 只保留最近5条对话
-                role = "用户" if msg.get('role') == 'user' else "助手"
-                context += f"{role}: {msg.get('content', '')}\n"
-            full_prompt = system_prompt + context + "\n\n当前问题：" + message
+        # 流式模式：推送到发起请求的Socket.IO客户端
+        if data.get('stream'):
+            sid = data.get('sid')
+            if not sid:
+                return jsonify({
+                    'success': False,
+                    'error': 'Socket.IO sid is required for streaming'
+                }), 400
+            
+            meta = {'model_used': model}
+            return _start_socketio_stream(
+                ai_service.stream_model(model, full_prompt, use_cache=use_cache, on_model=stream_service.model_recorder(meta)),
+                room=sid,
+                meta=meta
+            )
         
         # 调用AI模型
         try:
-            response = ai_service._call_model(model, full_prompt)
+            response, model_used = ai_service._call_model(model, full_prompt, use_cache=use_cache)
             
             result = {
                 'success': True,
                 'response': response,
-                'model_used': model,
+                'model_used': model_used,
                 'timestamp': datetime.utcnow().isoformat()
             }
             
-            print(f"通用聊天响应完成，使用模型: {model}")
+            print(f"通用聊天响应完成，使用模型: {model_used}")
             return jsonify(result)
             
         except Exception as e:
@@ -211,6 +222,104 @@ def general_chat():
             'error': str(e)
         }), 500
 
+def _build_general_prompt(message: str, model: str = None, conversation_history: list = None):
+    """构建通用聊天提示，返回(模型, 完整提示)"""
+    # 如果没有指定模型，根据消息内容智能选择
+    if model is None:
+        if any(keyword in message.lower() for keyword in ['代码', 'code', '编程', 'programming']):
+            model = ai_service.get_optimal_model('coding', len(message))
+        elif any(keyword in message.lower() for keyword in ['分析', 'analyze', '推理', 'reasoning']):
+            model = ai_service.get_optimal_model('reasoning', len(message))
+        else:
+            model = ai_service.get_optimal_model('coding', len(message))  # 默认使用编程模型
+    
+    # 构建系统提示
+    system_prompt = """
+你是一个专业的编程助手，擅长：
+1. 代码分析和生成
+2. 编程问题解答
+3. 技术架构建议
+4. 调试和优化建议
+5. 最佳实践指导
+
+请保持专业、准确和有帮助。
+"""
+    
+    # 构建完整的提示
+    full_prompt = system_prompt + "\n\n用户问题：" + message
+    
+    # 如果有对话历史，添加上下文
+    if conversation_history:
+        context = "\n\n对话历史：\n"
+        for msg in conversation_history[-5:]:  # 只保留最近5条对话
+            role = "用户" if msg.get('role') == 'user' else "助手"
+            context += f"{role}: {msg.get('content', '')}\n"
+        full_prompt = system_prompt + context + "\n\n当前问题：" + message
+    
+    return model, full_prompt
+
+@chat_bp.route('/chat/project/<int:project_id>/stream', methods=['POST'])
+def chat_with_project_stream(project_id):
+    """项目聊天的SSE流式接口（Socket.IO不可用时使用）"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('message'):
+            return jsonify({
+                'success': False,
+                'error': 'Message is required'
+            }), 400
+        
+        project = Project.query.get_or_404(project_id)
+        model, full_prompt = _build_project_prompt(project, data['message'], data.get('model'))
+        
+        meta = {'model_used': model, 'project_id': project_id}
+        return stream_service.sse_response(
+            ai_service.stream_model(model, full_prompt, use_cache=data.get('use_cache', True),
+                                    on_model=stream_service.model_recorder(meta)),
+            meta=meta
+        )
+        
+    except Exception as e:
+        print(f"项目流式聊天失败: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@chat_bp.route('/chat/general/stream', methods=['POST'])
+def general_chat_stream():
+    """通用聊天的SSE流式接口"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('message'):
+            return jsonify({
+                'success': False,
+                'error': 'Message is required'
+            }), 400
+        
+        model, full_prompt = _build_general_prompt(data['message'], data.get('model'), data.get('history', []))
+        
+        meta = {'model_used': model}
+        return stream_service.sse_response(
+            ai_service.stream_model(model, full_prompt, use_cache=data.get('use_cache', True),
+                                    on_model=stream_service.model_recorder(meta)),
+            meta=meta
+        )
+        
+    except Exception as e:
+        print(f"通用流式聊天失败: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def _start_socketio_stream(chunks, room: str, meta: dict):
+    """在后台推送流式输出，立即返回流ID"""
+    stream_id = stream_service.start_socketio_stream(chunks, room, meta)
+    return jsonify(dict(meta, success=True, stream_id=stream_id, room=room)), 202
+
 @chat_bp.route('/chat/models', methods=['GET'])
 def get_chat_models():
     """获取可用于聊天的AI模型"""
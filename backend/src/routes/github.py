@@ -1,10 +1,17 @@
 from flask import Blueprint, request, jsonify
-from src.services.github_service import github_service
+from src.services.github_service import github_service, CLONE_MODES
+from src.services.code_analysis_service import code_analysis_service
+from src.services.ingest_service import file_ingest_service, SCANNED_EXTENSIONS
+from src.services.mirror_cache import mirror_cache
+from src.services.parse_tree_cache import parse_tree_cache
+from src.services.search_index import search_index_service
+from src.services.blob_store import blob_store
+from src.services.job_service import job_service, JobQueueFull, JobCancelled
+from src.routes.project import schedule_embedding_index
 from src.models.user import db
-from src.models.project import Project, CodeFile
+from src.models.project import Project, AnalysisTask, CodeFile
 import os
 import json
-import requests
 import re
 from datetime import datetime
 
@@ -37,47 +44,25 @@ def get_branches():
                 'error': 'Invalid GitHub URL format'
             }), 400
         
-        # 构建GitHub API URL
-        api_url = f'https://api.github.com/repos/{owner}/{repo}/branches'
+        # 分页请求全部分支（经过元数据缓存和共享的连接池客户端），API不可用时改用git ls-remote
+        result = github_service.list_branches(owner, repo, github_url)
         
-        # 设置请求头
-        headers = {
-            'Accept': 'application/vnd.github.v3+json',
-            'User-Agent': 'Coding-Agent/1.0'
-        }
-        
-        # 如果有GitHub token，添加到请求头
-        github_token = os.getenv('GITHUB_TOKEN')
-        if github_token:
-            headers['Authorization'] = f'token {github_token}'
-        
-        # 发送请求
-        response = requests.get(api_url, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            branches_data = response.json()
-            branches = [branch['name'] for branch in branches_data]
-            
+        if result['success']:
             return jsonify({
                 'success': True,
-                'branches': branches
+                'branches': result['branches'],
+                'total': len(result['branches']),
+                'source': result['source']
             })
-        elif response.status_code == 404:
-            return jsonify({
-                'success': False,
-                'error': 'Repository not found or private'
-            }), 404
-        else:
-            return jsonify({
-                'success': False,
-                'error': f'GitHub API error: {response.status_code}'
-            }), response.status_code
-            
-    except requests.RequestException as e:
-        return jsonify({
+        
+        response = {
             'success': False,
-            'error': f'Network error: {str(e)}'
-        }), 500
+            'error': result['error']
+        }
+        if 'retry_after' in result:
+            response['retry_after'] = result['retry_after']
+        return jsonify(response), result['status_code']
+            
     except Exception as e:
         return jsonify({
             'success': False,
@@ -122,42 +107,51 @@ def clone_repository():
         github_url = data['github_url']
         project_id = data['project_id']
         branch = data.get('branch')
+        # 默认使用blobless部分克隆：保留完整提交历史（提交、推送正常工作），文件内容按需下载
+        clone_mode = data.get('clone_mode', 'blobless')
+        sparse_paths = data.get('sparse_paths')
+        
+        if clone_mode not in CLONE_MODES:
+            return jsonify({
+                'success': False,
+                'error': f'Unsupported clone mode: {clone_mode}'
+            }), 400
         
         # 获取项目信息
         project = Project.query.get_or_404(project_id)
         
-        # 设置本地路径
-        projects_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'projects')
-        os.makedirs(projects_dir, exist_ok=True)
-        local_path = os.path.join(projects_dir, f"project_{project_id}")
-        
-        # 更新项目状态
-        project.status = 'cloning'
-        project.github_url = github_url
-        project.local_path = local_path
-        db.session.commit()
-        
-        # 克隆仓库
-        result = github_service.clone_repository(github_url, local_path, branch)
-        
-        if result['success']:
-            # 更新项目状态
-            project.status = 'ready'
-            db.session.commit()
-            
-            # 扫描并保存文件信息
-            scan_result = scan_project_files(project_id, local_path)
-            result['files_scanned'] = scan_result
-        else:
-            # 克隆失败，更新状态
-            project.status = 'error'
-            db.session.commit()
+        # 异步模式：立即返回任务ID，进度通过analysis_update事件推送
+        if data.get('async'):
+            task = job_service.submit(
+                'clone',
+                project_id,
+                _clone_job,
+                input_data={
+                    'github_url': github_url,
+                    'branch': branch,
+                    'clone_mode': clone_mode,
+                    'sparse_paths': sparse_paths
+                },
+                description=f'Clone repository: {github_url}'
+            )
+            return jsonify({
+                'success': True,
+                'task_id': task.id,
+                'status': task.status
+            }), 202
         
+        result = _clone_project(project, github_url, branch, clone_mode, sparse_paths)
         return jsonify(result)
         
+    except JobQueueFull as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
     except Exception as e:
         # 更新项目状态为错误
         try:
+            db.session.rollback()
             project = Project.query.get(data.get('project_id'))
             if project:
                 project.status = 'error'
@@ -170,6 +164,73 @@ def clone_repository():
             'error': str(e)
         }), 500
 
+def _clone_project(project, github_url: str, branch: str = None, clone_mode: str = 'blobless',
+                   sparse_paths: list = None, job=None) -> dict:
+    """克隆仓库并扫描文件，job不为空时汇报进度"""
+    # 设置本地路径
+    projects_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'projects')
+    os.makedirs(projects_dir, exist_ok=True)
+    local_path = os.path.join(projects_dir, f"project_{project.id}")
+    
+    # 更新项目状态
+    project.status = 'cloning'
+    project.github_url = github_url
+    project.local_path = local_path
+    db.session.commit()
+    
+    if job:
+        job.progress(5, 'Cloning repository')
+    
+    # 克隆仓库
+    result = github_service.clone_repository(
+        github_url, local_path, branch, mode=clone_mode, sparse_paths=sparse_paths
+    )
+    
+    if result['success']:
+        # 更新项目状态
+        project.status = 'ready'
+        db.session.commit()
+        
+        if job:
+            job.progress(60, 'Scanning files')
+        
+        # 扫描并保存文件信息
+        scan_result = scan_project_files(project.id, local_path)
+        result['files_scanned'] = scan_result
+    else:
+        # 克隆失败，更新状态
+        project.status = 'error'
+        db.session.commit()
+    
+    return result
+
+def _clone_job(job, input_data: dict) -> dict:
+    """后台克隆任务"""
+    project = db.session.get(Project, job.project_id)
+    try:
+        result = _clone_project(
+            project,
+            input_data['github_url'],
+            input_data.get('branch'),
+            input_data.get('clone_mode', 'blobless'),
+            input_data.get('sparse_paths'),
+            job
+        )
+    except JobCancelled:
+        db.session.rollback()
+        project.status = 'created'
+        db.session.commit()
+        raise
+    except Exception:
+        db.session.rollback()
+        project.status = 'error'
+        db.session.commit()
+        raise
+    
+    if not result['success']:
+        raise Exception(result['error'])
+    return result
+
 @github_bp.route('/github/file-tree/<int:project_id>', methods=['GET'])
 def get_file_tree(project_id):
     """获取项目文件树"""
@@ -268,10 +329,13 @@ def save_file_content():
                 file_path=file_path
             ).first()
             
+            stale_hash = None
             if code_file:
+                stale_hash = code_file.content_hash
                 code_file.content = content
                 code_file.size = len(content.encode('utf-8'))
                 code_file.last_modified = datetime.utcnow()
+                code_file.blob_sha = github_service.compute_blob_sha(content.encode('utf-8'))
             else:
                 # 创建新的文件记录
                 code_file = CodeFile(
@@ -281,11 +345,28 @@ def save_file_content():
                     content=content,
                     size=len(content.encode('utf-8')),
                     last_modified=datetime.utcnow(),
+                    blob_sha=github_service.compute_blob_sha(content.encode('utf-8')),
                     project_id=project_id
                 )
                 db.session.add(code_file)
             
+            db.session.flush()
+            if stale_hash and stale_hash != code_file.content_hash:
+                # 旧内容不再被引用时删除
+                blob_store.discard([stale_hash])
             db.session.commit()
+            
+            # 更新检索索引（写入增量段）
+            if os.path.splitext(file_path)[1].lower() in SCANNED_EXTENSIONS:
+                search_index_service.update_files(project_id, {file_path: content})
+            
+            # 后台更新向量索引
+            schedule_embedding_index(project_id)
+            
+            # 编辑器中打开的文件直接增量更新缓存的语法树
+            diagnostics = parse_tree_cache.update_content(project_id, file_path, content)
+            if diagnostics is not None:
+                result['diagnostics'] = diagnostics
         
         return jsonify(result)
         
@@ -363,63 +444,90 @@ def push_changes():
             'error': str(e)
         }), 500
 
-def scan_project_files(project_id: int, project_path: str) -> dict:
-    """扫描项目文件并保存到数据库"""
+@github_bp.route('/github/rescan/<int:project_id>', methods=['POST'])
+def rescan_project(project_id):
+    """增量重新扫描和分析已克隆的项目（只处理变化的文件）"""
     try:
-        files_added = 0
+        project = Project.query.get_or_404(project_id)
         
-        for root, dirs, files in os.walk(project_path):
-            # 跳过.git和其他隐藏目录
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['node_modules', '__pycache__', 'venv', 'env']]
-            
-            for file in files:
-                if file.startswith('.'):
-                    continue
-                
-                file_path = os.path.join(root, file)
-                relative_path = os.path.relpath(file_path, project_path)
-                
-                # 只处理代码文件
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext in ['.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.rs']:
-                    try:
-                        # 读取文件内容
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        
-                        # 检查是否已存在
-                        existing_file = CodeFile.query.filter_by(
-                            project_id=project_id,
-                            file_path=relative_path
-                        ).first()
-                        
-                        if not existing_file:
-                            code_file = CodeFile(
-                                file_path=relative_path,
-                                file_name=file,
-                                file_type=file_ext,
-                                content=content,
-                                size=len(content.encode('utf-8')),
-                                last_modified=datetime.fromtimestamp(os.path.getmtime(file_path)),
-                                project_id=project_id
-                            )
-                            db.session.add(code_file)
-                            files_added += 1
-                    
-                    except (UnicodeDecodeError, IOError):
-                        # 跳过无法读取的文件
-                        continue
+        if not project.local_path or not os.path.exists(project.local_path):
+            return jsonify({
+                'success': False,
+                'error': 'Project not cloned or local path not found'
+            }), 404
         
-        db.session.commit()
+        scan_result = scan_project_files(project_id, project.local_path)
+        analysis = code_analysis_service.analyze_project(project.local_path, incremental=True)
         
-        return {
-            'success': True,
-            'files_added': files_added
+        if not analysis['success']:
+            return jsonify({
+                'success': False,
+                'files_scanned': scan_result,
+                'error': analysis['error']
+            }), 500
+        
+        summary = {
+            'stats': analysis['stats'],
+            'score': analysis['score'],
+            'files_analyzed': analysis['files_analyzed'],
+            'incremental': analysis.get('incremental')
         }
         
+        task = AnalysisTask(
+            task_type='analyze',
+            description='Incremental project analysis',
+            input_data=json.dumps({
+                'project_path': project.local_path
+            }),
+            output_data=json.dumps(summary),
+            ai_model='tree-sitter',
+            status='completed',
+            completed_at=datetime.utcnow(),
+            project_id=project_id
+        )
+        db.session.add(task)
+        db.session.commit()
+        
+        return jsonify(dict(summary, success=True, files_scanned=scan_result, task_id=task.id))
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@github_bp.route('/github/mirrors/stats', methods=['GET'])
+def get_mirror_stats():
+    """获取仓库镜像缓存统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': mirror_cache.get_stats()
+        })
     except Exception as e:
-        return {
+        return jsonify({
             'success': False,
             'error': str(e)
-        }
+        }), 500
 
+@github_bp.route('/github/cache/stats', methods=['GET'])
+def get_metadata_cache_stats():
+    """获取GitHub元数据缓存和API请求统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': github_service.metadata_cache.get_stats(),
+            'http': github_service.http.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def scan_project_files(project_id: int, project_path: str) -> dict:
+    """扫描项目文件并保存到数据库，文件有变化时在后台更新向量索引"""
+    result = file_ingest_service.scan_project_files(project_id, project_path)
+    if result['success'] and (result['files_added'] or result['files_updated'] or result['files_removed']):
+        schedule_embedding_index(project_id)
+    return result
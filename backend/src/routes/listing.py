@@ -0,0 +1,101 @@
+"""列表接口的字段投影和keyset分页"""
+import os
+import json
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
+
+# 每页默认条数和上限
+DEFAULT_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.getenv('LIST_MAX_PAGE_SIZE', 1000))
+
+class ListingError(ValueError):
+    """列表参数（fields、limit、cursor）无效"""
+
+def parse_fields(value: Optional[str], view: Optional[str], allowed: Sequence[str],
+                 summary: Sequence[str]) -> List[str]:
+    """解析 ?fields=a,b 或 ?view=summary|full，返回要输出的字段"""
+    if value:
+        fields = [field.strip() for field in value.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in allowed]
+        if unknown:
+            raise ListingError(f"Unknown fields: {', '.join(unknown)}")
+        return fields
+    if view in (None, '', 'summary'):
+        return list(summary)
+    if view == 'full':
+        return list(allowed)
+    raise ListingError(f'Unknown view: {view}')
+
+def parse_limit(value: Optional[str], default: int = DEFAULT_PAGE_SIZE) -> int:
+    """解析每页条数（1到MAX_PAGE_SIZE）"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ListingError('limit must be an integer')
+    if limit < 1:
+        raise ListingError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+def load_columns(query, model, fields: Sequence[str], required: Sequence[str] = ()):
+    """只加载输出需要的列，其余列（如文件内容、任务输入输出）延迟加载"""
+    columns = set(model.__table__.columns.keys())
+    names = [name for name in dict.fromkeys(list(fields) + list(required)) if name in columns]
+    return query.options(load_only(*[getattr(model, name) for name in names]))
+
+def paginate(query, sort_keys: Sequence[Tuple[Any, bool]], cursor: Optional[str],
+             limit: int) -> Tuple[list, Optional[str]]:
+    """按排序键做keyset分页，返回 (本页记录, 下一页游标)
+
+    sort_keys为 [(列, 是否降序)]，最后一个键必须唯一（通常是主键）；
+    游标记录上一页最后一条的排序键，翻页代价与页码无关
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(sort_keys):
+            raise ListingError('Invalid cursor')
+        query = query.filter(_after(sort_keys, values))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in sort_keys])
+
+    items = query.limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor([getattr(last, column.key) for column, _ in sort_keys])
+
+def serialize(item, fields: Sequence[str]) -> Dict[str, Any]:
+    """只读取指定字段，日期转为ISO格式（与to_dict一致）"""
+    data = {}
+    for field in fields:
+        value = getattr(item, field)
+        data[field] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
+def encode_cursor(values: List[Any]) -> str:
+    """把末行的排序键值编码为游标：URL安全的base64 JSON列表，日期写成 {'dt': ISO格式}"""
+    payload = [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """解码encode_cursor生成的游标，还原 {'dt': ISO格式} 为datetime，格式不对时抛出ListingError"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if not isinstance(payload, list):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value for value in payload]
+    except (ValueError, TypeError, KeyError):
+        raise ListingError('Invalid cursor')
+
+def _after(sort_keys: Sequence[Tuple[Any, bool]], values: List[Any]):
+    """排序在游标之后的条件：(a > x) OR (a = x AND b > y) ...（降序时取小于）"""
+    clauses = []
+    for index, (column, descending) in enumerate(sort_keys):
+        equal = [key == value for (key, _), value in zip(sort_keys[:index], values[:index])]
+        beyond = column < values[index] if descending else column > values[index]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
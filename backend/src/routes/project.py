@@ -1,11 +1,31 @@
 from flask import Blueprint, request, jsonify
+from sqlalchemy import select
 from src.models.user import db
 from src.models.project import Project, AnalysisTask, CodeFile
+from src.services.job_service import job_service, JobQueueFull
+from src.services.embedding_index import embedding_index_service
+from src.services.search_index import search_index_service, SYMBOL_KINDS
+from src.services.blob_store import blob_store
+from src.services.db_profile import db_profile
+from src.routes.listing import ListingError, parse_fields, parse_limit, load_columns, paginate, serialize
 import os
 import json
 
 project_bp = Blueprint('project', __name__)
 
+# 列表接口可选的字段（fields=），以及默认的摘要字段（不含文件内容、分析结果和任务输入输出）
+FILE_FIELDS = ['id', 'file_path', 'file_name', 'file_type', 'content_hash', 'size', 'last_modified',
+               'analysis_result', 'blob_sha', 'project_id', 'content']
+FILE_SUMMARY_FIELDS = ['id', 'file_path', 'file_name', 'file_type', 'content_hash', 'size', 'last_modified',
+                       'blob_sha', 'project_id']
+TASK_FIELDS = ['id', 'task_type', 'description', 'file_path', 'status', 'input_data', 'output_data',
+               'ai_model', 'created_at', 'completed_at', 'project_id']
+TASK_SUMMARY_FIELDS = ['id', 'task_type', 'description', 'file_path', 'status', 'ai_model',
+                       'created_at', 'completed_at', 'project_id']
+
+# 重建向量索引时每批读取的文件数
+INDEX_BATCH_SIZE = 500
+
 @project_bp.route('/projects', methods=['GET'])
 def get_projects():
     """获取所有项目列表"""
@@ -60,22 +80,30 @@ def get_project(project_id):
     """获取单个项目详情"""
     try:
         project = Project.query.get_or_404(project_id)
+        limit = parse_limit(request.args.get('limit'))
         
-        # 获取项目的代码文件
-        code_files = CodeFile.query.filter_by(project_id=project_id).all()
-        
-        # 获取项目的分析任务
-        analysis_tasks = AnalysisTask.query.filter_by(project_id=project_id).all()
+        # 只返回第一页的文件和任务摘要，其余通过 /files 和 /tasks 按游标翻页
+        code_files, files_cursor = _list_files(project_id, request.args.get('file_fields'), limit=limit)
+        analysis_tasks, tasks_cursor = _list_tasks(project_id, request.args.get('task_fields'), limit=limit)
         
         project_data = project.to_dict()
-        project_data['code_files'] = [file.to_dict() for file in code_files]
-        project_data['analysis_tasks'] = [task.to_dict() for task in analysis_tasks]
+        project_data['code_files'] = code_files
+        project_data['code_files_next_cursor'] = files_cursor
+        project_data['file_count'] = db_profile.read_session().query(CodeFile).filter_by(project_id=project_id).count()
+        project_data['analysis_tasks'] = analysis_tasks
+        project_data['analysis_tasks_next_cursor'] = tasks_cursor
+        project_data['task_count'] = db_profile.read_session().query(AnalysisTask).filter_by(project_id=project_id).count()
         
         return jsonify({
             'success': True,
             'project': project_data
         })
         
+    except ListingError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -123,9 +151,12 @@ def delete_project(project_id):
         
         # 删除关联的代码文件记录
         code_files = CodeFile.query.filter_by(project_id=project_id).all()
+        content_hashes = [code_file.content_hash for code_file in code_files]
         for code_file in code_files:
             db.session.delete(code_file)
-        print(f"删除了 {len(code_files)} 个代码文件记录")  # 调试日志
+        db.session.flush()
+        removed_blobs = blob_store.discard(content_hashes)
+        print(f"删除了 {len(code_files)} 个代码文件记录，{removed_blobs} 个文件内容")  # 调试日志
         
         # 删除关联的分析任务
         analysis_tasks = AnalysisTask.query.filter_by(project_id=project_id).all()
@@ -133,6 +164,10 @@ def delete_project(project_id):
             db.session.delete(task)
         print(f"删除了 {len(analysis_tasks)} 个分析任务")  # 调试日志
         
+        # 删除向量索引和检索索引
+        embedding_index_service.delete_project(project_id)
+        search_index_service.delete_project(project_id)
+        
         # 删除本地文件夹（如果存在）
         if project.local_path and os.path.exists(project.local_path):
             import shutil
@@ -196,21 +231,314 @@ def create_analysis_task(project_id):
             'error': str(e)
         }), 500
 
+@project_bp.route('/projects/<int:project_id>/tasks', methods=['GET'])
+def get_project_tasks(project_id):
+    """获取项目的分析任务列表（按创建时间倒序，keyset分页，可按status过滤）"""
+    try:
+        Project.query.get_or_404(project_id)
+        tasks, next_cursor = _list_tasks(project_id, request.args.get('fields'), request.args.get('cursor'),
+                                         parse_limit(request.args.get('limit')), request.args.get('status'))
+        
+        return jsonify({
+            'success': True,
+            'tasks': tasks,
+            'next_cursor': next_cursor
+        })
+        
+    except ListingError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@project_bp.route('/tasks/<int:task_id>', methods=['GET'])
+def get_task(task_id):
+    """获取任务状态（用于轮询后台任务）"""
+    try:
+        task = AnalysisTask.query.get_or_404(task_id)
+        
+        return jsonify({
+            'success': True,
+            'task': task.to_dict()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@project_bp.route('/tasks/<int:task_id>/cancel', methods=['POST'])
+def cancel_task(task_id):
+    """取消排队中或运行中的后台任务"""
+    try:
+        task = AnalysisTask.query.get_or_404(task_id)
+        
+        if task.status not in ['pending', 'running']:
+            return jsonify({
+                'success': False,
+                'error': f'Task is already {task.status}'
+            }), 400
+        
+        if not job_service.cancel(task_id):
+            return jsonify({
+                'success': False,
+                'error': 'Task is not managed by the job queue'
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'task_id': task_id,
+            'message': 'Cancellation requested'
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@project_bp.route('/tasks/stats', methods=['GET'])
+def get_task_stats():
+    """获取后台任务工作池状态"""
+    return jsonify({
+        'success': True,
+        'stats': job_service.get_stats()
+    })
+
+@project_bp.route('/projects/blobs/stats', methods=['GET'])
+def get_blob_stats():
+    """获取文件内容存储统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': blob_store.get_stats()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @project_bp.route('/projects/<int:project_id>/files', methods=['GET'])
 def get_project_files(project_id):
-    """获取项目文件列表"""
+    """获取项目文件列表（按路径排序，keyset分页）"""
     try:
         project = Project.query.get_or_404(project_id)
-        code_files = CodeFile.query.filter_by(project_id=project_id).all()
+        files, next_cursor = _list_files(project_id, request.args.get('fields'), request.args.get('cursor'),
+                                         parse_limit(request.args.get('limit')))
         
         return jsonify({
             'success': True,
-            'files': [file.to_dict() for file in code_files]
+            'files': files,
+            'next_cursor': next_cursor
         })
         
+    except ListingError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+def _list_files(project_id: int, fields_param: str = None, cursor: str = None, limit: int = None) -> tuple:
+    """按字段投影查询一页文件，include_content=true时附带文件内容"""
+    fields = parse_fields(fields_param, request.args.get('view'), FILE_FIELDS, FILE_SUMMARY_FIELDS)
+    if request.args.get('include_content', 'false').lower() in ['1', 'true', 'yes'] and 'content' not in fields:
+        fields.append('content')
+    
+    query = load_columns(db_profile.read_session().query(CodeFile).filter_by(project_id=project_id), CodeFile, fields,
+                         required=['file_path', 'content_hash'] if 'content' in fields else ['file_path'])
+    code_files, next_cursor = paginate(query, [(CodeFile.file_path, False), (CodeFile.id, False)], cursor,
+                                       limit or parse_limit(None))
+    if 'content' in fields:
+        blob_store.load_contents(code_files)
+    return [serialize(file, fields) for file in code_files], next_cursor
+
+def _list_tasks(project_id: int, fields_param: str = None, cursor: str = None, limit: int = None,
+                status: str = None) -> tuple:
+    """按字段投影查询一页分析任务（最新的在前）"""
+    fields = parse_fields(fields_param, request.args.get('view'), TASK_FIELDS, TASK_SUMMARY_FIELDS)
+    query = db_profile.read_session().query(AnalysisTask).filter_by(project_id=project_id)
+    if status:
+        query = query.filter_by(status=status)
+    query = load_columns(query, AnalysisTask, fields, required=['created_at'])
+    tasks, next_cursor = paginate(query, [(AnalysisTask.created_at, True), (AnalysisTask.id, True)], cursor,
+                                  limit or parse_limit(None))
+    return [serialize(task, fields) for task in tasks], next_cursor
+
+def _project_index_files(project_id: int) -> list:
+    """向量索引使用的文件列表（以blob SHA作为版本），分批读取文件并加载内容"""
+    files = []
+    # PostgreSQL上yield_per使用服务端游标，不会一次取出所有行
+    result = db.session.execute(
+        select(CodeFile).filter_by(project_id=project_id).execution_options(yield_per=INDEX_BATCH_SIZE)
+    )
+    for code_files in result.scalars().partitions():
+        blob_store.load_contents(code_files)
+        files.extend(
+            {'path': file.file_path, 'content': file.content, 'version': file.blob_sha}
+            for file in code_files
+            if file.content
+        )
+    return files
+
+def _embedding_index_job(job, input_data: dict) -> dict:
+    """后台重建项目向量索引"""
+    job.progress(10, 'Loading files')
+    files = _project_index_files(job.project_id)
+    job.progress(30, f'Embedding {len(files)} files')
+    result = embedding_index_service.sync_project(job.project_id, files)
+    result['success'] = True
+    return result
+
+def schedule_embedding_index(project_id: int):
+    """文件变化后提交后台任务增量更新向量索引，返回任务（未绑定应用或队列已满时返回None）"""
+    if job_service.app is None:
+        return None
+    try:
+        return job_service.submit('embedding_index', project_id, _embedding_index_job,
+                                  description='Update embedding index')
+    except JobQueueFull as e:
+        print(f"向量索引任务提交失败: {e}")
+        return None
+
+@project_bp.route('/projects/<int:project_id>/embeddings', methods=['GET'])
+def get_embedding_stats(project_id):
+    """获取项目向量索引统计"""
+    try:
+        Project.query.get_or_404(project_id)
+        return jsonify({
+            'success': True,
+            'stats': embedding_index_service.get_stats(project_id)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@project_bp.route('/projects/<int:project_id>/embeddings/rebuild', methods=['POST'])
+def rebuild_embeddings(project_id):
+    """在后台增量更新项目的全部文件向量"""
+    try:
+        Project.query.get_or_404(project_id)
+        
+        try:
+            task = job_service.submit('embedding_index', project_id, _embedding_index_job,
+                                      description='Build embedding index')
+        except JobQueueFull as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 503
+        
+        return jsonify({
+            'success': True,
+            'task_id': task.id,
+            'status': task.status
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@project_bp.route('/projects/<int:project_id>/semantic-search', methods=['POST'])
+def semantic_search(project_id):
+    """在项目代码中进行语义检索"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('query'):
+            return jsonify({
+                'success': False,
+                'error': 'Query is required'
+            }), 400
+        
+        Project.query.get_or_404(project_id)
+        
+        sync = embedding_index_service.sync_project(
+            project_id, _project_index_files(project_id), max_files=embedding_index_service.sync_batch
+        )
+        results = embedding_index_service.search(project_id, data['query'], k=int(data.get('k', 10)))
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'pending_files': sync['pending_files']
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@project_bp.route('/projects/<int:project_id>/search', methods=['GET'])
+def search_project(project_id):
+    """检索项目代码：type=content在文件内容中检索，type=symbol按名称检索函数和类定义"""
+    try:
+        query = request.args.get('q', '')
+        search_type = request.args.get('type', 'content')
+        kind = request.args.get('kind') or None
+        regex = request.args.get('regex', 'false').lower() in ('1', 'true', 'yes')
+        case_sensitive = request.args.get('case_sensitive', 'false').lower() in ('1', 'true', 'yes')
+        path_prefix = request.args.get('path') or None
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        
+        if not query:
+            return jsonify({
+                'success': False,
+                'error': 'Query is required'
+            }), 400
+        
+        if search_type not in ('content', 'symbol') or (kind and kind not in SYMBOL_KINDS):
+            return jsonify({
+                'success': False,
+                'error': f'Invalid search type or symbol kind (kinds: {", ".join(SYMBOL_KINDS)})'
+            }), 400
+        
+        project = Project.query.get_or_404(project_id)
+        
+        try:
+            if search_type == 'symbol':
+                result = search_index_service.search_symbols(
+                    project_id, query, regex=regex, case_sensitive=case_sensitive,
+                    kind=kind, path_prefix=path_prefix, limit=limit
+                )
+            else:
+                if not project.local_path or not os.path.exists(project.local_path):
+                    return jsonify({
+                        'success': False,
+                        'error': 'Project not cloned or local path not found'
+                    }), 404
+                result = search_index_service.search(
+                    project_id, project.local_path, query, regex=regex, case_sensitive=case_sensitive,
+                    kind=kind, path_prefix=path_prefix, limit=limit
+                )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        return jsonify(dict(result, success=True))
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
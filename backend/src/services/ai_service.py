@@ -1,20 +1,42 @@
 import os
-import json
-import requests
 from openai import OpenAI
 import anthropic
 import google.generativeai as genai
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterator, Callable, Tuple
 from dotenv import load_dotenv
+from src.services.response_cache import ResponseCache
+from src.services.rate_limiter import RateLimiterRegistry, ProviderBusy
+from src.services.context_packer import TokenCounter
+from src.services.model_router import ModelRouter, ProviderUnavailable
 
 # 加载环境变量
 load_dotenv()
 
+# 所有模型共用的调用参数
+SYSTEM_PROMPT = "You are a helpful coding assistant with expertise in code analysis and generation."
+DEFAULT_MAX_TOKENS = 4000
+DEFAULT_TEMPERATURE = 0.1
+
+# 各类型主模型（由get_optimal_model选出）失败或被熔断时依次尝试的模型
+FALLBACK_CHAINS = {
+    'coding': ['claude-3.7-sonnet', 'gpt-4.1-mini', 'deepseek-r1', 'gemini-2.5-flash'],
+    'reasoning': ['deepseek-r1', 'claude-3.7-sonnet', 'gpt-4.1-mini', 'gemini-2.5-flash'],
+    'large_context': ['gemini-2.5-flash', 'claude-3.7-sonnet', 'gpt-4.1-mini'],
+    'general': ['gpt-4.1-mini', 'claude-3.7-sonnet', 'deepseek-r1', 'gemini-2.5-flash']
+}
+
+# 遇到429后在排队等待上限内重新排队的最多次数
+RATE_LIMIT_RETRIES = int(os.getenv('AI_RATE_LIMIT_RETRIES', 3))
+
+# 单次提供商请求的超时秒数和SDK内部的重试次数（超时后由备用链切换模型）
+REQUEST_TIMEOUT = float(os.getenv('AI_REQUEST_TIMEOUT', 60))
+REQUEST_MAX_RETRIES = int(os.getenv('AI_REQUEST_MAX_RETRIES', 1))
+
 class AIService:
     """AI服务管理类，支持多种AI模型"""
     
     def __init__(self):
-        self.openai_client = OpenAI()
+        self.openai_client = OpenAI(timeout=REQUEST_TIMEOUT, max_retries=REQUEST_MAX_RETRIES)
         self.deepseek_base_url = "https://api.deepseek.com/v1"
         self.anthropic_api_key = os.getenv('ANTHROPIC_API_KEY')
         self.google_api_key = os.getenv('GOOGLE_API_KEY')
@@ -22,7 +44,11 @@ class AIService:
         
         # 初始化Anthropic客户端
         if self.anthropic_api_key:
-            self.anthropic_client = anthropic.Anthropic(api_key=self.anthropic_api_key)
+            self.anthropic_client = anthropic.Anthropic(
+                api_key=self.anthropic_api_key,
+                timeout=REQUEST_TIMEOUT,
+                max_retries=REQUEST_MAX_RETRIES
+            )
         else:
             self.anthropic_client = None
             
@@ -34,11 +60,26 @@ class AIService:
         if self.deepseek_api_key:
             self.deepseek_client = OpenAI(
                 api_key=self.deepseek_api_key,
-                base_url=self.deepseek_base_url
+                base_url=self.deepseek_base_url,
+                timeout=REQUEST_TIMEOUT,
+                max_retries=REQUEST_MAX_RETRIES
             )
         else:
             self.deepseek_client = None
         
+        # AI响应缓存
+        self.response_cache = ResponseCache.from_env()
+        
+        # 各提供商的并发和速率限制（首次调用时按环境变量创建）
+        self.rate_limiters = RateLimiterRegistry()
+        self.token_counter = TokenCounter()
+        
+        # 备用链、对冲请求和熔断
+        self.router = ModelRouter(
+            dispatch=lambda model, prompt: self._dispatch_model(model, prompt),
+            stream=lambda model, prompt: self._dispatch_stream(model, prompt)
+        )
+        
     def get_available_models(self) -> List[Dict[str, Any]]:
         """获取可用的AI模型列表"""
         return [
@@ -99,7 +140,7 @@ class AIService:
         else:
             return 'claude-3.7-sonnet'
     
-    def analyze_code(self, code: str, file_type: str, model: str = None) -> Dict[str, Any]:
+    def analyze_code(self, code: str, file_type: str, model: str = None, use_cache: bool = True) -> Dict[str, Any]:
         """分析代码质量和结构"""
         # 如果没有指定模型，使用智能选择
         if model is None:
@@ -125,11 +166,11 @@ class AIService:
 """
         
         try:
-            response = self._call_model(model, prompt)
+            response, model_used = self._call_model(model, prompt, use_cache=use_cache)
             return {
                 'success': True,
                 'analysis': response,
-                'model_used': model
+                'model_used': model_used
             }
         except Exception as e:
             return {
@@ -138,13 +179,41 @@ class AIService:
                 'model_used': model
             }
     
-    def generate_code(self, description: str, language: str, model: str = None) -> Dict[str, Any]:
+    def generate_code(self, description: str, language: str, model: str = None, use_cache: bool = True) -> Dict[str, Any]:
         """根据描述生成代码"""
         # 如果没有指定模型，使用智能选择
         if model is None:
             model = self.get_optimal_model('code_generation', len(description))
         
-        prompt = f"""
+        prompt = self._build_generate_prompt(description, language)
+        
+        try:
+            response, model_used = self._call_model(model, prompt, use_cache=use_cache)
+            return {
+                'success': True,
+                'code': response,
+                'language': language,
+                'model_used': model_used
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'model_used': model
+            }
+    
+    def generate_code_stream(self, description: str, language: str, model: str = None, use_cache: bool = True,
+                             on_model: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+        """流式生成代码，逐块返回文本"""
+        if model is None:
+            model = self.get_optimal_model('code_generation', len(description))
+        
+        prompt = self._build_generate_prompt(description, language)
+        return self.stream_model(model, prompt, use_cache=use_cache, on_model=on_model)
+    
+    def _build_generate_prompt(self, description: str, language: str) -> str:
+        """构建代码生成提示"""
+        return f"""
 请根据以下描述生成{language}代码：
 
 需求描述：
@@ -159,23 +228,8 @@ class AIService:
 
 请只返回代码，不要包含其他解释。
 """
-        
-        try:
-            response = self._call_model(model, prompt)
-            return {
-                'success': True,
-                'code': response,
-                'language': language,
-                'model_used': model
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': str(e),
-                'model_used': model
-            }
     
-    def modify_code(self, original_code: str, modification_request: str, file_type: str, model: str = None) -> Dict[str, Any]:
+    def modify_code(self, original_code: str, modification_request: str, file_type: str, model: str = None, use_cache: bool = True) -> Dict[str, Any]:
         """修改现有代码"""
         # 如果没有指定模型，使用智能选择
         if model is None:
@@ -196,11 +250,11 @@ class AIService:
 """
         
         try:
-            response = self._call_model(model, prompt)
+            response, model_used = self._call_model(model, prompt, use_cache=use_cache)
             return {
                 'success': True,
                 'modified_code': response,
-                'model_used': model
+                'model_used': model_used
             }
         except Exception as e:
             return {
@@ -209,7 +263,7 @@ class AIService:
                 'model_used': model
             }
     
-    def review_code(self, code: str, file_type: str, model: str = None) -> Dict[str, Any]:
+    def review_code(self, code: str, file_type: str, model: str = None, use_cache: bool = True) -> Dict[str, Any]:
         """代码审查"""
         # 如果没有指定模型，使用智能选择
         if model is None:
@@ -235,11 +289,11 @@ class AIService:
 """
         
         try:
-            response = self._call_model(model, prompt)
+            response, model_used = self._call_model(model, prompt, use_cache=use_cache)
             return {
                 'success': True,
                 'review': response,
-                'model_used': model
+                'model_used': model_used
             }
         except Exception as e:
             return {
@@ -248,8 +302,136 @@ class AIService:
                 'model_used': model
             }
     
-    def _call_model(self, model: str, prompt: str) -> str:
-        """调用指定的AI模型"""
+    def get_model_chain(self, model: str, prompt: str = '') -> List[str]:
+        """模型及其备用链：按模型类型的备用顺序，跳过上下文窗口放不下该提示的模型"""
+        models = {item['id']: item for item in self.get_available_models()}
+        if model not in models:
+            raise ValueError(f"Unsupported model: {model}")
+        model_type = models[model]['type']
+        required = self.token_counter.count(prompt, model) + DEFAULT_MAX_TOKENS
+        
+        chain = [model]
+        for candidate in FALLBACK_CHAINS[model_type]:
+            if candidate not in chain and models[candidate]['context_window'] >= required:
+                chain.append(candidate)
+        return chain
+    
+    def _call_model(self, model: str, prompt: str, use_cache: bool = True) -> Tuple[str, str]:
+        """调用指定的AI模型（优先读取响应缓存），失败时沿备用链切换模型，返回(响应, 实际回答的模型)"""
+        if not use_cache:
+            self.response_cache.record_bypass()
+            return self.router.call(self.get_model_chain(model, prompt), prompt)
+        
+        cached = self.response_cache.get(self._cache_key(model, prompt))
+        if cached is not None:
+            return cached, model
+        
+        response, model_used = self.router.call(self.get_model_chain(model, prompt), prompt)
+        if response:
+            # 备用模型的回答按实际模型缓存，不会在之后请求主模型时返回
+            self.response_cache.set(self._cache_key(model_used, prompt), response)
+        return response, model_used
+    
+    def stream_model(self, model: str, prompt: str, use_cache: bool = True,
+                     on_model: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+        """流式调用指定的AI模型，逐块返回文本
+
+        on_model在开始输出前以实际回答的模型调用（备用链切换模型时与请求的模型不同）
+        """
+        if use_cache:
+            cached = self.response_cache.get(self._cache_key(model, prompt))
+            if cached is not None:
+                if on_model is not None:
+                    on_model(model)
+                yield cached
+                return
+        else:
+            self.response_cache.record_bypass()
+        
+        chunks = []
+        answered = []
+        
+        def record_model(answered_model: str):
+            answered.append(answered_model)
+            if on_model is not None:
+                on_model(answered_model)
+        
+        for chunk in self.router.stream(self.get_model_chain(model, prompt), prompt, on_model=record_model):
+            if chunk:
+                chunks.append(chunk)
+                yield chunk
+        
+        response = ''.join(chunks)
+        if use_cache and response:
+            self.response_cache.set(self._cache_key(answered[-1] if answered else model, prompt), response)
+    
+    @staticmethod
+    def _cache_key(model: str, prompt: str) -> str:
+        """响应缓存键（模型和全部调用参数）"""
+        return ResponseCache.make_key(model, SYSTEM_PROMPT, prompt, DEFAULT_TEMPERATURE, DEFAULT_MAX_TOKENS)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取响应缓存统计"""
+        return self.response_cache.get_stats()
+    
+    def get_routing_stats(self) -> Dict[str, Any]:
+        """获取模型路由统计（备用切换、对冲请求、各提供商熔断状态和耗时）"""
+        return self.router.get_stats()
+    
+    def get_rate_limit_stats(self) -> Dict[str, Any]:
+        """获取各提供商的限流统计（执行中、排队数、被限流次数等）"""
+        return self.rate_limiters.get_stats()
+    
+    def _limited_call(self, provider: str, model: str, prompt: str, call: Callable[[], Any]) -> Any:
+        """在提供商限流器的名额内执行请求；遇到429时按服务端要求暂停，并在等待上限内重新排队"""
+        limiter = self.rate_limiters.get(provider)
+        estimated = self._estimate_tokens(prompt, model)
+        deadline = limiter.deadline()
+        attempt = 0
+        while True:
+            with limiter.acquire(estimated, deadline):
+                try:
+                    response = call()
+                except Exception as e:
+                    if not _is_rate_limit_error(e):
+                        raise
+                    limiter.record_rate_limited(_error_headers(e))
+                    if attempt >= RATE_LIMIT_RETRIES:
+                        raise
+                    attempt += 1
+                    continue
+            # 按成功响应的限额头校准剩余额度
+            response, headers = _unwrap_response(response)
+            if headers:
+                limiter.update_from_headers(headers)
+            limiter.record_success(estimated, _token_usage(response))
+            return response
+    
+    def _limited_stream(self, provider: str, model: str, prompt: str,
+                        open_stream: Callable[[Callable[[Dict[str, str]], None]], Iterator[str]]) -> Iterator[str]:
+        """流式请求在整个输出期间占用提供商的并发名额；open_stream收到响应头后调用传入的回调校准额度"""
+        limiter = self.rate_limiters.get(provider)
+        estimated = self._estimate_tokens(prompt, model)
+
+        def on_headers(headers: Dict[str, str]):
+            if headers:
+                limiter.update_from_headers(headers)
+
+        with limiter.acquire(estimated):
+            try:
+                yield from open_stream(on_headers)
+            except Exception as e:
+                if _is_rate_limit_error(e):
+                    limiter.record_rate_limited(_error_headers(e))
+                raise
+        limiter.record_success(estimated)
+    
+    def _estimate_tokens(self, prompt: str, model: str) -> int:
+        """请求占用的token额度：输入token数加上最大输出token数"""
+        return self.token_counter.count(SYSTEM_PROMPT + prompt, model) + DEFAULT_MAX_TOKENS
+    
+    def _dispatch_model(self, model: str, prompt: str) -> str:
+        """根据模型名称分发到对应的提供商"""
         if model.startswith('gpt'):
             return self._call_openai(prompt, model)
         elif model.startswith('gemini'):
@@ -262,32 +444,47 @@ class AIService:
             # 默认使用Claude进行编程任务
             return self._call_claude(prompt, 'claude-3.7-sonnet')
     
+    def _dispatch_stream(self, model: str, prompt: str) -> Iterator[str]:
+        """根据模型名称分发到对应提供商的流式接口"""
+        if model.startswith('gpt'):
+            return self._stream_openai(prompt, model)
+        elif model.startswith('gemini'):
+            return self._stream_gemini(prompt, model)
+        elif model.startswith('claude'):
+            return self._stream_claude(prompt, model)
+        elif model == 'deepseek-r1':
+            return self._stream_deepseek(prompt)
+        else:
+            return self._stream_claude(prompt, 'claude-3.7-sonnet')
+    
     def _call_deepseek(self, prompt: str) -> str:
         """调用DeepSeek模型"""
         try:
             if self.deepseek_client:
-                response = self.deepseek_client.chat.completions.create(
+                response = self._limited_call('deepseek', 'deepseek-r1', prompt, lambda: self.deepseek_client.chat.completions.with_raw_response.create(
                     model="deepseek-r1",
                     messages=[
-                        {"role": "system", "content": "You are a helpful coding assistant with expertise in code analysis and generation."},
+                        {"role": "system", "content": SYSTEM_PROMPT},
                         {"role": "user", "content": prompt}
                     ],
-                    max_tokens=4000,
-                    temperature=0.1
-                )
+                    max_tokens=DEFAULT_MAX_TOKENS,
+                    temperature=DEFAULT_TEMPERATURE
+                ))
                 return response.choices[0].message.content
             else:
                 # 如果没有DeepSeek API密钥，使用OpenAI作为备选
-                response = self.openai_client.chat.completions.create(
+                response = self._limited_call('openai', 'gpt-4.1-mini', prompt, lambda: self.openai_client.chat.completions.with_raw_response.create(
                     model="gpt-4.1-mini",
                     messages=[
-                        {"role": "system", "content": "You are a helpful coding assistant with expertise in code analysis and generation."},
+                        {"role": "system", "content": SYSTEM_PROMPT},
                         {"role": "user", "content": prompt}
                     ],
-                    max_tokens=4000,
-                    temperature=0.1
-                )
+                    max_tokens=DEFAULT_MAX_TOKENS,
+                    temperature=DEFAULT_TEMPERATURE
+                ))
                 return response.choices[0].message.content
+        except ProviderBusy:
+            raise
         except Exception as e:
             raise Exception(f"DeepSeek API error: {str(e)}")
     
@@ -295,67 +492,178 @@ class AIService:
         """调用Gemini模型 (Google AI API)"""
         try:
             if not self.google_api_key:
-                return f"Gemini API未配置，请设置GOOGLE_API_KEY环境变量"
+                raise ProviderUnavailable("Gemini API未配置，请设置GOOGLE_API_KEY环境变量")
             
             # 根据模型名称选择对应的Gemini模型
             model_name = "gemini-2.0-flash-exp" if "2.5" in model else "gemini-1.5-flash"
             
             model_instance = genai.GenerativeModel(model_name)
-            response = model_instance.generate_content(
+            response = self._limited_call('gemini', model, prompt, lambda: model_instance.generate_content(
                 prompt,
                 generation_config=genai.types.GenerationConfig(
-                    max_output_tokens=4000,
-                    temperature=0.1,
-                )
-            )
+                    max_output_tokens=DEFAULT_MAX_TOKENS,
+                    temperature=DEFAULT_TEMPERATURE,
+                ),
+                request_options={'timeout': REQUEST_TIMEOUT}
+            ))
             return response.text
+        except (ProviderUnavailable, ProviderBusy):
+            raise
         except Exception as e:
-            return f"Gemini API error: {str(e)}"
+            raise Exception(f"Gemini API error: {str(e)}")
     
     def _call_claude(self, prompt: str, model: str) -> str:
         """调用Claude模型 (Anthropic API)"""
         try:
             if not self.anthropic_client:
-                return f"Claude API未配置，请设置ANTHROPIC_API_KEY环境变量"
+                raise ProviderUnavailable("Claude API未配置，请设置ANTHROPIC_API_KEY环境变量")
             
             # 根据模型名称选择对应的Claude模型
-            if "3.7" in model:
-                claude_model = "claude-3-5-sonnet-20241022"  # 使用最新的Claude 3.5 Sonnet作为3.7的替代
-            elif "3.5" in model:
-                claude_model = "claude-3-5-sonnet-20241022"
-            else:
-                claude_model = "claude-3-haiku-20240307"
+            claude_model = self._resolve_claude_model(model)
             
-            response = self.anthropic_client.messages.create(
+            response = self._limited_call('anthropic', model, prompt, lambda: self.anthropic_client.messages.with_raw_response.create(
                 model=claude_model,
-                max_tokens=4000,
-                temperature=0.1,
-                system="You are a helpful coding assistant with expertise in code analysis and generation.",
+                max_tokens=DEFAULT_MAX_TOKENS,
+                temperature=DEFAULT_TEMPERATURE,
+                system=SYSTEM_PROMPT,
                 messages=[
                     {"role": "user", "content": prompt}
                 ]
-            )
+            ))
             return response.content[0].text
+        except (ProviderUnavailable, ProviderBusy):
+            raise
         except Exception as e:
-            return f"Claude API error: {str(e)}"
+            raise Exception(f"Claude API error: {str(e)}")
     
     def _call_openai(self, prompt: str, model: str) -> str:
         """调用OpenAI模型"""
         try:
-            response = self.openai_client.chat.completions.create(
+            response = self._limited_call('openai', model, prompt, lambda: self.openai_client.chat.completions.with_raw_response.create(
                 model=model,
                 messages=[
-                    {"role": "system", "content": "You are a helpful coding assistant with expertise in code analysis and generation."},
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
-                max_tokens=4000,
-                temperature=0.1
-            )
+                max_tokens=DEFAULT_MAX_TOKENS,
+                temperature=DEFAULT_TEMPERATURE
+            ))
             return response.choices[0].message.content
+        except ProviderBusy:
+            raise
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+
+    def _stream_openai_compatible(self, client, prompt: str, model: str,
+                                  on_headers: Callable[[Dict[str, str]], None]) -> Iterator[str]:
+        """流式调用OpenAI兼容接口（OpenAI/DeepSeek）"""
+        stream, headers = _unwrap_response(client.chat.completions.with_raw_response.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=DEFAULT_MAX_TOKENS,
+            temperature=DEFAULT_TEMPERATURE,
+            stream=True
+        ))
+        on_headers(headers)
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    def _stream_openai(self, prompt: str, model: str) -> Iterator[str]:
+        """流式调用OpenAI模型"""
+        try:
+            yield from self._limited_stream('openai', model, prompt,
+                                            lambda on_headers: self._stream_openai_compatible(self.openai_client, prompt, model, on_headers))
+        except ProviderBusy:
+            raise
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
+    
+    def _stream_deepseek(self, prompt: str) -> Iterator[str]:
+        """流式调用DeepSeek模型"""
+        try:
+            if self.deepseek_client:
+                yield from self._limited_stream('deepseek', 'deepseek-r1', prompt,
+                                                lambda on_headers: self._stream_openai_compatible(self.deepseek_client, prompt, "deepseek-r1", on_headers))
+            else:
+                # 如果没有DeepSeek API密钥，使用OpenAI作为备选
+                yield from self._limited_stream('openai', 'gpt-4.1-mini', prompt,
+                                                lambda on_headers: self._stream_openai_compatible(self.openai_client, prompt, "gpt-4.1-mini", on_headers))
+        except ProviderBusy:
+            raise
+        except Exception as e:
+            raise Exception(f"DeepSeek API error: {str(e)}")
+    
+    def _stream_gemini(self, prompt: str, model: str) -> Iterator[str]:
+        """流式调用Gemini模型"""
+        try:
+            if not self.google_api_key:
+                raise ProviderUnavailable("Gemini API未配置，请设置GOOGLE_API_KEY环境变量")
+            
+            model_name = "gemini-2.0-flash-exp" if "2.5" in model else "gemini-1.5-flash"
+            model_instance = genai.GenerativeModel(model_name)
+            
+            def open_stream(on_headers):
+                # Gemini SDK不返回限额头
+                response = model_instance.generate_content(
+                    prompt,
+                    generation_config=genai.types.GenerationConfig(
+                        max_output_tokens=DEFAULT_MAX_TOKENS,
+                        temperature=DEFAULT_TEMPERATURE,
+                    ),
+                    stream=True,
+                    request_options={'timeout': REQUEST_TIMEOUT}
+                )
+                for chunk in response:
+                    if chunk.text:
+                        yield chunk.text
+            
+            yield from self._limited_stream('gemini', model, prompt, open_stream)
+        except (ProviderUnavailable, ProviderBusy):
+            raise
+        except Exception as e:
+            raise Exception(f"Gemini API error: {str(e)}")
+    
+    def _stream_claude(self, prompt: str, model: str) -> Iterator[str]:
+        """流式调用Claude模型"""
+        try:
+            if not self.anthropic_client:
+                raise ProviderUnavailable("Claude API未配置，请设置ANTHROPIC_API_KEY环境变量")
+            
+            claude_model = self._resolve_claude_model(model)
+            
+            def open_stream(on_headers):
+                with self.anthropic_client.messages.stream(
+                    model=claude_model,
+                    max_tokens=DEFAULT_MAX_TOKENS,
+                    temperature=DEFAULT_TEMPERATURE,
+                    system=SYSTEM_PROMPT,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ]
+                ) as stream:
+                    on_headers(_headers_dict(getattr(getattr(stream, 'response', None), 'headers', None)))
+                    yield from stream.text_stream
+            
+            yield from self._limited_stream('anthropic', model, prompt, open_stream)
+        except (ProviderUnavailable, ProviderBusy):
+            raise
+        except Exception as e:
+            raise Exception(f"Claude API error: {str(e)}")
+    
+    def _resolve_claude_model(self, model: str) -> str:
+        """将界面上的Claude模型名映射为API模型名"""
+        if "3.7" in model:
+            return "claude-3-5-sonnet-20241022"  # 使用最新的Claude 3.5 Sonnet作为3.7的替代
+        elif "3.5" in model:
+            return "claude-3-5-sonnet-20241022"
+        else:
+            return "claude-3-haiku-20240307"
 
-    def analyze_project(self, project_overview: dict, important_files: list, analysis_type: str = 'overview', model: str = None) -> dict:
+    def analyze_project(self, project_overview: dict, important_files: list, analysis_type: str = 'overview', model: str = None, use_cache: bool = True) -> dict:
         """分析整个项目"""
         try:
             # 如果没有指定模型，使用智能选择（项目分析通常需要大上下文）
@@ -468,13 +776,13 @@ class AIService:
                 prompt = f"请分析项目：{project_overview.get('name', 'Unknown')}"
             
             # 调用AI模型
-            response = self._call_model(model, prompt)
+            response, model_used = self._call_model(model, prompt, use_cache=use_cache)
             
             return {
                 'success': True,
                 'analysis': response,
                 'analysis_type': analysis_type,
-                'model_used': model,
+                'model_used': model_used,
                 'files_analyzed': len(important_files)
             }
             
@@ -486,6 +794,39 @@ class AIService:
                 'model_used': model
             }
 
+def _is_rate_limit_error(error: Exception) -> bool:
+    """SDK抛出的异常是否为429（OpenAI/Anthropic的status_code，Google的code）"""
+    return getattr(error, 'status_code', None) == 429 or getattr(error, 'code', None) == 429
+
+def _error_headers(error: Exception) -> Dict[str, str]:
+    """取出异常附带的HTTP响应头（包含retry-after和限额信息）"""
+    return _headers_dict(getattr(getattr(error, 'response', None), 'headers', None))
+
+def _headers_dict(headers: Any) -> Dict[str, str]:
+    try:
+        return dict(headers) if headers else {}
+    except (TypeError, ValueError):
+        return {}
+
+def _unwrap_response(response: Any) -> Tuple[Any, Dict[str, str]]:
+    """with_raw_response返回的原始响应：解析出SDK的响应对象并取出HTTP响应头，其他对象原样返回"""
+    response_type = type(response)
+    if callable(getattr(response_type, 'parse', None)) and hasattr(response_type, 'headers'):
+        return response.parse(), _headers_dict(response.headers)
+    return response, {}
+
+def _token_usage(response: Any) -> Optional[int]:
+    """从各SDK的响应中取出实际消耗的token数，取不到时返回None"""
+    usage = getattr(response, 'usage', None)
+    total = getattr(usage, 'total_tokens', None)
+    if isinstance(total, int):
+        return total
+    input_tokens, output_tokens = getattr(usage, 'input_tokens', None), getattr(usage, 'output_tokens', None)
+    if isinstance(input_tokens, int) and isinstance(output_tokens, int):
+        return input_tokens + output_tokens
+    total = getattr(getattr(response, 'usage_metadata', None), 'total_token_count', None)
+    return total if isinstance(total, int) else None
+
 # 全局AI服务实例
 ai_service = AIService()
 
@@ -0,0 +1,83 @@
+import os
+import json
+import hashlib
+from typing import Dict, Optional, Any
+
+# 默认的分析索引目录
+DEFAULT_INDEX_DIR = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'database', 'analysis_index'
+)
+
+INDEX_VERSION = 3
+
+class AnalysisIndex:
+    """按git blob SHA记录每个文件分析结果的项目索引，用于增量分析"""
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self.files = {}
+        self.stats = None
+        self.quality_score_total = 0
+
+    @classmethod
+    def for_project(cls, project_path: str, index_dir: Optional[str] = None) -> 'AnalysisIndex':
+        """根据项目路径定位并加载索引"""
+        index_dir = index_dir or os.getenv('ANALYSIS_INDEX_DIR') or DEFAULT_INDEX_DIR
+        key = hashlib.sha1(os.path.abspath(project_path).encode('utf-8')).hexdigest()[:16]
+        index = cls(os.path.join(index_dir, f'{key}.json'))
+        index.load()
+        return index
+
+    def load(self):
+        """从磁盘加载索引，文件不存在或版本不匹配时视为空索引"""
+        if not os.path.exists(self.index_path):
+            return
+
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"Failed to load analysis index {self.index_path}: {e}")
+            return
+
+        if data.get('version') != INDEX_VERSION:
+            return
+
+        self.files = data.get('files', {})
+        self.stats = data.get('stats')
+        self.quality_score_total = data.get('quality_score_total', 0)
+
+    def save(self):
+        """原子地写回磁盘"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'files': self.files,
+                'stats': self.stats,
+                'quality_score_total': self.quality_score_total
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def get_sha(self, relative_path: str) -> Optional[str]:
+        """获取已索引文件的blob SHA"""
+        entry = self.files.get(relative_path)
+        return entry['blob_sha'] if entry else None
+
+    def get_analysis(self, relative_path: str) -> Optional[Dict[str, Any]]:
+        """获取已索引文件的分析结果"""
+        entry = self.files.get(relative_path)
+        return entry['analysis'] if entry else None
+
+    def put(self, relative_path: str, blob_sha: str, analysis: Dict[str, Any]):
+        """记录文件的分析结果"""
+        self.files[relative_path] = {
+            'blob_sha': blob_sha,
+            'analysis': analysis
+        }
+
+    def remove(self, relative_path: str) -> Optional[Dict[str, Any]]:
+        """移除文件，返回旧的分析结果"""
+        entry = self.files.pop(relative_path, None)
+        return entry['analysis'] if entry else None
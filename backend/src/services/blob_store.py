@@ -0,0 +1,141 @@
+import os
+import zlib
+import hashlib
+from typing import Dict, Iterable, List, Optional, Any
+from sqlalchemy import delete, exists, func
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.user import db
+from src.models.project import CodeFile, FileBlob
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 每次IN查询的哈希数量（低于SQLite的变量个数上限）
+QUERY_CHUNK_SIZE = 500
+
+class BlobStore:
+    """文件内容的内容寻址存储
+
+    文件内容按SHA-256去重后压缩保存在file_blob表中，code_file只保存content_hash，
+    列表查询不再加载文件内容
+    """
+
+    def __init__(self, codec: Optional[str] = None, level: Optional[int] = None, min_size: Optional[int] = None):
+        codec = (codec or os.getenv('BLOB_CODEC', 'zstd')).lower()
+        if codec == 'zstd' and zstandard is None:
+            # 未安装zstandard时退化为zlib
+            codec = 'zlib'
+        self.codec = codec
+        self.level = level if level is not None else int(os.getenv('BLOB_COMPRESSION_LEVEL', 3 if codec == 'zstd' else 6))
+        # 小于该字节数的内容不压缩
+        self.min_size = min_size if min_size is not None else int(os.getenv('BLOB_MIN_COMPRESS_SIZE', 256))
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        """内容的SHA-256（十六进制）"""
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def put(self, content: str) -> str:
+        """保存单个内容（已存在时不重复写入），返回哈希；由调用方提交事务"""
+        content_hash = self.hash_content(content)
+        self._insert_ignore([dict(hash=content_hash, **self._encode(content))])
+        return content_hash
+
+    def put_many(self, contents: Dict[str, str]):
+        """批量保存 {哈希: 内容}，已存在的内容由数据库忽略；由调用方提交事务"""
+        self._insert_ignore([
+            dict(hash=content_hash, **self._encode(content))
+            for content_hash, content in contents.items()
+        ])
+
+    def get(self, content_hash: str) -> Optional[str]:
+        """按哈希读取内容，不存在时返回None"""
+        blob = db.session.get(FileBlob, content_hash)
+        return self._decode(blob.codec, blob.data) if blob else None
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, str]:
+        """批量读取内容，返回 {哈希: 内容}"""
+        unique = [content_hash for content_hash in set(hashes) if content_hash]
+        contents = {}
+        for start in range(0, len(unique), QUERY_CHUNK_SIZE):
+            chunk = unique[start:start + QUERY_CHUNK_SIZE]
+            for content_hash, codec, data in db.session.query(
+                FileBlob.hash, FileBlob.codec, FileBlob.data
+            ).filter(FileBlob.hash.in_(chunk)):
+                contents[content_hash] = self._decode(codec, data)
+        return contents
+
+    def load_contents(self, code_files: List[CodeFile]):
+        """为一组文件批量预加载内容，避免逐个访问content时每个文件一次查询"""
+        contents = self.get_many(code_file.content_hash for code_file in code_files)
+        for code_file in code_files:
+            code_file.set_loaded_content(contents.get(code_file.content_hash))
+
+    def discard(self, hashes: Iterable[str]) -> int:
+        """删除不再被任何文件引用的内容，返回删除数量；由调用方提交事务
+
+        是否仍被引用在同一条DELETE语句中判断，不会删除其他事务在查询之后引用的内容
+        """
+        candidates = list({content_hash for content_hash in hashes if content_hash})
+        removed = 0
+        for start in range(0, len(candidates), QUERY_CHUNK_SIZE):
+            chunk = candidates[start:start + QUERY_CHUNK_SIZE]
+            removed += db.session.execute(
+                delete(FileBlob)
+                .where(FileBlob.hash.in_(chunk))
+                .where(~exists().where(CodeFile.content_hash == FileBlob.hash))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """内容存储统计（数量、原始大小和压缩后大小）"""
+        count, raw_bytes, stored_bytes = db.session.query(
+            func.count(FileBlob.hash), func.sum(FileBlob.size), func.sum(func.length(FileBlob.data))
+        ).one()
+        files = db.session.query(func.count(CodeFile.id)).filter(CodeFile.content_hash.isnot(None)).scalar()
+        return {
+            'codec': self.codec,
+            'blobs': count,
+            'files': files,
+            'raw_bytes': raw_bytes or 0,
+            'stored_bytes': stored_bytes or 0,
+            'compression_ratio': round((stored_bytes or 0) / raw_bytes, 3) if raw_bytes else None
+        }
+
+    def _insert_ignore(self, rows: List[Dict[str, Any]]):
+        """INSERT ... ON CONFLICT DO NOTHING：并发写入相同内容时不会因主键冲突中止事务"""
+        if not rows:
+            return
+        dialect = db.session.get_bind(mapper=FileBlob).dialect.name
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        db.session.execute(insert(FileBlob).on_conflict_do_nothing(index_elements=['hash']), rows)
+
+    def _encode(self, content: str) -> Dict[str, Any]:
+        """压缩内容；小文件或压缩后没有变小时原样保存"""
+        raw = content.encode('utf-8')
+        codec, data = 'none', raw
+        if len(raw) >= self.min_size:
+            if self.codec == 'zstd':
+                compressed = zstandard.ZstdCompressor(level=self.level).compress(raw)
+            elif self.codec == 'zlib':
+                compressed = zlib.compress(raw, self.level)
+            else:
+                compressed = raw
+            if len(compressed) < len(raw):
+                codec, data = self.codec, compressed
+        return {'codec': codec, 'size': len(raw), 'data': data}
+
+    def _decode(self, codec: str, data: bytes) -> str:
+        if codec == 'zstd':
+            if zstandard is None:
+                raise RuntimeError('zstandard is required to read zstd-compressed file content')
+            data = zstandard.ZstdDecompressor().decompress(data)
+        elif codec == 'zlib':
+            data = zlib.decompress(data)
+        return bytes(data).decode('utf-8')
+
+# 全局内容存储实例
+blob_store = BlobStore()
@@ -0,0 +1,58 @@
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, List
+from sqlalchemy import insert
+from src.models.user import db
+
+def bulk_insert(model, rows: List[Dict[str, Any]]):
+    """批量插入：PostgreSQL使用COPY，其他数据库使用executemany；由调用方提交事务"""
+    if not rows:
+        return
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        copy_rows(connection, model.__table__, rows)
+    else:
+        db.session.execute(insert(model), rows)
+
+def copy_rows(connection, table, rows: List[Dict[str, Any]]):
+    """通过 COPY ... FROM STDIN（text格式）写入一批行，所有行的键相同"""
+    columns = list(rows[0])
+    preparer = connection.dialect.identifier_preparer
+    sql = (f"COPY {preparer.format_table(table)} ({', '.join(preparer.quote(column) for column in columns)}) "
+           "FROM STDIN")
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(row.get(column)) for column in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+def _copy_value(value: Any) -> str:
+    """转换为COPY text格式：NULL为\\N，反斜杠、制表符和换行需要转义"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # bytea的十六进制格式，反斜杠本身也要转义
+        return '\\\\x' + bytes(value).hex()
+    if isinstance(value, datetime):
+        value = value.isoformat(sep=' ')
+    elif isinstance(value, bool):
+        value = 't' if value else 'f'
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False)
+    else:
+        value = str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
@@ -1,27 +1,29 @@
 import os
-import tree_sitter_python as tspython
-from tree_sitter import Language, Parser
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import json
-import re
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from src.services.analysis_index import AnalysisIndex
+from src.services.line_scanner import line_scanner
+from src.services.parser_registry import parser_registry
+
+# 分析项目时跳过的目录
+IGNORED_DIRS = ['node_modules', '__pycache__', 'venv', 'env']
 
 class CodeAnalysisService:
     """代码分析服务类，使用Tree-sitter进行代码解析"""
     
-    def __init__(self):
-        # 初始化支持的语言解析器
-        self.parsers = {}
-        self.languages = {}
-        
-        # 初始化Python解析器
-        try:
-            PY_LANGUAGE = Language(tspython.language())
-            self.languages['python'] = PY_LANGUAGE
-            
-            parser = Parser(PY_LANGUAGE)
-            self.parsers['python'] = parser
-        except Exception as e:
-            print(f"Failed to initialize Python parser: {e}")
+    def __init__(self, max_workers: Optional[int] = None):
+        # 语法解析器由注册表按语言延迟加载
+        self.parser_registry = parser_registry
+        
+        # 并行分析的进程池（首次使用时创建，所有请求共享，进程数固定为max_workers）
+        # 默认取CPU核数的一半且不超过4，避免分析任务占满Web进程所在机器
+        self.max_workers = max_workers or int(os.getenv('ANALYSIS_WORKERS', 0)) or \
+            min(4, max(1, (os.cpu_count() or 1) // 2))
+        self._executor = None
+        self._executor_lock = threading.Lock()
     
     def analyze_file(self, file_path: str, content: str = None) -> Dict[str, Any]:
         """分析单个文件"""
@@ -40,16 +42,13 @@ class CodeAnalysisService:
                     'error': f'Unsupported file type: {file_ext}'
                 }
             
-            # 基础分析
-            basic_analysis = self._basic_analysis(content, language)
+            # 基础分析和代码质量分析（单遍扫描）
+            basic_analysis, quality_analysis = line_scanner.scan(content, language)
             
             # 语法分析（如果支持Tree-sitter）
             syntax_analysis = {}
-            if language in self.parsers:
-                syntax_analysis = self._syntax_analysis(content, language)
-            
-            # 代码质量分析
-            quality_analysis = self._quality_analysis(content, language)
+            if self.parser_registry.supports(language, file_ext):
+                syntax_analysis = self._syntax_analysis(content, language, file_ext=file_ext)
             
             return {
                 'success': True,
@@ -66,44 +65,48 @@ class CodeAnalysisService:
                 'error': str(e)
             }
     
-    def analyze_project(self, project_path: str) -> Dict[str, Any]:
-        """分析整个项目"""
+    def extract_symbols(self, content: str, file_path: str) -> List[Dict[str, Any]]:
+        """提取文件中的函数和类定义（用于符号索引），不支持语法分析的文件返回空列表"""
+        file_ext = os.path.splitext(file_path)[1].lower()
+        language = self._detect_language(file_ext)
+        if not language or not self.parser_registry.supports(language, file_ext):
+            return []
+
+        syntax_analysis = self._syntax_analysis(content, language, file_ext=file_ext)
+        symbols = []
+        for kind, key in (('function', 'functions'), ('class', 'classes')):
+            for definition in syntax_analysis.get(key, []):
+                symbols.append(dict(definition, kind=kind))
+        symbols.sort(key=lambda symbol: symbol['start_line'])
+        return symbols
+
+    def analyze_project(self, project_path: str, workers: Optional[int] = None,
+                        chunk_size: Optional[int] = None, incremental: bool = False,
+                        index_dir: Optional[str] = None) -> Dict[str, Any]:
+        """分析整个项目（workers > 1 时使用共享进程池并行分析，不超过max_workers；incremental时只分析变更文件）"""
         try:
+            workers = min(workers or self.max_workers, self.max_workers)
+            
+            if incremental:
+                blob_shas = self._get_blob_shas(project_path)
+                if blob_shas is not None:
+                    return self._analyze_project_incremental(project_path, blob_shas, workers, chunk_size, index_dir)
+            
             analysis_results = []
-            project_stats = {
-                'total_files': 0,
-                'total_lines': 0,
-                'languages': {},
-                'file_types': {},
-                'complexity_score': 0,
-                'issues_count': 0
-            }
+            project_stats = self._empty_project_stats()
             
-            # 遍历项目文件
-            for root, dirs, files in os.walk(project_path):
-                # 跳过常见的忽略目录
-                dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['node_modules', '__pycache__', 'venv', 'env']]
-                
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(file_path, project_path)
+            # 收集代码文件，排序保证结果顺序确定
+            code_files = self._collect_code_files(project_path)
+            
+            for (file_path, relative_path), analysis in zip(code_files, self._analyze_files(code_files, workers, chunk_size)):
+                if analysis['success']:
+                    analysis_results.append({
+                        'file_path': relative_path,
+                        'analysis': analysis
+                    })
                     
-                    # 只分析代码文件
-                    if self._is_code_file(file):
-                        try:
-                            analysis = self.analyze_file(file_path)
-                            if analysis['success']:
-                                analysis_results.append({
-                                    'file_path': relative_path,
-                                    'analysis': analysis
-                                })
-                                
-                                # 更新项目统计
-                                self._update_project_stats(project_stats, analysis)
-                                
-                        except Exception as e:
-                            print(f"Failed to analyze {relative_path}: {e}")
-                            continue
+                    # 更新项目统计
+                    self._update_project_stats(project_stats, analysis)
             
             # 计算项目整体评分
             project_score = self._calculate_project_score(project_stats, analysis_results)
@@ -123,56 +126,164 @@ class CodeAnalysisService:
                 'error': str(e)
             }
     
-    def _basic_analysis(self, content: str, language: str) -> Dict[str, Any]:
-        """基础代码分析"""
-        lines = content.split('\n')
-        
-        analysis = {
-            'total_lines': len(lines),
-            'code_lines': 0,
-            'comment_lines': 0,
-            'blank_lines': 0,
-            'max_line_length': 0,
-            'avg_line_length': 0,
-            'functions_count': 0,
-            'classes_count': 0
-        }
+    def _analyze_project_incremental(self, project_path: str, blob_shas: Dict[str, str], workers: int,
+                                     chunk_size: Optional[int], index_dir: Optional[str]) -> Dict[str, Any]:
+        """基于blob SHA索引增量分析项目，只重新分析新增和修改的文件"""
+        index = AnalysisIndex.for_project(project_path, index_dir)
+        project_stats = index.stats or self._empty_project_stats()
+        
+        code_files = self._collect_code_files(project_path)
+        current = {relative_path: file_path for file_path, relative_path in code_files}
+        
+        # 删除的文件：从索引和统计中移除
+        deleted = [path for path in index.files if path not in current]
+        for relative_path in deleted:
+            self._remove_indexed_analysis(index, project_stats, relative_path)
+        
+        # 新增或修改的文件（被git忽略的文件没有SHA，用文件大小和修改时间代替）
+        changed = []
+        file_shas = {}
+        added = modified = 0
+        for file_path, relative_path in code_files:
+            blob_sha = blob_shas.get(relative_path) or self._stat_signature(file_path)
+            file_shas[relative_path] = blob_sha
+            indexed_sha = index.get_sha(relative_path)
+            if blob_sha == indexed_sha:
+                continue
+            if indexed_sha is None:
+                added += 1
+            else:
+                modified += 1
+                self._remove_indexed_analysis(index, project_stats, relative_path)
+            changed.append((file_path, relative_path))
+        
+        for (file_path, relative_path), analysis in zip(changed, self._analyze_files(changed, workers, chunk_size)):
+            index.put(relative_path, file_shas[relative_path], analysis)
+            if analysis['success']:
+                self._update_project_stats(project_stats, analysis)
+                index.quality_score_total += analysis.get('quality_analysis', {}).get('quality_score', 0)
+        
+        index.stats = project_stats
+        if changed or deleted:
+            index.save()
+        
+        analysis_results = []
+        for relative_path in sorted(current):
+            analysis = index.get_analysis(relative_path)
+            if analysis and analysis['success']:
+                analysis_results.append({
+                    'file_path': relative_path,
+                    'analysis': analysis
+                })
         
-        total_length = 0
+        project_score = self._score_from_totals(project_stats, index.quality_score_total, len(analysis_results))
         
-        for line in lines:
-            stripped = line.strip()
-            line_length = len(line)
-            total_length += line_length
-            
-            if line_length > analysis['max_line_length']:
-                analysis['max_line_length'] = line_length
+        return {
+            'success': True,
+            'project_path': project_path,
+            'stats': project_stats,
+            'score': project_score,
+            'files_analyzed': len(analysis_results),
+            'file_analyses': analysis_results,
+            'incremental': {
+                'added': added,
+                'modified': modified,
+                'deleted': len(deleted),
+                'unchanged': len(code_files) - len(changed)
+            }
+        }
+    
+    def _remove_indexed_analysis(self, index: AnalysisIndex, stats: Dict[str, Any], relative_path: str):
+        """从索引中移除文件并扣除其统计贡献"""
+        analysis = index.remove(relative_path)
+        if analysis and analysis['success']:
+            self._remove_project_stats(stats, analysis)
+            index.quality_score_total -= analysis.get('quality_analysis', {}).get('quality_score', 0)
+    
+    def _stat_signature(self, file_path: str) -> str:
+        """没有blob SHA时用于判断文件是否变化的签名"""
+        stat = os.stat(file_path)
+        return f'stat:{stat.st_size}:{stat.st_mtime_ns}'
+    
+    def _get_blob_shas(self, project_path: str) -> Optional[Dict[str, str]]:
+        """获取项目文件的blob SHA，非git仓库返回None"""
+        from src.services.github_service import github_service
+        try:
+            return github_service.get_file_blob_shas(project_path)
+        except Exception as e:
+            print(f"Incremental analysis unavailable for {project_path}: {e}")
+            return None
+    
+    def shutdown(self):
+        """关闭并行分析进程池"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+    
+    def _collect_code_files(self, project_path: str) -> List[Tuple[str, str]]:
+        """遍历项目，返回排序后的(绝对路径, 相对路径)列表"""
+        code_files = []
+        for root, dirs, files in os.walk(project_path):
+            # 跳过常见的忽略目录
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in IGNORED_DIRS]
             
-            if not stripped:
-                analysis['blank_lines'] += 1
-            elif self._is_comment_line(stripped, language):
-                analysis['comment_lines'] += 1
-            else:
-                analysis['code_lines'] += 1
+            for file in files:
+                # 只分析代码文件
+                if self._is_code_file(file):
+                    file_path = os.path.join(root, file)
+                    code_files.append((file_path, os.path.relpath(file_path, project_path)))
         
-        if lines:
-            analysis['avg_line_length'] = total_length / len(lines)
+        code_files.sort(key=lambda item: item[1])
+        return code_files
+    
+    def _analyze_files(self, code_files: List[Tuple[str, str]], workers: int,
+                       chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """分析文件列表，返回与输入顺序一致的结果"""
+        paths = [file_path for file_path, _ in code_files]
+        
+        # 文件太少时进程间通信的开销大于收益
+        if workers <= 1 or len(paths) < workers * 2:
+            return [self.analyze_file(path) for path in paths]
         
-        # 简单的函数和类计数
-        if language == 'python':
-            analysis['functions_count'] = len(re.findall(r'^\s*def\s+\w+', content, re.MULTILINE))
-            analysis['classes_count'] = len(re.findall(r'^\s*class\s+\w+', content, re.MULTILINE))
-        elif language in ['javascript', 'typescript']:
-            analysis['functions_count'] = len(re.findall(r'function\s+\w+|=>\s*{|\w+\s*:\s*function', content))
-            analysis['classes_count'] = len(re.findall(r'class\s+\w+', content))
+        if chunk_size is None:
+            # 每个进程约分到4批，兼顾负载均衡与通信开销
+            chunk_size = max(1, min(64, len(paths) // (workers * 4)))
         
-        return analysis
+        executor = self._get_executor()
+        return list(executor.map(_analyze_in_worker, paths, chunksize=chunk_size))
     
-    def _syntax_analysis(self, content: str, language: str) -> Dict[str, Any]:
-        """语法分析（使用Tree-sitter）"""
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """延迟创建共享的分析进程池（并发请求排队使用同一组进程）"""
+        with self._executor_lock:
+            if self._executor is None:
+                # 使用spawn启动，避免fork继承gevent的事件循环状态
+                context = multiprocessing.get_context(os.getenv('ANALYSIS_START_METHOD', 'spawn'))
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_analysis_worker
+                )
+            return self._executor
+    
+    def _syntax_analysis(self, content: str, language: str, skip_types: Optional[set] = None,
+                         file_ext: Optional[str] = None, tree=None,
+                         rows: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+        """语法分析（使用Tree-sitter）
+        
+        skip_types: 不进入其子树的节点类型，默认使用LANGUAGE_SPECS中的配置，传入空集合则遍历整棵树
+        tree: 已经解析好的语法树（如编辑器增量重解析的结果），传入时不再重新解析content
+        rows: 只提取与这些行（从0开始，含两端）相交的定义和导入，语法错误仍然报告整个文件的
+        """
         try:
-            parser = self.parsers[language]
-            tree = parser.parse(bytes(content, 'utf8'))
+            if tree is None:
+                parser = self.parser_registry.get_parser(language, file_ext)
+                if parser is None:
+                    return {'error': f'No tree-sitter grammar available for {language}'}
+                tree = parser.parse(bytes(content, 'utf8'))
+            spec = self.parser_registry.get_spec(language)
+            if skip_types is None:
+                skip_types = spec['skip']
             
             analysis = {
                 'parse_errors': [],
@@ -184,146 +295,96 @@ class CodeAnalysisService:
             }
             
             # 遍历语法树
-            self._traverse_tree(tree.root_node, analysis, content)
+            max_depth = self._walk_tree(tree, spec, skip_types, analysis, rows)
+            analysis['complexity_metrics']['max_nesting_depth'] = max_depth
             
             return analysis
             
         except Exception as e:
             return {'error': str(e)}
     
-    def _quality_analysis(self, content: str, language: str) -> Dict[str, Any]:
-        """代码质量分析"""
-        issues = []
-        
-        lines = content.split('\n')
-        
-        # 检查常见问题
-        for i, line in enumerate(lines, 1):
-            stripped = line.strip()
+    def _walk_tree(self, tree, spec: Dict[str, Any], skip_types: set, analysis: Dict[str, Any],
+                   rows: Optional[Tuple[int, int]] = None) -> int:
+        """用TreeCursor迭代遍历语法树，提取定义和导入，返回定义的最大嵌套深度"""
+        function_types = spec['function']
+        class_types = spec['class']
+        import_types = spec['import']
+        requires_body = spec.get('requires_body', ())
+        
+        cursor = tree.walk()
+        level = 0
+        def_levels = []  # 当前所在的函数/类定义所处的层级
+        max_depth = 0
+        
+        while True:
+            node = cursor.node
+            node_type = node.type
+            # 回到同级或更浅的层级时，之前的定义已经结束
+            while def_levels and def_levels[-1] >= level:
+                def_levels.pop()
             
-            # 行长度检查
-            if len(line) > 120:
-                issues.append({
-                    'type': 'line_length',
-                    'severity': 'warning',
-                    'line': i,
-                    'message': f'Line too long ({len(line)} characters)'
-                })
+            descend = True
+            if rows is not None and (node.end_point[0] < rows[0] or node.start_point[0] > rows[1]):
+                # 区域外的子树只需要查找语法错误
+                descend = node.has_error
+            elif node_type in function_types or node_type in class_types:
+                name = self._definition_name(node, spec)
+                if name and (node_type not in requires_body or node.child_by_field_name('body')):
+                    analysis['functions' if node_type in function_types else 'classes'].append({
+                        'name': name,
+                        'start_line': node.start_point[0] + 1,
+                        'end_line': node.end_point[0] + 1,
+                        'depth': len(def_levels)
+                    })
+                    def_levels.append(level)
+                    max_depth = max(max_depth, len(def_levels))
+            elif node_type in import_types:
+                for entry in spec['imports'](node):
+                    entry.setdefault('line', node.start_point[0] + 1)
+                    analysis['imports'].append(entry)
+                descend = False
+            elif node_type in skip_types and not node.has_error:
+                # 该子树不会包含定义或导入
+                descend = False
             
-            # 尾随空格检查
-            if line.endswith(' ') or line.endswith('\t'):
-                issues.append({
-                    'type': 'trailing_whitespace',
-                    'severity': 'info',
-                    'line': i,
-                    'message': 'Trailing whitespace'
+            if node_type == 'ERROR' or node.is_missing:
+                analysis['parse_errors'].append({
+                    'line': node.start_point[0] + 1,
+                    'column': node.start_point[1] + 1,
+                    'message': f'Missing {node_type}' if node.is_missing else 'Syntax error'
                 })
             
-            # 语言特定检查
-            if language == 'python':
-                issues.extend(self._python_quality_checks(stripped, i))
-            elif language in ['javascript', 'typescript']:
-                issues.extend(self._javascript_quality_checks(stripped, i))
-        
-        # 计算质量评分
-        quality_score = max(0, 100 - len(issues) * 2)
-        
-        return {
-            'issues': issues,
-            'quality_score': quality_score,
-            'issues_by_severity': {
-                'error': len([i for i in issues if i['severity'] == 'error']),
-                'warning': len([i for i in issues if i['severity'] == 'warning']),
-                'info': len([i for i in issues if i['severity'] == 'info'])
-            }
-        }
-    
-    def _python_quality_checks(self, line: str, line_num: int) -> List[Dict[str, Any]]:
-        """Python特定的质量检查"""
-        issues = []
-        
-        # 检查import语句
-        if line.startswith('from ') and ' import *' in line:
-            issues.append({
-                'type': 'wildcard_import',
-                'severity': 'warning',
-                'line': line_num,
-                'message': 'Avoid wildcard imports'
-            })
-        
-        # 检查print语句（可能是调试代码）
-        if 'print(' in line and not line.strip().startswith('#'):
-            issues.append({
-                'type': 'debug_print',
-                'severity': 'info',
-                'line': line_num,
-                'message': 'Consider removing debug print statement'
-            })
-        
-        # 检查TODO注释
-        if 'TODO' in line.upper() or 'FIXME' in line.upper():
-            issues.append({
-                'type': 'todo_comment',
-                'severity': 'info',
-                'line': line_num,
-                'message': 'TODO/FIXME comment found'
-            })
-        
-        return issues
-    
-    def _javascript_quality_checks(self, line: str, line_num: int) -> List[Dict[str, Any]]:
-        """JavaScript/TypeScript特定的质量检查"""
-        issues = []
-        
-        # 检查console.log
-        if 'console.log(' in line:
-            issues.append({
-                'type': 'debug_console',
-                'severity': 'info',
-                'line': line_num,
-                'message': 'Consider removing debug console.log'
-            })
-        
-        # 检查var声明
-        if re.match(r'^\s*var\s+', line):
-            issues.append({
-                'type': 'var_declaration',
-                'severity': 'warning',
-                'line': line_num,
-                'message': 'Consider using let or const instead of var'
-            })
-        
-        return issues
+            if descend and cursor.goto_first_child():
+                level += 1
+                continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return max_depth
+                level -= 1
     
-    def _traverse_tree(self, node, analysis: Dict[str, Any], content: str):
-        """遍历语法树节点"""
-        if node.type == 'function_definition':
-            func_name = self._get_node_text(node, content)
-            analysis['functions'].append({
-                'name': func_name,
-                'start_line': node.start_point[0] + 1,
-                'end_line': node.end_point[0] + 1
-            })
-        elif node.type == 'class_definition':
-            class_name = self._get_node_text(node, content)
-            analysis['classes'].append({
-                'name': class_name,
-                'start_line': node.start_point[0] + 1,
-                'end_line': node.end_point[0] + 1
-            })
-        
-        # 递归遍历子节点
-        for child in node.children:
-            self._traverse_tree(child, analysis, content)
-    
-    def _get_node_text(self, node, content: str) -> str:
-        """获取节点对应的文本"""
-        try:
-            start_byte = node.start_byte
-            end_byte = node.end_byte
-            return content[start_byte:end_byte]
-        except:
-            return "unknown"
+    def _definition_name(self, node, spec: Dict[str, Any]) -> str:
+        """获取定义的名称，匿名函数取赋值目标的名称"""
+        name_node = None
+        for field in spec.get('name_fields', ('name',)):
+            name_node = node.child_by_field_name(field)
+            if name_node is not None:
+                break
+        
+        if name_node is None:
+            parent = node.parent
+            field = spec.get('parent_name_fields', {}).get(parent.type) if parent else None
+            if field:
+                name_node = parent.child_by_field_name(field)
+            if name_node is None:
+                return ''
+        
+        # C系语言：沿declarator链找到最内层的标识符
+        while True:
+            inner = name_node.child_by_field_name('declarator')
+            if inner is None:
+                break
+            name_node = inner
+        return name_node.text.decode('utf-8', 'replace')
     
     def _detect_language(self, file_ext: str) -> Optional[str]:
         """检测编程语言"""
@@ -485,17 +546,16 @@ class CodeAnalysisService:
         ext = os.path.splitext(filename)[1].lower()
         return ext in code_extensions
     
-    def _is_comment_line(self, line: str, language: str) -> bool:
-        """判断是否为注释行"""
-        if language == 'python':
-            return line.startswith('#')
-        elif language in ['javascript', 'typescript', 'java', 'cpp', 'c', 'cs']:
-            return line.startswith('//') or line.startswith('/*') or line.startswith('*')
-        elif language == 'html':
-            return line.startswith('<!--')
-        elif language == 'css':
-            return line.startswith('/*')
-        return False
+    def _empty_project_stats(self) -> Dict[str, Any]:
+        """初始的项目统计信息"""
+        return {
+            'total_files': 0,
+            'total_lines': 0,
+            'languages': {},
+            'file_types': {},
+            'complexity_score': 0,
+            'issues_count': 0
+        }
     
     def _update_project_stats(self, stats: Dict[str, Any], analysis: Dict[str, Any]):
         """更新项目统计信息"""
@@ -511,20 +571,40 @@ class CodeAnalysisService:
             quality = analysis.get('quality_analysis', {})
             stats['issues_count'] += len(quality.get('issues', []))
     
+    def _remove_project_stats(self, stats: Dict[str, Any], analysis: Dict[str, Any]):
+        """从项目统计中扣除一个文件的贡献（_update_project_stats的逆操作）"""
+        if analysis['success']:
+            stats['total_files'] -= 1
+            
+            basic = analysis.get('basic_analysis', {})
+            stats['total_lines'] -= basic.get('total_lines', 0)
+            
+            language = analysis.get('language', 'unknown')
+            remaining = stats['languages'].get(language, 0) - 1
+            if remaining > 0:
+                stats['languages'][language] = remaining
+            else:
+                stats['languages'].pop(language, None)
+            
+            quality = analysis.get('quality_analysis', {})
+            stats['issues_count'] -= len(quality.get('issues', []))
+    
     def _calculate_project_score(self, stats: Dict[str, Any], analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
         """计算项目整体评分"""
-        if not analyses:
-            return {'overall_score': 0, 'details': 'No files analyzed'}
-        
         total_quality_score = 0
-        total_files = len(analyses)
-        
         for analysis_result in analyses:
             analysis = analysis_result.get('analysis', {})
             quality = analysis.get('quality_analysis', {})
             total_quality_score += quality.get('quality_score', 0)
         
-        overall_score = total_quality_score / total_files if total_files > 0 else 0
+        return self._score_from_totals(stats, total_quality_score, len(analyses))
+    
+    def _score_from_totals(self, stats: Dict[str, Any], total_quality_score: float, total_files: int) -> Dict[str, Any]:
+        """根据累计的质量分计算项目评分（增量分析时无需遍历全部结果）"""
+        if not total_files:
+            return {'overall_score': 0, 'details': 'No files analyzed'}
+        
+        overall_score = total_quality_score / total_files
         
         return {
             'overall_score': round(overall_score, 2),
@@ -534,6 +614,24 @@ class CodeAnalysisService:
             'details': f'Analyzed {total_files} files with {stats["issues_count"]} total issues'
         }
 
+# 工作进程内的分析服务实例，解析器在进程启动时初始化一次
+_worker_service = None
+
+def _init_analysis_worker():
+    """进程池初始化函数"""
+    global _worker_service
+    _worker_service = CodeAnalysisService()
+
+def _analyze_in_worker(file_path: str) -> Dict[str, Any]:
+    """在工作进程中分析单个文件"""
+    try:
+        return _worker_service.analyze_file(file_path)
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
 # 全局代码分析服务实例
 code_analysis_service = CodeAnalysisService()
 
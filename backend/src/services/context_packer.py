@@ -0,0 +1,395 @@
+import os
+import re
+import math
+from typing import Dict, List, Optional, Any, Tuple
+from src.services.code_analysis_service import code_analysis_service
+
+try:
+    import tiktoken
+except ImportError:
+    # 可选依赖：未安装时OpenAI模型也按字符比例估算
+    tiktoken = None
+
+# 各提供商的token估算比例：(每个token对应的非CJK字符数, 每个CJK字符对应的token数)
+TOKEN_RATIOS = {
+    'openai': (3.6, 1.0),
+    'anthropic': (3.3, 1.4),
+    'gemini': (3.8, 0.9),
+    'deepseek': (3.6, 0.7)
+}
+
+# 项目分析类型对应的检索词（没有用户问题时用来排序文件）
+ANALYSIS_TERMS = {
+    'overview': [],
+    'security': ['auth', 'login', 'password', 'token', 'secret', 'session', 'permission', 'sql', 'exec',
+                 'eval', 'subprocess', 'shell', 'upload', 'crypt', 'hash', 'sanitize', 'cors', 'csrf'],
+    'performance': ['cache', 'query', 'loop', 'async', 'thread', 'pool', 'batch', 'index', 'sort',
+                    'stream', 'buffer', 'memory', 'timeout', 'concurrent'],
+    'architecture': ['app', 'main', 'route', 'service', 'model', 'config', 'blueprint', 'controller',
+                     'handler', 'factory', 'interface']
+}
+
+# 向量检索命中对排序分数和片段优先级的加权（乘以相对相似度）
+RETRIEVAL_WEIGHT = 5.0
+
+# 入口文件（没有检索词时优先放入上下文）
+ENTRY_FILE_NAMES = {'main', 'app', 'index', 'server', '__init__', 'setup', 'manage', 'cli', 'wsgi'}
+
+_STOP_WORDS = {
+    'the', 'and', 'for', 'with', 'this', 'that', 'what', 'how', 'why', 'does', 'are', 'can', 'you',
+    'please', 'from', 'into', 'about', 'where', 'which', 'when', 'there', 'have', 'has', 'its', 'not',
+    'code', 'file', 'files', 'project'
+}
+_WORD_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|[\u4e00-\u9fff]+')
+_CAMEL_PATTERN = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+def model_provider(model: str) -> str:
+    """模型所属的提供商（与AIService的分发规则一致）"""
+    if model.startswith('gpt'):
+        return 'openai'
+    if model.startswith('gemini'):
+        return 'gemini'
+    if model.startswith('deepseek'):
+        return 'deepseek'
+    return 'anthropic'
+
+def extract_terms(query: str) -> List[str]:
+    """从问题中提取检索词：标识符整体及其驼峰/下划线拆分后的部分，中文按二字词切分"""
+    terms = []
+    for word in _WORD_PATTERN.findall(query or ''):
+        if _CJK_PATTERN.match(word):
+            candidates = [word[i:i + 2] for i in range(len(word) - 1)] or [word]
+        else:
+            parts = [part.lower() for piece in word.split('_') for part in _CAMEL_PATTERN.findall(piece)]
+            candidates = [word.lower()] + (parts if len(parts) > 1 else [])
+        for term in candidates:
+            if len(term) < 2 or (term.isascii() and len(term) < 3) or term in _STOP_WORDS:
+                continue
+            if term not in terms:
+                terms.append(term)
+    return terms
+
+class TokenCounter:
+    """按提供商统计token数：OpenAI模型在安装了tiktoken时精确计数，其他情况按字符比例估算"""
+
+    def __init__(self):
+        self._encodings = {}
+
+    def count(self, text: str, model: str) -> int:
+        """文本在该模型下的token数"""
+        if not text:
+            return 0
+        provider = model_provider(model)
+        if provider == 'openai' and tiktoken is not None:
+            encoding = self._get_encoding(model)
+            if encoding is not None:
+                return len(encoding.encode(text, disallowed_special=()))
+
+        chars_per_token, cjk_tokens = TOKEN_RATIOS[provider]
+        if text.isascii():
+            return math.ceil(len(text) / chars_per_token)
+        cjk = len(_CJK_PATTERN.findall(text))
+        return math.ceil((len(text) - cjk) / chars_per_token + cjk * cjk_tokens)
+
+    def _get_encoding(self, model: str):
+        """tiktoken编码（按模型缓存，未知模型使用o200k_base）"""
+        if model not in self._encodings:
+            try:
+                self._encodings[model] = tiktoken.encoding_for_model(model)
+            except Exception:
+                try:
+                    self._encodings[model] = tiktoken.get_encoding('o200k_base')
+                except Exception:
+                    self._encodings[model] = None
+        return self._encodings[model]
+
+class ContextPacker:
+    """按token预算为提示挑选项目代码
+
+    文件按与问题的相关度排序（BM25 + 路径命中 + 入口文件加权），依次放入上下文，
+    直到用满目标模型上下文窗口的一定比例；放不下整个文件时改为放入相关的函数/类和其余定义的签名，
+    而不是截取文件开头
+    """
+
+    def __init__(self, window_fraction: Optional[float] = None, max_tokens: Optional[int] = None,
+                 output_reserve: Optional[int] = None, max_file_share: float = 0.3,
+                 context_windows: Optional[Dict[str, int]] = None, candidate_factor: Optional[float] = None):
+        self.window_fraction = window_fraction or float(os.getenv('CONTEXT_WINDOW_FRACTION', 0.25))
+        self.max_tokens = max_tokens if max_tokens is not None else int(os.getenv('CONTEXT_MAX_TOKENS', 60000))
+        self.output_reserve = output_reserve if output_reserve is not None else int(os.getenv('CONTEXT_OUTPUT_RESERVE', 4096))
+        # 按元数据预选时加载内容的候选文件估算token总数，相对预算的倍数
+        self.candidate_factor = candidate_factor or float(os.getenv('CONTEXT_CANDIDATE_FACTOR', 2.0))
+        # 单个文件最多占用的预算比例，避免一个大文件挤掉其他相关文件
+        self.max_file_share = max_file_share
+        self._context_windows = context_windows
+        self.token_counter = TokenCounter()
+
+    def get_budget(self, model: str) -> int:
+        """该模型可用于项目代码的token预算"""
+        window = self._context_window(model)
+        budget = int(window * self.window_fraction)
+        if self.max_tokens:
+            budget = min(budget, self.max_tokens)
+        return max(min(budget, window - self.output_reserve), 0)
+
+    def count_tokens(self, text: str, model: str) -> int:
+        """文本在该模型下的token数"""
+        return self.token_counter.count(text, model)
+
+    def estimate_tokens(self, size: int, model: str) -> int:
+        """按文件字节数估算token数（不读取内容）"""
+        return math.ceil((size or 0) / TOKEN_RATIOS[model_provider(model)][0])
+
+    def preselect(self, files: List[Dict[str, Any]], query: str, model: str, reserved_tokens: int = 0,
+                  extra_terms: Optional[List[str]] = None, retrieved: Optional[List[Dict[str, Any]]] = None,
+                  term_matches: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """不读取文件内容，按元数据挑选需要加载内容再交给pack的候选文件
+
+        files: [{'path', 'size', ...}]；term_matches: 检索索引中每个文件可能包含的检索词个数 {路径: 个数}
+        按路径命中、检索索引命中、向量检索命中和入口文件排序，依次选取直到估算token数达到预算的candidate_factor倍
+        """
+        terms = self._terms(query, extra_terms)
+        limit = max(self.get_budget(model) - reserved_tokens, 0) * self.candidate_factor
+        hits = self._normalize_hits(retrieved)
+        term_matches = term_matches or {}
+        mentions_tests = any('test' in term for term in terms)
+
+        ranked = []
+        for file in files:
+            path = file['path'].lower()
+            score = self._prior(path, mentions_tests) + term_matches.get(file['path'], 0)
+            if file['path'] in hits:
+                score += RETRIEVAL_WEIGHT * max(weight for weight, _, _ in hits[file['path']])
+            score += sum(3 for term in terms if term in path)
+            ranked.append((score, file))
+        ranked.sort(key=lambda item: (-item[0], item[1]['path'].count('/'), item[1]['path']))
+
+        selected = []
+        estimated = 0
+        for _, file in ranked:
+            if estimated >= limit:
+                break
+            selected.append(file)
+            estimated += self.estimate_tokens(file.get('size'), model)
+        return selected
+
+    def pack(self, files: List[Dict[str, Any]], query: str, model: str, reserved_tokens: int = 0,
+             extra_terms: Optional[List[str]] = None,
+             retrieved: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """挑选放入提示的文件内容
+
+        files: [{'path', 'type', 'content'}]；reserved_tokens: 提示模板和问题本身占用的token数
+        retrieved: 向量检索命中的代码块 [{'file_path', 'start_line', 'end_line', 'score'}]，
+        命中的文件排序靠前，命中的行在片段中优先保留
+        返回的files中snippet为True的项只包含相关片段
+        """
+        terms = self._terms(query, extra_terms)
+        budget = max(self.get_budget(model) - reserved_tokens, 0)
+        file_cap = max(int(budget * self.max_file_share), 1)
+        hits = self._normalize_hits(retrieved)
+        ranked = self.rank(files, terms, hits)
+
+        packed = []
+        used = 0
+        snippets = 0
+        for score, file in ranked:
+            remaining = budget - used
+            if remaining <= 0:
+                break
+            content = file['content']
+            cap = min(remaining, file_cap)
+            tokens = self.count_tokens(content, model)
+            is_snippet = False
+            if tokens > cap:
+                content = self._build_snippet(file, terms, cap, model, hits.get(file['path']))
+                if not content:
+                    continue
+                tokens = self.count_tokens(content, model)
+                if tokens > remaining:
+                    continue
+                is_snippet = True
+                snippets += 1
+
+            packed.append({
+                'path': file['path'],
+                'type': file.get('type'),
+                'content': content,
+                'score': round(score, 3),
+                'tokens': tokens,
+                'snippet': is_snippet
+            })
+            used += tokens
+
+        return {
+            'files': packed,
+            'tokens': used,
+            'budget': budget,
+            'candidates': len(files),
+            'snippets': snippets,
+            'terms': terms
+        }
+
+    def rank(self, files: List[Dict[str, Any]], terms: List[str],
+             hits: Optional[Dict[str, List[Tuple[float, int, int]]]] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        """按相关度从高到低排序，空文件不参与排序"""
+        candidates = [file for file in files if file.get('content') and file['content'].strip()]
+        if not candidates:
+            return []
+
+        lowered = [(file['path'].lower(), file['content'].lower()) for file in candidates]
+        lengths = [len(content) for _, content in lowered]
+        avg_length = sum(lengths) / len(lengths)
+
+        idf = {}
+        for term in terms:
+            df = sum(1 for path, content in lowered if term in content or term in path)
+            idf[term] = math.log(1 + (len(candidates) - df + 0.5) / (df + 0.5))
+
+        mentions_tests = any('test' in term for term in terms)
+        ranked = []
+        for file, (path, content), length in zip(candidates, lowered, lengths):
+            score = self._prior(path, mentions_tests)
+            if hits and file['path'] in hits:
+                score += RETRIEVAL_WEIGHT * max(weight for weight, _, _ in hits[file['path']])
+            norm = 1.2 * (0.25 + 0.75 * length / avg_length)
+            for term in terms:
+                tf = content.count(term)
+                if tf:
+                    score += idf[term] * tf * 2.2 / (tf + norm)
+                if term in path:
+                    score += 3 * idf[term]
+            ranked.append((score, file))
+
+        # 分数相同时路径较浅的文件优先
+        ranked.sort(key=lambda item: (-item[0], item[1]['path'].count('/'), item[1]['path']))
+        return ranked
+
+    @staticmethod
+    def _terms(query: str, extra_terms: Optional[List[str]]) -> List[str]:
+        """问题中的检索词加上额外的检索词"""
+        terms = extract_terms(query)
+        for term in extra_terms or []:
+            if term not in terms:
+                terms.append(term)
+        return terms
+
+    def _prior(self, path: str, mentions_tests: bool) -> float:
+        """与问题无关的文件权重：入口文件加分，测试、生成和嵌套过深的文件减分"""
+        name = os.path.splitext(os.path.basename(path))[0]
+        score = 0.0
+        if name in ENTRY_FILE_NAMES:
+            score += 1.0
+        is_test = (any(part.startswith('test') for part in path.split('/')[:-1])
+                   or name.startswith('test_') or name.endswith(('_test', '.test', '.spec')))
+        if is_test and not mentions_tests:
+            score -= 1.0
+        if path.endswith(('.min.js', '.min.css', '.lock', '.map')) or 'vendor/' in path:
+            score -= 5.0
+        return score - 0.1 * path.count('/')
+
+    def _build_snippet(self, file: Dict[str, Any], terms: List[str], budget: int, model: str,
+                       hits: Optional[List[Tuple[float, int, int]]] = None) -> str:
+        """在预算内选取文件的片段：开头的导入、相关定义的完整代码、其余定义的签名"""
+        content = file['content']
+        lines = content.split('\n')
+        file_ext = os.path.splitext(file['path'])[1].lower()
+        language = code_analysis_service._detect_language(file_ext)
+
+        definitions = []
+        if language and code_analysis_service.parser_registry.supports(language, file_ext):
+            syntax = code_analysis_service._syntax_analysis(content, language, file_ext=file_ext)
+            definitions = syntax.get('functions', []) + syntax.get('classes', [])
+        definitions.sort(key=lambda item: item['start_line'])
+
+        # 候选片段 (优先级, 起始行, 结束行)，行号从1开始
+        pieces = []
+        first_definition = definitions[0]['start_line'] if definitions else len(lines) + 1
+        header_end = min(first_definition - 1, 30)
+        if header_end >= 1:
+            pieces.append((1e9, 1, header_end))
+
+        if definitions:
+            for definition in definitions:
+                start, end = definition['start_line'], definition['end_line']
+                body = '\n'.join(lines[start - 1:end]).lower()
+                relevance = sum(body.count(term) for term in terms)
+                relevance += sum(5 for term in terms if term in definition['name'].lower())
+                if relevance:
+                    pieces.append((relevance, start, end))
+                elif definition['depth'] <= 1:
+                    # 不相关的定义只保留签名行
+                    pieces.append((0.5 / (1 + definition['depth']), start, start))
+        else:
+            # 不支持语法分析的语言：取命中检索词的行附近的窗口
+            for index, line in enumerate(lines):
+                lowered = line.lower()
+                matches = sum(lowered.count(term) for term in terms)
+                if matches:
+                    pieces.append((matches, max(index + 1 - 5, 1), min(index + 1 + 5, len(lines))))
+
+        # 向量检索命中的行
+        for weight, start, end in hits or []:
+            pieces.append((RETRIEVAL_WEIGHT * weight, max(start, 1), min(end, len(lines))))
+
+        pieces.sort(key=lambda piece: (-piece[0], piece[1]))
+        chosen = []
+        used = 0
+        for _, start, end in pieces:
+            # 已被选中的片段覆盖（如类中的方法）时跳过
+            if any(chosen_start <= start and end <= chosen_end for chosen_start, chosen_end in chosen):
+                continue
+            tokens = self.count_tokens('\n'.join(lines[start - 1:end]), model) + 8
+            if used + tokens > budget:
+                continue
+            chosen.append((start, end))
+            used += tokens
+
+        if not chosen:
+            return ''
+        return self._render_ranges(lines, chosen)
+
+    @staticmethod
+    def _normalize_hits(retrieved: Optional[List[Dict[str, Any]]]) -> Dict[str, List[Tuple[float, int, int]]]:
+        """按文件分组检索结果，相似度归一化到0~1（相对最相似的块）"""
+        if not retrieved:
+            return {}
+        best = max(hit['score'] for hit in retrieved)
+        if best <= 0:
+            return {}
+        hits = {}
+        for hit in retrieved:
+            if hit['score'] > 0:
+                hits.setdefault(hit['file_path'], []).append(
+                    (hit['score'] / best, hit['start_line'], hit['end_line'])
+                )
+        return hits
+
+    @staticmethod
+    def _render_ranges(lines: List[str], ranges: List[Tuple[int, int]]) -> str:
+        """按行号顺序合并片段，每段以 @@ L起始-L结束 @@ 标注位置"""
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        blocks = []
+        for start, end in merged:
+            blocks.append(f'@@ L{start}-L{end} @@\n' + '\n'.join(lines[start - 1:end]))
+        return '\n'.join(blocks)
+
+    def _context_window(self, model: str) -> int:
+        """模型的上下文窗口大小，未知模型按已声明的最小窗口计算"""
+        if self._context_windows is None:
+            from src.services.ai_service import ai_service
+            self._context_windows = {
+                item['id']: item['context_window'] for item in ai_service.get_available_models()
+            }
+        if model in self._context_windows:
+            return self._context_windows[model]
+        return min(self._context_windows.values())
+
+# 全局上下文打包实例
+context_packer = ContextPacker()
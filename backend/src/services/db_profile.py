@@ -0,0 +1,200 @@
+import os
+import time
+import threading
+from typing import Any, Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+# 获取写锁的语句（SQLite同一时间只允许一个写事务）
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER')
+
+class DatabaseBusy(Exception):
+    """等待写锁超时"""
+
+class DatabaseProfile:
+    """SQLite连接配置：连接时设置WAL等pragma，使用有界连接池，并提供只读连接池
+
+    gevent下SQLite的busy等待在C代码中阻塞整个事件循环，持有写锁的greenlet无法继续提交，
+    等待方最终报 database is locked。因此进程内的写事务先获取一个协作式写锁排队，
+    busy_timeout只用于等待其他进程（如迁移脚本）
+
+    同一线程（gevent下为greenlet）已通过另一个连接持有写锁时（嵌套会话写入），等待永远不会结束，
+    在C代码中忙等也会阻塞整个事件循环，因此直接抛出DatabaseBusy
+    """
+
+    def __init__(self):
+        self.journal_mode = os.getenv('DB_JOURNAL_MODE', 'WAL')
+        self.synchronous = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+        self.busy_timeout = int(os.getenv('DB_BUSY_TIMEOUT', 5000))  # 毫秒
+        self.cache_size = int(os.getenv('DB_CACHE_SIZE', -65536))  # 负数表示KiB
+        self.mmap_size = int(os.getenv('DB_MMAP_SIZE', 268435456))
+        self.pool_size = int(os.getenv('DB_POOL_SIZE', 5))
+        self.max_overflow = int(os.getenv('DB_MAX_OVERFLOW', 10))
+        self.pool_timeout = float(os.getenv('DB_POOL_TIMEOUT', 30))
+        self.read_pool_size = int(os.getenv('DB_READ_POOL_SIZE', 5))  # 0表示不使用单独的只读连接池
+        self.write_lock_enabled = os.getenv('DB_WRITE_LOCK', 'true').lower() not in ['0', 'false', 'no']
+        self.write_lock_timeout = float(os.getenv('DB_WRITE_LOCK_TIMEOUT', 30))
+
+        self.engine = None
+        self.read_engine = None
+        self._read_session = None
+        self._write_lock = threading.Lock()
+        self._write_owner = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'write_lock_acquired': 0,
+            'write_lock_waits': 0,
+            'write_lock_wait_ms': 0.0,
+            'write_lock_timeouts': 0
+        }
+
+    def init_app(self, app, db):
+        """按数据库URL配置引擎参数并初始化Flask-SQLAlchemy，SQLite文件数据库时启用连接配置"""
+        url = app.config['SQLALCHEMY_DATABASE_URI']
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        if self.is_file_sqlite(url):
+            for key, value in self.engine_options().items():
+                options.setdefault(key, value)
+        elif make_url(url).get_backend_name() == 'postgresql':
+            # PostgreSQL使用同样大小的连接池，取出连接前检测是否断开
+            for key, value in self.engine_options().items():
+                if key != 'connect_args':
+                    options.setdefault(key, value)
+            options.setdefault('pool_pre_ping', True)
+        db.init_app(app)
+
+        if not self.is_file_sqlite(url):
+            return
+        with app.app_context():
+            self.engine = db.engine
+        self.attach(self.engine)
+
+        if self.read_pool_size > 0:
+            self.read_engine = create_engine(url, **self.engine_options(self.read_pool_size))
+            self.attach(self.read_engine, read_only=True)
+            self._read_session = scoped_session(sessionmaker(bind=self.read_engine), scopefunc=db.session.registry.scopefunc)
+            app.teardown_appcontext(lambda exc: self._read_session.remove())
+
+    @staticmethod
+    def is_file_sqlite(url: str) -> bool:
+        """是否为SQLite文件数据库（内存数据库不适用WAL和连接池）"""
+        parsed = make_url(url)
+        return parsed.get_backend_name() == 'sqlite' and parsed.database not in (None, '', ':memory:')
+
+    def engine_options(self, pool_size: Optional[int] = None) -> Dict[str, Any]:
+        """有界的QueuePool：连接数固定，greenlet在池满时协作式排队（gevent下Queue已被patch）"""
+        return {
+            'poolclass': QueuePool,
+            'pool_size': pool_size or self.pool_size,
+            'max_overflow': self.max_overflow,
+            'pool_timeout': self.pool_timeout,
+            # 连接会在不同线程（greenlet）间复用
+            'connect_args': {'check_same_thread': False}
+        }
+
+    def attach(self, engine, read_only: bool = False):
+        """在引擎上注册连接时的pragma设置；读写引擎还注册写锁"""
+        event.listen(engine, 'connect', lambda dbapi_connection, record: self._apply_pragmas(dbapi_connection, read_only))
+        if self.write_lock_enabled and not read_only:
+            event.listen(engine, 'before_cursor_execute', self._before_execute)
+            event.listen(engine, 'commit', self._commit_and_release)
+            event.listen(engine, 'rollback', self._rollback_and_release)
+            # 连接未结束事务就归还时也释放写锁
+            event.listen(engine.pool, 'checkin', lambda dbapi_connection, record: self._release(record.info))
+
+    def read_session(self):
+        """只读查询使用的会话（未启用只读连接池时返回主会话）"""
+        if self._read_session is None:
+            from src.models.user import db
+            return db.session
+        return self._read_session
+
+    def get_stats(self) -> Dict[str, Any]:
+        """连接池状态、写锁等待统计和当前pragma"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['write_lock_wait_ms'] = round(stats['write_lock_wait_ms'], 1)
+        stats['enabled'] = self.engine is not None
+        if self.engine is None:
+            return stats
+        stats['pool'] = self.engine.pool.status()
+        stats['read_pool'] = self.read_engine.pool.status() if self.read_engine is not None else None
+        with self.engine.connect() as conn:
+            stats['pragmas'] = {
+                name: conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+                for name in ['journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size']
+            }
+        return stats
+
+    def _apply_pragmas(self, dbapi_connection, read_only: bool):
+        """新建连接时设置pragma（只读连接额外开启query_only）"""
+        cursor = dbapi_connection.cursor()
+        try:
+            if not read_only:
+                # journal_mode保存在数据库文件中，只需读写连接设置
+                cursor.execute(f'PRAGMA journal_mode={self.journal_mode}')
+            cursor.execute(f'PRAGMA synchronous={self.synchronous}')
+            cursor.execute(f'PRAGMA busy_timeout={self.busy_timeout}')
+            cursor.execute(f'PRAGMA cache_size={self.cache_size}')
+            cursor.execute(f'PRAGMA mmap_size={self.mmap_size}')
+            cursor.execute('PRAGMA temp_store=MEMORY')
+            if read_only:
+                cursor.execute('PRAGMA query_only=ON')
+        finally:
+            cursor.close()
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        """写语句执行前获取写锁，直到事务提交或回滚"""
+        if conn.info.get('holds_write_lock'):
+            return
+        if not statement.lstrip()[:8].upper().startswith(WRITE_STATEMENTS):
+            return
+
+        me = threading.get_ident()
+        if self._write_owner == me:
+            raise DatabaseBusy('The database write lock is already held by another connection in this thread '
+                               '(nested session write)')
+
+        if not self._write_lock.acquire(blocking=False):
+            start = time.monotonic()
+            acquired = self._write_lock.acquire(timeout=self.write_lock_timeout)
+            waited = (time.monotonic() - start) * 1000
+            with self._stats_lock:
+                self._stats['write_lock_waits'] += 1
+                self._stats['write_lock_wait_ms'] += waited
+                if not acquired:
+                    self._stats['write_lock_timeouts'] += 1
+            if not acquired:
+                raise DatabaseBusy(f'Timed out after {self.write_lock_timeout}s waiting for the database write lock')
+        self._write_owner = me
+        conn.info['holds_write_lock'] = True
+        with self._stats_lock:
+            self._stats['write_lock_acquired'] += 1
+
+    def _commit_and_release(self, conn):
+        """commit事件在DBAPI提交之前触发，先完成提交再释放写锁（之后SQLAlchemy的提交是空操作）"""
+        self._finish_and_release(conn, 'commit')
+
+    def _rollback_and_release(self, conn):
+        """先完成回滚再释放写锁，避免排队的写入遇到尚未结束的事务"""
+        self._finish_and_release(conn, 'rollback')
+
+    def _finish_and_release(self, conn, method: str):
+        """持有写锁的连接结束DBAPI事务后释放写锁"""
+        if not conn.info.get('holds_write_lock'):
+            return
+        try:
+            getattr(conn.connection.dbapi_connection, method)()
+        finally:
+            self._release(conn.info)
+
+    def _release(self, info: Dict[str, Any]):
+        """连接持有写锁时释放（连接可能在其他线程归还，不检查持有者）"""
+        if info.pop('holds_write_lock', False):
+            self._write_owner = None
+            self._write_lock.release()
+
+# 全局数据库连接配置实例
+db_profile = DatabaseProfile()
@@ -0,0 +1,520 @@
+import os
+import re
+import json
+import math
+import zlib
+import shutil
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+
+# 索引文件格式版本，格式变化时旧索引会被重建
+EMBEDDING_INDEX_VERSION = 1
+
+# 默认的索引目录
+DEFAULT_EMBEDDING_DIR = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'database', 'embeddings'
+)
+
+# 行数达到该值后才训练倒排（IVF）聚类，更小的索引直接精确搜索
+IVF_MIN_ROWS = 4096
+# 训练聚类时最多采样的向量数和迭代次数
+IVF_TRAIN_SAMPLE = 20000
+IVF_TRAIN_ITERATIONS = 8
+
+_IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|[\u4e00-\u9fff]')
+_CAMEL_PATTERN = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+# 不参与嵌入的常见英文词和关键字（几乎每个块都有，只会稀释向量）
+_STOP_WORDS = {
+    'the', 'and', 'for', 'with', 'this', 'that', 'what', 'how', 'why', 'does', 'are', 'can', 'you',
+    'from', 'into', 'where', 'which', 'when', 'have', 'has', 'not', 'none', 'true', 'false', 'null',
+    'self', 'def', 'return', 'import', 'class', 'var', 'let', 'const', 'function', 'else', 'elif',
+    'try', 'except', 'public', 'private', 'static', 'void', 'int', 'str', 'new', 'get', 'set'
+}
+# 简单的英文词尾归一（evicted/evicts -> evict），让问题中的自然语言和代码中的标识符对得上
+_SUFFIXES = ('ing', 'ed', 'es', 's')
+
+def _stem(word: str) -> str:
+    """去掉常见的英文词尾"""
+    for suffix in _SUFFIXES:
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+class HashedNgramEmbedder:
+    """特征哈希向量：标识符、拆分后的子词和相邻子词二元组按crc32哈希到固定维度（不需要模型文件）"""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f'hashed-ngram-{dim}'
+        self._buckets = {}  # 特征 -> (维度, 符号)，代码中的标识符重复率很高
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """返回L2归一化后的float32矩阵"""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            indices, signs = self._features(text)
+            if indices:
+                counts = np.bincount(indices, weights=signs, minlength=self.dim)
+                vectors[row] = np.sign(counts) * np.log1p(np.abs(counts))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def _features(self, text: str) -> Tuple[List[int], List[float]]:
+        """文本的特征哈希位置和符号"""
+        indices = []
+        signs = []
+        previous = None
+        for word in _IDENTIFIER_PATTERN.findall(text):
+            lowered = word.lower()
+            if lowered in _STOP_WORDS or (len(lowered) < 3 and lowered.isascii()):
+                continue
+            parts = [_stem(part.lower()) for piece in word.split('_') for part in _CAMEL_PATTERN.findall(piece)] or [lowered]
+            features = [lowered]
+            features.extend(part for part in parts if part != lowered)
+            for part in parts:
+                if previous is not None:
+                    features.append(previous + ' ' + part)
+                previous = part
+            for feature in features:
+                bucket = self._buckets.get(feature)
+                if bucket is None:
+                    hashed = zlib.crc32(feature.encode('utf-8'))
+                    bucket = self._buckets[feature] = (hashed % self.dim, 1.0 if hashed & 0x80000000 else -1.0)
+                indices.append(bucket[0])
+                signs.append(bucket[1])
+        return indices, signs
+
+class SentenceTransformerEmbedder:
+    """本地CPU运行的sentence-transformers模型（可选依赖）"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f'sentence-transformers:{model_name}'
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """返回L2归一化后的float32矩阵"""
+        vectors = self.model.encode(texts, batch_size=32, normalize_embeddings=True, convert_to_numpy=True)
+        return vectors.astype(np.float32)
+
+def create_embedder(model_name: Optional[str] = None, dim: Optional[int] = None):
+    """配置了EMBEDDING_MODEL且安装了sentence-transformers时使用本地模型，否则使用特征哈希"""
+    model_name = model_name if model_name is not None else os.getenv('EMBEDDING_MODEL', '')
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            print(f"Failed to load embedding model {model_name}, using hashed n-grams: {e}")
+    return HashedNgramEmbedder(dim or int(os.getenv('EMBEDDING_DIM', 256)))
+
+def chunk_content(content: str, chunk_lines: int = 40, overlap: int = 10) -> List[Tuple[int, int, str]]:
+    """按行切分为有重叠的块，返回[(起始行, 结束行, 文本)]，行号从1开始，跳过空白块"""
+    lines = content.split('\n')
+    step = max(chunk_lines - overlap, 1)
+    chunks = []
+    for start in range(0, len(lines), step):
+        end = min(start + chunk_lines, len(lines))
+        text = '\n'.join(lines[start:end])
+        if text.strip():
+            chunks.append((start + 1, end, text))
+        if end == len(lines):
+            break
+    return chunks
+
+class ProjectVectorIndex:
+    """单个项目的向量索引
+
+    向量以float32原始矩阵保存在磁盘上并通过memmap读取；文件变化时旧行标记为删除、新行追加到末尾，
+    删除比例过高时压缩重写。行数较多时用球面k-means训练倒排列表（IVF），搜索只比较最近的几个簇
+    """
+
+    def __init__(self, path: str, embedder, nprobe: int = 16):
+        self.path = path
+        self.embedder = embedder
+        self.nprobe = nprobe
+        self.dim = embedder.dim
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        """清空为没有任何行的索引"""
+        self.files = {}        # file_path -> {'version', 'first_row', 'lines': [[起始行, 结束行], ...]}
+        self.count = 0         # 矩阵中的总行数（含已删除的行）
+        self.vectors = None    # memmap (count, dim)
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_files = []    # 行 -> 文件路径
+        self.row_lines = np.zeros((0, 2), dtype=np.int32)
+
+        self.centroids = None  # (nlist, dim)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_rows = 0
+        self._list_order = None
+        self._list_offsets = None
+
+    @property
+    def alive_count(self) -> int:
+        """未删除的行数"""
+        return int(self.alive.sum())
+
+    def sync(self, files: List[Dict[str, Any]], max_files: Optional[int] = None,
+             chunk_lines: int = 40, overlap: int = 10) -> Dict[str, Any]:
+        """按文件版本增量更新索引
+
+        files: [{'path', 'version', 'content'}]（version可以是blob SHA）；max_files限制本次最多重新嵌入的文件数，
+        剩余的变化留到下次同步，用于把耗时限制在可接受范围内
+        """
+        current = {file['path']: file for file in files}
+        removed = [path for path in self.files if path not in current]
+        changed = [file for path, file in current.items()
+                   if self.files.get(path, {}).get('version') != file['version']]
+        pending = 0
+        if max_files is not None and len(changed) > max_files:
+            pending = len(changed) - max_files
+            changed = changed[:max_files]
+
+        for path in removed:
+            self._remove_file(path)
+        for file in changed:
+            self._remove_file(file['path'])
+
+        new_texts = []
+        new_rows = []
+        for file in changed:
+            chunks = chunk_content(file['content'] or '', chunk_lines, overlap)
+            self.files[file['path']] = {
+                'version': file['version'],
+                'first_row': self.count + len(new_texts),
+                'lines': [[start, end] for start, end, _ in chunks]
+            }
+            for start, end, text in chunks:
+                # 路径中的词也参与嵌入，问题中提到模块名时更容易命中
+                new_texts.append(f"{file['path']}\n{text}")
+                new_rows.append((file['path'], start, end))
+
+        if new_texts:
+            self._append(self.embedder.embed(new_texts), new_rows)
+
+        rebuilt = False
+        if removed or changed:
+            rebuilt = self._maybe_rebuild()
+            self._save()
+
+        return {
+            'added_files': len(changed),
+            'removed_files': len(removed),
+            'pending_files': pending,
+            'chunks': self.alive_count,
+            'rebuilt': rebuilt
+        }
+
+    def search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        """返回与问题最相似的k个块"""
+        if self.count == 0:
+            return []
+        return self.search_vector(self.embedder.embed([query])[0], k)
+
+    def search_vector(self, query_vector: np.ndarray, k: int = 10) -> List[Dict[str, Any]]:
+        """按向量检索（倒排列表只比较最近的nprobe个簇内的行）"""
+        if self.count == 0 or self.alive_count == 0:
+            return []
+
+        if self.centroids is None:
+            rows = np.flatnonzero(self.alive)
+            scores = self.vectors[:self.count] @ query_vector
+            scores = scores[rows]
+        else:
+            nprobe = min(self.nprobe, len(self.centroids))
+            probe = np.argpartition(-(self.centroids @ query_vector), nprobe - 1)[:nprobe]
+            rows = np.concatenate([
+                self._list_order[self._list_offsets[cluster]:self._list_offsets[cluster + 1]] for cluster in probe
+            ])
+            rows = rows[self.alive[rows]]
+            if len(rows) == 0:
+                return []
+            rows.sort()
+            scores = self.vectors[rows] @ query_vector
+
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {
+                'file_path': self.row_files[rows[index]],
+                'start_line': int(self.row_lines[rows[index]][0]),
+                'end_line': int(self.row_lines[rows[index]][1]),
+                'score': round(float(scores[index]), 4)
+            }
+            for index in top
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """索引统计"""
+        return {
+            'embedder': self.embedder.name,
+            'dim': self.dim,
+            'files': len(self.files),
+            'chunks': self.alive_count,
+            'deleted_rows': self.count - self.alive_count,
+            'ivf_lists': 0 if self.centroids is None else len(self.centroids),
+            'disk_bytes': self.count * self.dim * 4
+        }
+
+    def _remove_file(self, path: str):
+        """把文件的行标记为删除"""
+        entry = self.files.pop(path, None)
+        if entry is not None:
+            first = entry['first_row']
+            self.alive[first:first + len(entry['lines'])] = False
+
+    def _append(self, vectors: np.ndarray, rows: List[Tuple[str, int, int]]):
+        """把新向量追加到磁盘矩阵末尾并重新映射"""
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._vectors_path(), 'ab') as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self.count += len(rows)
+        self._map_vectors()
+
+        self.alive = np.concatenate([self.alive, np.ones(len(rows), dtype=bool)])
+        self.row_files.extend(path for path, _, _ in rows)
+        self.row_lines = np.concatenate([self.row_lines, np.array([[s, e] for _, s, e in rows], dtype=np.int32)])
+        if self.centroids is not None:
+            # 新行直接分配到已有的簇，数据分布变化较大时再重新训练
+            self.assignments = np.concatenate([self.assignments, self._assign(vectors)])
+            self._build_lists()
+
+    def _maybe_rebuild(self) -> bool:
+        """删除行过多时压缩，行数增长较多或首次达到阈值时重新训练聚类"""
+        alive = self.alive_count
+        deleted = self.count - alive
+        needs_compact = self.count > 0 and deleted > 0.3 * self.count
+        needs_training = alive >= IVF_MIN_ROWS and (self.centroids is None or alive > 2 * self.trained_rows)
+        if self.centroids is not None and alive < IVF_MIN_ROWS // 2:
+            # 行数减少很多后退回精确搜索
+            self.centroids = None
+            self.assignments = np.zeros(0, dtype=np.int32)
+            self.trained_rows = 0
+            self._list_order = None
+            self._list_offsets = None
+        if not (needs_compact or needs_training):
+            return False
+
+        if needs_compact:
+            self._compact()
+        if alive >= IVF_MIN_ROWS:
+            self._train()
+        return True
+
+    def _compact(self):
+        """只保留未删除的行，重写磁盘矩阵"""
+        keep = np.flatnonzero(self.alive)
+        vectors = np.array(self.vectors[keep]) if len(keep) else np.zeros((0, self.dim), dtype=np.float32)
+        self.vectors = None
+        temp_path = self._vectors_path() + '.tmp'
+        vectors.tofile(temp_path)
+        os.replace(temp_path, self._vectors_path())
+
+        # 新行号等于之前保留下来的行数（没有块的文件也能正确映射）
+        for entry in self.files.values():
+            entry['first_row'] = int(np.searchsorted(keep, entry['first_row']))
+        self.row_files = [self.row_files[row] for row in keep]
+        self.row_lines = self.row_lines[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.count = len(keep)
+        self._map_vectors()
+        if self.centroids is not None:
+            self.assignments = self.assignments[keep]
+            self._build_lists()
+
+    def _train(self):
+        """球面k-means训练簇中心，并把所有行分配到最近的簇"""
+        alive_rows = np.flatnonzero(self.alive)
+        nlist = int(min(max(2 * math.sqrt(len(alive_rows)), 16), 4096))
+        rng = np.random.default_rng(0)
+        sample_rows = alive_rows
+        if len(sample_rows) > IVF_TRAIN_SAMPLE:
+            sample_rows = np.sort(rng.choice(alive_rows, IVF_TRAIN_SAMPLE, replace=False))
+        sample = np.array(self.vectors[sample_rows])
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            # 空簇重新随机选取中心
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            centroids = (sums / norms).astype(np.float32)
+
+        self.centroids = centroids
+        self.assignments = self._assign(self.vectors[:self.count])
+        self.trained_rows = len(alive_rows)
+        self._build_lists()
+
+    def _assign(self, vectors: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+        """把向量分配到最近的簇（分批计算，限制内存）"""
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch_size):
+            batch = np.asarray(vectors[start:start + batch_size])
+            labels[start:start + batch_size] = np.argmax(batch @ self.centroids.T, axis=1)
+        return labels
+
+    def _build_lists(self):
+        """根据分配结果生成倒排列表：按簇排序的行号和每个簇的起始位置"""
+        self._list_order = np.argsort(self.assignments, kind='stable').astype(np.int64)
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def _map_vectors(self):
+        """以只读memmap方式映射磁盘矩阵"""
+        if self.count == 0:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        else:
+            self.vectors = np.memmap(self._vectors_path(), dtype=np.float32, mode='r', shape=(self.count, self.dim))
+
+    def _load(self):
+        """从磁盘加载索引，格式或嵌入方式不一致时丢弃旧索引"""
+        meta_path = os.path.join(self.path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != EMBEDDING_INDEX_VERSION or meta.get('embedder') != self.embedder.name:
+                raise ValueError('Embedding index format changed')
+
+            self.files = meta['files']
+            self.count = meta['count']
+            self.trained_rows = meta.get('trained_rows', 0)
+            self._map_vectors()
+            arrays = np.load(os.path.join(self.path, 'rows.npz'))
+            self.alive = arrays['alive']
+            self.row_lines = arrays['lines']
+            self.row_files = [None] * self.count
+            for path, entry in self.files.items():
+                first = entry['first_row']
+                for offset in range(len(entry['lines'])):
+                    self.row_files[first + offset] = path
+            if 'centroids' in arrays:
+                self.centroids = arrays['centroids']
+                self.assignments = arrays['assignments']
+                self._build_lists()
+        except Exception as e:
+            print(f"Discarding embedding index {self.path}: {e}")
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._reset()
+
+    def _save(self):
+        """保存元数据和行信息（先写临时文件再替换）"""
+        os.makedirs(self.path, exist_ok=True)
+        arrays = {'alive': self.alive, 'lines': self.row_lines}
+        if self.centroids is not None:
+            arrays['centroids'] = self.centroids
+            arrays['assignments'] = self.assignments
+        temp_path = os.path.join(self.path, 'rows.tmp.npz')
+        np.savez(temp_path, **arrays)
+        os.replace(temp_path, os.path.join(self.path, 'rows.npz'))
+
+        meta = {
+            'version': EMBEDDING_INDEX_VERSION,
+            'embedder': self.embedder.name,
+            'count': self.count,
+            'trained_rows': self.trained_rows,
+            'files': self.files
+        }
+        temp_path = os.path.join(self.path, 'meta.json.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(temp_path, os.path.join(self.path, 'meta.json'))
+
+    def _vectors_path(self) -> str:
+        """向量矩阵文件路径"""
+        return os.path.join(self.path, 'vectors.f32')
+
+class EmbeddingIndexService:
+    """按项目管理向量索引，最近使用的索引保留在内存中"""
+
+    def __init__(self, index_dir: Optional[str] = None, embedder=None, max_loaded: int = 8):
+        self.index_dir = index_dir or os.getenv('EMBEDDING_INDEX_DIR') or DEFAULT_EMBEDDING_DIR
+        self.embedder = embedder
+        self.max_loaded = max_loaded
+        self.nprobe = int(os.getenv('EMBEDDING_NPROBE', 16))
+        self.chunk_lines = int(os.getenv('EMBEDDING_CHUNK_LINES', 40))
+        self.sync_batch = int(os.getenv('EMBEDDING_SYNC_BATCH', 50))
+        self.top_k = int(os.getenv('EMBEDDING_TOP_K', 20))
+
+        self._indexes = OrderedDict()  # project_id -> ProjectVectorIndex
+        self._lock = threading.Lock()
+        self._project_locks = {}
+
+    def sync_project(self, project_id: int, files: List[Dict[str, Any]],
+                     max_files: Optional[int] = None) -> Dict[str, Any]:
+        """增量更新项目索引
+
+        files: [{'path', 'content', 'version'?}]，未提供version时使用内容的SHA1
+        """
+        entries = []
+        for file in files:
+            if not file.get('content'):
+                continue
+            version = file.get('version') or hashlib.sha1(file['content'].encode('utf-8')).hexdigest()
+            entries.append({'path': file['path'], 'version': version, 'content': file['content']})
+
+        with self._get_project_lock(project_id):
+            index = self._get_index(project_id)
+            return index.sync(entries, max_files, self.chunk_lines, max(self.chunk_lines // 4, 0))
+
+    def search(self, project_id: int, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        """在项目索引中检索与问题最相似的代码块"""
+        with self._get_project_lock(project_id):
+            return self._get_index(project_id).search(query, k)
+
+    def get_stats(self, project_id: int) -> Dict[str, Any]:
+        """项目索引统计"""
+        with self._get_project_lock(project_id):
+            return self._get_index(project_id).get_stats()
+
+    def delete_project(self, project_id: int):
+        """删除项目索引"""
+        with self._get_project_lock(project_id):
+            with self._lock:
+                self._indexes.pop(project_id, None)
+            shutil.rmtree(self._project_path(project_id), ignore_errors=True)
+
+    def _get_index(self, project_id: int) -> ProjectVectorIndex:
+        """获取项目索引（首次使用时从磁盘加载）"""
+        with self._lock:
+            index = self._indexes.get(project_id)
+            if index is not None:
+                self._indexes.move_to_end(project_id)
+                return index
+            if self.embedder is None:
+                self.embedder = create_embedder()
+
+        index = ProjectVectorIndex(self._project_path(project_id), self.embedder, self.nprobe)
+        with self._lock:
+            self._indexes[project_id] = index
+            while len(self._indexes) > self.max_loaded:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _project_path(self, project_id: int) -> str:
+        """项目索引目录"""
+        return os.path.join(self.index_dir, f'project_{project_id}')
+
+    def _get_project_lock(self, project_id: int) -> threading.Lock:
+        """获取项目级别的锁"""
+        with self._lock:
+            if project_id not in self._project_locks:
+                self._project_locks[project_id] = threading.Lock()
+            return self._project_locks[project_id]
+
+# 全局向量索引服务实例
+embedding_index_service = EmbeddingIndexService()
@@ -1,23 +1,46 @@
 import os
 import git
 import shutil
-import requests
 from typing import Dict, List, Optional, Any
 from urllib.parse import urlparse
+import re
 import json
+import hashlib
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from src.services.http_client import HttpClient, RateLimitExceeded
+from src.services.metadata_cache import MetadataCache
+from src.services.mirror_cache import mirror_cache
+
+# 支持的克隆模式
+CLONE_MODES = ['full', 'shallow', 'blobless']
+
+# GitHub列表接口每页允许的最大条数
+PER_PAGE = 100
+
+# Link头中的单个链接，如 <https://api.github.com/...&page=2>; rel="next"
+LINK_PATTERN = re.compile(r'<([^>]+)>\s*;\s*rel="([^"]+)"')
 
 class GitHubService:
     """GitHub集成服务类"""
     
     def __init__(self, github_token: Optional[str] = None):
         self.github_token = github_token or os.getenv('GITHUB_TOKEN')
-        self.base_url = "https://api.github.com"
+        self.base_url = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
         self.headers = {
             'Accept': 'application/vnd.github.v3+json',
             'User-Agent': 'CodingAgent/1.0'
         }
         if self.github_token:
             self.headers['Authorization'] = f'token {self.github_token}'
+        # 所有GitHub API请求共用的连接池客户端，元数据请求经过ETag缓存
+        self.http = HttpClient(headers=self.headers)
+        self.metadata_cache = MetadataCache.from_env()
+        # 已知总页数后并发请求其余页的线程数
+        self.page_concurrency = int(os.getenv('GITHUB_PAGE_CONCURRENCY', 8))
+        # API不可用时用本地镜像列出分支
+        self.mirrors = mirror_cache
     
     def parse_github_url(self, github_url: str) -> Dict[str, str]:
         """解析GitHub URL，提取owner和repo信息"""
@@ -41,6 +64,132 @@ class GitHubService:
         except Exception as e:
             raise ValueError(f"Failed to parse GitHub URL: {str(e)}")
     
+    def api_get(self, path: str, params: Optional[Dict[str, Any]] = None):
+        """通过元数据缓存请求GitHub REST API，path如'/repos/{owner}/{repo}'"""
+        return self.metadata_cache.fetch(self.http, f'{self.base_url}{path}', params)
+    
+    def list_branches(self, owner: str, repo: str, repo_url: Optional[str] = None) -> Dict[str, Any]:
+        """获取仓库的全部分支
+        
+        按per_page=100分页，从第一页的Link头得知总页数后并发请求其余页；
+        API限流或不可用时改用git ls-remote（有镜像时读镜像，否则直接查询远程）
+        """
+        path = f'/repos/{owner}/{repo}/branches'
+        retry_after = None
+        try:
+            pages = self.api_get_all_pages(path)
+            if pages['status_code'] == 200:
+                return {
+                    'success': True,
+                    'branches': [branch['name'] for branch in pages['items']],
+                    'source': 'api',
+                    'pages': pages['pages']
+                }
+            if pages['status_code'] == 404:
+                return {
+                    'success': False,
+                    'error': 'Repository not found or private',
+                    'status_code': 404
+                }
+            error, status_code = f"GitHub API error: {pages['status_code']}", pages['status_code']
+        except RateLimitExceeded as e:
+            error, status_code, retry_after = str(e), 429, int(e.retry_after)
+        except requests.RequestException as e:
+            error, status_code = f'Network error: {str(e)}', 500
+        
+        branches = self.list_remote_branches(repo_url or f'https://github.com/{owner}/{repo}.git')
+        if branches is not None:
+            return {
+                'success': True,
+                'branches': branches,
+                'source': 'git',
+                'pages': 0
+            }
+        result = {
+            'success': False,
+            'error': error,
+            'status_code': status_code
+        }
+        if retry_after is not None:
+            result['retry_after'] = retry_after
+        return result
+    
+    def api_get_all_pages(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """请求分页列表接口的所有页，按页序合并结果
+        
+        返回 {'status_code', 'items', 'pages'}；任一页失败时status_code为该页的状态码
+        """
+        params = dict(params or {}, per_page=PER_PAGE)
+        first = self.api_get(path, dict(params, page=1))
+        if first.status_code != 200:
+            return {'status_code': first.status_code, 'items': [], 'pages': 1}
+        
+        items = list(first.json())
+        links = self._parse_link_header(first.headers.get('Link'))
+        last_page = self._page_number(links.get('last'))
+        
+        if last_page and last_page > 1:
+            # 已知总页数：其余页并发请求，避免逐页串行往返
+            page_numbers = list(range(2, last_page + 1))
+            workers = max(1, min(self.page_concurrency, len(page_numbers)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='github-page') as executor:
+                responses = list(executor.map(lambda page: self.api_get(path, dict(params, page=page)), page_numbers))
+            for response in responses:
+                if response.status_code != 200:
+                    return {'status_code': response.status_code, 'items': [], 'pages': last_page}
+                items.extend(response.json())
+            return {'status_code': 200, 'items': items, 'pages': last_page}
+        
+        # 没有给出最后一页时沿着next链接逐页请求
+        pages = 1
+        next_page = self._page_number(links.get('next'))
+        while next_page:
+            response = self.api_get(path, dict(params, page=next_page))
+            pages += 1
+            if response.status_code != 200:
+                return {'status_code': response.status_code, 'items': [], 'pages': pages}
+            items.extend(response.json())
+            next_page = self._page_number(self._parse_link_header(response.headers.get('Link')).get('next'))
+        return {'status_code': 200, 'items': items, 'pages': pages}
+    
+    def list_remote_branches(self, repo_url: str) -> Optional[List[str]]:
+        """用git ls-remote列出分支名：已有镜像时读取镜像（不访问网络），否则查询远程；失败时返回None"""
+        mirror_path = self.mirrors.get_mirror_path(repo_url)
+        try:
+            output = git.Git().ls_remote(
+                '--heads', mirror_path or repo_url,
+                env={'GIT_TERMINAL_PROMPT': '0'}, kill_after_timeout=30
+            )
+        except Exception as e:
+            print(f"git ls-remote failed for {repo_url}: {e}")
+            return None
+        
+        branches = []
+        for line in output.splitlines():
+            _, _, ref = line.partition('\t')
+            if ref.startswith('refs/heads/'):
+                branches.append(ref[len('refs/heads/'):])
+        return sorted(branches)
+    
+    @staticmethod
+    def _parse_link_header(value: Optional[str]) -> Dict[str, str]:
+        """解析Link响应头，返回 rel -> URL"""
+        links = {}
+        for url, rels in LINK_PATTERN.findall(value or ''):
+            for rel in rels.split():
+                links[rel] = url
+        return links
+    
+    @staticmethod
+    def _page_number(url: Optional[str]) -> Optional[int]:
+        """取出分页链接中的page参数"""
+        if not url:
+            return None
+        try:
+            return int(parse_qs(urlparse(url).query).get('page', [''])[0])
+        except ValueError:
+            return None
+    
     def get_repo_info(self, github_url: str) -> Dict[str, Any]:
         """获取GitHub仓库信息"""
         try:
@@ -48,8 +197,7 @@ class GitHubService:
             owner = repo_info['owner']
             repo = repo_info['repo']
             
-            url = f"{self.base_url}/repos/{owner}/{repo}"
-            response = requests.get(url, headers=self.headers)
+            response = self.api_get(f'/repos/{owner}/{repo}')
             
             if response.status_code == 200:
                 data = response.json()
@@ -81,9 +229,18 @@ class GitHubService:
                 'error': str(e)
             }
     
-    def clone_repository(self, github_url: str, local_path: str, branch: str = None) -> Dict[str, Any]:
-        """克隆GitHub仓库到本地"""
+    def clone_repository(self, github_url: str, local_path: str, branch: str = None, mode: str = 'full',
+                         single_branch: bool = False, sparse_paths: Optional[List[str]] = None,
+                         depth: Optional[int] = None) -> Dict[str, Any]:
+        """克隆GitHub仓库到本地
+        
+        mode: full（完整历史）、shallow（浅克隆，默认深度1）、blobless（--filter=blob:none，按需下载文件内容）
+        sparse_paths: 只检出匹配这些路径模式的文件（gitignore风格，如 'src/'、'*.py'）
+        """
         try:
+            if mode not in CLONE_MODES:
+                raise ValueError(f"Unsupported clone mode: {mode}")
+            
             # 确保本地路径不存在或为空
             if os.path.exists(local_path):
                 if os.listdir(local_path):
@@ -93,10 +250,12 @@ class GitHubService:
                 os.makedirs(local_path, exist_ok=True)
             
             # 克隆仓库
-            if branch:
-                repo = git.Repo.clone_from(github_url, local_path, branch=branch)
-            else:
-                repo = git.Repo.clone_from(github_url, local_path)
+            clone_options = self._build_clone_options(branch, mode, single_branch, sparse_paths, depth)
+            repo = git.Repo.clone_from(github_url, local_path, **clone_options)
+            
+            # 稀疏检出：只把匹配的文件写入工作区
+            if sparse_paths:
+                repo.git.sparse_checkout('set', '--no-cone', *sparse_paths)
             
             # 获取仓库统计信息
             stats = self._get_repo_stats(local_path)
@@ -106,6 +265,8 @@ class GitHubService:
                 'local_path': local_path,
                 'branch': repo.active_branch.name,
                 'commit_hash': repo.head.commit.hexsha,
+                'clone_mode': mode,
+                'sparse_paths': sparse_paths or [],
                 'stats': stats
             }
             
@@ -115,6 +276,24 @@ class GitHubService:
                 'error': str(e)
             }
     
+    def _build_clone_options(self, branch: Optional[str], mode: str, single_branch: bool,
+                             sparse_paths: Optional[List[str]], depth: Optional[int]) -> Dict[str, Any]:
+        """把克隆模式转换为git clone参数"""
+        options = {}
+        if branch:
+            options['branch'] = branch
+        if mode == 'shallow':
+            # --depth隐含--single-branch
+            options['depth'] = depth or 1
+        elif mode == 'blobless':
+            options['filter'] = 'blob:none'
+        if single_branch:
+            options['single_branch'] = True
+        if sparse_paths:
+            # 初始只检出根目录文件，随后由sparse-checkout设置实际范围
+            options['sparse'] = True
+        return options
+    
     def get_file_tree(self, local_path: str, max_depth: int = 3) -> Dict[str, Any]:
         """获取仓库文件树结构"""
         try:
@@ -290,6 +469,44 @@ class GitHubService:
                 'error': str(e)
             }
     
+    @staticmethod
+    def compute_blob_sha(data: bytes) -> str:
+        """计算与git hash-object一致的blob SHA"""
+        return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+    
+    def get_file_blob_shas(self, local_path: str) -> Dict[str, str]:
+        """获取工作区中每个文件的git blob SHA（相对路径 -> SHA）"""
+        repo = git.Repo(local_path)
+        shas = {}
+        
+        # 暂存区中的条目可以直接拿到SHA，无需读取文件内容
+        for entry in repo.git.ls_files('-s', '-z').split('\0'):
+            if not entry:
+                continue
+            meta, path = entry.split('\t', 1)
+            mode, sha, _ = meta.split(' ')
+            if mode != '160000':  # 跳过子模块
+                shas[path] = sha
+        
+        # 工作区修改过的文件和未跟踪文件需要重新计算哈希
+        changed = [p for p in repo.git.diff('--name-only', '-z').split('\0') if p]
+        untracked = [p for p in repo.git.ls_files('--others', '--exclude-standard', '-z').split('\0') if p]
+        to_hash = []
+        for path in changed + untracked:
+            if os.path.isfile(os.path.join(local_path, path)):
+                to_hash.append(path)
+            else:
+                shas.pop(path, None)  # 已在工作区删除
+        
+        for start in range(0, len(to_hash), 500):
+            batch = to_hash[start:start + 500]
+            hashes = repo.git.hash_object('--', *batch).split('\n')
+            shas.update(zip(batch, hashes))
+        
+        if os.sep != '/':
+            shas = {path.replace('/', os.sep): sha for path, sha in shas.items()}
+        return shas
+    
     def _get_repo_stats(self, local_path: str) -> Dict[str, Any]:
         """获取仓库统计信息"""
         try:
@@ -0,0 +1,169 @@
+import os
+import time
+import random
+import threading
+import requests
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from typing import Dict, Optional, Any
+
+# 可以安全重试的请求方法
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+# 服务端临时错误，重试通常能成功
+RETRY_STATUS_CODES = {500, 502, 503, 504}
+
+class RateLimitExceeded(requests.RequestException):
+    """API限额已用完，且恢复时间超过允许等待的时长"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class HttpClient:
+    """带连接池的HTTP客户端：keep-alive会话、统一超时、临时错误和限流时按抖动退避重试"""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+                 connect_timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                 pool_size: Optional[int] = None, backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 max_retry_wait: Optional[float] = None, sleep=time.sleep):
+        self.timeout = timeout or float(os.getenv('HTTP_TIMEOUT', 10))
+        self.connect_timeout = connect_timeout or float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('HTTP_MAX_RETRIES', 3))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Retry-After或限额恢复时间超过该值时不再等待，直接把结果交给调用方
+        self.max_retry_wait = max_retry_wait if max_retry_wait is not None else float(os.getenv('HTTP_MAX_RETRY_WAIT', 10))
+        self._sleep = sleep
+
+        pool_size = pool_size or int(os.getenv('HTTP_POOL_SIZE', 20))
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        # 重试由本类处理，urllib3层面不重试
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._rate_limits = {}  # 主机 -> 限额恢复的时间戳（剩余次数为0时记录）
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limit_waits': 0}
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """发送GET请求"""
+        return self.request('GET', url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """发送请求，按需重试；返回最后一次的响应（包括不再重试的错误响应）
+
+        限额已用完且恢复时间超过max_retry_wait时抛出RateLimitExceeded，不再发出请求
+        """
+        method = method.upper()
+        kwargs.setdefault('timeout', (self.connect_timeout, self.timeout))
+        host = urlparse(url).netloc
+        attempt = 0
+
+        while True:
+            self._wait_for_rate_limit(host)
+            with self._lock:
+                self.stats['requests'] += 1
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries or method not in IDEMPOTENT_METHODS:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                self._record_rate_limit(host, response)
+                delay = self._retry_delay(response, attempt)
+                if delay is None or attempt >= self.max_retries or method not in IDEMPOTENT_METHODS:
+                    return response
+                if delay > self.max_retry_wait:
+                    return response
+                response.close()
+
+            attempt += 1
+            with self._lock:
+                self.stats['retries'] += 1
+            self._sleep(delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """请求统计"""
+        with self._lock:
+            return dict(self.stats)
+
+    def _retry_delay(self, response: requests.Response, attempt: int) -> Optional[float]:
+        """响应需要重试时返回等待的秒数，否则返回None"""
+        status = response.status_code
+        rate_limited = status == 429 or (status == 403 and (
+            'Retry-After' in response.headers or response.headers.get('X-RateLimit-Remaining') == '0'
+            or 'secondary rate limit' in response.text.lower()
+        ))
+        if not rate_limited and status not in RETRY_STATUS_CODES:
+            return None
+
+        retry_after = self._parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is not None:
+            return retry_after
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            reset = self._parse_reset(response.headers.get('X-RateLimit-Reset'))
+            if reset is not None:
+                return max(reset - time.time(), 0) + 1
+        # 二级限流没有给出等待时间时，至少等待一分钟（GitHub的建议）
+        if rate_limited:
+            return max(60.0, self._backoff(attempt))
+        return self._backoff(attempt)
+
+    def _backoff(self, attempt: int) -> float:
+        """全抖动的指数退避"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record_rate_limit(self, host: str, response: requests.Response):
+        """记录剩余次数为0的主机，之后的请求等到限额恢复"""
+        if response.headers.get('X-RateLimit-Remaining') != '0':
+            with self._lock:
+                self._rate_limits.pop(host, None)
+            return
+        reset = self._parse_reset(response.headers.get('X-RateLimit-Reset'))
+        if reset is not None:
+            with self._lock:
+                self._rate_limits[host] = reset
+
+    def _wait_for_rate_limit(self, host: str):
+        """限额已用完时等待恢复，等待时间过长则直接失败"""
+        with self._lock:
+            reset = self._rate_limits.get(host)
+        if reset is None:
+            return
+        wait = reset - time.time()
+        if wait <= 0:
+            with self._lock:
+                self._rate_limits.pop(host, None)
+            return
+        if wait > self.max_retry_wait:
+            raise RateLimitExceeded(f'API rate limit exceeded for {host}, resets in {int(wait)}s', wait)
+        with self._lock:
+            self.stats['rate_limit_waits'] += 1
+        self._sleep(wait)
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """解析Retry-After头（秒数或HTTP日期）"""
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _parse_reset(value: Optional[str]) -> Optional[float]:
+        """解析X-RateLimit-Reset头（Unix时间戳）"""
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
@@ -0,0 +1,213 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+from sqlalchemy import update
+from src.models.user import db
+from src.models.project import CodeFile
+from src.services.github_service import github_service
+from src.services.search_index import search_index_service
+from src.services.blob_store import blob_store
+from src.services.bulk_insert import bulk_insert
+
+# 扫描时保存到数据库的代码文件扩展名
+SCANNED_EXTENSIONS = ['.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go', '.rs']
+
+# 扫描时跳过的目录
+IGNORED_DIRS = ['node_modules', '__pycache__', 'venv', 'env']
+
+class FileIngestService:
+    """项目文件批量入库服务"""
+
+    def __init__(self, batch_size: Optional[int] = None, search_index=None):
+        self.batch_size = batch_size or int(os.getenv('SCAN_BATCH_SIZE', 1000))
+        self.search_index = search_index or search_index_service
+
+    def scan_project_files(self, project_id: int, project_path: str) -> Dict[str, Any]:
+        """扫描项目文件并批量写入数据库（按git blob SHA或内容哈希跳过未变化的文件）"""
+        try:
+            try:
+                blob_shas = github_service.get_file_blob_shas(project_path)
+            except Exception:
+                # 不是git仓库时退化为全量扫描
+                blob_shas = {}
+
+            existing_files = self._load_existing(project_id)
+            indexed_paths = self.search_index.indexed_paths(project_id)
+            seen_paths = set()
+            pending_index = {}
+            pending_inserts = []
+            pending_updates = []
+            pending_blobs = {}
+            stale_hashes = []
+            files_added = 0
+            files_updated = 0
+            files_unchanged = 0
+
+            for file_path, relative_path, file_name, file_ext in self._iter_code_files(project_path):
+                blob_sha = blob_shas.get(relative_path)
+                existing = existing_files.get(relative_path)
+                if existing and blob_sha and existing[1] == blob_sha:
+                    seen_paths.add(relative_path)
+                    files_unchanged += 1
+                    if relative_path not in indexed_paths:
+                        # 检索索引缺失该文件（如索引被删除），只补建索引
+                        content = self._read_text(file_path)
+                        if content is not None:
+                            self._queue_index(project_id, pending_index, relative_path, content)
+                    continue
+
+                content = self._read_text(file_path)
+                if content is None:
+                    # 跳过无法读取的文件
+                    continue
+
+                seen_paths.add(relative_path)
+                content_hash = blob_store.hash_content(content)
+                if existing and existing[2] == content_hash and (not blob_sha or existing[1] == blob_sha):
+                    # 没有git blob SHA时（非git项目）按内容哈希跳过未变化的文件
+                    files_unchanged += 1
+                    if relative_path not in indexed_paths:
+                        self._queue_index(project_id, pending_index, relative_path, content)
+                    continue
+
+                self._queue_index(project_id, pending_index, relative_path, content)
+                pending_blobs[content_hash] = content
+                row = {
+                    'content_hash': content_hash,
+                    'size': len(content.encode('utf-8')),
+                    'last_modified': datetime.fromtimestamp(os.path.getmtime(file_path)),
+                    'blob_sha': blob_sha,
+                    'analysis_result': None
+                }
+
+                if existing:
+                    row['id'] = existing[0]
+                    pending_updates.append(row)
+                    if existing[2] != content_hash:
+                        stale_hashes.append(existing[2])
+                    files_updated += 1
+                    if len(pending_updates) >= self.batch_size:
+                        self._flush_updates(pending_updates, pending_blobs)
+                        pending_updates = []
+                else:
+                    row.update({
+                        'file_path': relative_path,
+                        'file_name': file_name,
+                        'file_type': file_ext,
+                        'project_id': project_id
+                    })
+                    pending_inserts.append(row)
+                    files_added += 1
+                    if len(pending_inserts) >= self.batch_size:
+                        self._flush_inserts(pending_inserts, pending_blobs)
+                        pending_inserts = []
+
+            self._flush_inserts(pending_inserts, pending_blobs)
+            self._flush_updates(pending_updates, pending_blobs)
+
+            # 删除工作区中已不存在的文件记录
+            removed = [(file_id, content_hash) for path, (file_id, _, content_hash) in existing_files.items()
+                       if path not in seen_paths]
+            removed_ids = [file_id for file_id, _ in removed]
+            self._delete(removed_ids)
+
+            # 清理不再被引用的文件内容
+            stale_hashes.extend(content_hash for _, content_hash in removed)
+            if stale_hashes:
+                blob_store.discard(stale_hashes)
+                db.session.commit()
+
+            # 更新检索索引（符号和三元组）
+            removed_paths = [path for path in indexed_paths | set(existing_files) if path not in seen_paths]
+            self._update_search_index(project_id, pending_index, removed_paths)
+
+            return {
+                'success': True,
+                'files_added': files_added,
+                'files_updated': files_updated,
+                'files_removed': len(removed_ids),
+                'files_unchanged': files_unchanged
+            }
+
+        except Exception as e:
+            db.session.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def _read_text(self, file_path: str) -> Optional[str]:
+        """读取文本文件，无法按UTF-8读取时返回None"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except (UnicodeDecodeError, IOError):
+            return None
+
+    def _queue_index(self, project_id: int, pending: Dict[str, str], relative_path: str, content: str):
+        """暂存需要建立检索索引的文件，攒够一批后写入内存中的索引（扫描结束时统一保存）"""
+        pending[relative_path] = content
+        if len(pending) >= self.batch_size:
+            self._update_search_index(project_id, pending, save=False)
+            pending.clear()
+
+    def _update_search_index(self, project_id: int, files: Dict[str, str],
+                             removed: Optional[List[str]] = None, save: bool = True):
+        """更新检索索引，索引失败不影响文件入库"""
+        try:
+            self.search_index.update_files(project_id, files, removed or (), save=save)
+        except Exception as e:
+            print(f"Failed to update search index for project {project_id}: {e}")
+
+    def _load_existing(self, project_id: int) -> Dict[str, tuple]:
+        """一次查询取出已有文件的(id, blob_sha, content_hash)，不加载文件内容（PostgreSQL上使用服务端游标分批读取）"""
+        return {
+            file_path: (file_id, blob_sha, content_hash)
+            for file_id, file_path, blob_sha, content_hash in db.session.query(
+                CodeFile.id, CodeFile.file_path, CodeFile.blob_sha, CodeFile.content_hash
+            ).filter_by(project_id=project_id).yield_per(self.batch_size)
+        }
+
+    def _iter_code_files(self, project_path: str):
+        """遍历项目中需要入库的代码文件"""
+        for root, dirs, files in os.walk(project_path):
+            # 跳过.git和其他隐藏目录
+            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in IGNORED_DIRS]
+
+            for file in files:
+                if file.startswith('.'):
+                    continue
+
+                file_ext = os.path.splitext(file)[1].lower()
+                if file_ext in SCANNED_EXTENSIONS:
+                    file_path = os.path.join(root, file)
+                    yield file_path, os.path.relpath(file_path, project_path), file, file_ext
+
+    def _flush_inserts(self, rows: List[Dict[str, Any]], blobs: Dict[str, str]):
+        """先写入文件内容，再批量插入（PostgreSQL使用COPY）并提交"""
+        if rows:
+            self._flush_blobs(blobs)
+            bulk_insert(CodeFile, rows)
+            db.session.commit()
+
+    def _flush_updates(self, rows: List[Dict[str, Any]], blobs: Dict[str, str]):
+        """先写入文件内容，再按主键批量更新并提交"""
+        if rows:
+            self._flush_blobs(blobs)
+            db.session.execute(update(CodeFile), rows)
+            db.session.commit()
+
+    def _flush_blobs(self, blobs: Dict[str, str]):
+        """把暂存的文件内容写入blob存储（相同内容只保存一份）"""
+        blob_store.put_many(blobs)
+        blobs.clear()
+
+    def _delete(self, file_ids: List[int]):
+        """分批删除文件记录"""
+        for start in range(0, len(file_ids), self.batch_size):
+            batch = file_ids[start:start + self.batch_size]
+            CodeFile.query.filter(CodeFile.id.in_(batch)).delete(synchronize_session=False)
+            db.session.commit()
+
+# 全局文件入库服务实例
+file_ingest_service = FileIngestService()
@@ -0,0 +1,219 @@
+import os
+import json
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Any, Callable
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+from src.models.user import db
+from src.models.project import AnalysisTask
+
+class JobCancelled(Exception):
+    """任务被取消"""
+    pass
+
+class JobQueueFull(Exception):
+    """等待中的任务过多"""
+    pass
+
+class JobContext:
+    """传给任务处理函数的上下文，用于汇报进度和检查取消"""
+
+    def __init__(self, job_service: 'JobService', task_id: int, project_id: int, cancel_event: threading.Event):
+        self.job_service = job_service
+        self.task_id = task_id
+        self.project_id = project_id
+        self.cancel_event = cancel_event
+
+    def progress(self, progress: int, message: str = ''):
+        """推送进度（同时作为取消检查点）"""
+        self.check_cancelled()
+        self.job_service.emit_update(self.task_id, self.project_id, 'running', progress, message)
+
+    def check_cancelled(self):
+        """已请求取消时抛出JobCancelled"""
+        if self.cancel_event.is_set():
+            raise JobCancelled(f'Task {self.task_id} cancelled')
+
+class JobService:
+    """基于AnalysisTask的后台任务服务，使用有界工作池执行耗时操作"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.max_workers = max_workers or int(os.getenv('JOB_WORKERS', 4))
+        self.max_pending = max_pending or int(os.getenv('JOB_QUEUE_SIZE', 100))
+        # 启动时把上次进程遗留的未结束任务标记为失败（多个进程共用数据库时应关闭）
+        self.recover_on_start = os.getenv('JOB_RECOVER_ON_START', 'true').lower() not in ['0', 'false', 'no']
+        self.app = None
+        self.socketio = None
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._jobs = {}  # task_id -> (future, cancel_event)
+
+    def init_app(self, app, socketio=None):
+        """绑定Flask应用（任务在应用上下文中运行）和Socket.IO实例，并回收上次进程遗留的任务"""
+        self.app = app
+        self.socketio = socketio
+        app.extensions['job_service'] = self
+        if self.recover_on_start:
+            with app.app_context():
+                self.recover_interrupted()
+
+    def recover_interrupted(self) -> int:
+        """任务队列只在内存中，进程退出时排队或运行中的任务无法继续，标记为失败并返回数量"""
+        try:
+            result = db.session.execute(
+                update(AnalysisTask)
+                .where(AnalysisTask.status.in_(['pending', 'running']))
+                .values(
+                    status='failed',
+                    output_data=json.dumps({'success': False, 'error': 'Task interrupted by a server restart'}),
+                    completed_at=datetime.utcnow()
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except SQLAlchemyError as e:
+            # 数据库尚未迁移（任务表不存在）时没有需要回收的任务
+            db.session.rollback()
+            print(f"Skipped recovering interrupted jobs: {e}")
+            return 0
+        if result.rowcount:
+            print(f"Marked {result.rowcount} interrupted job(s) as failed")
+        return result.rowcount
+
+    def submit(self, task_type: str, project_id: int, handler: Callable[[JobContext, Dict[str, Any]], Dict[str, Any]],
+               input_data: Optional[Dict[str, Any]] = None, description: str = '',
+               ai_model: Optional[str] = None) -> AnalysisTask:
+        """创建任务记录并提交到工作池，立即返回任务"""
+        input_data = input_data or {}
+
+        with self._lock:
+            if self.get_queue_depth() >= self.max_pending:
+                raise JobQueueFull(f'Too many pending jobs (limit {self.max_pending})')
+
+            task = AnalysisTask(
+                task_type=task_type,
+                description=description,
+                status='pending',
+                input_data=json.dumps(input_data),
+                ai_model=ai_model,
+                project_id=project_id
+            )
+            db.session.add(task)
+            db.session.commit()
+
+            # 先推送排队状态，保证客户端收到的事件顺序与状态变化一致
+            self.emit_update(task.id, project_id, 'pending', 0, 'Queued')
+
+            cancel_event = threading.Event()
+            future = self._get_executor().submit(self._run, task.id, project_id, handler, input_data, cancel_event)
+            self._jobs[task.id] = (future, cancel_event)
+
+        return task
+
+    def cancel(self, task_id: int) -> bool:
+        """请求取消任务；未开始的任务直接取消，运行中的任务在下一个检查点停止"""
+        with self._lock:
+            job = self._jobs.get(task_id)
+        if not job:
+            return False
+
+        future, cancel_event = job
+        cancel_event.set()
+        if future.cancel():
+            with self._lock:
+                self._jobs.pop(task_id, None)
+            self._finish(task_id, 'cancelled', {'success': False, 'error': 'Task cancelled'})
+        return True
+
+    def get_queue_depth(self) -> int:
+        """尚未结束的任务数量"""
+        return sum(1 for future, _ in self._jobs.values() if not future.done())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取工作池状态"""
+        with self._lock:
+            running = sum(1 for future, _ in self._jobs.values() if future.running())
+            active = self.get_queue_depth()
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'running': running,
+            'queued': active - running
+        }
+
+    def emit_update(self, task_id: int, project_id: int, status: str, progress: int, message: str = '',
+                    result: Optional[Dict[str, Any]] = None):
+        """通过analysis_update事件推送任务状态"""
+        if not self.socketio:
+            return
+        payload = {
+            'task_id': task_id,
+            'status': status,
+            'progress': progress,
+            'message': message
+        }
+        if result is not None:
+            payload['result'] = result
+        self.socketio.emit('analysis_update', payload, room=f'project_{project_id}')
+
+    def shutdown(self, wait: bool = True):
+        """关闭工作池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """延迟创建工作池（gevent下线程会被替换为协程）"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        return self._executor
+
+    def _run(self, task_id: int, project_id: int, handler: Callable, input_data: Dict[str, Any],
+             cancel_event: threading.Event):
+        """在工作线程中执行任务"""
+        with self.app.app_context():
+            try:
+                if cancel_event.is_set():
+                    raise JobCancelled(f'Task {task_id} cancelled')
+
+                task = db.session.get(AnalysisTask, task_id)
+                task.status = 'running'
+                db.session.commit()
+                self.emit_update(task_id, project_id, 'running', 0, 'Started')
+
+                output = handler(JobContext(self, task_id, project_id, cancel_event), input_data)
+                self._finish(task_id, 'completed', output)
+
+            except JobCancelled:
+                db.session.rollback()
+                self._finish(task_id, 'cancelled', {'success': False, 'error': 'Task cancelled'})
+            except Exception as e:
+                db.session.rollback()
+                self._finish(task_id, 'failed', {'success': False, 'error': str(e)})
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._jobs.pop(task_id, None)
+
+    def _finish(self, task_id: int, status: str, output: Dict[str, Any]):
+        """写入任务结果并推送最终状态"""
+        with self.app.app_context():
+            task = db.session.get(AnalysisTask, task_id)
+            if task is None:
+                return
+            task.status = status
+            task.output_data = json.dumps(output)
+            if output.get('model_used'):
+                # 备用链切换模型时记录实际回答的模型
+                task.ai_model = output['model_used']
+            task.completed_at = datetime.utcnow()
+            db.session.commit()
+            project_id = task.project_id
+
+        self.emit_update(task_id, project_id, status, 100, status.capitalize(), result=output)
+
+# 全局后台任务服务实例
+job_service = JobService()
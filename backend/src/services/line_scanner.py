@@ -0,0 +1,284 @@
+import io
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Any, Tuple
+
+# 各语言的注释行前缀
+COMMENT_PREFIXES = {
+    'python': ('#',),
+    'javascript': ('//', '/*', '*'),
+    'typescript': ('//', '/*', '*'),
+    'java': ('//', '/*', '*'),
+    'cpp': ('//', '/*', '*'),
+    'c': ('//', '/*', '*'),
+    'cs': ('//', '/*', '*'),
+    'html': ('<!--',),
+    'css': ('/*',)
+}
+
+# 超过该长度的行会被报告（内置检查）
+MAX_LINE_LENGTH = 120
+
+class LineRule:
+    """逐行质量检查规则
+
+    check(line, stripped) 返回问题描述，没有问题时返回None
+    needles为触发子串（不区分大小写）：行内不包含任何needle时跳过该规则；为空表示每行都检查
+    languages为None表示适用于所有语言
+    """
+
+    def __init__(self, rule_type: str, severity: str, check: Callable[[str, str], Optional[str]],
+                 needles: Optional[Iterable[str]] = None, languages: Optional[Iterable[str]] = None):
+        self.rule_type = rule_type
+        self.severity = severity
+        self.check = check
+        self.needles = tuple(needles) if needles else ()
+        self.languages = set(languages) if languages else None
+
+    def applies_to(self, language: str) -> bool:
+        """规则是否适用于该语言"""
+        return self.languages is None or language in self.languages
+
+class LineCounter:
+    """逐行计数规则（如函数、类的数量），count(line) 返回该行的计数，needles含义同LineRule"""
+
+    def __init__(self, field: str, count: Callable[[str], int], needles: Iterable[str],
+                 languages: Iterable[str]):
+        self.field = field
+        self.count = count
+        self.needles = tuple(needles)
+        self.languages = set(languages)
+
+class ScanPlan:
+    """某个语言的规则集合，以及所有规则needle合并后的预筛选列表"""
+
+    def __init__(self, rules: List[LineRule], counters: List[LineCounter]):
+        self.rules = rules
+        self.counters = counters
+
+        needles = set()
+        always = False
+        for rule in rules:
+            if not rule.needles:
+                always = True
+            needles.update(rule.needles)
+        for counter in counters:
+            if not counter.needles:
+                always = True
+            needles.update(counter.needles)
+
+        # 有不带needle的规则时每行都要检查，不做预筛选
+        self.always = always and bool(rules or counters)
+        self.needles = () if always else tuple(sorted(needle.lower() for needle in needles))
+
+class LineScanner:
+    """单遍扫描代码行，同时计算行统计、质量问题和计数
+
+    行长度和尾随空格是内置检查；其他检查通过register_rule/register_counter注册，
+    并由合并后的needle统一预筛选，新增规则不会增加扫描遍数
+    """
+
+    def __init__(self, max_line_length: int = MAX_LINE_LENGTH):
+        self.max_line_length = max_line_length
+        self._rules = []
+        self._counters = []
+        self._plans = {}  # language -> ScanPlan
+
+    def register_rule(self, rule: LineRule):
+        """注册质量检查规则（同一行的问题按注册顺序报告）"""
+        self._rules.append(rule)
+        self._plans.clear()
+
+    def register_counter(self, counter: LineCounter):
+        """注册计数规则"""
+        self._counters.append(counter)
+        self._plans.clear()
+
+    def scan(self, content: str, language: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """扫描文本，返回(基础分析, 质量分析)"""
+        # StringIO按行惰性迭代，不会像split那样一次性生成整个行列表；newline='\n'只在\n处分行，单独的\r留在行内
+        return self.scan_lines(io.StringIO(content, newline='\n'), language)
+
+    def scan_lines(self, lines: Iterable[str], language: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """扫描行迭代器（可以直接传入以newline='\n'打开的文件对象）
+
+        行号和行数与content.split('\n')一致
+        """
+        plan = self._get_plan(language)
+        rules = plan.rules
+        counters = plan.counters
+        needles = plan.needles
+        run_always = plan.always
+        comment_prefixes = COMMENT_PREFIXES.get(language)
+        max_allowed = self.max_line_length
+
+        counts = {counter.field: 0 for counter in counters}
+        issues = []
+        append_issue = issues.append
+
+        line_num = 0
+        code_lines = 0
+        comment_lines = 0
+        blank_lines = 0
+        max_line_length = 0
+        total_length = 0
+        ends_with_newline = True
+
+        for line in lines:
+            line_num += 1
+            if line[-1:] == '\n':
+                line = line[:-1]
+                ends_with_newline = True
+            else:
+                ends_with_newline = False
+
+            line_length = len(line)
+            total_length += line_length
+            if line_length > max_line_length:
+                max_line_length = line_length
+
+            stripped = line.strip()
+            if not stripped:
+                blank_lines += 1
+                if not line:
+                    continue
+            elif comment_prefixes and stripped.startswith(comment_prefixes):
+                comment_lines += 1
+            else:
+                code_lines += 1
+
+            # 内置检查
+            if line_length > max_allowed:
+                append_issue({
+                    'type': 'line_length',
+                    'severity': 'warning',
+                    'line': line_num,
+                    'message': f'Line too long ({line_length} characters)'
+                })
+            if line[-1] in ' \t':
+                append_issue({
+                    'type': 'trailing_whitespace',
+                    'severity': 'info',
+                    'line': line_num,
+                    'message': 'Trailing whitespace'
+                })
+
+            # 已注册的规则，大多数行在预筛选时就被跳过（str的in比不区分大小写的正则快得多）
+            matched = run_always
+            if needles and not matched:
+                lowered = line.lower()
+                for needle in needles:
+                    if needle in lowered:
+                        matched = True
+                        break
+            if matched:
+                for rule in rules:
+                    message = rule.check(line, stripped)
+                    if message:
+                        append_issue({
+                            'type': rule.rule_type,
+                            'severity': rule.severity,
+                            'line': line_num,
+                            'message': message
+                        })
+                for counter in counters:
+                    counts[counter.field] += counter.count(line)
+
+        # 与split一致：空文本或以换行结尾时，末尾还有一个空行
+        if ends_with_newline:
+            line_num += 1
+            blank_lines += 1
+
+        basic_analysis = {
+            'total_lines': line_num,
+            'code_lines': code_lines,
+            'comment_lines': comment_lines,
+            'blank_lines': blank_lines,
+            'max_line_length': max_line_length,
+            'avg_line_length': total_length / line_num,
+            'functions_count': counts.get('functions_count', 0),
+            'classes_count': counts.get('classes_count', 0)
+        }
+
+        severity_counts = {'error': 0, 'warning': 0, 'info': 0}
+        for issue in issues:
+            if issue['severity'] in severity_counts:
+                severity_counts[issue['severity']] += 1
+
+        quality_analysis = {
+            'issues': issues,
+            'quality_score': max(0, 100 - len(issues) * 2),
+            'issues_by_severity': severity_counts
+        }
+
+        return basic_analysis, quality_analysis
+
+    def _get_plan(self, language: str) -> ScanPlan:
+        """按语言筛选规则并生成预筛选正则（结果缓存）"""
+        plan = self._plans.get(language)
+        if plan is None:
+            plan = ScanPlan(
+                [rule for rule in self._rules if rule.applies_to(language)],
+                [counter for counter in self._counters if language in counter.languages]
+            )
+            self._plans[language] = plan
+        return plan
+
+# 默认规则
+_TODO_PATTERN = re.compile(r'TODO|FIXME', re.IGNORECASE)
+_VAR_PATTERN = re.compile(r'var\s+')
+_PY_FUNCTION_PATTERN = re.compile(r'\s*def\s+\w+')
+_PY_CLASS_PATTERN = re.compile(r'\s*class\s+\w+')
+_JS_FUNCTION_PATTERN = re.compile(r'function\s+\w+|=>\s*{|\w+\s*:\s*function')
+_JS_CLASS_PATTERN = re.compile(r'class\s+\w+')
+
+def _check_wildcard_import(line: str, stripped: str) -> Optional[str]:
+    if stripped.startswith('from ') and ' import *' in stripped:
+        return 'Avoid wildcard imports'
+    return None
+
+def _check_debug_print(line: str, stripped: str) -> Optional[str]:
+    if 'print(' in stripped and not stripped.startswith('#'):
+        return 'Consider removing debug print statement'
+    return None
+
+def _check_todo_comment(line: str, stripped: str) -> Optional[str]:
+    if _TODO_PATTERN.search(stripped):
+        return 'TODO/FIXME comment found'
+    return None
+
+def _check_debug_console(line: str, stripped: str) -> Optional[str]:
+    if 'console.log(' in stripped:
+        return 'Consider removing debug console.log'
+    return None
+
+def _check_var_declaration(line: str, stripped: str) -> Optional[str]:
+    if _VAR_PATTERN.match(stripped):
+        return 'Consider using let or const instead of var'
+    return None
+
+def _register_default_rules(scanner: LineScanner):
+    """注册内置的检查和计数规则"""
+    python = ['python']
+    scanner.register_rule(LineRule('wildcard_import', 'warning', _check_wildcard_import, [' import *'], python))
+    scanner.register_rule(LineRule('debug_print', 'info', _check_debug_print, ['print('], python))
+    scanner.register_rule(LineRule('todo_comment', 'info', _check_todo_comment, ['todo', 'fixme'], python))
+    scanner.register_counter(LineCounter(
+        'functions_count', lambda line: 1 if _PY_FUNCTION_PATTERN.match(line) else 0, ['def'], python
+    ))
+    scanner.register_counter(LineCounter(
+        'classes_count', lambda line: 1 if _PY_CLASS_PATTERN.match(line) else 0, ['class'], python
+    ))
+
+    js_languages = ['javascript', 'typescript']
+    scanner.register_rule(LineRule('debug_console', 'info', _check_debug_console, ['console.log('], js_languages))
+    scanner.register_rule(LineRule('var_declaration', 'warning', _check_var_declaration, ['var'], js_languages))
+    scanner.register_counter(LineCounter(
+        'functions_count', lambda line: len(_JS_FUNCTION_PATTERN.findall(line)), ['function', '=>'], js_languages
+    ))
+    scanner.register_counter(LineCounter(
+        'classes_count', lambda line: len(_JS_CLASS_PATTERN.findall(line)), ['class'], js_languages
+    ))
+
+# 全局行扫描器实例
+line_scanner = LineScanner()
+_register_default_rules(line_scanner)
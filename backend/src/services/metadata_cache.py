@@ -0,0 +1,223 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+import requests
+from typing import Dict, Optional, Any
+
+# 默认的缓存数据库路径（与应用数据库放在同一目录，多个工作进程共享）
+DEFAULT_METADATA_CACHE_PATH = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'database', 'github_cache.db'
+)
+
+# 服务端临时错误，此时返回过期的缓存而不是错误
+STALE_ON_STATUS = {429, 500, 502, 503, 504}
+
+# 随响应体一起缓存的响应头（分页列表需要Link头找到其余页）
+CACHED_HEADERS = ('Link',)
+
+class CachedResponse:
+    """缓存返回的响应，提供与requests.Response相同的status_code/text/json()接口"""
+
+    def __init__(self, status_code: int, text: str, headers: Optional[Dict[str, str]] = None,
+                 cache_status: str = 'miss'):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+        # hit: TTL内直接命中；revalidated: 304重新验证；miss: 完整请求；stale: 请求失败时返回的过期缓存；bypass: 缓存已关闭
+        self.cache_status = cache_status
+
+    def json(self) -> Any:
+        """解析JSON响应体"""
+        return json.loads(self.text)
+
+class MetadataCache:
+    """GitHub REST元数据缓存
+
+    响应连同ETag/Last-Modified存在SQLite中（多个工作进程共享），TTL内直接返回，
+    过期后带If-None-Match/If-Modified-Since发送条件请求，304响应不计入GitHub的限额
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl: int = 60, max_entries: int = 5000,
+                 enabled: bool = True):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {
+            'hits': 0,
+            'revalidations': 0,
+            'misses': 0,
+            'stale': 0,
+            'stores': 0,
+            'bypassed': 0
+        }
+
+    @classmethod
+    def from_env(cls) -> 'MetadataCache':
+        """根据环境变量创建缓存实例"""
+        return cls(
+            ttl=int(os.getenv('GITHUB_CACHE_TTL', 60)),
+            max_entries=int(os.getenv('GITHUB_CACHE_MAX_ENTRIES', 5000)),
+            enabled=os.getenv('GITHUB_CACHE_ENABLED', 'true').lower() not in ['0', 'false', 'no']
+        )
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict[str, Any]], authorization: Optional[str]) -> str:
+        """按URL、查询参数和凭据计算缓存键（不同token可见的仓库不同）"""
+        identity = hashlib.sha256(authorization.encode('utf-8')).hexdigest() if authorization else ''
+        payload = json.dumps([url, sorted((params or {}).items()), identity])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def fetch(self, http_client, url: str, params: Optional[Dict[str, Any]] = None) -> CachedResponse:
+        """通过缓存发送GET请求"""
+        if not self.enabled:
+            self._count('bypassed')
+            return self._wrap(http_client.get(url, params=params), 'bypass')
+
+        key = self.make_key(url, params, http_client.session.headers.get('Authorization'))
+        now = time.time()
+        row = self._read(key)
+        if row and row['expires_at'] > now:
+            self._count('hits')
+            return CachedResponse(200, row['body'], row['headers'], cache_status='hit')
+
+        headers = {}
+        if row and row['etag']:
+            headers['If-None-Match'] = row['etag']
+        if row and row['last_modified']:
+            headers['If-Modified-Since'] = row['last_modified']
+
+        try:
+            response = http_client.get(url, params=params, headers=headers)
+        except requests.RequestException:
+            if row is None:
+                raise
+            self._count('stale')
+            return CachedResponse(200, row['body'], row['headers'], cache_status='stale')
+
+        if response.status_code == 304 and row:
+            self._count('revalidations')
+            self._write(key, row['body'], response.headers.get('ETag') or row['etag'],
+                        response.headers.get('Last-Modified') or row['last_modified'], row['headers'])
+            return CachedResponse(200, row['body'], row['headers'], cache_status='revalidated')
+
+        if response.status_code in STALE_ON_STATUS and row:
+            self._count('stale')
+            return CachedResponse(200, row['body'], row['headers'], cache_status='stale')
+
+        self._count('misses')
+        if response.status_code == 200:
+            cached_headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+            self._write(key, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                        cached_headers)
+        return self._wrap(response, 'miss')
+
+    def clear(self):
+        """清空所有缓存"""
+        with self._lock:
+            try:
+                conn = self._get_conn()
+                conn.execute('DELETE FROM metadata_cache')
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Metadata cache clear failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+
+        lookups = stats['hits'] + stats['revalidations'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['revalidations']) / lookups, 4) if lookups else 0
+        stats['enabled'] = self.enabled
+        stats['ttl'] = self.ttl
+        return stats
+
+    @staticmethod
+    def _wrap(response: requests.Response, cache_status: str) -> CachedResponse:
+        """把实际请求的响应包装成统一的返回类型"""
+        return CachedResponse(response.status_code, response.text, dict(response.headers), cache_status)
+
+    def _count(self, name: str):
+        """计数加一"""
+        with self._lock:
+            self._stats[name] += 1
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存条目（包括已过期的，用于条件请求）"""
+        with self._lock:
+            try:
+                row = self._get_conn().execute(
+                    'SELECT body, etag, last_modified, expires_at, headers FROM metadata_cache WHERE key = ?', (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Metadata cache read failed: {e}")
+                return None
+        if row is None:
+            return None
+        return {
+            'body': row[0],
+            'etag': row[1],
+            'last_modified': row[2],
+            'expires_at': row[3],
+            'headers': json.loads(row[4]) if row[4] else {}
+        }
+
+    def _write(self, key: str, body: str, etag: Optional[str], last_modified: Optional[str],
+               headers: Optional[Dict[str, str]] = None):
+        """写入或刷新缓存条目，并将条目数控制在上限内"""
+        now = time.time()
+        with self._lock:
+            self._stats['stores'] += 1
+            try:
+                conn = self._get_conn()
+                conn.execute(
+                    'INSERT OR REPLACE INTO metadata_cache '
+                    '(key, body, etag, last_modified, updated_at, expires_at, headers) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (key, body, etag, last_modified, now, now + self.ttl, json.dumps(headers or {}))
+                )
+                overflow = conn.execute('SELECT COUNT(*) FROM metadata_cache').fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        'DELETE FROM metadata_cache WHERE key IN '
+                        '(SELECT key FROM metadata_cache ORDER BY updated_at LIMIT ?)',
+                        (overflow,)
+                    )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Metadata cache write failed: {e}")
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """延迟打开缓存数据库（WAL模式，允许多个进程同时读写）"""
+        if self._conn is None:
+            db_path = self.db_path or os.getenv('GITHUB_CACHE_DB_PATH') or DEFAULT_METADATA_CACHE_PATH
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS metadata_cache (
+                    key TEXT PRIMARY KEY,
+                    body TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    headers TEXT
+                )
+            ''')
+            # 旧版本创建的缓存表没有headers列
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(metadata_cache)')]
+            if 'headers' not in columns:
+                conn.execute('ALTER TABLE metadata_cache ADD COLUMN headers TEXT')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_metadata_cache_updated_at ON metadata_cache(updated_at)'
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
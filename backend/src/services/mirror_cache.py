@@ -0,0 +1,209 @@
+import os
+import git
+import time
+import shutil
+import hashlib
+import threading
+from typing import Dict, List, Optional, Any
+
+# 默认的镜像缓存目录
+DEFAULT_MIRROR_DIR = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'database', 'mirrors'
+)
+
+class MirrorCache:
+    """按仓库URL缓存的裸镜像，重复分析时增量fetch并检出worktree，避免重新克隆"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or os.getenv('MIRROR_CACHE_DIR') or DEFAULT_MIRROR_DIR
+        self.max_bytes = max_bytes or int(os.getenv('MIRROR_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+        self._lock = threading.Lock()
+        self._repo_locks = {}     # key -> Lock，同一仓库的fetch串行执行
+        self._last_fetch = {}     # key -> 最近一次fetch完成的时间
+        self._in_use = {}         # key -> 正在使用的worktree数量
+        self._worktrees = {}      # worktree路径 -> key
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'fetches': 0,
+            'shared_fetches': 0,
+            'evictions': 0
+        }
+
+    @staticmethod
+    def make_key(repo_url: str) -> str:
+        """根据规范化后的仓库URL计算缓存键"""
+        url = repo_url.strip().rstrip('/')
+        if url.endswith('.git'):
+            url = url[:-4]
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+    def checkout(self, repo_url: str, dest: str, branch: Optional[str] = None,
+                 sparse_paths: Optional[List[str]] = None) -> Dict[str, Any]:
+        """更新镜像并在dest检出worktree，使用完毕后需调用release"""
+        key = self.make_key(repo_url)
+        mirror_path = self._mirror_path(key)
+        with self._lock:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        try:
+            requested_at = time.time()
+            with self._get_repo_lock(key):
+                if os.path.isdir(mirror_path):
+                    cache_hit = True
+                    # 等锁期间其他请求已完成fetch时直接复用
+                    if self._last_fetch.get(key, 0) >= requested_at:
+                        self._count('shared_fetches')
+                    else:
+                        git.Git(mirror_path).remote('update', '--prune')
+                        self._last_fetch[key] = time.time()
+                        self._count('fetches')
+                else:
+                    cache_hit = False
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    try:
+                        git.Repo.clone_from(repo_url, mirror_path, mirror=True)
+                    except Exception:
+                        # 不留下不完整的镜像
+                        shutil.rmtree(mirror_path, ignore_errors=True)
+                        raise
+                    self._last_fetch[key] = time.time()
+                self._count('hits' if cache_hit else 'misses')
+
+                # 记录使用时间，用于LRU淘汰
+                os.utime(mirror_path)
+                # 镜像直接用git命令操作（稀疏worktree会开启worktreeConfig，GitPython无法正确识别裸仓库）
+                mirror = git.Git(mirror_path)
+                # 清理异常退出时遗留的worktree记录
+                mirror.worktree('prune')
+                rev = branch or 'HEAD'
+                if sparse_paths:
+                    mirror.worktree('add', '--detach', '--no-checkout', dest, rev)
+                else:
+                    mirror.worktree('add', '--detach', dest, rev)
+
+            with self._lock:
+                self._worktrees[os.path.abspath(dest)] = key
+
+            repo = git.Repo(dest)
+            if sparse_paths:
+                repo.git.sparse_checkout('set', '--no-cone', *sparse_paths)
+                repo.git.checkout('--detach', 'HEAD')
+
+            self._evict(exclude=key)
+
+            return {
+                'success': True,
+                'local_path': dest,
+                'branch': branch or mirror.symbolic_ref('--short', 'HEAD'),
+                'commit_hash': repo.head.commit.hexsha,
+                'cache_hit': cache_hit,
+                'sparse_paths': sparse_paths or []
+            }
+
+        except Exception as e:
+            with self._lock:
+                registered = os.path.abspath(dest) in self._worktrees
+            if registered:
+                self.release(dest)
+            else:
+                self._release_key(key)
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def release(self, dest: str):
+        """删除worktree并释放对镜像的占用"""
+        with self._lock:
+            key = self._worktrees.pop(os.path.abspath(dest), None)
+        if key is None:
+            return
+
+        try:
+            with self._get_repo_lock(key):
+                git.Git(self._mirror_path(key)).worktree('remove', '--force', dest)
+        except Exception as e:
+            print(f"Failed to remove worktree {dest}: {e}")
+            shutil.rmtree(dest, ignore_errors=True)
+        finally:
+            self._release_key(key)
+
+    def get_mirror_path(self, repo_url: str) -> Optional[str]:
+        """返回仓库已有镜像的路径，没有镜像时返回None"""
+        mirror_path = self._mirror_path(self.make_key(repo_url))
+        return mirror_path if os.path.isdir(mirror_path) else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取镜像缓存统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        sizes = self._mirror_sizes()
+        stats['mirrors'] = len(sizes)
+        stats['total_bytes'] = sum(size for size, _ in sizes.values())
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+    def _evict(self, exclude: Optional[str] = None):
+        """总大小超过上限时按最近使用时间淘汰未被占用的镜像"""
+        sizes = self._mirror_sizes()
+        total = sum(size for size, _ in sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        for key, (size, _) in sorted(sizes.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            with self._lock:
+                if key == exclude or self._in_use.get(key):
+                    continue
+            with self._get_repo_lock(key):
+                shutil.rmtree(self._mirror_path(key), ignore_errors=True)
+                self._last_fetch.pop(key, None)
+            total -= size
+            self._count('evictions')
+
+    def _mirror_sizes(self) -> Dict[str, tuple]:
+        """统计每个镜像的磁盘大小和最近使用时间"""
+        sizes = {}
+        if not os.path.isdir(self.cache_dir):
+            return sizes
+
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.git'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            total = 0
+            for root, dirs, files in os.walk(path):
+                for file in files:
+                    try:
+                        total += os.path.getsize(os.path.join(root, file))
+                    except OSError:
+                        continue
+            sizes[name[:-4]] = (total, os.path.getmtime(path))
+        return sizes
+
+    def _mirror_path(self, key: str) -> str:
+        """镜像目录路径"""
+        return os.path.join(self.cache_dir, f'{key}.git')
+
+    def _get_repo_lock(self, key: str) -> threading.Lock:
+        """获取仓库级别的锁"""
+        with self._lock:
+            if key not in self._repo_locks:
+                self._repo_locks[key] = threading.Lock()
+            return self._repo_locks[key]
+
+    def _release_key(self, key: str):
+        """减少镜像占用计数"""
+        with self._lock:
+            self._in_use[key] = max(self._in_use.get(key, 1) - 1, 0)
+
+    def _count(self, name: str):
+        """累加统计计数"""
+        with self._lock:
+            self._stats[name] += 1
+
+# 全局镜像缓存实例
+mirror_cache = MirrorCache()
@@ -0,0 +1,356 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Any, Callable, Iterator, Tuple
+from src.services.context_packer import model_provider
+from src.services.rate_limiter import ProviderBusy
+
+class ProviderUnavailable(Exception):
+    """提供商未配置（缺少API密钥），路由时直接跳过，不计入熔断"""
+
+class AllModelsFailed(Exception):
+    """备用链上的所有模型都失败或被熔断"""
+
+    def __init__(self, errors: List[Tuple[str, Exception]]):
+        self.errors = errors
+        details = '; '.join(f'{model}: {error}' for model, error in errors) or 'no available model'
+        super().__init__(f'All models failed: {details}')
+
+class CircuitBreaker:
+    """单个提供商的熔断器
+
+    连续失败达到阈值后打开，冷却期内直接跳过该提供商；冷却结束后半开，只放行一个试探请求，
+    成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """closed、open或half_open"""
+        with self._lock:
+            return self._state(self._clock())
+
+    def allow(self) -> bool:
+        """是否放行请求（半开状态只放行一个试探请求）"""
+        with self._lock:
+            state = self._state(self._clock())
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        """请求成功，关闭熔断器"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release_probe(self):
+        """试探请求未得到提供商的结果（如本地限流排队超时），不计失败，允许下一个试探请求"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        """请求失败，连续失败达到阈值（或试探失败）时打开熔断器"""
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._probing = False
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if now - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+class LatencyTracker:
+    """记录最近的成功请求耗时，用于计算对冲请求的触发延迟（p95）"""
+
+    def __init__(self, window: int = 100):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """耗时的分位数，没有样本时返回None"""
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+class ModelRouter:
+    """模型路由：按备用链依次尝试模型，可选对冲请求，按提供商熔断
+
+    对冲：当前请求超过该提供商p95耗时（样本不足时用默认延迟）仍未返回时，
+    向备用链上的下一个模型并发发出同样的请求，采用先成功返回的结果
+
+    整条备用链有总时限（deadline），超过后不再尝试后续模型
+    """
+
+    def __init__(self, dispatch: Callable[[str, str], str], stream: Optional[Callable[[str, str], Iterator[str]]] = None,
+                 fallback_enabled: Optional[bool] = None, hedge_enabled: Optional[bool] = None,
+                 hedge_delay: Optional[float] = None, hedge_min_samples: Optional[int] = None,
+                 failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None,
+                 max_workers: Optional[int] = None, deadline: Optional[float] = None):
+        self._dispatch = dispatch
+        self._stream = stream
+        self.fallback_enabled = fallback_enabled if fallback_enabled is not None else \
+            os.getenv('AI_FALLBACK_ENABLED', 'true').lower() not in ['0', 'false', 'no']
+        self.hedge_enabled = hedge_enabled if hedge_enabled is not None else \
+            os.getenv('AI_HEDGE_ENABLED', 'false').lower() in ['1', 'true', 'yes']
+        # 样本不足时的对冲延迟，以及开始使用p95所需的样本数
+        self.hedge_delay = hedge_delay if hedge_delay is not None else float(os.getenv('AI_HEDGE_DELAY', 20))
+        self.hedge_min_samples = hedge_min_samples if hedge_min_samples is not None else \
+            int(os.getenv('AI_HEDGE_MIN_SAMPLES', 20))
+        self.failure_threshold = failure_threshold or int(os.getenv('AI_BREAKER_FAILURES', 5))
+        self.reset_timeout = reset_timeout or float(os.getenv('AI_BREAKER_RESET_TIMEOUT', 30))
+        self.max_workers = max_workers or int(os.getenv('AI_ROUTER_WORKERS', 16))
+        # 一次请求沿备用链尝试的总秒数
+        self.deadline = deadline or float(os.getenv('AI_ROUTER_DEADLINE', 180))
+
+        self._breakers = {}
+        self._latencies = {}
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'fallbacks': 0,
+            'hedges': 0,
+            'hedge_wins': 0,
+            'skipped_open': 0,
+            'failures': 0,
+            'deadline_exceeded': 0
+        }
+
+    def call(self, models: List[str], prompt: str) -> Tuple[str, str]:
+        """按备用链调用模型，返回 (响应文本, 实际使用的模型)"""
+        self._count('requests')
+        deadline = time.monotonic() + self.deadline
+        candidates = models if self.fallback_enabled else models[:1]
+        if self.hedge_enabled and len(candidates) > 1:
+            return self._call_hedged(candidates, prompt, deadline)
+
+        errors = []
+        for model in candidates:
+            if errors and self._deadline_passed(deadline, errors):
+                break
+            if not self._admit(model):
+                continue
+            if errors:
+                self._count('fallbacks')
+                print(f"Model fallback to {model} after: {errors[-1][0]}: {errors[-1][1]}")
+            try:
+                return self._attempt(model, prompt), model
+            except Exception as e:
+                errors.append((model, e))
+        raise self._failure(errors)
+
+    def stream(self, models: List[str], prompt: str,
+               on_model: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+        """流式调用：第一个文本块返回前失败时切换到下一个模型，开始输出后不再切换
+
+        on_model在开始输出前以实际输出的模型调用
+        """
+        self._count('requests')
+        deadline = time.monotonic() + self.deadline
+        candidates = models if self.fallback_enabled else models[:1]
+        errors = []
+        for model in candidates:
+            if errors and self._deadline_passed(deadline, errors):
+                break
+            if not self._admit(model):
+                continue
+            if errors:
+                self._count('fallbacks')
+                print(f"Model stream fallback to {model} after: {errors[-1][0]}: {errors[-1][1]}")
+
+            start = time.monotonic()
+            try:
+                chunks = iter(self._stream(model, prompt))
+                first = next(chunks, None)
+            except Exception as e:
+                self._record_failure(model, e)
+                errors.append((model, e))
+                continue
+
+            if on_model is not None:
+                on_model(model)
+            try:
+                if first is not None:
+                    yield first
+                yield from chunks
+            except GeneratorExit:
+                # 调用方提前结束读取，提供商本身是正常的
+                self._record_success(model, time.monotonic() - start)
+                raise
+            except Exception as e:
+                self._record_failure(model, e)
+                raise
+            self._record_success(model, time.monotonic() - start)
+            return
+        raise self._failure(errors)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """路由统计和各提供商的熔断状态、耗时分位数"""
+        with self._lock:
+            stats = dict(self._stats)
+            providers = set(self._breakers) | set(self._latencies)
+        stats['providers'] = {}
+        for provider in sorted(providers):
+            latency = self._get_latency(provider)
+            p50, p95 = latency.percentile(0.5), latency.percentile(0.95)
+            stats['providers'][provider] = {
+                'circuit': self._get_breaker(provider).state,
+                'samples': latency.count(),
+                'p50_ms': round(p50 * 1000) if p50 is not None else None,
+                'p95_ms': round(p95 * 1000) if p95 is not None else None,
+                'hedge_delay_ms': round(self._hedge_delay(provider) * 1000)
+            }
+        stats['fallback_enabled'] = self.fallback_enabled
+        stats['hedge_enabled'] = self.hedge_enabled
+        stats['deadline'] = self.deadline
+        return stats
+
+    def _call_hedged(self, candidates: List[str], prompt: str, deadline: float) -> Tuple[str, str]:
+        """对冲调用：最多两个请求同时进行，先成功的结果胜出，失败时继续沿备用链尝试"""
+        executor = self._get_executor()
+        queue = list(candidates)
+        pending = {}
+        errors = []
+
+        def launch() -> bool:
+            while queue:
+                model = queue.pop(0)
+                if self._admit(model):
+                    pending[executor.submit(self._attempt, model, prompt)] = model
+                    return True
+            return False
+
+        launch()
+        first_model = next(iter(pending.values()), None)
+        while pending:
+            if self._deadline_passed(deadline, errors):
+                break
+            remaining = deadline - time.monotonic()
+            # 只有一个请求在途且还有备用模型时，等到对冲延迟为止
+            timeout = remaining
+            if len(pending) == 1 and queue:
+                timeout = min(remaining, self._hedge_delay(model_provider(next(iter(pending.values())))))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if time.monotonic() < deadline and launch():
+                    self._count('hedges')
+                continue
+
+            for future in done:
+                model = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append((model, e))
+                    continue
+                if first_model in pending.values():
+                    self._count('hedge_wins')
+                return result, model
+            if not pending and not self._deadline_passed(deadline, errors) and launch():
+                self._count('fallbacks')
+        raise self._failure(errors)
+
+    def _attempt(self, model: str, prompt: str) -> str:
+        """调用一次模型，记录耗时和熔断状态"""
+        start = time.monotonic()
+        try:
+            response = self._dispatch(model, prompt)
+        except Exception as e:
+            self._record_failure(model, e)
+            raise
+        self._record_success(model, time.monotonic() - start)
+        return response
+
+    def _deadline_passed(self, deadline: float, errors: List[Tuple[str, Exception]]) -> bool:
+        """超过备用链总时限时记录一个超时错误（在途的对冲请求在后台结束，结果被丢弃）"""
+        if time.monotonic() < deadline:
+            return False
+        self._count('deadline_exceeded')
+        errors.append(('deadline', TimeoutError(f'Model chain exceeded its {self.deadline}s deadline')))
+        return True
+
+    def _admit(self, model: str) -> bool:
+        """熔断器打开时跳过该模型"""
+        if self._get_breaker(model_provider(model)).allow():
+            return True
+        self._count('skipped_open')
+        return False
+
+    def _record_success(self, model: str, seconds: float):
+        provider = model_provider(model)
+        self._get_breaker(provider).record_success()
+        self._get_latency(provider).record(seconds)
+
+    def _record_failure(self, model: str, error: Exception):
+        """未配置的提供商和本地限流排队超时不计入熔断"""
+        self._count('failures')
+        if isinstance(error, (ProviderUnavailable, ProviderBusy)):
+            self._get_breaker(model_provider(model)).release_probe()
+            return
+        self._get_breaker(model_provider(model)).record_failure()
+
+    def _failure(self, errors: List[Tuple[str, Exception]]) -> Exception:
+        """只有一个模型参与时原样抛出它的异常"""
+        if len(errors) == 1:
+            return errors[0][1]
+        return AllModelsFailed(errors)
+
+    def _hedge_delay(self, provider: str) -> float:
+        """对冲延迟：样本足够时使用该提供商的p95耗时"""
+        latency = self._get_latency(provider)
+        if latency.count() >= self.hedge_min_samples:
+            return latency.percentile(0.95)
+        return self.hedge_delay
+
+    def _get_breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[provider]
+
+    def _get_latency(self, provider: str) -> LatencyTracker:
+        with self._lock:
+            if provider not in self._latencies:
+                self._latencies[provider] = LatencyTracker()
+            return self._latencies[provider]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """延迟创建对冲请求使用的线程池"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='model-router')
+            return self._executor
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
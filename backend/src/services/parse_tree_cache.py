@@ -0,0 +1,306 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+from src.services.code_analysis_service import code_analysis_service
+from src.services.line_scanner import line_scanner
+
+# 基本多文种平面之外的字符（在UTF-16中占两个码元）
+_ASTRAL_PATTERN = re.compile('[\U00010000-\U0010FFFF]')
+
+class _OpenFile:
+    """编辑器中打开的文件：当前文本、对应的字节串和最近一次的语法树"""
+
+    def __init__(self, language: str, file_ext: str):
+        self.language = language
+        self.file_ext = file_ext
+        self.text = ''
+        self.source = b''
+        self.tree = None
+        self.has_astral = False
+        self.version = None
+        self.lock = threading.Lock()
+
+class ParseTreeCache:
+    """打开文件的语法树缓存
+
+    编辑器发送diff时用tree.edit()标记修改位置并增量重解析，
+    只对变更区域重新计算质量问题和定义，避免每次按键都从头解析整个文件
+    """
+
+    def __init__(self, max_files: Optional[int] = None, analysis_service=None):
+        self.max_files = max_files or int(os.getenv('PARSE_CACHE_MAX_FILES', 100))
+        self.analysis_service = analysis_service or code_analysis_service
+
+        self._files = OrderedDict()  # (project_id, file_path) -> _OpenFile，按最近使用排序
+        self._lock = threading.Lock()
+        self._stats = {
+            'full_parses': 0,
+            'incremental_parses': 0,
+            'evictions': 0
+        }
+
+    def open(self, project_id: int, file_path: str, content: str,
+             version: Optional[int] = None) -> Dict[str, Any]:
+        """打开文件（或用完整内容重新同步），完整解析并返回整个文件的诊断"""
+        file_ext = os.path.splitext(file_path)[1].lower()
+        language = self.analysis_service._detect_language(file_ext)
+        if not language:
+            return {
+                'success': False,
+                'error': f'Unsupported file type: {file_ext}'
+            }
+
+        entry = _OpenFile(language, file_ext)
+        with entry.lock:
+            started = time.perf_counter()
+            entry.text = content
+            entry.source = content.encode('utf-8')
+            entry.has_astral = _ASTRAL_PATTERN.search(content) is not None
+            entry.version = version
+            parser = self.analysis_service.parser_registry.get_parser(language, file_ext)
+            if parser is not None:
+                entry.tree = parser.parse(entry.source)
+            self._count('full_parses')
+            parse_ms = (time.perf_counter() - started) * 1000
+
+            self._store((project_id, file_path), entry)
+            return self._diagnostics(file_path, entry, 0, content.count('\n'), False, parse_ms)
+
+    def apply_edits(self, project_id: int, file_path: str, edits: List[Dict[str, Any]],
+                    version: Optional[int] = None) -> Dict[str, Any]:
+        """应用编辑器的修改并增量重解析，只返回变更区域的诊断
+
+        edits按顺序应用，每项为 {'offset', 'length', 'text'}：offset/length是修改前文本中的
+        UTF-16偏移（即Monaco变更事件中的rangeOffset/rangeLength），text为替换后的文本
+        """
+        entry = self._get((project_id, file_path))
+        if entry is None:
+            return {
+                'success': False,
+                'error': 'File not open',
+                'resync': True
+            }
+
+        with entry.lock:
+            started = time.perf_counter()
+            old_tree = entry.tree
+            changed_start = changed_end = None
+
+            for edit in edits:
+                offset = int(edit.get('offset', 0))
+                start = self._to_index(entry, offset)
+                old_end = self._to_index(entry, offset + int(edit.get('length', 0)))
+                new_text = edit.get('text') or ''
+                if start > len(entry.text) or old_end > len(entry.text):
+                    # 客户端与缓存的内容已经不一致，需要重新发送完整内容
+                    self.close(project_id, file_path)
+                    return {
+                        'success': False,
+                        'error': 'Edit out of range',
+                        'resync': True
+                    }
+
+                start_byte, start_point = self._position(entry.text, start)
+                old_end_byte, old_end_point = self._position(entry.text, old_end)
+
+                encoded = new_text.encode('utf-8')
+                entry.text = entry.text[:start] + new_text + entry.text[old_end:]
+                entry.source = entry.source[:start_byte] + encoded + entry.source[old_end_byte:]
+                if not entry.has_astral and _ASTRAL_PATTERN.search(new_text):
+                    entry.has_astral = True
+                new_end_byte, new_end_point = self._position(entry.text, start + len(new_text))
+
+                if old_tree is not None:
+                    old_tree.edit(
+                        start_byte=start_byte,
+                        old_end_byte=old_end_byte,
+                        new_end_byte=new_end_byte,
+                        start_point=start_point,
+                        old_end_point=old_end_point,
+                        new_end_point=new_end_point
+                    )
+
+                changed_start, changed_end = self._merge_rows(
+                    changed_start, changed_end, start_point[0], old_end_point[0], new_end_point[0]
+                )
+
+            if changed_start is None:
+                changed_start = changed_end = 0
+
+            if old_tree is not None:
+                parser = self.analysis_service.parser_registry.get_parser(entry.language, entry.file_ext)
+                entry.tree = parser.parse(entry.source, old_tree)
+                # 语法结构发生变化的区域（如补全了引号后后面的代码不再是字符串）
+                for changed in old_tree.changed_ranges(entry.tree):
+                    changed_start = min(changed_start, changed.start_point[0])
+                    changed_end = max(changed_end, changed.end_point[0])
+                self._count('incremental_parses')
+
+            entry.version = version
+            parse_ms = (time.perf_counter() - started) * 1000
+            return self._diagnostics(file_path, entry, changed_start, changed_end, True, parse_ms)
+
+    def update_content(self, project_id: int, file_path: str, content: str) -> Optional[Dict[str, Any]]:
+        """用完整内容更新已打开的文件（如保存时），文件未打开时返回None
+
+        通过公共前缀和后缀把新旧内容的差异转换成一次编辑，仍然走增量重解析
+        """
+        entry = self._get((project_id, file_path))
+        if entry is None:
+            return None
+
+        with entry.lock:
+            old_text = entry.text
+            if old_text == content:
+                return None
+            prefix = self._common_prefix(old_text, content)
+            max_suffix = min(len(old_text), len(content)) - prefix
+            suffix = self._common_prefix(old_text[::-1], content[::-1], max_suffix)
+            start = prefix
+            old_end = len(old_text) - suffix
+            new_text = content[prefix:len(content) - suffix]
+            edit = {
+                'offset': self._to_utf16(entry, start),
+                'length': self._to_utf16(entry, old_end) - self._to_utf16(entry, start),
+                'text': new_text
+            }
+            version = entry.version
+
+        return self.apply_edits(project_id, file_path, [edit], version)
+
+    def close(self, project_id: int, file_path: str) -> bool:
+        """关闭文件，释放缓存的语法树"""
+        with self._lock:
+            return self._files.pop((project_id, file_path), None) is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_files'] = len(self._files)
+        stats['max_files'] = self.max_files
+        return stats
+
+    def _diagnostics(self, file_path: str, entry: _OpenFile, start_row: int, end_row: int,
+                     incremental: bool, parse_ms: float) -> Dict[str, Any]:
+        """计算变更区域（start_row到end_row，从0开始）的质量问题和定义"""
+        total_lines = entry.text.count('\n') + 1
+        end_row = min(end_row, total_lines - 1)
+        first_line, last_line = start_row + 1, end_row + 1
+
+        region = self._region_lines(entry.text, start_row, end_row)
+        _, quality = line_scanner.scan_lines(region, entry.language)
+        issues = [dict(issue, line=issue['line'] + start_row) for issue in quality['issues']]
+
+        syntax = {}
+        if entry.tree is not None:
+            # 区域外只进入含有语法错误的子树
+            syntax = self.analysis_service._syntax_analysis(
+                entry.text, entry.language, file_ext=entry.file_ext, tree=entry.tree, rows=(start_row, end_row)
+            )
+
+        return {
+            'success': True,
+            'file_path': file_path,
+            'language': entry.language,
+            'version': entry.version,
+            'incremental': incremental,
+            'total_lines': total_lines,
+            'changed_lines': {'start': first_line, 'end': last_line},
+            'issues': issues,
+            'parse_errors': syntax.get('parse_errors', []),
+            'functions': syntax.get('functions', []),
+            'classes': syntax.get('classes', []),
+            'parse_ms': round(parse_ms, 3)
+        }
+
+    @staticmethod
+    def _region_lines(text: str, start_row: int, end_row: int) -> List[str]:
+        """取出start_row到end_row之间的行（不带换行符）"""
+        return text.split('\n', end_row + 1)[start_row:end_row + 1]
+
+    @staticmethod
+    def _merge_rows(changed_start: Optional[int], changed_end: Optional[int], start_row: int,
+                    old_end_row: int, new_end_row: int) -> Tuple[int, int]:
+        """把之前的变更区域映射到本次编辑后的行号，并与本次编辑的区域合并"""
+        def shift(row):
+            if row <= start_row:
+                return row
+            if row >= old_end_row:
+                return row + new_end_row - old_end_row
+            return min(row, new_end_row)
+
+        if changed_start is None:
+            return start_row, new_end_row
+        return min(shift(changed_start), start_row), max(shift(changed_end), new_end_row)
+
+    @staticmethod
+    def _position(text: str, index: int) -> Tuple[int, Tuple[int, int]]:
+        """字符下标对应的字节偏移和(行, 列字节数)"""
+        row = text.count('\n', 0, index)
+        line_start = text.rfind('\n', 0, index) + 1
+        if text.isascii():
+            return index, (row, index - line_start)
+        column = len(text[line_start:index].encode('utf-8'))
+        return len(text[:line_start].encode('utf-8')) + column, (row, column)
+
+    @staticmethod
+    def _to_index(entry: _OpenFile, offset: int) -> int:
+        """UTF-16偏移转换为字符下标"""
+        if not entry.has_astral:
+            return offset
+
+        text = entry.text
+        index = 0
+        while offset > 0 and index < len(text):
+            offset -= 2 if ord(text[index]) > 0xFFFF else 1
+            index += 1
+        return index + max(offset, 0)
+
+    @staticmethod
+    def _to_utf16(entry: _OpenFile, index: int) -> int:
+        """字符下标转换为UTF-16偏移"""
+        if not entry.has_astral:
+            return index
+        return index + len(_ASTRAL_PATTERN.findall(entry.text, 0, index))
+
+    @staticmethod
+    def _common_prefix(a: str, b: str, limit: Optional[int] = None) -> int:
+        """两个字符串公共前缀的长度（按块二分比较，避免逐字符循环）"""
+        limit = min(len(a), len(b)) if limit is None else limit
+        low, high = 0, limit
+        while low < high:
+            middle = (low + high + 1) // 2
+            if a[low:middle] == b[low:middle]:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def _get(self, key: Tuple[int, str]) -> Optional[_OpenFile]:
+        """获取打开的文件并标记为最近使用"""
+        with self._lock:
+            entry = self._files.get(key)
+            if entry is not None:
+                self._files.move_to_end(key)
+            return entry
+
+    def _store(self, key: Tuple[int, str], entry: _OpenFile):
+        """保存打开的文件，超过上限时淘汰最久未使用的文件"""
+        with self._lock:
+            self._files[key] = entry
+            self._files.move_to_end(key)
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _count(self, name: str):
+        """累加统计计数"""
+        with self._lock:
+            self._stats[name] += 1
+
+# 全局语法树缓存实例
+parse_tree_cache = ParseTreeCache()
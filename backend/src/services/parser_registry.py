@@ -0,0 +1,275 @@
+import importlib
+import threading
+from tree_sitter import Language, Parser
+from typing import Dict, List, Optional, Any, Tuple
+
+def _text(node) -> str:
+    """节点源码文本"""
+    return node.text.decode('utf-8', 'replace')
+
+def _unquote(text: str) -> str:
+    """去掉字符串字面量两端的引号或尖括号"""
+    return text.strip('"\'`<>')
+
+def _python_imports(node) -> List[Dict[str, Any]]:
+    """import / from ... import"""
+    names = []
+    for child in node.children_by_field_name('name'):
+        if child.type == 'aliased_import':
+            child = child.child_by_field_name('name')
+        names.append(_text(child))
+
+    if node.type == 'import_statement':
+        return [{'module': name, 'names': []} for name in names]
+
+    module_node = node.child_by_field_name('module_name')
+    module = _text(module_node) if module_node else '__future__'
+    if any(child.type == 'wildcard_import' for child in node.children):
+        names.append('*')
+    return [{'module': module, 'names': names}]
+
+def _javascript_imports(node) -> List[Dict[str, Any]]:
+    """import ... from 'module'"""
+    source = node.child_by_field_name('source')
+    if source is None:
+        return []
+
+    names = []
+    for clause in node.children:
+        if clause.type != 'import_clause':
+            continue
+        for child in clause.children:
+            if child.type == 'identifier':
+                names.append(_text(child))
+            elif child.type == 'namespace_import':
+                names.append('*')
+            elif child.type == 'named_imports':
+                for specifier in child.children:
+                    if specifier.type == 'import_specifier':
+                        names.append(_text(specifier.child_by_field_name('name')))
+    return [{'module': _unquote(_text(source)), 'names': names}]
+
+def _go_imports(node) -> List[Dict[str, Any]]:
+    """import "fmt" / import ( ... )"""
+    specs = []
+    for child in node.children:
+        if child.type == 'import_spec':
+            specs.append(child)
+        elif child.type == 'import_spec_list':
+            specs.extend(spec for spec in child.children if spec.type == 'import_spec')
+    return [
+        {'module': _unquote(_text(spec.child_by_field_name('path'))), 'names': [], 'line': spec.start_point[0] + 1}
+        for spec in specs
+    ]
+
+def _rust_imports(node) -> List[Dict[str, Any]]:
+    """use a::b::{c, d}"""
+    argument = node.child_by_field_name('argument')
+    if argument is None:
+        return []
+    if argument.type == 'scoped_use_list':
+        path = argument.child_by_field_name('path')
+        items = argument.child_by_field_name('list')
+        names = [_text(item) for item in items.named_children] if items else []
+        return [{'module': _text(path) if path else '', 'names': names}]
+    if argument.type == 'use_as_clause':
+        argument = argument.child_by_field_name('path')
+    if argument.type == 'use_wildcard':
+        return [{'module': _text(argument)[:-3], 'names': ['*']}]
+    return [{'module': _text(argument), 'names': []}]
+
+def _java_imports(node) -> List[Dict[str, Any]]:
+    """import a.b.C; / import a.b.*;"""
+    module = next((_text(child) for child in node.named_children
+                   if child.type in ['scoped_identifier', 'identifier']), '')
+    names = ['*'] if any(child.type == 'asterisk' for child in node.children) else []
+    return [{'module': module, 'names': names}]
+
+def _c_imports(node) -> List[Dict[str, Any]]:
+    """#include <x.h> / #include "x.h" """
+    path = node.child_by_field_name('path')
+    return [{'module': _unquote(_text(path)), 'names': []}] if path else []
+
+# 各语言的语法包与语法分析配置：
+#   grammar: (模块名, 加载函数名)，grammar_by_ext 可按扩展名使用其他语法（如.tsx）
+#   function/class/import: 关注的节点类型；imports: 导入语句的提取函数
+#   name_fields: 取名称时依次尝试的字段（C系语言的名称在declarator链的末端）
+#   parent_name_fields: 匿名函数按父节点字段取名（如 const f = () => {}），取不到名称的匿名函数不记录
+#   requires_body: 只有带body时才算定义的节点（如C的struct前置声明）
+#   skip: 不可能包含命名定义或导入的节点，遍历时不进入其子树
+_C_FAMILY_SKIP = {'comment', 'string_literal', 'char_literal', 'expression_statement', 'return_statement',
+                  'call_expression', 'preproc_def', 'preproc_function_def'}
+_JS_PARENT_NAME_FIELDS = {'variable_declarator': 'name', 'assignment_expression': 'left',
+                          'pair': 'key', 'field_definition': 'property', 'public_field_definition': 'name'}
+_JS_SKIP = {'comment', 'string', 'template_string', 'regex', 'number', 'jsx_element', 'jsx_self_closing_element'}
+
+LANGUAGE_SPECS = {
+    'python': {
+        'grammar': ('tree_sitter_python', 'language'),
+        'function': {'function_definition'},
+        'class': {'class_definition'},
+        'import': {'import_statement', 'import_from_statement', 'future_import_statement'},
+        'imports': _python_imports,
+        'skip': {
+            'expression_statement', 'return_statement', 'raise_statement', 'assert_statement',
+            'pass_statement', 'break_statement', 'continue_statement', 'delete_statement',
+            'global_statement', 'nonlocal_statement', 'print_statement', 'exec_statement',
+            'comment', 'decorator', 'parameters', 'string', 'call', 'attribute', 'subscript',
+            'binary_operator', 'comparison_operator', 'boolean_operator', 'not_operator'
+        }
+    },
+    'javascript': {
+        'grammar': ('tree_sitter_javascript', 'language'),
+        'function': {'function_declaration', 'generator_function_declaration', 'method_definition',
+                     'function_expression', 'arrow_function'},
+        'class': {'class_declaration'},
+        'import': {'import_statement'},
+        'imports': _javascript_imports,
+        'parent_name_fields': _JS_PARENT_NAME_FIELDS,
+        'skip': _JS_SKIP
+    },
+    'typescript': {
+        'grammar': ('tree_sitter_typescript', 'language_typescript'),
+        'grammar_by_ext': {'.tsx': ('tree_sitter_typescript', 'language_tsx')},
+        'function': {'function_declaration', 'generator_function_declaration', 'method_definition',
+                     'function_expression', 'arrow_function', 'method_signature', 'abstract_method_signature'},
+        'class': {'class_declaration', 'abstract_class_declaration', 'interface_declaration', 'enum_declaration'},
+        'import': {'import_statement'},
+        'imports': _javascript_imports,
+        'parent_name_fields': _JS_PARENT_NAME_FIELDS,
+        'skip': _JS_SKIP
+    },
+    'go': {
+        'grammar': ('tree_sitter_go', 'language'),
+        'function': {'function_declaration', 'method_declaration'},
+        'class': {'type_spec'},
+        'import': {'import_declaration'},
+        'imports': _go_imports,
+        'skip': {'comment', 'interpreted_string_literal', 'raw_string_literal', 'expression_statement',
+                 'return_statement', 'call_expression', 'assignment_statement', 'short_var_declaration'}
+    },
+    'rust': {
+        'grammar': ('tree_sitter_rust', 'language'),
+        'function': {'function_item', 'function_signature_item'},
+        'class': {'struct_item', 'enum_item', 'trait_item', 'impl_item', 'union_item'},
+        'import': {'use_declaration'},
+        'imports': _rust_imports,
+        'name_fields': ('name', 'type'),
+        'skip': {'line_comment', 'block_comment', 'string_literal', 'raw_string_literal',
+                 'macro_invocation', 'attribute_item', 'inner_attribute_item'}
+    },
+    'java': {
+        'grammar': ('tree_sitter_java', 'language'),
+        'function': {'method_declaration', 'constructor_declaration'},
+        'class': {'class_declaration', 'interface_declaration', 'enum_declaration', 'record_declaration',
+                  'annotation_type_declaration'},
+        'import': {'import_declaration'},
+        'imports': _java_imports,
+        'skip': {'line_comment', 'block_comment', 'string_literal', 'marker_annotation', 'annotation'}
+    },
+    'c': {
+        'grammar': ('tree_sitter_c', 'language'),
+        'function': {'function_definition'},
+        'class': {'struct_specifier', 'union_specifier', 'enum_specifier'},
+        'import': {'preproc_include'},
+        'imports': _c_imports,
+        'name_fields': ('name', 'declarator'),
+        'requires_body': {'struct_specifier', 'union_specifier', 'enum_specifier'},
+        'skip': _C_FAMILY_SKIP
+    },
+    'cpp': {
+        'grammar': ('tree_sitter_cpp', 'language'),
+        'function': {'function_definition'},
+        'class': {'class_specifier', 'struct_specifier', 'union_specifier', 'enum_specifier'},
+        'import': {'preproc_include'},
+        'imports': _c_imports,
+        'name_fields': ('name', 'declarator'),
+        'requires_body': {'class_specifier', 'struct_specifier', 'union_specifier', 'enum_specifier'},
+        'skip': _C_FAMILY_SKIP | {'raw_string_literal'}
+    }
+}
+
+class ParserRegistry:
+    """Tree-sitter解析器注册表：语法在首次使用时才加载，Parser按线程缓存"""
+
+    def __init__(self, specs: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.specs = specs if specs is not None else LANGUAGE_SPECS
+        self._languages = {}     # (模块名, 加载函数名) -> Language，只读对象可跨线程共享
+        self._failed = {}        # (模块名, 加载函数名) -> 加载失败原因
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def supports(self, language: str, file_ext: Optional[str] = None) -> bool:
+        """该语言是否可以进行语法分析（会触发语法加载）"""
+        return self.get_language(language, file_ext) is not None
+
+    def get_spec(self, language: str) -> Optional[Dict[str, Any]]:
+        """获取语言的语法分析配置"""
+        return self.specs.get(language)
+
+    def get_language(self, language: str, file_ext: Optional[str] = None) -> Optional[Language]:
+        """获取Language对象，语法包未安装时返回None"""
+        grammar = self._resolve_grammar(language, file_ext)
+        if grammar is None:
+            return None
+
+        loaded = self._languages.get(grammar)
+        if loaded is not None:
+            return loaded
+
+        with self._lock:
+            if grammar in self._languages:
+                return self._languages[grammar]
+            if grammar in self._failed:
+                return None
+
+            module_name, function_name = grammar
+            try:
+                module = importlib.import_module(module_name)
+                loaded = Language(getattr(module, function_name)())
+            except Exception as e:
+                print(f"Failed to load tree-sitter grammar {module_name}.{function_name}: {e}")
+                self._failed[grammar] = str(e)
+                return None
+
+            self._languages[grammar] = loaded
+            return loaded
+
+    def get_parser(self, language: str, file_ext: Optional[str] = None) -> Optional[Parser]:
+        """获取当前线程专用的Parser（Parser不是线程安全的）"""
+        grammar = self._resolve_grammar(language, file_ext)
+        if grammar is None:
+            return None
+
+        parsers = getattr(self._local, 'parsers', None)
+        if parsers is None:
+            parsers = self._local.parsers = {}
+
+        parser = parsers.get(grammar)
+        if parser is None:
+            loaded = self.get_language(language, file_ext)
+            if loaded is None:
+                return None
+            parser = parsers[grammar] = Parser(loaded)
+        return parser
+
+    def get_stats(self) -> Dict[str, Any]:
+        """已加载和加载失败的语法"""
+        with self._lock:
+            return {
+                'configured': sorted(self.specs),
+                'loaded': sorted(f'{module}.{function}' for module, function in self._languages),
+                'failed': {f'{module}.{function}': error for (module, function), error in self._failed.items()}
+            }
+
+    def _resolve_grammar(self, language: str, file_ext: Optional[str]) -> Optional[Tuple[str, str]]:
+        """根据语言和扩展名确定使用的语法"""
+        spec = self.specs.get(language)
+        if spec is None:
+            return None
+        if file_ext and file_ext in spec.get('grammar_by_ext', {}):
+            return spec['grammar_by_ext'][file_ext]
+        return spec['grammar']
+
+# 全局解析器注册表实例
+parser_registry = ParserRegistry()
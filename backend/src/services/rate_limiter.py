@@ -0,0 +1,340 @@
+import os
+import re
+import time
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Any, Callable
+
+# 各提供商的默认限额：(最大并发数, 每分钟请求数, 每分钟token数)，0表示不限制
+DEFAULT_PROVIDER_LIMITS = {
+    'anthropic': (8, 50, 40000),
+    'openai': (8, 500, 200000),
+    'deepseek': (8, 60, 0),
+    'gemini': (8, 60, 1000000)
+}
+
+# 遇到429时限额乘以该系数（同一轮限流中的多个429只减一次），
+# 之后每完成一轮（当前并发数个）成功请求，并发上限恢复1个，直到回到配置的上限
+DECREASE_FACTOR = 0.5
+MIN_RATE_FACTOR = 0.1
+DECREASE_HOLDOFF = 1.0
+
+# 没有给出Retry-After时429之后暂停的秒数，以及暂停的最短时间
+DEFAULT_RATE_LIMIT_PAUSE = 1.0
+MIN_RATE_LIMIT_PAUSE = 0.1
+
+# OpenAI的重置时间格式，如 "1s"、"6m0s"、"20ms"
+_DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+class ProviderBusy(Exception):
+    """提供商的排队已满，或在允许的等待时间内没有拿到执行名额"""
+
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """按分钟额度匀速补充的令牌桶（额度为0时不限制）"""
+
+    def __init__(self, per_minute: float, now: float):
+        self.per_minute = per_minute
+        self.level = float(per_minute)
+        self.updated = now
+
+    @property
+    def unlimited(self) -> bool:
+        return self.per_minute <= 0
+
+    def set_rate(self, per_minute: float, now: float):
+        """调整额度，已积累的令牌不超过新的容量"""
+        self.refill(now)
+        self.per_minute = per_minute
+        self.level = min(self.level, per_minute)
+
+    def refill(self, now: float):
+        """按流逝的时间补充令牌"""
+        if not self.unlimited:
+            self.level = min(self.per_minute, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """取出amount个令牌还需要等待的秒数"""
+        if self.unlimited:
+            return 0.0
+        self.refill(now)
+        # 单次请求超过整桶容量时按整桶计算，避免永远等不到
+        amount = min(amount, self.per_minute)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.per_minute
+
+    def take(self, amount: float):
+        """取出令牌（允许透支，透支部分由之后的补充抵消）"""
+        if not self.unlimited:
+            self.level -= min(amount, self.per_minute)
+
+    def drain_to(self, remaining: float):
+        """按服务端报告的剩余额度校准"""
+        if not self.unlimited:
+            self.level = min(self.level, remaining)
+
+class ProviderLimiter:
+    """单个AI提供商的限流器：并发信号量 + 请求数/token数令牌桶
+
+    超出限额的请求排队等待（有等待上限和队列长度上限）；遇到429或限额头显示额度用完时暂停，
+    并按AIMD调整速率：429时减半，之后每次成功逐步恢复到配置的上限
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 8, requests_per_minute: float = 0,
+                 tokens_per_minute: float = 0, max_wait: float = 60.0, max_queue: int = 100,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self._clock = clock
+
+        now = clock()
+        self._requests = TokenBucket(requests_per_minute, now)
+        self._tokens = TokenBucket(tokens_per_minute, now)
+        self._rate_factor = 1.0
+        self._paused_until = 0.0
+        self._holdoff_until = 0.0
+        self._in_flight = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            'admitted': 0,
+            'rejected': 0,
+            'rate_limited': 0,
+            'max_queue_depth': 0,
+            'total_wait': 0.0
+        }
+
+    @classmethod
+    def from_env(cls, name: str) -> 'ProviderLimiter':
+        """根据环境变量创建限流器，如 AI_ANTHROPIC_MAX_CONCURRENCY、AI_ANTHROPIC_RPM、AI_ANTHROPIC_TPM"""
+        concurrency, rpm, tpm = DEFAULT_PROVIDER_LIMITS.get(name, (8, 0, 0))
+        prefix = f'AI_{name.upper()}_'
+        return cls(
+            name,
+            max_concurrency=int(os.getenv(prefix + 'MAX_CONCURRENCY', concurrency)),
+            requests_per_minute=float(os.getenv(prefix + 'RPM', rpm)),
+            tokens_per_minute=float(os.getenv(prefix + 'TPM', tpm)),
+            max_wait=float(os.getenv('AI_LIMIT_MAX_WAIT', 60)),
+            max_queue=int(os.getenv('AI_LIMIT_MAX_QUEUE', 100))
+        )
+
+    @contextmanager
+    def acquire(self, tokens: int = 0, deadline: Optional[float] = None):
+        """等待执行名额，拿到后在with块内执行请求；超过等待上限时抛出ProviderBusy"""
+        self.wait_for_slot(tokens, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def deadline(self) -> float:
+        """从现在开始计算的等待截止时间（同一请求多次排队时共用）"""
+        return self._clock() + self.max_wait
+
+    def wait_for_slot(self, tokens: int = 0, deadline: Optional[float] = None):
+        """排队直到并发名额和两个令牌桶都满足要求"""
+        start = self._clock()
+        deadline = deadline if deadline is not None else self.deadline()
+        with self._condition:
+            if self._waiting >= self.max_queue:
+                self._stats['rejected'] += 1
+                raise ProviderBusy(f'{self.name} request queue is full ({self.max_queue} waiting)',
+                                   self._retry_hint(start))
+
+            self._waiting += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._waiting)
+            try:
+                while True:
+                    now = self._clock()
+                    delay = self._admission_delay(tokens, now)
+                    if delay == 0:
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._stats['rejected'] += 1
+                        raise ProviderBusy(f'{self.name} rate limit: no capacity within {self.max_wait:.0f}s',
+                                           self._retry_hint(now))
+                    # 等并发名额时由release唤醒；等令牌或暂停结束时按计算出的时间醒来
+                    self._condition.wait(remaining if delay is None else min(delay, remaining))
+
+                self._requests.take(1)
+                self._tokens.take(tokens)
+                self._in_flight += 1
+                self._stats['admitted'] += 1
+                self._stats['total_wait'] += now - start
+            finally:
+                self._waiting -= 1
+
+    def release(self):
+        """请求结束，释放并发名额"""
+        with self._condition:
+            self._in_flight = max(self._in_flight - 1, 0)
+            self._condition.notify_all()
+
+    def record_success(self, estimated_tokens: int = 0, used_tokens: Optional[int] = None):
+        """请求成功：按实际用量校正token桶，并逐步恢复速率"""
+        with self._condition:
+            if used_tokens is not None and not self._tokens.unlimited:
+                refund = min(estimated_tokens, self._tokens.per_minute) - used_tokens
+                self._tokens.level = min(self._tokens.per_minute, self._tokens.level + refund)
+            # 刚被限流的一段时间内不恢复，避免马上又撞到上限
+            if self._rate_factor < 1.0 and self._clock() >= self._holdoff_until:
+                step = 1.0 / (self.max_concurrency * self._effective_concurrency())
+                self._set_rate_factor(min(1.0, self._rate_factor + step))
+
+    def record_rate_limited(self, headers: Optional[Dict[str, str]] = None):
+        """遇到429：暂停到服务端要求的时间，并把速率减半"""
+        with self._condition:
+            self._stats['rate_limited'] += 1
+            wait = parse_retry_after(headers) if headers else None
+            pause = max(wait, MIN_RATE_LIMIT_PAUSE) if wait is not None else DEFAULT_RATE_LIMIT_PAUSE
+            self._pause(pause)
+            # 同时在途的请求会一起收到429，只按第一个减速
+            now = self._clock()
+            if now >= self._holdoff_until:
+                self._holdoff_until = now + max(pause, DECREASE_HOLDOFF)
+                self._set_rate_factor(max(MIN_RATE_FACTOR, self._rate_factor * DECREASE_FACTOR))
+            if headers:
+                self._apply_headers(headers)
+
+    def update_from_headers(self, headers: Dict[str, str]):
+        """根据响应的限额头校准剩余额度（额度用完时暂停到重置时间）"""
+        with self._condition:
+            self._apply_headers(headers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限流统计（包括当前排队数）"""
+        with self._condition:
+            now = self._clock()
+            stats = dict(self._stats)
+            total_wait = stats.pop('total_wait')
+            stats.update({
+                'in_flight': self._in_flight,
+                'queue_depth': self._waiting,
+                'avg_wait_ms': round(total_wait / stats['admitted'] * 1000, 1) if stats['admitted'] else 0,
+                'max_concurrency': self._effective_concurrency(),
+                'requests_per_minute': round(self._requests.per_minute, 1),
+                'tokens_per_minute': round(self._tokens.per_minute, 1),
+                'rate_factor': round(self._rate_factor, 3),
+                'paused_for': round(max(self._paused_until - now, 0), 3)
+            })
+            return stats
+
+    def _admission_delay(self, tokens: int, now: float) -> Optional[float]:
+        """还需要等待的秒数；0表示可以执行，None表示要等其他请求结束"""
+        if self._paused_until > now:
+            return self._paused_until - now
+        if self._in_flight >= self._effective_concurrency():
+            return None
+        return max(self._requests.delay(1, now), self._tokens.delay(tokens, now))
+
+    def _effective_concurrency(self) -> int:
+        """按当前速率系数缩放后的并发上限"""
+        return max(1, int(self.max_concurrency * self._rate_factor))
+
+    def _set_rate_factor(self, factor: float):
+        """调整速率系数，同步两个令牌桶的额度"""
+        now = self._clock()
+        self._rate_factor = factor
+        self._requests.set_rate(self.requests_per_minute * factor, now)
+        self._tokens.set_rate(self.tokens_per_minute * factor, now)
+        self._condition.notify_all()
+
+    def _pause(self, seconds: float):
+        """在指定时间内不放行新请求"""
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def _retry_hint(self, now: float) -> float:
+        """建议调用方多久之后重试"""
+        return max(self._paused_until - now, 1.0)
+
+    def _apply_headers(self, headers: Dict[str, str]):
+        """解析OpenAI（x-ratelimit-*）和Anthropic（anthropic-ratelimit-*）的限额头"""
+        now = self._clock()
+        lowered = {key.lower(): value for key, value in headers.items()}
+        for bucket, kind in ((self._requests, 'requests'), (self._tokens, 'tokens')):
+            remaining = _to_float(lowered.get(f'x-ratelimit-remaining-{kind}',
+                                              lowered.get(f'anthropic-ratelimit-{kind}-remaining')))
+            if remaining is None:
+                continue
+            bucket.refill(now)
+            bucket.drain_to(remaining)
+            if remaining <= 0:
+                reset = lowered.get(f'x-ratelimit-reset-{kind}') or lowered.get(f'anthropic-ratelimit-{kind}-reset')
+                wait = parse_reset(reset)
+                if wait is not None:
+                    self._pause(wait)
+
+def parse_retry_after(headers: Dict[str, str]) -> Optional[float]:
+    """从响应头取出建议的等待秒数（retry-after-ms、retry-after秒数或HTTP日期）"""
+    lowered = {key.lower(): value for key, value in headers.items()}
+    milliseconds = _to_float(lowered.get('retry-after-ms'))
+    if milliseconds is not None:
+        return max(milliseconds / 1000, 0.0)
+    value = lowered.get('retry-after')
+    if not value:
+        return None
+    seconds = _to_float(value)
+    if seconds is not None:
+        return max(seconds, 0.0)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """解析限额重置时间：OpenAI的时长（如"6m0s"）或Anthropic的RFC 3339时间"""
+    if not value:
+        return None
+    parts = _DURATION_PATTERN.findall(value)
+    if parts and ''.join(number + unit for number, unit in parts) == value:
+        return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+    try:
+        reset = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return max(reset.timestamp() - time.time(), 0.0)
+
+def _to_float(value: Optional[str]) -> Optional[float]:
+    """把数字字符串转为float，无效时返回None"""
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class RateLimiterRegistry:
+    """按提供商创建和管理限流器"""
+
+    def __init__(self):
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str) -> ProviderLimiter:
+        """获取提供商的限流器（首次使用时根据环境变量创建）"""
+        with self._lock:
+            if provider not in self._limiters:
+                self._limiters[provider] = ProviderLimiter.from_env(provider)
+            return self._limiters[provider]
+
+    def set(self, provider: str, limiter: ProviderLimiter):
+        """替换提供商的限流器"""
+        with self._lock:
+            self._limiters[provider] = limiter
+
+    def get_stats(self) -> Dict[str, Any]:
+        """所有已使用的提供商的限流统计"""
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {name: limiter.get_stats() for name, limiter in limiters.items()}
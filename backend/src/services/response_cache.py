@@ -0,0 +1,180 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+
+# 默认的磁盘缓存路径（与应用数据库放在同一目录）
+DEFAULT_CACHE_DB_PATH = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'database', 'ai_cache.db'
+)
+
+class ResponseCache:
+    """AI响应缓存，进程内LRU + SQLite磁盘两级缓存"""
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 512,
+                 max_disk_entries: int = 10000, ttl: int = 3600, enabled: bool = True):
+        self.db_path = db_path or DEFAULT_CACHE_DB_PATH
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.enabled = enabled
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'bypassed': 0
+        }
+
+    @classmethod
+    def from_env(cls) -> 'ResponseCache':
+        """根据环境变量创建缓存实例"""
+        return cls(
+            db_path=os.getenv('AI_CACHE_DB_PATH') or None,
+            max_entries=int(os.getenv('AI_CACHE_MAX_ENTRIES', 512)),
+            max_disk_entries=int(os.getenv('AI_CACHE_MAX_DISK_ENTRIES', 10000)),
+            ttl=int(os.getenv('AI_CACHE_TTL', 3600)),
+            enabled=os.getenv('AI_CACHE_ENABLED', 'true').lower() not in ['0', 'false', 'no']
+        )
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        """根据请求参数计算缓存键"""
+        payload = json.dumps(
+            [model, system_prompt, prompt, temperature, max_tokens],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，先查内存再查磁盘"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return value
+                del self._memory[key]
+
+            try:
+                row = self._get_conn().execute(
+                    'SELECT value, expires_at FROM response_cache WHERE key = ?', (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Response cache read failed: {e}")
+                row = None
+
+            if row and row[1] > now:
+                self._remember(key, row[0], row[1])
+                self._stats['disk_hits'] += 1
+                return row[0]
+
+            self._stats['misses'] += 1
+            return None
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None):
+        """写入缓存（内存和磁盘）"""
+        if not self.enabled:
+            return
+
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._stats['stores'] += 1
+            try:
+                conn = self._get_conn()
+                conn.execute(
+                    'INSERT OR REPLACE INTO response_cache (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)',
+                    (key, value, now, expires_at)
+                )
+                self._evict_disk(conn, now)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Response cache write failed: {e}")
+
+    def record_bypass(self):
+        """记录一次跳过缓存的请求"""
+        with self._lock:
+            self._stats['bypassed'] += 1
+
+    def clear(self):
+        """清空所有缓存"""
+        with self._lock:
+            self._memory.clear()
+            try:
+                conn = self._get_conn()
+                conn.execute('DELETE FROM response_cache')
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Response cache clear failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        stats['hits'] = hits
+        stats['hit_rate'] = round(hits / lookups, 4) if lookups else 0
+        stats['enabled'] = self.enabled
+        stats['ttl'] = self.ttl
+        return stats
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        """写入内存LRU并按容量淘汰"""
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _evict_disk(self, conn: sqlite3.Connection, now: float):
+        """删除过期条目，并将磁盘条目数控制在上限内"""
+        conn.execute('DELETE FROM response_cache WHERE expires_at <= ?', (now,))
+        count = conn.execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            conn.execute(
+                'DELETE FROM response_cache WHERE key IN '
+                '(SELECT key FROM response_cache ORDER BY created_at LIMIT ?)',
+                (overflow,)
+            )
+            self._stats['evictions'] += overflow
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """延迟打开磁盘缓存连接"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_response_cache_created_at ON response_cache(created_at)'
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
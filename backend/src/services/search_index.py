@@ -0,0 +1,613 @@
+import os
+import re
+import json
+import time
+import shutil
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Iterable
+
+try:
+    import re._parser as _regex_parser
+except ImportError:  # Python 3.10及更早版本
+    import sre_parse as _regex_parser
+
+from src.services.code_analysis_service import code_analysis_service
+
+# 索引文件格式版本，格式变化时旧索引会被重建
+SEARCH_INDEX_VERSION = 1
+
+# 默认的索引目录
+DEFAULT_SEARCH_INDEX_DIR = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'database', 'search_index'
+)
+
+SYMBOL_KINDS = ('function', 'class')
+
+# 增量更新的文件数超过该值（且超过文件总数的10%）时合并进主倒排表
+DELTA_MERGE_MIN_FILES = 256
+DELTA_MERGE_FRACTION = 0.1
+
+# 正则拆出的候选组合过多时放弃过滤（只会多读文件，不会漏结果）
+MAX_QUERY_ALTERNATIVES = 16
+# 每个文件最多返回的匹配行数，以及返回的行文本长度上限
+MAX_MATCHES_PER_FILE = 20
+MAX_LINE_LENGTH = 300
+
+_EMPTY_GRAMS = np.zeros(0, dtype=np.uint32)
+# 重复操作符（Python 3.11起增加了占有量词）
+_REPEAT_OPS = {
+    getattr(_regex_parser, name) for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+    if hasattr(_regex_parser, name)
+}
+
+def file_trigrams(content: str) -> np.ndarray:
+    """文件内容（转小写后的UTF-8字节）中出现过的三元组，编码为24位整数并排序去重"""
+    data = np.frombuffer(content.lower().encode('utf-8'), dtype=np.uint8)
+    if len(data) < 3:
+        return _EMPTY_GRAMS
+    data = data.astype(np.uint32)
+    return np.unique((data[:-2] << 16) | (data[1:-1] << 8) | data[2:])
+
+def _required_literals(items) -> List[tuple]:
+    """从正则语法树中提取必须出现的字面量
+
+    返回若干候选（任一候选成立即可），每个候选是必须同时出现的字面量元组；[()]表示没有约束
+    """
+    alternatives = [()]
+    run = []
+
+    def concat(left, right):
+        combined = [a + b for a in left for b in right]
+        return combined if len(combined) <= MAX_QUERY_ALTERNATIVES else [()]
+
+    for op, av in items:
+        if op is _regex_parser.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            alternatives = concat(alternatives, [(''.join(run),)])
+            run = []
+
+        if op is _regex_parser.SUBPATTERN:
+            alternatives = concat(alternatives, _required_literals(av[-1]))
+        elif op in _REPEAT_OPS:
+            if av[0] >= 1:
+                alternatives = concat(alternatives, _required_literals(av[2]))
+        elif op is _regex_parser.BRANCH:
+            branches = []
+            for branch in av[1]:
+                required = _required_literals(branch)
+                if () in required:
+                    branches = [()]
+                    break
+                branches.extend(required)
+            alternatives = concat(alternatives, branches if len(branches) <= MAX_QUERY_ALTERNATIVES else [()])
+        # 字符类、任意字符、锚点等不提供字面量约束
+
+    if run:
+        alternatives = concat(alternatives, [(''.join(run),)])
+    return alternatives
+
+def query_trigrams(pattern: str, flags: int = 0) -> Optional[List[np.ndarray]]:
+    """把正则转换为三元组查询：返回若干三元组集合（文件包含任一集合的全部三元组才可能匹配）
+
+    正则中没有至少3个连续字面量字符时返回None，表示无法用索引过滤
+    """
+    queries = []
+    for literals in _required_literals(_regex_parser.parse(pattern, flags)):
+        grams = [file_trigrams(literal) for literal in literals]
+        grams = np.unique(np.concatenate(grams)) if grams else _EMPTY_GRAMS
+        if not len(grams):
+            return None
+        queries.append(grams)
+    return queries
+
+class ProjectSearchIndex:
+    """单个项目的符号表和三元组倒排索引
+
+    主倒排表以CSR形式存放（keys/offsets/postings，内存映射），之后更新的文件先放在增量段中，
+    累积到一定数量后再合并，删除或更新的文件在主表中用in_base标记失效
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        """清空索引"""
+        self.paths = []           # 文件ID -> 相对路径，已删除的为None
+        self.file_ids = {}        # 相对路径 -> 文件ID
+        self.symbols = {}         # 相对路径 -> [[名称, 类型, 起始行, 结束行]]
+        self.keys = _EMPTY_GRAMS
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings = _EMPTY_GRAMS
+        self.in_base = np.zeros(0, dtype=bool)
+        self.delta = {}           # 文件ID -> 三元组（尚未合并进主表）
+        self._symbol_table = None
+
+    def update(self, files: Dict[str, Dict[str, Any]], removed: Iterable[str] = ()):
+        """更新文件的三元组和符号，files: {相对路径: {'grams', 'symbols'}}"""
+        for path in removed:
+            file_id = self.file_ids.pop(path, None)
+            if file_id is None:
+                continue
+            self.paths[file_id] = None
+            self.symbols.pop(path, None)
+            self.delta.pop(file_id, None)
+            if file_id < len(self.in_base):
+                self.in_base[file_id] = False
+
+        for path, entry in files.items():
+            file_id = self.file_ids.get(path)
+            if file_id is None:
+                file_id = len(self.paths)
+                self.paths.append(path)
+                self.file_ids[path] = file_id
+            elif file_id < len(self.in_base):
+                self.in_base[file_id] = False
+            self.delta[file_id] = entry['grams']
+            self.symbols[path] = [
+                [symbol['name'], symbol['kind'], symbol['start_line'], symbol['end_line']]
+                for symbol in entry['symbols']
+            ]
+        self._symbol_table = None
+
+    def save(self):
+        """增量段过大时合并，然后保存到磁盘"""
+        if len(self.delta) > max(DELTA_MERGE_MIN_FILES, DELTA_MERGE_FRACTION * len(self.file_ids)):
+            self._merge()
+        self._save()
+
+    def candidates(self, queries: List[np.ndarray]) -> List[int]:
+        """返回可能匹配三元组查询的文件ID"""
+        matched = []
+        for grams in queries:
+            matched.append(self._base_candidates(grams))
+            matched.append(np.array([
+                file_id for file_id, file_grams in self.delta.items()
+                if np.isin(grams, file_grams, assume_unique=True).all()
+            ], dtype=np.int64))
+        return np.unique(np.concatenate(matched)).tolist()
+
+    def _base_candidates(self, grams: np.ndarray) -> np.ndarray:
+        """在主倒排表中求各三元组倒排列表的交集"""
+        positions = np.searchsorted(self.keys, grams)
+        if (positions >= len(self.keys)).any() or (self.keys[np.minimum(positions, len(self.keys) - 1)] != grams).any():
+            return np.zeros(0, dtype=np.int64)
+
+        lists = sorted(
+            (self.postings[self.offsets[position]:self.offsets[position + 1]] for position in positions),
+            key=len
+        )
+        result = np.asarray(lists[0])
+        for postings in lists[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, postings, assume_unique=True)
+        result = result.astype(np.int64)
+        return result[self.in_base[result]]
+
+    def search_symbols(self, pattern: re.Pattern, lowered: bool, kind: Optional[str],
+                       path_prefix: Optional[str], limit: int) -> Dict[str, Any]:
+        """按名称检索符号：完全匹配优先，其次是前缀匹配，同级按名称长度排序
+
+        lowered: pattern是否针对小写后的名称（不区分大小写的普通查询），用于避开较慢的IGNORECASE匹配
+        """
+        table = self._get_symbol_table()
+        if not table['refs']:
+            return {'results': [], 'total': 0, 'truncated': False}
+        blob = table['blob']
+        if lowered:
+            if table['lowered'] is not None:
+                blob = table['lowered']
+            else:
+                pattern = re.compile(pattern.pattern, pattern.flags | re.IGNORECASE)
+
+        starts = table['starts']
+        lengths = table['lengths']
+        candidate_ids = None if lowered else self._symbol_candidates(table, pattern)
+        if candidate_ids is None:
+            spans = [match.span() for match in pattern.finditer(blob)]
+        else:
+            # 只对包含必需字面量的名称逐个匹配
+            spans = []
+            for symbol_id in candidate_ids.tolist():
+                match = pattern.search(table['names'][symbol_id])
+                if match:
+                    offset = int(starts[symbol_id])
+                    spans.append((offset + match.start(), offset + match.end()))
+        spans = np.array(spans, dtype=np.int64).reshape(-1, 2)
+        symbol_ids = np.searchsorted(starts, spans[:, 0], side='right') - 1
+        # 跨越换行（多个名称）的匹配无效
+        valid = spans[:, 1] <= starts[symbol_ids] + lengths[symbol_ids]
+        spans = spans[valid]
+        symbol_ids = symbol_ids[valid]
+
+        at_start = spans[:, 0] == starts[symbol_ids]
+        ranks = np.where(at_start & (spans[:, 1] - spans[:, 0] == lengths[symbol_ids]), 0, np.where(at_start, 1, 2))
+        # 同一符号多处匹配时取最好的排名
+        order = np.lexsort((ranks, symbol_ids))
+        symbol_ids, first = np.unique(symbol_ids[order], return_index=True)
+        ranks = ranks[order][first]
+        if kind:
+            keep = table['kinds'][symbol_ids] == SYMBOL_KINDS.index(kind)
+            symbol_ids = symbol_ids[keep]
+            ranks = ranks[keep]
+
+        results = []
+        total = 0
+        for symbol_id in symbol_ids[np.lexsort((lengths[symbol_ids], ranks))].tolist():
+            path, (name, symbol_kind, start_line, end_line) = table['refs'][symbol_id]
+            if path_prefix and not path.startswith(path_prefix):
+                continue
+            total += 1
+            if len(results) < limit:
+                results.append({
+                    'name': name,
+                    'kind': symbol_kind,
+                    'file_path': path,
+                    'start_line': start_line,
+                    'end_line': end_line
+                })
+            elif not path_prefix:
+                total = len(symbol_ids)
+                break
+
+        return {
+            'results': results,
+            'total': total,
+            'truncated': total > limit
+        }
+
+    def _symbol_candidates(self, table: Dict[str, Any], pattern: re.Pattern) -> Optional[np.ndarray]:
+        """用正则中必须出现的字面量在小写名称串中快速定位候选符号
+
+        无法提取字面量、名称串不可用或候选过多（逐个匹配反而更慢）时返回None
+        """
+        if table['lowered'] is None:
+            return None
+        alternatives = _required_literals(_regex_parser.parse(pattern.pattern, pattern.flags))
+        if () in alternatives:
+            return None
+
+        positions = []
+        for literals in alternatives:
+            literal = max(literals, key=len).lower()
+            positions.extend(match.start() for match in re.finditer(re.escape(literal), table['lowered']))
+            if len(positions) > len(table['refs']) // 8:
+                return None
+        return np.unique(np.searchsorted(table['starts'], np.array(positions, dtype=np.int64), side='right') - 1)
+
+    def _get_symbol_table(self) -> Dict[str, Any]:
+        """所有符号名用换行连接成一个字符串，整体用正则匹配后再按偏移找回符号"""
+        if self._symbol_table is None:
+            names = []
+            refs = []
+            for path, symbols in self.symbols.items():
+                for symbol in symbols:
+                    names.append(symbol[0])
+                    refs.append((path, symbol))
+            lengths = np.fromiter(map(len, names), dtype=np.int64, count=len(names))
+            starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1])).astype(np.int64)
+            blob = '\n'.join(names) + '\n'
+            lowered = blob.lower()
+            self._symbol_table = {
+                'blob': blob,
+                # 个别Unicode字符转小写后长度会变，此时不能按偏移对应
+                'lowered': lowered if len(lowered) == len(blob) else None,
+                'starts': starts,
+                'lengths': lengths,
+                'kinds': np.array([SYMBOL_KINDS.index(symbol[1]) for _, symbol in refs], dtype=np.int8),
+                'names': names,
+                'refs': refs
+            }
+        return self._symbol_table
+
+    def get_stats(self) -> Dict[str, Any]:
+        """索引统计"""
+        return {
+            'files': len(self.file_ids),
+            'symbols': sum(len(symbols) for symbols in self.symbols.values()),
+            'trigrams': len(self.keys),
+            'postings': len(self.postings),
+            'delta_files': len(self.delta)
+        }
+
+    def _merge(self):
+        """把增量段合并进主倒排表，同时去掉已删除的文件并重新编号"""
+        alive_ids = np.array([file_id for file_id, path in enumerate(self.paths) if path is not None], dtype=np.int64)
+        remap = np.full(len(self.paths), -1, dtype=np.int64)
+        remap[alive_ids] = np.arange(len(alive_ids))
+
+        parts = []
+        if len(self.postings):
+            keys = np.repeat(np.asarray(self.keys, dtype=np.uint64), np.diff(self.offsets))
+            file_ids = np.asarray(self.postings, dtype=np.int64)
+            keep = self.in_base[file_ids]
+            parts.append((keys[keep] << np.uint64(32)) | remap[file_ids[keep]].astype(np.uint64))
+        for file_id, grams in self.delta.items():
+            if self.paths[file_id] is not None:
+                parts.append((grams.astype(np.uint64) << np.uint64(32)) | np.uint64(remap[file_id]))
+
+        # (三元组, 文件ID)打包成一个64位整数，一次排序得到按三元组分组、组内按文件ID有序的倒排表
+        pairs = np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.uint64)
+        keys = (pairs >> np.uint64(32)).astype(np.uint32)
+        self.keys, starts = np.unique(keys, return_index=True)
+        self.offsets = np.append(starts, len(keys)).astype(np.int64)
+        self.postings = (pairs & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+        self.paths = [self.paths[file_id] for file_id in alive_ids]
+        self.file_ids = {path: file_id for file_id, path in enumerate(self.paths)}
+        self.in_base = np.ones(len(self.paths), dtype=bool)
+        self.delta = {}
+
+        os.makedirs(self.path, exist_ok=True)
+        for name in ('keys', 'offsets', 'postings'):
+            temp_path = os.path.join(self.path, f'{name}.tmp.npy')
+            np.save(temp_path, getattr(self, name))
+            os.replace(temp_path, os.path.join(self.path, f'{name}.npy'))
+        self._map_base()
+
+    def _map_base(self):
+        """以只读内存映射方式打开主倒排表"""
+        for name in ('keys', 'offsets', 'postings'):
+            setattr(self, name, np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r'))
+
+    def _load(self):
+        """从磁盘加载索引，格式不一致或文件损坏时丢弃旧索引"""
+        meta_path = os.path.join(self.path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != SEARCH_INDEX_VERSION:
+                raise ValueError('Search index format changed')
+
+            self.paths = meta['paths']
+            self.file_ids = {path: file_id for file_id, path in enumerate(self.paths) if path is not None}
+            self.symbols = meta['symbols']
+            if os.path.exists(os.path.join(self.path, 'keys.npy')):
+                self._map_base()
+            arrays = np.load(os.path.join(self.path, 'state.npz'))
+            self.in_base = arrays['in_base']
+            delta_offsets = arrays['delta_offsets']
+            for index, file_id in enumerate(arrays['delta_ids'].tolist()):
+                self.delta[file_id] = arrays['delta_grams'][delta_offsets[index]:delta_offsets[index + 1]]
+        except Exception as e:
+            print(f"Discarding search index {self.path}: {e}")
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._reset()
+
+    def _save(self):
+        """保存文件列表、符号和增量段（先写临时文件再替换）"""
+        os.makedirs(self.path, exist_ok=True)
+        in_base = np.zeros(len(self.paths), dtype=bool)
+        in_base[:len(self.in_base)] = self.in_base
+        self.in_base = in_base
+
+        delta_ids = sorted(self.delta)
+        grams = [self.delta[file_id] for file_id in delta_ids]
+        temp_path = os.path.join(self.path, 'state.tmp.npz')
+        np.savez(
+            temp_path,
+            in_base=self.in_base,
+            delta_ids=np.array(delta_ids, dtype=np.int64),
+            delta_offsets=np.concatenate(([0], np.cumsum([len(g) for g in grams]))).astype(np.int64),
+            delta_grams=np.concatenate(grams) if grams else _EMPTY_GRAMS
+        )
+        os.replace(temp_path, os.path.join(self.path, 'state.npz'))
+
+        temp_path = os.path.join(self.path, 'meta.json.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': SEARCH_INDEX_VERSION, 'paths': self.paths, 'symbols': self.symbols}, f)
+        os.replace(temp_path, os.path.join(self.path, 'meta.json'))
+
+class SearchIndexService:
+    """按项目管理代码检索索引：扫描时建立，检索时只读取候选文件"""
+
+    def __init__(self, index_dir: Optional[str] = None, max_loaded: int = 8):
+        self.index_dir = index_dir or os.getenv('SEARCH_INDEX_DIR') or DEFAULT_SEARCH_INDEX_DIR
+        self.max_loaded = max_loaded
+
+        self._indexes = OrderedDict()  # project_id -> ProjectSearchIndex
+        self._lock = threading.Lock()
+        self._project_locks = {}
+
+    def update_files(self, project_id: int, files: Dict[str, str], removed: Iterable[str] = (),
+                     save: bool = True):
+        """更新项目中文件的索引，files: {相对路径: 内容}
+
+        save为False时只更新内存（用于扫描过程中分批提交，最后一批再保存）
+        """
+        entries = {
+            path: {
+                'grams': file_trigrams(content),
+                'symbols': code_analysis_service.extract_symbols(content, path)
+            }
+            for path, content in files.items()
+        }
+        with self._get_project_lock(project_id):
+            index = self._get_index(project_id)
+            index.update(entries, removed)
+            if save:
+                index.save()
+
+    def term_matches(self, project_id: int, terms: Iterable[str]) -> Dict[str, int]:
+        """每个文件可能包含的检索词个数 {相对路径: 个数}，只查三元组倒排表，不读取文件内容
+
+        少于3个字节的检索词无法用三元组过滤，不参与统计
+        """
+        queries = [grams for grams in (file_trigrams(term) for term in terms) if len(grams)]
+        counts = {}
+        with self._get_project_lock(project_id):
+            index = self._get_index(project_id)
+            for grams in queries:
+                for file_id in index.candidates([grams]):
+                    path = index.paths[file_id]
+                    if path is not None:
+                        counts[path] = counts.get(path, 0) + 1
+        return counts
+
+    def indexed_paths(self, project_id: int) -> set:
+        """已建立索引的文件路径"""
+        with self._get_project_lock(project_id):
+            return set(self._get_index(project_id).file_ids)
+
+    def search(self, project_id: int, root_path: str, query: str, regex: bool = False,
+               case_sensitive: bool = False, kind: Optional[str] = None,
+               path_prefix: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+        """在文件内容中检索
+
+        先用三元组倒排表找出候选文件，只读取候选文件验证匹配；kind指定时只返回位于该类型定义内的匹配
+        查询中没有至少3个连续字面量字符时抛出ValueError
+        """
+        start_time = time.perf_counter()
+        flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+        pattern = self._compile(query if regex else re.escape(query), flags)
+        queries = query_trigrams(pattern.pattern, flags)
+        if queries is None:
+            raise ValueError('Query must contain at least 3 consecutive literal characters')
+
+        with self._get_project_lock(project_id):
+            index = self._get_index(project_id)
+            candidate_paths = sorted(
+                path for path in (index.paths[file_id] for file_id in index.candidates(queries))
+                if path is not None and (not path_prefix or path.startswith(path_prefix))
+            )
+            symbols = {path: index.symbols.get(path, []) for path in candidate_paths}
+
+        results = []
+        files_searched = 0
+        truncated = False
+        for path in candidate_paths:
+            if len(results) >= limit:
+                truncated = True
+                break
+            try:
+                with open(os.path.join(root_path, path), 'r', encoding='utf-8', errors='replace') as f:
+                    content = f.read()
+            except IOError:
+                continue
+            files_searched += 1
+            results.extend(self._match_file(pattern, content, path, symbols[path], kind, limit - len(results)))
+
+        return {
+            'results': results,
+            'candidates': len(candidate_paths),
+            'files_searched': files_searched,
+            'truncated': truncated,
+            'took_ms': round((time.perf_counter() - start_time) * 1000, 2)
+        }
+
+    def search_symbols(self, project_id: int, query: str, regex: bool = False, case_sensitive: bool = False,
+                       kind: Optional[str] = None, path_prefix: Optional[str] = None,
+                       limit: int = 50) -> Dict[str, Any]:
+        """按名称检索函数和类定义（不读取文件内容）"""
+        start_time = time.perf_counter()
+        lowered = not regex and not case_sensitive
+        if lowered:
+            pattern = self._compile(re.escape(query.lower()), re.MULTILINE)
+        else:
+            flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+            pattern = self._compile(query if regex else re.escape(query), flags)
+
+        with self._get_project_lock(project_id):
+            result = self._get_index(project_id).search_symbols(pattern, lowered, kind, path_prefix, limit)
+        result['took_ms'] = round((time.perf_counter() - start_time) * 1000, 2)
+        return result
+
+    def get_stats(self, project_id: int) -> Dict[str, Any]:
+        """项目索引统计"""
+        with self._get_project_lock(project_id):
+            return self._get_index(project_id).get_stats()
+
+    def delete_project(self, project_id: int):
+        """删除项目索引"""
+        with self._get_project_lock(project_id):
+            with self._lock:
+                self._indexes.pop(project_id, None)
+            shutil.rmtree(self._project_path(project_id), ignore_errors=True)
+
+    def _match_file(self, pattern: re.Pattern, content: str, path: str, symbols: List[list],
+                    kind: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        """在单个文件中查找匹配的行"""
+        matches = []
+        line_number = 1
+        position = 0
+        last_line = 0
+        for match in pattern.finditer(content):
+            line_number += content.count('\n', position, match.start())
+            position = match.start()
+            if line_number == last_line:
+                continue
+            last_line = line_number
+
+            symbol = self._enclosing_symbol(symbols, line_number)
+            if kind and (symbol is None or symbol[1] != kind):
+                continue
+
+            line_start = content.rfind('\n', 0, position) + 1
+            line_end = content.find('\n', position)
+            text = content[line_start:line_end if line_end != -1 else len(content)]
+            matches.append({
+                'file_path': path,
+                'line': line_number,
+                'column': position - line_start + 1,
+                'text': text[:MAX_LINE_LENGTH],
+                'symbol': symbol[0] if symbol else None
+            })
+            if len(matches) >= min(limit, MAX_MATCHES_PER_FILE):
+                break
+        return matches
+
+    @staticmethod
+    def _enclosing_symbol(symbols: List[list], line: int) -> Optional[list]:
+        """包含该行的最内层定义"""
+        enclosing = None
+        for symbol in symbols:
+            if symbol[2] > line:
+                break
+            if symbol[3] >= line:
+                enclosing = symbol
+        return enclosing
+
+    @staticmethod
+    def _compile(pattern: str, flags: int) -> re.Pattern:
+        """编译检索正则，语法错误转换为ValueError"""
+        try:
+            return re.compile(pattern, flags)
+        except re.error as e:
+            raise ValueError(f'Invalid regular expression: {e}')
+
+    def _get_index(self, project_id: int) -> ProjectSearchIndex:
+        """获取项目索引（首次使用时从磁盘加载）"""
+        with self._lock:
+            index = self._indexes.get(project_id)
+            if index is not None:
+                self._indexes.move_to_end(project_id)
+                return index
+
+        index = ProjectSearchIndex(self._project_path(project_id))
+        with self._lock:
+            self._indexes[project_id] = index
+            while len(self._indexes) > self.max_loaded:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _project_path(self, project_id: int) -> str:
+        """项目索引目录"""
+        return os.path.join(self.index_dir, f'project_{project_id}')
+
+    def _get_project_lock(self, project_id: int) -> threading.Lock:
+        """获取项目级别的锁"""
+        with self._lock:
+            if project_id not in self._project_locks:
+                self._project_locks[project_id] = threading.Lock()
+            return self._project_locks[project_id]
+
+# 全局代码检索索引服务实例
+search_index_service = SearchIndexService()
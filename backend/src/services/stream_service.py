@@ -0,0 +1,108 @@
+import json
+import uuid
+from typing import Dict, Iterable, Iterator, Optional, Any, Callable
+from flask import Response, stream_with_context, current_app
+
+class StreamService:
+    """AI流式输出分发服务，支持Socket.IO推送和SSE回退"""
+
+    def new_stream_id(self) -> str:
+        """生成流ID，客户端据此拼接同一次响应的分块"""
+        return uuid.uuid4().hex
+
+    def start_socketio_stream(self, chunks: Iterable[str], room: str, meta: Optional[Dict[str, Any]] = None,
+                              on_complete: Optional[Callable[[str], None]] = None) -> str:
+        """在Socket.IO后台任务中推送分块，立即返回流ID（需在请求上下文中调用）"""
+        socketio = current_app.extensions['socketio']
+        app = current_app._get_current_object()
+        stream_id = self.new_stream_id()
+
+        socketio.start_background_task(
+            self.emit_to_room, socketio, app, chunks, room, stream_id, meta, on_complete
+        )
+        return stream_id
+
+    def emit_to_room(self, socketio, app, chunks: Iterable[str], room: str, stream_id: str,
+                     meta: Optional[Dict[str, Any]] = None,
+                     on_complete: Optional[Callable[[str], None]] = None) -> str:
+        """将分块推送到Socket.IO房间，返回完整文本（在后台任务中运行）"""
+        meta = meta or {}
+        parts = []
+        socketio.emit('ai_stream_start', dict(meta, stream_id=stream_id), room=room)
+
+        try:
+            for index, chunk in enumerate(chunks):
+                parts.append(chunk)
+                socketio.emit('ai_stream_chunk', {
+                    'stream_id': stream_id,
+                    'index': index,
+                    'delta': chunk
+                }, room=room)
+                # 让出控制权，使分块尽快写出
+                socketio.sleep(0)
+        except Exception as e:
+            socketio.emit('ai_stream_error', {
+                'stream_id': stream_id,
+                'error': str(e)
+            }, room=room)
+            return ''.join(parts)
+
+        content = ''.join(parts)
+        socketio.emit('ai_stream_end', dict(meta, stream_id=stream_id, content=content), room=room)
+
+        if on_complete:
+            try:
+                with app.app_context():
+                    on_complete(content)
+            except Exception as e:
+                print(f"Stream completion callback failed: {e}")
+
+        return content
+
+    def sse_response(self, chunks: Iterable[str], meta: Optional[Dict[str, Any]] = None,
+                     on_complete: Optional[Callable[[str], None]] = None) -> Response:
+        """构建text/event-stream响应（Socket.IO不可用时的回退方案）"""
+        meta = meta or {}
+
+        def generate() -> Iterator[str]:
+            parts = []
+            yield self.format_sse('start', meta)
+            try:
+                for index, chunk in enumerate(chunks):
+                    parts.append(chunk)
+                    yield self.format_sse('chunk', {'index': index, 'delta': chunk})
+            except Exception as e:
+                yield self.format_sse('error', {'error': str(e)})
+                return
+
+            content = ''.join(parts)
+            if on_complete:
+                try:
+                    on_complete(content)
+                except Exception as e:
+                    print(f"Stream completion callback failed: {e}")
+            yield self.format_sse('end', dict(meta, length=len(content)))
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+
+    @staticmethod
+    def model_recorder(meta: Dict[str, Any]) -> Callable[[str], None]:
+        """返回把实际回答的模型写入meta['model_used']的回调（结束事件按流结束时的meta发送）"""
+        def record(model: str):
+            meta['model_used'] = model
+        return record
+
+    @staticmethod
+    def format_sse(event: str, data: Dict[str, Any]) -> str:
+        """格式化单个SSE事件"""
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# 全局流式输出服务实例
+stream_service = StreamService()
@@ -16,6 +16,126 @@ def temp_dir():
     import shutil
     shutil.rmtree(temp_dir, ignore_errors=True)
 
+@pytest.fixture(autouse=True)
+def isolated_ai_cache(tmp_path, monkeypatch):
+    """让AI响应缓存和GitHub元数据缓存写入临时目录，避免污染真实数据库目录"""
+    monkeypatch.setenv('AI_CACHE_DB_PATH', str(tmp_path / 'ai_cache.db'))
+    monkeypatch.setenv('GITHUB_CACHE_DB_PATH', str(tmp_path / 'github_cache.db'))
+    yield
+
+@pytest.fixture(autouse=True)
+def isolated_search_index(tmp_path, monkeypatch):
+    """让代码检索索引写入临时目录"""
+    from collections import OrderedDict
+    from src.services.search_index import search_index_service
+    monkeypatch.setattr(search_index_service, 'index_dir', str(tmp_path / 'search_index'))
+    monkeypatch.setattr(search_index_service, '_indexes', OrderedDict())
+    yield
+
+@pytest.fixture
+def app():
+    """使用内存SQLite数据库的Flask应用，预置一个用户和项目"""
+    from flask import Flask
+    from src.models.user import db, User
+    from src.models.project import Project
+    
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='tester', email='tester@example.com'))
+        db.session.add(Project(name='test-project', user_id=1))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def git_repo(temp_dir):
+    """创建带有一次提交的本地git仓库"""
+    import git
+    repo = git.Repo.init(temp_dir)
+    with repo.config_writer() as config:
+        config.set_value('user', 'name', 'Test User')
+        config.set_value('user', 'email', 'test@example.com')
+    
+    os.makedirs(os.path.join(temp_dir, 'src'))
+    with open(os.path.join(temp_dir, 'src', 'main.py'), 'w') as f:
+        f.write('def main():\n    print("Hello")\n')
+    with open(os.path.join(temp_dir, 'src', 'utils.py'), 'w') as f:
+        f.write('def helper():\n    return 1\n')
+    
+    repo.index.add(['src/main.py', 'src/utils.py'])
+    repo.index.commit('Initial commit')
+    yield repo
+
+@pytest.fixture
+def bare_repo_url(git_repo, tmp_path):
+    """基于git_repo创建带两次提交和两个分支的本地裸仓库，返回file:// URL"""
+    import git
+    work_dir = git_repo.working_tree_dir
+    os.makedirs(os.path.join(work_dir, 'docs'))
+    with open(os.path.join(work_dir, 'docs', 'guide.md'), 'w') as f:
+        f.write('# Guide\n')
+    git_repo.index.add(['docs/guide.md'])
+    git_repo.index.commit('Add docs')
+    git_repo.git.branch('-M', 'main')
+    git_repo.git.branch('feature')
+    
+    bare_path = str(tmp_path / 'remote.git')
+    bare = git_repo.clone(bare_path, bare=True)
+    # 允许file://协议下的部分克隆
+    with bare.config_writer() as config:
+        config.set_value('uploadpack', 'allowFilter', 'true')
+        config.set_value('uploadpack', 'allowAnySHA1InWant', 'true')
+    yield f'file://{bare_path}'
+
+@pytest.fixture
+def http_stub():
+    """本地HTTP桩服务器：按顺序返回预设的响应 (状态码, 响应头, JSON body或None)，并记录收到的请求
+    
+    routes中按请求路径（含查询参数）预设的响应优先，用于并发请求
+    """
+    import json
+    import threading
+    from types import SimpleNamespace
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    
+    stub = SimpleNamespace(responses=[], routes={}, requests=[])
+    
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # 响应头和body分两次写出，关闭Nagle避免与客户端的延迟ACK叠加出40ms等待
+        disable_nagle_algorithm = True
+        
+        def do_GET(self):
+            stub.requests.append({'path': self.path, 'headers': dict(self.headers), 'port': self.client_address[1]})
+            if self.path in stub.routes:
+                status, headers, body = stub.routes[self.path]
+            else:
+                status, headers, body = stub.responses.pop(0) if stub.responses else (200, {}, {})
+            data = json.dumps(body).encode('utf-8') if body is not None else b''
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield stub
+    server.shutdown()
+    server.server_close()
+
 @pytest.fixture
 def mock_env_vars():
     """模拟环境变量的fixture"""
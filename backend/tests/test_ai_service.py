@@ -2,6 +2,7 @@ import pytest
 import os
 from unittest.mock import Mock, patch
 from src.services.ai_service import AIService
+from src.services.model_router import ProviderUnavailable
 
 class TestAIService:
     """AI服务测试类"""
@@ -30,7 +31,7 @@ class TestAIService:
         test_code = "def hello_world():\n    print('Hello, World!')"
         
         with patch.object(self.ai_service, '_call_model') as mock_call:
-            mock_call.return_value = "This is a simple Python function that prints 'Hello, World!'"
+            mock_call.return_value = ("This is a simple Python function that prints 'Hello, World!'", 'deepseek-r1')
             
             result = self.ai_service.analyze_code(test_code, 'python', 'deepseek-r1')
             
@@ -55,7 +56,7 @@ class TestAIService:
         description = "Create a function that adds two numbers"
         
         with patch.object(self.ai_service, '_call_model') as mock_call:
-            mock_call.return_value = "def add_numbers(a, b):\n    return a + b"
+            mock_call.return_value = ("def add_numbers(a, b):\n    return a + b", 'deepseek-r1')
             
             result = self.ai_service.generate_code(description, 'python', 'deepseek-r1')
             
@@ -69,7 +70,7 @@ class TestAIService:
         modification = "Add input validation"
         
         with patch.object(self.ai_service, '_call_model') as mock_call:
-            mock_call.return_value = "def add(a, b):\n    if not isinstance(a, (int, float)) or not isinstance(b, (int, float)):\n        raise ValueError('Inputs must be numbers')\n    return a + b"
+            mock_call.return_value = ("def add(a, b):\n    if not isinstance(a, (int, float)) or not isinstance(b, (int, float)):\n        raise ValueError('Inputs must be numbers')\n    return a + b", 'deepseek-r1')
             
             result = self.ai_service.modify_code(original_code, modification, 'python', 'deepseek-r1')
             
@@ -81,7 +82,7 @@ class TestAIService:
         test_code = "def divide(a, b):\n    return a / b"
         
         with patch.object(self.ai_service, '_call_model') as mock_call:
-            mock_call.return_value = "This function lacks error handling for division by zero."
+            mock_call.return_value = ("This function lacks error handling for division by zero.", 'deepseek-r1')
             
             result = self.ai_service.review_code(test_code, 'python', 'deepseek-r1')
             
@@ -109,6 +110,87 @@ class TestAIService:
         with pytest.raises(ValueError, match="Unsupported model"):
             self.ai_service._call_model("unsupported-model", "test prompt")
     
+    def test_provider_clients_have_timeouts(self, monkeypatch):
+        """测试提供商客户端设置了请求超时和重试次数"""
+        from src.services import ai_service as ai_module
+        monkeypatch.setenv('ANTHROPIC_API_KEY', 'test-key')
+        monkeypatch.setenv('DEEPSEEK_API_KEY', 'test-key')
+        service = AIService()
+        
+        for client in (service.openai_client, service.anthropic_client, service.deepseek_client):
+            assert client.timeout == ai_module.REQUEST_TIMEOUT
+            assert client.max_retries == ai_module.REQUEST_MAX_RETRIES
+    
+    def test_stream_reports_fallback_model(self):
+        """测试主模型在第一个文本块前失败时，on_model报告实际输出的备用模型"""
+        def stream(model, prompt):
+            if model.startswith('claude'):
+                raise Exception('overloaded')
+            yield model
+        
+        self.ai_service.router._stream = stream
+        seen = []
+        chunks = list(self.ai_service.stream_model('claude-3.7-sonnet', 'p', use_cache=False, on_model=seen.append))
+        
+        assert chunks == ['gpt-4.1-mini']
+        assert seen == ['gpt-4.1-mini']
+    
+    def test_sse_end_event_reports_fallback_model(self, app, monkeypatch):
+        """测试SSE结束事件报告实际输出的备用模型，而不是请求的模型"""
+        import json
+        from src.routes.chat import chat_bp
+        from src.services.ai_service import ai_service
+        
+        def stream(model, prompt):
+            if model.startswith('claude'):
+                raise Exception('overloaded')
+            yield 'hello'
+        
+        monkeypatch.setattr(ai_service.router, '_stream', stream)
+        app.register_blueprint(chat_bp, url_prefix='/api')
+        response = app.test_client().post('/api/chat/general/stream', json={
+            'message': 'hi', 'model': 'claude-3.7-sonnet', 'use_cache': False
+        })
+        events = {}
+        for block in response.get_data(as_text=True).strip().split('\n\n'):
+            event, data = block.split('\n', 1)
+            events[event[len('event: '):]] = json.loads(data[len('data: '):])
+        
+        assert events['start']['model_used'] == 'claude-3.7-sonnet'
+        assert events['end']['model_used'] == 'gpt-4.1-mini'
+    
+    def test_generate_route_saves_answering_model(self, app, monkeypatch):
+        """测试代码生成接口返回并保存实际回答的模型"""
+        from src.routes.ai import ai_bp
+        from src.services.ai_service import ai_service
+        from src.models.project import AnalysisTask
+        
+        monkeypatch.setattr(ai_service, 'generate_code', lambda *args, **kwargs: {
+            'success': True, 'code': 'x = 1', 'language': 'python', 'model_used': 'gpt-4.1-mini'
+        })
+        app.register_blueprint(ai_bp, url_prefix='/api')
+        data = app.test_client().post('/api/ai/generate-code', json={
+            'description': 'x', 'model': 'claude-3.7-sonnet', 'project_id': 1
+        }).get_json()
+        
+        assert data['model_used'] == 'gpt-4.1-mini'
+        assert AnalysisTask.query.one().ai_model == 'gpt-4.1-mini'
+    
+    def test_analyze_route_reports_answering_model(self, app, monkeypatch):
+        """测试代码分析接口顶层的model_used与AI分析结果中的实际模型一致"""
+        from src.routes.ai import ai_bp
+        from src.services.ai_service import ai_service
+        
+        monkeypatch.setattr(ai_service, 'analyze_code', lambda *args, **kwargs: {
+            'success': True, 'analysis': 'ok', 'model_used': 'gpt-4.1-mini'
+        })
+        app.register_blueprint(ai_bp, url_prefix='/api')
+        data = app.test_client().post('/api/ai/analyze-code', json={
+            'code': 'x = 1\n', 'model': 'claude-3.7-sonnet'
+        }).get_json()
+        
+        assert data['model_used'] == data['ai_analysis']['model_used'] == 'gpt-4.1-mini'
+    
     def test_deepseek_fallback_to_openai(self):
         """测试DeepSeek回退到OpenAI"""
         # 模拟没有DeepSeek API密钥的情况
@@ -129,15 +211,115 @@ class TestAIService:
         """测试Claude API未配置的情况"""
         self.ai_service.anthropic_client = None
         
-        result = self.ai_service._call_claude("Test prompt", "claude-3.5-sonnet")
-        
-        assert "Claude API未配置" in result
+        with pytest.raises(ProviderUnavailable, match="Claude API未配置"):
+            self.ai_service._call_claude("Test prompt", "claude-3.5-sonnet")
     
     def test_gemini_api_not_configured(self):
         """测试Gemini API未配置的情况"""
         self.ai_service.google_api_key = None
         
-        result = self.ai_service._call_gemini("Test prompt", "gemini-2.5-flash")
+        with pytest.raises(ProviderUnavailable, match="Gemini API未配置"):
+            self.ai_service._call_gemini("Test prompt", "gemini-2.5-flash")
+    
+    def test_call_model_uses_response_cache(self):
+        """测试相同请求命中响应缓存"""
+        with patch.object(self.ai_service, '_dispatch_model') as mock_dispatch:
+            mock_dispatch.return_value = "Cached response"
+            
+            first = self.ai_service._call_model('claude-3.7-sonnet', 'Same prompt')
+            second = self.ai_service._call_model('claude-3.7-sonnet', 'Same prompt')
+            
+            assert first == second == ("Cached response", 'claude-3.7-sonnet')
+            mock_dispatch.assert_called_once()
+            assert self.ai_service.get_cache_stats()['hits'] == 1
+    
+    def test_call_model_bypass_cache(self):
+        """测试按请求跳过缓存"""
+        with patch.object(self.ai_service, '_dispatch_model') as mock_dispatch:
+            mock_dispatch.return_value = "Fresh response"
+            
+            self.ai_service._call_model('claude-3.7-sonnet', 'Same prompt')
+            self.ai_service._call_model('claude-3.7-sonnet', 'Same prompt', use_cache=False)
+            
+            assert mock_dispatch.call_count == 2
+            assert self.ai_service.get_cache_stats()['bypassed'] == 1
+    
+    def test_call_model_does_not_cache_errors(self):
+        """测试所有模型都失败时抛出异常，且不写入缓存"""
+        self.ai_service.router.fallback_enabled = False
+        with patch.object(self.ai_service, '_dispatch_model') as mock_dispatch:
+            mock_dispatch.side_effect = [Exception("Claude API error: overloaded"), "Fresh response"]
+            
+            with pytest.raises(Exception, match="overloaded"):
+                self.ai_service._call_model('claude-3.7-sonnet', 'Same prompt')
+            
+            assert self.ai_service._call_model('claude-3.7-sonnet', 'Same prompt') == ("Fresh response", 'claude-3.7-sonnet')
+            assert mock_dispatch.call_count == 2
+    
+    def test_call_model_falls_back_to_next_model(self):
+        """测试主模型失败时沿备用链切换，未配置的提供商直接跳过"""
+        calls = []
         
-        assert "Gemini API未配置" in result
-
+        def dispatch(model, prompt):
+            calls.append(model)
+            if model == 'claude-3.7-sonnet':
+                raise Exception("Claude API error: overloaded")
+            if model == 'gpt-4.1-mini':
+                raise ProviderUnavailable("not configured")
+            return f"answer from {model}"
+        
+        with patch.object(self.ai_service, '_dispatch_model', side_effect=dispatch):
+            result = self.ai_service.analyze_code("print('hi')", 'python', model='claude-3.7-sonnet')
+        
+        assert result['success'] is True
+        assert result['analysis'] == 'answer from deepseek-r1'
+        assert result['model_used'] == 'deepseek-r1'
+        assert calls == ['claude-3.7-sonnet', 'gpt-4.1-mini', 'deepseek-r1']
+        assert self.ai_service.get_routing_stats()['fallbacks'] == 2
+    
+    def test_fallback_response_cached_under_answering_model(self):
+        """测试备用模型的回答按实际模型缓存，之后请求主模型时不会命中"""
+        self.ai_service.router.fallback_enabled = True
+        with patch.object(self.ai_service, '_dispatch_model') as mock_dispatch:
+            mock_dispatch.side_effect = [Exception("Claude API error: overloaded"), "answer from gpt"]
+            assert self.ai_service._call_model('claude-3.7-sonnet', 'Prompt') == ("answer from gpt", 'gpt-4.1-mini')
+        
+        assert self.ai_service.response_cache.get(self.ai_service._cache_key('claude-3.7-sonnet', 'Prompt')) is None
+        assert self.ai_service._call_model('gpt-4.1-mini', 'Prompt') == ("answer from gpt", 'gpt-4.1-mini')
+        
+        with patch.object(self.ai_service, '_dispatch_stream') as mock_stream:
+            mock_stream.side_effect = [Exception("Claude API error: overloaded"), iter(['streamed ', 'answer'])]
+            assert list(self.ai_service.stream_model('claude-3.7-sonnet', 'Stream')) == ['streamed ', 'answer']
+        assert self.ai_service.response_cache.get(self.ai_service._cache_key('claude-3.7-sonnet', 'Stream')) is None
+        assert self.ai_service.response_cache.get(self.ai_service._cache_key('gpt-4.1-mini', 'Stream')) == 'streamed answer'
+    
+    def test_model_chain_skips_small_context_windows(self):
+        """测试备用链跳过上下文窗口放不下提示的模型"""
+        assert self.ai_service.get_model_chain('deepseek-r1', 'short') == [
+            'deepseek-r1', 'claude-3.7-sonnet', 'gpt-4.1-mini', 'gemini-2.5-flash'
+        ]
+        large_prompt = 'x' * 900000
+        assert self.ai_service.get_model_chain('gemini-2.5-flash', large_prompt) == ['gemini-2.5-flash']
+    
+    def test_stream_model_yields_chunks_and_caches(self):
+        """测试流式调用逐块返回并写入缓存"""
+        with patch.object(self.ai_service, '_dispatch_stream') as mock_stream:
+            mock_stream.return_value = iter(['def add', '(a, b):', ' return a + b'])
+            
+            chunks = list(self.ai_service.stream_model('claude-3.7-sonnet', 'Stream prompt'))
+            
+            assert chunks == ['def add', '(a, b):', ' return a + b']
+        
+        # 相同请求直接从缓存整体返回
+        with patch.object(self.ai_service, '_dispatch_stream') as mock_stream:
+            cached = list(self.ai_service.stream_model('claude-3.7-sonnet', 'Stream prompt'))
+            
+            assert cached == ['def add(a, b): return a + b']
+            mock_stream.assert_not_called()
+    
+    def test_stream_claude_not_configured(self):
+        """测试Claude未配置时的流式输出"""
+        self.ai_service.anthropic_client = None
+        
+        with pytest.raises(ProviderUnavailable, match="Claude API未配置"):
+            list(self.ai_service._stream_claude("Test prompt", "claude-3.5-sonnet"))
@@ -0,0 +1,89 @@
+import pytest
+from src.models.user import db
+from src.models.project import CodeFile, FileBlob
+from src.services.blob_store import BlobStore
+
+class TestBlobStore:
+    """文件内容存储测试类"""
+
+    def _add_file(self, path, content):
+        code_file = CodeFile(file_path=path, file_name=path, content=content, project_id=1)
+        db.session.add(code_file)
+        db.session.commit()
+        return code_file
+
+    @pytest.mark.parametrize('codec', ['zlib', 'none'])
+    def test_roundtrip_and_dedup(self, app, codec):
+        """测试相同内容只保存一份，压缩后可以还原"""
+        store = BlobStore(codec=codec, min_size=16)
+        content = 'def handler(request):\n    return request\n' * 50
+        first = store.put(content)
+        assert store.put(content) == first
+        store.put_many({store.hash_content('tiny'): 'tiny', first: content})
+        db.session.commit()
+
+        blobs = {blob.hash: blob for blob in FileBlob.query.all()}
+        assert len(blobs) == 2
+        assert blobs[first].codec == codec
+        assert blobs[store.hash_content('tiny')].codec == 'none'
+        if codec == 'zlib':
+            assert len(blobs[first].data) < len(content)
+        assert store.get(first) == content
+        assert store.get_many([first, store.hash_content('tiny'), 'missing']) == {
+            first: content,
+            store.hash_content('tiny'): 'tiny'
+        }
+
+    def test_put_many_ignores_concurrent_insert(self, app):
+        """测试其他事务已写入相同内容时批量保存不会因主键冲突失败"""
+        store = BlobStore(codec='none')
+        content_hash = store.hash_content('shared')
+        # 模拟另一个扫描任务在本次写入前插入了同一内容
+        db.session.execute(FileBlob.__table__.insert(), [dict(hash=content_hash, codec='none', size=6, data=b'shared')])
+
+        store.put_many({content_hash: 'shared', store.hash_content('new'): 'new'})
+        assert store.put('shared') == content_hash
+        db.session.commit()
+        assert FileBlob.query.count() == 2
+
+    def test_code_file_loads_content_lazily(self, app):
+        """测试文件记录只保存哈希，列表默认不返回内容，访问content时才加载"""
+        self._add_file('a.py', 'print(1)\n')
+        db.session.expunge_all()
+
+        code_file = CodeFile.query.first()
+        assert '_loaded_content' not in code_file.__dict__
+        assert 'content' not in code_file.to_dict()
+        assert code_file.to_dict(include_content=True)['content'] == 'print(1)\n'
+
+        code_file.content = 'print(2)\n'
+        db.session.commit()
+        assert CodeFile.query.first().content == 'print(2)\n'
+
+    def test_discard_keeps_shared_content(self, app):
+        """测试只删除不再被任何文件引用的内容"""
+        from src.services.blob_store import blob_store
+        shared = self._add_file('a.py', 'x = 1\n')
+        self._add_file('b.py', 'x = 1\n')
+        unique = self._add_file('c.py', 'y = 2\n')
+        hashes = [shared.content_hash, unique.content_hash]
+
+        CodeFile.query.filter(CodeFile.file_path.in_(['a.py', 'c.py'])).delete(synchronize_session=False)
+        assert blob_store.discard(hashes) == 1
+        db.session.commit()
+
+        assert [blob.hash for blob in FileBlob.query.all()] == [hashes[0]]
+        stats = blob_store.get_stats()
+        assert stats['blobs'] == 1 and stats['files'] == 1
+
+    def test_project_files_endpoint_omits_content(self, app):
+        """测试文件列表接口默认不返回内容，include_content=true时批量加载"""
+        from src.routes.project import project_bp
+        app.register_blueprint(project_bp, url_prefix='/api')
+        self._add_file('a.py', 'print(1)\n')
+        client = app.test_client()
+
+        files = client.get('/api/projects/1/files').get_json()['files']
+        assert 'content' not in files[0] and files[0]['content_hash']
+        files = client.get('/api/projects/1/files?include_content=true').get_json()['files']
+        assert files[0]['content'] == 'print(1)\n'
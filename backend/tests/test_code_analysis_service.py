@@ -0,0 +1,189 @@
+import os
+import pytest
+from src.services.code_analysis_service import CodeAnalysisService
+
+class TestCodeAnalysisService:
+    """代码分析服务测试类"""
+    
+    def setup_method(self):
+        """测试前的设置"""
+        self.service = CodeAnalysisService(max_workers=2)
+    
+    def teardown_method(self):
+        """测试后的清理"""
+        self.service.shutdown()
+    
+    def _write(self, root, relative_path, content):
+        path = os.path.join(root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    
+    def _make_project(self, root, file_count=12):
+        for i in range(file_count):
+            self._write(root, f'pkg/module_{i:02d}.py', f'def func_{i}():\n    print({i})\n')
+        self._write(root, 'web/app.js', 'var x = 1;\nconsole.log(x);\n')
+        self._write(root, 'node_modules/lib/index.js', 'var ignored = 1;\n')
+        self._write(root, 'README.txt', 'not code\n')
+    
+    def test_analyze_file_python(self, sample_code, temp_dir):
+        """测试分析单个Python文件"""
+        result = self.service.analyze_file('example.py', sample_code['python'])
+        
+        assert result['success'] is True
+        assert result['language'] == 'python'
+        assert result['basic_analysis']['functions_count'] == 2
+        assert len(result['syntax_analysis']['functions']) == 2
+    
+    def test_syntax_analysis_extracts_names_and_depth(self):
+        """测试语法分析只提取名称、位置和嵌套深度"""
+        content = (
+            "import os, sys as system\n"
+            "from .utils import (helper, other as alias)\n"
+            "from lib import *\n"
+            "\n"
+            "@decorator\n"
+            "class Outer(Base):\n"
+            "    def method(self):\n"
+            "        def inner():\n"
+            "            return os.getcwd()\n"
+            "        return inner\n"
+            "\n"
+            "def top():\n"
+            "    pass\n"
+        )
+        result = self.service._syntax_analysis(content, 'python')
+        
+        assert [(f['name'], f['depth']) for f in result['functions']] == [('method', 1), ('inner', 2), ('top', 0)]
+        assert result['classes'] == [{'name': 'Outer', 'start_line': 6, 'end_line': 10, 'depth': 0}]
+        assert result['imports'] == [
+            {'module': 'os', 'names': [], 'line': 1},
+            {'module': 'sys', 'names': [], 'line': 1},
+            {'module': '.utils', 'names': ['helper', 'other'], 'line': 2},
+            {'module': 'lib', 'names': ['*'], 'line': 3}
+        ]
+        assert result['complexity_metrics']['max_nesting_depth'] == 3
+        assert result['parse_errors'] == []
+    
+    def test_syntax_analysis_skip_matches_full_traversal(self, sample_code):
+        """测试跳过子树与完整遍历的结果一致"""
+        content = sample_code['python'] + "\nx = [lambda: 1 for _ in range(3)]\nif x:\n    def late():\n        pass\n"
+        
+        assert self.service._syntax_analysis(content, 'python') == \
+            self.service._syntax_analysis(content, 'python', skip_types=set())
+    
+    def test_syntax_analysis_deep_nesting(self):
+        """测试深度嵌套的代码不会触发递归上限"""
+        content = 'x = ' + '[' * 3000 + ']' * 3000 + '\n'
+        result = self.service._syntax_analysis(content, 'python', skip_types=set())
+        
+        assert 'error' not in result
+        assert result['parse_errors'] == []
+    
+    def test_syntax_analysis_reports_parse_errors(self):
+        """测试报告语法错误位置"""
+        result = self.service._syntax_analysis("def broken(:\n    pass\n", 'python')
+        
+        assert result['parse_errors']
+        assert result['parse_errors'][0]['line'] == 1
+        assert result['functions'][0]['name'] == 'broken'
+    
+    def test_collect_code_files_sorted_and_filtered(self, temp_dir):
+        """测试文件收集顺序确定并跳过忽略目录"""
+        self._make_project(temp_dir, file_count=3)
+        
+        files = [relative for _, relative in self.service._collect_code_files(temp_dir)]
+        
+        assert files == sorted(files)
+        assert os.path.join('web', 'app.js') in files
+        assert not any(path.startswith('node_modules') for path in files)
+        assert 'README.txt' not in files
+    
+    def test_analyze_project_sequential(self, temp_dir):
+        """测试顺序分析项目"""
+        self._make_project(temp_dir)
+        
+        result = self.service.analyze_project(temp_dir, workers=1)
+        
+        assert result['success'] is True
+        assert result['files_analyzed'] == 13
+        assert result['stats']['languages'] == {'python': 12, 'javascript': 1}
+    
+    def test_analyze_project_parallel_matches_sequential(self, temp_dir):
+        """测试并行分析与顺序分析结果一致"""
+        self._make_project(temp_dir)
+        
+        sequential = self.service.analyze_project(temp_dir, workers=1)
+        parallel = self.service.analyze_project(temp_dir, workers=2, chunk_size=3)
+        
+        assert parallel['success'] is True
+        assert [f['file_path'] for f in parallel['file_analyses']] == [f['file_path'] for f in sequential['file_analyses']]
+        assert parallel['stats'] == sequential['stats']
+        assert parallel['score'] == sequential['score']
+    
+    def test_executor_reused_across_calls(self, temp_dir):
+        """测试进程池跨调用复用"""
+        self._make_project(temp_dir)
+        
+        self.service.analyze_project(temp_dir, workers=2)
+        executor = self.service._executor
+        self.service.analyze_project(temp_dir, workers=2)
+        
+        assert executor is not None
+        assert self.service._executor is executor
+    
+    def test_executor_bounded_by_max_workers(self, temp_dir):
+        """测试请求更多进程时仍使用共享进程池，进程数不超过max_workers"""
+        self._make_project(temp_dir)
+        
+        self.service.analyze_project(temp_dir, workers=2)
+        executor = self.service._executor
+        result = self.service.analyze_project(temp_dir, workers=64)
+        
+        assert result['success'] is True
+        assert self.service._executor is executor
+        assert executor._max_workers == 2
+    
+    def test_default_workers_conservative(self, monkeypatch):
+        """测试默认进程数不超过CPU核数的一半且最多4个，ANALYSIS_WORKERS可覆盖"""
+        monkeypatch.delenv('ANALYSIS_WORKERS', raising=False)
+        monkeypatch.setattr(os, 'cpu_count', lambda: 32)
+        assert CodeAnalysisService().max_workers == 4
+        monkeypatch.setattr(os, 'cpu_count', lambda: 1)
+        assert CodeAnalysisService().max_workers == 1
+        monkeypatch.setenv('ANALYSIS_WORKERS', '6')
+        assert CodeAnalysisService().max_workers == 6
+    
+    def test_incremental_analysis_only_reanalyzes_changes(self, git_repo, tmp_path):
+        """测试增量分析只重新分析变化的文件"""
+        root = git_repo.working_tree_dir
+        index_dir = str(tmp_path / 'index')
+        
+        first = self.service.analyze_project(root, workers=1, incremental=True, index_dir=index_dir)
+        assert first['incremental'] == {'added': 2, 'modified': 0, 'deleted': 0, 'unchanged': 0}
+        
+        unchanged = self.service.analyze_project(root, workers=1, incremental=True, index_dir=index_dir)
+        assert unchanged['incremental'] == {'added': 0, 'modified': 0, 'deleted': 0, 'unchanged': 2}
+        assert unchanged['stats'] == first['stats']
+        
+        with open(os.path.join(root, 'src', 'main.py'), 'a') as f:
+            f.write('print("debug")\n')
+        os.remove(os.path.join(root, 'src', 'utils.py'))
+        self._write(root, 'src/extra.js', 'var y = 2;\n')
+        
+        incremental = self.service.analyze_project(root, workers=1, incremental=True, index_dir=index_dir)
+        full = self.service.analyze_project(root, workers=1)
+        
+        assert incremental['incremental'] == {'added': 1, 'modified': 1, 'deleted': 1, 'unchanged': 0}
+        assert incremental['stats'] == full['stats']
+        assert incremental['score'] == full['score']
+        assert [f['file_path'] for f in incremental['file_analyses']] == [f['file_path'] for f in full['file_analyses']]
+    
+    def test_incremental_falls_back_without_git(self, temp_dir, tmp_path):
+        """测试非git目录退化为全量分析"""
+        self._make_project(temp_dir, file_count=2)
+        
+        result = self.service.analyze_project(temp_dir, workers=1, incremental=True, index_dir=str(tmp_path))
+        
+        assert result['success'] is True
+        assert 'incremental' not in result
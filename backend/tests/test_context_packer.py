@@ -0,0 +1,172 @@
+import pytest
+from src.services.context_packer import ContextPacker, TokenCounter, extract_terms, model_provider
+
+WINDOWS = {'claude-3.7-sonnet': 200000, 'gemini-2.5-flash': 1000000, 'gpt-4.1-mini': 128000}
+
+def _python_file(name, body_lines=200):
+    """生成带有多个函数的较大Python文件"""
+    lines = ['import os', '']
+    for index in range(body_lines):
+        lines.append(f'def helper_{index}(value):')
+        lines.append(f'    return value + {index}')
+        lines.append('')
+    lines.append(f'def {name}(request):')
+    lines.append(f'    """{name} handles the request"""')
+    lines.append('    return request')
+    return '\n'.join(lines)
+
+class TestContextPacker:
+    """上下文打包测试类"""
+
+    def setup_method(self):
+        """使用固定的上下文窗口，不依赖AI服务"""
+        self.packer = ContextPacker(window_fraction=0.5, max_tokens=0, output_reserve=0, context_windows=WINDOWS)
+
+    def test_extract_terms(self):
+        """测试检索词提取：拆分驼峰和下划线，过滤停用词"""
+        terms = extract_terms('How does parseTree handle user_login?')
+        assert terms == ['parsetree', 'parse', 'tree', 'handle', 'user_login', 'user', 'login']
+        assert extract_terms('登录功能') == ['登录', '录功', '功能']
+
+    def test_token_counter_per_provider(self):
+        """测试不同提供商的token估算"""
+        counter = TokenCounter()
+        text = 'x' * 330
+        assert model_provider('claude-3.7-sonnet') == 'anthropic'
+        assert model_provider('deepseek-r1') == 'deepseek'
+        assert counter.count(text, 'claude-3.7-sonnet') == 100
+        assert counter.count(text, 'gemini-2.5-flash') < counter.count(text, 'claude-3.7-sonnet')
+        assert counter.count('中文' * 10, 'claude-3.7-sonnet') == 28
+        assert counter.count('', 'gpt-4.1-mini') == 0
+
+    def test_budget_from_context_window(self):
+        """测试预算按模型上下文窗口的比例计算，并受上限约束"""
+        assert self.packer.get_budget('claude-3.7-sonnet') == 100000
+        assert self.packer.get_budget('gemini-2.5-flash') == 500000
+        # 未知模型按最小窗口计算
+        assert self.packer.get_budget('unknown-model') == 64000
+
+        capped = ContextPacker(window_fraction=0.5, max_tokens=30000, output_reserve=0, context_windows=WINDOWS)
+        assert capped.get_budget('gemini-2.5-flash') == 30000
+
+    def test_rank_by_relevance(self):
+        """测试按相关度排序：内容和路径命中的文件在前，空文件被忽略"""
+        files = [
+            {'path': 'src/utils.py', 'type': '.py', 'content': 'def add(a, b):\n    return a + b\n'},
+            {'path': 'src/auth/login.py', 'type': '.py', 'content': 'def login(user, password):\n    return check(password)\n'},
+            {'path': 'src/empty.py', 'type': '.py', 'content': '   '},
+            {'path': 'tests/test_login.py', 'type': '.py', 'content': 'def test_login():\n    login("a", "b")\n'}
+        ]
+
+        ranked = self.packer.rank(files, extract_terms('Where is the login password checked?'))
+
+        paths = [file['path'] for _, file in ranked]
+        assert paths[0] == 'src/auth/login.py'
+        assert paths.index('tests/test_login.py') < paths.index('src/utils.py')
+        assert 'src/empty.py' not in paths
+
+    def test_pack_respects_budget(self):
+        """测试打包结果不超过预算"""
+        files = [
+            {'path': f'src/module_{index}.py', 'type': '.py', 'content': f'def func_{index}():\n    return {index}\n' * 50}
+            for index in range(20)
+        ]
+        packer = ContextPacker(window_fraction=1.0, max_tokens=2000, output_reserve=0, context_windows=WINDOWS)
+
+        packed = packer.pack(files, 'func_3', 'claude-3.7-sonnet', reserved_tokens=500)
+
+        assert packed['budget'] == 1500
+        assert 0 < packed['tokens'] <= packed['budget']
+        assert packed['files'][0]['path'] == 'src/module_3.py'
+        assert packed['candidates'] == 20
+
+    def test_large_file_packed_as_symbol_snippets(self):
+        """测试大文件放不下时改为相关定义的片段，而不是文件开头"""
+        pytest.importorskip('tree_sitter_python')
+        content = _python_file('process_payment')
+        files = [{'path': 'src/payments.py', 'type': '.py', 'content': content}]
+        packer = ContextPacker(window_fraction=1.0, max_tokens=1000, output_reserve=0, context_windows=WINDOWS)
+
+        packed = packer.pack(files, 'How does process_payment work?', 'claude-3.7-sonnet')
+
+        entry = packed['files'][0]
+        assert entry['snippet'] is True
+        assert packed['tokens'] <= packed['budget']
+        assert 'def process_payment(request):' in entry['content']
+        assert 'return request' in entry['content']
+        # 开头的导入和部分不相关函数的签名
+        assert entry['content'].startswith('@@ L1-L')
+        assert 'import os' in entry['content']
+        assert 'return value + 0' not in entry['content']
+
+    def test_snippet_for_unsupported_language(self):
+        """测试不支持语法分析的文件取命中行附近的窗口"""
+        lines = [f'line {index}' for index in range(300)]
+        lines[150] = 'SELECT * FROM payments WHERE refund = 1'
+        files = [{'path': 'db/report.sql', 'type': '.sql', 'content': '\n'.join(lines)}]
+        packer = ContextPacker(window_fraction=1.0, max_tokens=200, output_reserve=0, context_windows=WINDOWS)
+
+        packed = packer.pack(files, 'refund payments', 'claude-3.7-sonnet')
+
+        content = packed['files'][0]['content']
+        assert content.startswith('@@ L146-L156 @@')
+        assert 'refund = 1' in content
+
+    def test_retrieved_chunks_boost_files(self):
+        """测试向量检索命中的文件排在前面，即使没有关键词命中"""
+        files = [
+            {'path': 'src/utils.py', 'type': '.py', 'content': 'def cleanup(value):\n    return value\n'},
+            {'path': 'src/mirror_cache.py', 'type': '.py', 'content': 'def prune_stale(entries):\n    return entries[:10]\n'}
+        ]
+        retrieved = [{'file_path': 'src/mirror_cache.py', 'start_line': 1, 'end_line': 2, 'score': 0.4}]
+
+        packed = self.packer.pack(files, 'how are old mirrors evicted', 'claude-3.7-sonnet', retrieved=retrieved)
+
+        assert [file['path'] for file in packed['files']][0] == 'src/mirror_cache.py'
+
+    def test_preselect_by_metadata(self):
+        """测试按路径、检索索引和向量检索命中预选候选文件，估算token数超过预算倍数后停止"""
+        files = [{'path': f'src/module_{index}.py', 'size': 3300} for index in range(20)]
+        files.append({'path': 'src/auth/login.py', 'size': 3300})
+        packer = ContextPacker(window_fraction=1.0, max_tokens=2000, output_reserve=0, context_windows=WINDOWS,
+                               candidate_factor=2.0)
+        retrieved = [{'file_path': 'src/module_7.py', 'start_line': 1, 'end_line': 5, 'score': 0.8}]
+
+        selected = packer.preselect(files, 'login flow', 'claude-3.7-sonnet', retrieved=retrieved,
+                                    term_matches={'src/module_3.py': 1})
+
+        paths = [file['path'] for file in selected]
+        assert paths[:3] == ['src/module_7.py', 'src/auth/login.py', 'src/module_3.py']
+        # 每个文件约1000 token，预算2000的2倍需要4个文件
+        assert len(paths) == 4
+
+    def test_chat_loads_only_candidate_contents(self, app, tmp_path, monkeypatch):
+        """测试项目聊天只加载预选候选文件的内容"""
+        import src.routes.chat as chat_routes
+        from src.models.user import db
+        from src.models.project import Project, CodeFile
+        from src.services.embedding_index import EmbeddingIndexService, HashedNgramEmbedder
+        contents = {
+            f'src/module_{index}.py': f'def handler_{index}(request):\n    return {index}\n' * 200
+            for index in range(30)
+        }
+        for path, content in contents.items():
+            db.session.add(CodeFile(file_path=path, file_name=path, file_type='.py',
+                                    content=content, size=len(content), project_id=1))
+        db.session.commit()
+        chat_routes.search_index_service.update_files(1, contents)
+        monkeypatch.setattr(chat_routes, 'embedding_index_service', EmbeddingIndexService(
+            index_dir=str(tmp_path / 'embeddings'), embedder=HashedNgramEmbedder(64)))
+        db.session.expunge_all()
+
+        loaded = []
+        load_contents = chat_routes.blob_store.load_contents
+        monkeypatch.setattr(chat_routes.blob_store, 'load_contents',
+                            lambda files: loaded.extend(files) or load_contents(files))
+        monkeypatch.setattr(chat_routes, 'context_packer', ContextPacker(
+            window_fraction=1.0, max_tokens=3000, output_reserve=0, context_windows=WINDOWS))
+
+        _, prompt = chat_routes._build_project_prompt(db.session.get(Project, 1), 'where is handler_12', 'claude-3.7-sonnet')
+
+        assert 0 < len(loaded) < 30
+        assert 'src/module_12.py' in prompt
@@ -0,0 +1,164 @@
+import time
+import threading
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from src.services.db_profile import DatabaseProfile
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    """使用SQLite文件数据库和独立连接配置的Flask应用"""
+    from flask import Flask
+    from src.models.user import db, User
+    from src.models.project import Project
+    monkeypatch.setenv('DB_POOL_SIZE', '3')
+    profile = DatabaseProfile()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'app.db'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    profile.init_app(app, db)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='tester', email='tester@example.com'))
+        db.session.add(Project(name='test-project', user_id=1))
+        db.session.commit()
+        yield app, profile
+        db.session.remove()
+        db.drop_all()
+    profile.read_engine.dispose()
+
+class TestDatabaseProfile:
+    """SQLite连接配置测试类"""
+
+    def test_pragmas_and_pools(self, file_app):
+        """测试连接时应用WAL等pragma，使用有界连接池，只读连接不能写入"""
+        app, profile = file_app
+        stats = profile.get_stats()
+        assert stats['enabled']
+        assert stats['pragmas']['journal_mode'] == 'wal'
+        assert stats['pragmas']['synchronous'] == 1
+        assert stats['pragmas']['busy_timeout'] == 5000
+        assert stats['pragmas']['mmap_size'] > 0
+        assert profile.engine.pool.size() == 3
+
+        reader = profile.read_session()
+        assert reader.execute(text('SELECT name FROM project')).scalar() == 'test-project'
+        with pytest.raises(OperationalError, match='readonly'):
+            reader.execute(text("UPDATE project SET name = 'x'"))
+        reader.rollback()
+
+    def test_memory_database_not_configured(self, app):
+        """测试内存数据库不启用连接配置，只读会话回退到主会话"""
+        from src.models.user import db
+        profile = DatabaseProfile()
+        assert not profile.is_file_sqlite('sqlite://')
+        assert profile.read_session() is db.session
+        assert profile.get_stats()['enabled'] is False
+
+    def test_concurrent_writers_queue_on_write_lock(self, file_app):
+        """测试事务未提交时其他写入在写锁上排队，而不是报 database is locked"""
+        app, profile = file_app
+        profile.busy_timeout = 0
+        errors = []
+        holding = threading.Event()
+
+        def writer(name, hold):
+            try:
+                with profile.engine.begin() as conn:
+                    conn.execute(text('INSERT INTO analysis_task (task_type, project_id) VALUES (:t, 1)'), {'t': name})
+                    holding.set()
+                    time.sleep(hold)
+            except Exception as e:
+                errors.append(e)
+
+        first = threading.Thread(target=writer, args=('first', 0.2))
+        first.start()
+        holding.wait()
+        second = threading.Thread(target=writer, args=('second', 0))
+        second.start()
+        # 写锁上排队时读取不受影响（WAL）
+        with profile.read_engine.connect() as conn:
+            assert conn.execute(text('SELECT COUNT(*) FROM analysis_task')).scalar() == 0
+        first.join()
+        second.join()
+
+        assert errors == []
+        stats = profile.get_stats()
+        assert stats['write_lock_waits'] == 1 and stats['write_lock_wait_ms'] >= 100
+        with profile.engine.connect() as conn:
+            assert conn.execute(text('SELECT COUNT(*) FROM analysis_task')).scalar() == 2
+
+    def test_write_lock_released_on_rollback_and_timeout(self, file_app):
+        """测试回滚或连接归还时释放写锁，等待超时抛出DatabaseBusy"""
+        from src.services.db_profile import DatabaseBusy
+        app, profile = file_app
+        profile.write_lock_timeout = 0.05
+
+        errors = []
+
+        def other_writer():
+            try:
+                with profile.engine.connect() as other:
+                    other.execute(text("UPDATE project SET name = 'other'"))
+            except Exception as e:
+                errors.append(e)
+
+        conn = profile.engine.connect()
+        conn.execute(text("UPDATE project SET name = 'renamed'"))
+        thread = threading.Thread(target=other_writer)
+        thread.start()
+        thread.join()
+        assert len(errors) == 1 and isinstance(errors[0], DatabaseBusy)
+        conn.rollback()
+        conn.close()
+
+        conn = profile.engine.connect()
+        conn.execute(text("UPDATE project SET name = 'renamed'"))
+        conn.close()
+        with profile.engine.begin() as other:
+            other.execute(text("UPDATE project SET name = 'other'"))
+        assert profile.get_stats()['write_lock_timeouts'] == 1
+
+    def test_nested_session_write_fails_fast(self, file_app):
+        """测试同一线程的嵌套会话写入立即抛出DatabaseBusy，不在自己持有的写锁或SQLite忙等上阻塞，外层事务不受影响"""
+        from sqlalchemy.orm import Session
+        from src.services.db_profile import DatabaseBusy
+        app, profile = file_app
+        profile.write_lock_timeout = 5
+
+        outer = Session(profile.engine)
+        outer.execute(text("UPDATE project SET name = 'outer'"))
+        inner = Session(profile.engine)
+        start = time.monotonic()
+        with pytest.raises(DatabaseBusy, match='nested'):
+            inner.execute(text("UPDATE project SET name = 'inner'"))
+        assert time.monotonic() - start < 1
+        inner.close()
+        outer.commit()
+        outer.close()
+
+        with profile.engine.begin() as conn:
+            conn.execute(text("UPDATE project SET name = 'after'"))
+            assert conn.execute(text('SELECT name FROM project')).scalar() == 'after'
+        stats = profile.get_stats()
+        assert stats['write_lock_waits'] == 0 and stats['write_lock_timeouts'] == 0
+
+    def test_listing_uses_read_pool(self, file_app, monkeypatch):
+        """测试文件列表通过只读连接池查询，能读到主会话已提交的数据"""
+        from src.models.user import db
+        from src.models.project import CodeFile
+        from src.routes import project as project_routes
+        app, profile = file_app
+        monkeypatch.setattr(project_routes, 'db_profile', profile)
+        app.register_blueprint(project_routes.project_bp, url_prefix='/api')
+        db.session.add(CodeFile(file_path='a.py', file_name='a.py', content='x = 1\n', project_id=1))
+        db.session.commit()
+
+        checkouts = []
+        from sqlalchemy import event
+        event.listen(profile.read_engine, 'checkout', lambda *args: checkouts.append(1))
+        files = app.test_client().get('/api/projects/1/files?include_content=true').get_json()['files']
+        assert files[0]['content'] == 'x = 1\n'
+        assert checkouts
@@ -0,0 +1,154 @@
+import numpy as np
+import pytest
+import src.services.embedding_index as embedding_index
+from src.services.embedding_index import (
+    EmbeddingIndexService, HashedNgramEmbedder, ProjectVectorIndex, chunk_content
+)
+
+FILES = [
+    {'path': 'src/mirror_cache.py', 'content': 'class MirrorCache:\n    def evict_mirrors(self):\n        remove_old_mirror()\n'},
+    {'path': 'src/job_service.py', 'content': 'class JobService:\n    def cancel_job(self, task_id):\n        self.cancel_event.set()\n'},
+    {'path': 'src/context_packer.py', 'content': 'def token_budget(model):\n    return context_window(model) * fraction\n'}
+]
+
+class TestEmbeddingIndex:
+    """项目向量索引测试类"""
+
+    @pytest.fixture(autouse=True)
+    def setup_service(self, temp_dir):
+        """每个测试使用独立的索引目录"""
+        self.index_dir = temp_dir
+        self.service = EmbeddingIndexService(index_dir=temp_dir, embedder=HashedNgramEmbedder(128))
+
+    def test_chunk_content(self):
+        """测试按行切分为有重叠的块，跳过空白块"""
+        content = '\n'.join(f'line {index}' for index in range(1, 101))
+        chunks = chunk_content(content, chunk_lines=40, overlap=10)
+        assert [(start, end) for start, end, _ in chunks] == [(1, 40), (31, 70), (61, 100)]
+        assert chunk_content('\n\n   \n') == []
+
+    def test_hashed_embedder(self):
+        """测试特征哈希向量确定且归一化，拆分后的子词能匹配自然语言"""
+        embedder = HashedNgramEmbedder(128)
+        vectors = embedder.embed(['evictMirrors()', 'evict mirror', 'cancel job', ''])
+        assert vectors.dtype == np.float32
+        assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+        assert not vectors[3].any()
+        assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+        assert np.array_equal(HashedNgramEmbedder(128).embed(['evictMirrors()'])[0], vectors[0])
+
+    def test_search_returns_relevant_chunk(self):
+        """测试检索返回语义相近的代码块"""
+        self.service.sync_project(1, FILES)
+
+        results = self.service.search(1, 'how are old mirrors evicted', k=2)
+
+        assert results[0]['file_path'] == 'src/mirror_cache.py'
+        assert results[0]['start_line'] == 1
+        assert results[0]['score'] > results[1]['score']
+
+    def test_incremental_sync(self):
+        """测试只重新嵌入版本变化的文件，删除的文件不再出现在结果中"""
+        first = self.service.sync_project(1, FILES)
+        assert first['added_files'] == 3
+
+        assert self.service.sync_project(1, FILES)['added_files'] == 0
+
+        changed = [dict(FILES[0], content='def fetch_remote():\n    pass\n'), FILES[1]]
+        result = self.service.sync_project(1, changed)
+        assert result['added_files'] == 1
+        assert result['removed_files'] == 1
+
+        paths = {hit['file_path'] for hit in self.service.search(1, 'token budget mirrors', k=10)}
+        assert 'src/context_packer.py' not in paths
+        stats = self.service.get_stats(1)
+        assert stats['files'] == 2
+
+    def test_sync_limits_files_per_call(self):
+        """测试单次同步最多嵌入max_files个文件，剩余的留到下次"""
+        result = self.service.sync_project(1, FILES, max_files=2)
+        assert result['pending_files'] == 1
+        assert self.service.sync_project(1, FILES, max_files=2)['pending_files'] == 0
+        assert self.service.get_stats(1)['files'] == 3
+
+    def test_index_persisted(self):
+        """测试索引保存在磁盘上，重新加载后可以直接检索"""
+        self.service.sync_project(1, FILES)
+
+        reloaded = EmbeddingIndexService(index_dir=self.index_dir, embedder=HashedNgramEmbedder(128))
+        assert reloaded.sync_project(1, FILES)['added_files'] == 0
+        assert reloaded.search(1, 'cancel job', k=1)[0]['file_path'] == 'src/job_service.py'
+
+        # 嵌入方式变化时丢弃旧索引
+        other = EmbeddingIndexService(index_dir=self.index_dir, embedder=HashedNgramEmbedder(64))
+        assert other.get_stats(1)['chunks'] == 0
+
+        self.service.delete_project(1)
+        assert EmbeddingIndexService(index_dir=self.index_dir, embedder=HashedNgramEmbedder(128)).get_stats(1)['files'] == 0
+
+    def test_ivf_search_and_compaction(self, temp_dir, monkeypatch):
+        """测试行数达到阈值后训练倒排列表，删除过多时压缩矩阵"""
+        monkeypatch.setattr(embedding_index, 'IVF_MIN_ROWS', 200)
+        rng = np.random.default_rng(0)
+        topics = rng.normal(0, 1, (20, 32)).astype(np.float32)
+        vectors = topics[rng.integers(0, 20, 400)] + rng.normal(0, 0.1, (400, 32)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        index = ProjectVectorIndex(temp_dir, HashedNgramEmbedder(32), nprobe=4)
+        rows = [(f'file_{row // 10}.py', (row % 10) * 5 + 1, (row % 10) * 5 + 5) for row in range(400)]
+        for path in sorted({path for path, _, _ in rows}):
+            first = next(row for row, (name, _, _) in enumerate(rows) if name == path)
+            index.files[path] = {'version': 'v1', 'first_row': first, 'lines': [[1, 5]] * 10}
+        index._append(vectors, rows)
+        assert index._maybe_rebuild() is True
+        assert index.centroids is not None
+
+        results = index.search_vector(vectors[123], k=1)
+        assert results[0]['file_path'] == 'file_12.py'
+        assert results[0]['start_line'] == 16
+
+        # 删除一半文件后压缩，行号重新映射
+        for path in [f'file_{number}.py' for number in range(20)]:
+            index._remove_file(path)
+        assert index._maybe_rebuild() is True
+        assert index.count == 200
+        results = index.search_vector(vectors[323], k=1)
+        assert results[0]['file_path'] == 'file_32.py'
+        assert index.files['file_32.py']['first_row'] == 120
+
+    def test_scan_schedules_background_index_update(self, app, git_repo, monkeypatch):
+        """测试扫描到文件变化后在后台任务中更新索引，没有变化时不提交任务"""
+        import src.routes.project as project_routes
+        from src.routes.github import scan_project_files
+        from src.services.job_service import JobService
+        jobs = JobService(max_workers=1)
+        jobs.init_app(app)
+        monkeypatch.setattr(project_routes, 'job_service', jobs)
+        monkeypatch.setattr(project_routes, 'embedding_index_service', self.service)
+
+        try:
+            scan_project_files(1, git_repo.working_tree_dir)
+            assert len(jobs._jobs) <= 1
+            for future, _ in list(jobs._jobs.values()):
+                future.result(timeout=10)
+            assert self.service.get_stats(1)['files'] == 2
+
+            scan_project_files(1, git_repo.working_tree_dir)
+            assert not jobs._jobs
+        finally:
+            jobs.shutdown()
+
+    def test_chat_prompt_only_queries_index(self, app, monkeypatch):
+        """测试构建聊天提示时只查询索引，不在请求中嵌入文件"""
+        import src.routes.chat as chat_routes
+        from src.models.user import db
+        from src.models.project import Project, CodeFile
+        monkeypatch.setattr(chat_routes, 'embedding_index_service', self.service)
+        for file in FILES:
+            db.session.add(CodeFile(file_path=file['path'], file_name=file['path'], file_type='.py',
+                                    content=file['content'], project_id=1))
+        db.session.commit()
+
+        model, prompt = chat_routes._build_project_prompt(db.session.get(Project, 1), 'token budget', 'gpt-4.1-mini')
+        assert self.service.get_stats(1)['files'] == 0
+        assert 'src/context_packer.py' in prompt
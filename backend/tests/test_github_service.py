@@ -2,6 +2,7 @@ import pytest
 import os
 import tempfile
 import shutil
+import git
 from unittest.mock import Mock, patch, MagicMock
 from src.services.github_service import GitHubService
 
@@ -41,12 +42,9 @@ class TestGitHubService:
         with pytest.raises(ValueError, match="Invalid GitHub URL format"):
             self.github_service.parse_github_url("invalid-url")
     
-    @patch('requests.get')
-    def test_get_repo_info_success(self, mock_get):
+    def test_get_repo_info_success(self, http_stub):
         """测试获取仓库信息成功"""
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        http_stub.responses.append((200, {}, {
             'name': 'test-repo',
             'full_name': 'user/test-repo',
             'description': 'Test repository',
@@ -59,28 +57,100 @@ class TestGitHubService:
             'default_branch': 'main',
             'created_at': '2023-01-01T00:00:00Z',
             'updated_at': '2023-01-02T00:00:00Z'
-        }
-        mock_get.return_value = mock_response
+        }))
+        self.github_service.base_url = http_stub.url
         
         result = self.github_service.get_repo_info("https://github.com/user/test-repo")
         
         assert result['success'] is True
         assert result['repo_info']['name'] == 'test-repo'
         assert result['repo_info']['language'] == 'Python'
+        assert http_stub.requests[0]['path'] == '/repos/user/test-repo'
+        assert http_stub.requests[0]['headers']['Accept'] == 'application/vnd.github.v3+json'
     
-    @patch('requests.get')
-    def test_get_repo_info_failure(self, mock_get):
+    def test_get_repo_info_failure(self, http_stub):
         """测试获取仓库信息失败"""
-        mock_response = Mock()
-        mock_response.status_code = 404
-        mock_response.text = "Not Found"
-        mock_get.return_value = mock_response
+        http_stub.responses.append((404, {}, {'message': 'Not Found'}))
+        self.github_service.base_url = http_stub.url
         
         result = self.github_service.get_repo_info("https://github.com/user/nonexistent")
         
         assert result['success'] is False
         assert 'GitHub API error' in result['error']
     
+    def _branch_page(self, http_stub, page, names, last=None, next_page=None):
+        """预设一页分支列表响应"""
+        links = []
+        if next_page:
+            links.append(f'<{http_stub.url}/repos/user/repo/branches?per_page=100&page={next_page}>; rel="next"')
+        if last:
+            links.append(f'<{http_stub.url}/repos/user/repo/branches?per_page=100&page={last}>; rel="last"')
+        headers = {'Link': ', '.join(links)} if links else {}
+        http_stub.routes[f'/repos/user/repo/branches?per_page=100&page={page}'] = (
+            200, headers, [{'name': name} for name in names]
+        )
+    
+    def test_list_branches_fetches_all_pages(self, http_stub):
+        """测试从Link头得知最后一页后请求全部分页，按页序合并"""
+        self.github_service.base_url = http_stub.url
+        self._branch_page(http_stub, 1, [f'a{i:03d}' for i in range(100)], last=3, next_page=2)
+        self._branch_page(http_stub, 2, [f'b{i:03d}' for i in range(100)], last=3, next_page=3)
+        self._branch_page(http_stub, 3, ['c000', 'c001'])
+        
+        result = self.github_service.list_branches('user', 'repo')
+        
+        assert result['success'] is True
+        assert result['source'] == 'api'
+        assert result['pages'] == 3
+        assert len(result['branches']) == 202
+        assert result['branches'][99:101] == ['a099', 'b000']
+        assert result['branches'][-1] == 'c001'
+        assert len(http_stub.requests) == 3
+        
+        # 再次请求命中元数据缓存
+        assert self.github_service.list_branches('user', 'repo')['branches'] == result['branches']
+        assert len(http_stub.requests) == 3
+    
+    def test_list_branches_follows_next_links(self, http_stub):
+        """测试没有last链接时沿next链接逐页请求"""
+        self.github_service.base_url = http_stub.url
+        self._branch_page(http_stub, 1, ['main'], next_page=2)
+        self._branch_page(http_stub, 2, ['dev'])
+        
+        result = self.github_service.list_branches('user', 'repo')
+        
+        assert result['branches'] == ['main', 'dev']
+        assert result['pages'] == 2
+    
+    def test_list_branches_falls_back_to_mirror(self, http_stub, bare_repo_url, tmp_path):
+        """测试API不可用时用本地镜像列出分支"""
+        from src.services.http_client import HttpClient
+        from src.services.mirror_cache import MirrorCache
+        self.github_service.base_url = http_stub.url
+        self.github_service.http = HttpClient(max_retries=0)
+        self.github_service.mirrors = MirrorCache(cache_dir=str(tmp_path / 'mirrors'))
+        checkout = self.github_service.mirrors.checkout(bare_repo_url, str(tmp_path / 'wt'))
+        self.github_service.mirrors.release(checkout['local_path'])
+        http_stub.responses.append((503, {}, {'message': 'Service Unavailable'}))
+        
+        result = self.github_service.list_branches('user', 'repo', bare_repo_url)
+        
+        assert result['success'] is True
+        assert result['source'] == 'git'
+        assert result['branches'] == ['feature', 'main']
+    
+    def test_list_branches_not_found(self, http_stub, tmp_path):
+        """测试仓库不存在时返回404，不回退到git"""
+        from src.services.mirror_cache import MirrorCache
+        self.github_service.base_url = http_stub.url
+        self.github_service.mirrors = MirrorCache(cache_dir=str(tmp_path / 'mirrors'))
+        http_stub.responses.append((404, {}, {'message': 'Not Found'}))
+        
+        result = self.github_service.list_branches('user', 'missing')
+        
+        assert result['success'] is False
+        assert result['status_code'] == 404
+    
     def test_read_file_content_success(self):
         """测试读取文件内容成功"""
         # 创建测试文件
@@ -197,6 +267,60 @@ class TestGitHubService:
         assert result['success'] is False
         assert 'Clone failed' in result['error']
     
+    def test_clone_repository_shallow(self, bare_repo_url, tmp_path):
+        """测试浅克隆只包含最新一次提交"""
+        local_path = str(tmp_path / 'shallow')
+        result = self.github_service.clone_repository(bare_repo_url, local_path, 'main', mode='shallow')
+        
+        assert result['success'] is True
+        assert result['clone_mode'] == 'shallow'
+        repo = git.Repo(local_path)
+        assert repo.git.rev_list('--count', 'HEAD') == '1'
+        assert os.path.exists(os.path.join(local_path, 'docs', 'guide.md'))
+    
+    def test_clone_repository_blobless(self, bare_repo_url, tmp_path):
+        """测试blobless部分克隆保留完整历史"""
+        local_path = str(tmp_path / 'blobless')
+        result = self.github_service.clone_repository(bare_repo_url, local_path, mode='blobless')
+        
+        assert result['success'] is True
+        repo = git.Repo(local_path)
+        assert repo.git.rev_list('--count', 'HEAD') == '2'
+        assert repo.git.config('remote.origin.partialclonefilter') == 'blob:none'
+    
+    def test_clone_repository_single_branch(self, bare_repo_url, tmp_path):
+        """测试单分支克隆只拉取指定分支"""
+        local_path = str(tmp_path / 'single')
+        result = self.github_service.clone_repository(
+            bare_repo_url, local_path, 'feature', single_branch=True
+        )
+        
+        assert result['success'] is True
+        assert result['branch'] == 'feature'
+        remote_branches = [ref.name for ref in git.Repo(local_path).remotes.origin.refs]
+        assert remote_branches == ['origin/feature']
+    
+    def test_clone_repository_sparse(self, bare_repo_url, tmp_path):
+        """测试稀疏检出只检出匹配的路径"""
+        local_path = str(tmp_path / 'sparse')
+        result = self.github_service.clone_repository(
+            bare_repo_url, local_path, mode='blobless', sparse_paths=['src/*.py']
+        )
+        
+        assert result['success'] is True
+        assert result['sparse_paths'] == ['src/*.py']
+        assert os.path.exists(os.path.join(local_path, 'src', 'main.py'))
+        assert not os.path.exists(os.path.join(local_path, 'docs', 'guide.md'))
+    
+    def test_clone_repository_invalid_mode(self, tmp_path):
+        """测试不支持的克隆模式"""
+        result = self.github_service.clone_repository(
+            'https://github.com/user/repo.git', str(tmp_path / 'x'), mode='mirror'
+        )
+        
+        assert result['success'] is False
+        assert 'Unsupported clone mode' in result['error']
+    
     def test_detect_language(self):
         """测试语言检测"""
         assert self.github_service._detect_language('.py') == 'Python'
@@ -226,4 +350,30 @@ class TestGitHubService:
         assert '.js' in stats['file_types']
         assert 'Python' in stats['languages']
         assert 'JavaScript' in stats['languages']
-
+    
+    def test_compute_blob_sha_matches_git(self, git_repo):
+        """测试blob SHA计算与git一致"""
+        data = b'def main():\n    print("Hello")\n'
+        expected = git_repo.git.hash_object('src/main.py')
+        
+        assert self.github_service.compute_blob_sha(data) == expected
+    
+    def test_get_file_blob_shas_tracks_worktree_changes(self, git_repo):
+        """测试获取工作区文件的blob SHA"""
+        root = git_repo.working_tree_dir
+        committed = self.github_service.get_file_blob_shas(root)
+        
+        assert set(committed) == {os.path.join('src', 'main.py'), os.path.join('src', 'utils.py')}
+        
+        # 修改、删除和新增文件
+        with open(os.path.join(root, 'src', 'main.py'), 'w') as f:
+            f.write('def main():\n    print("Changed")\n')
+        os.remove(os.path.join(root, 'src', 'utils.py'))
+        with open(os.path.join(root, 'src', 'new.py'), 'w') as f:
+            f.write('x = 1\n')
+        
+        shas = self.github_service.get_file_blob_shas(root)
+        
+        assert set(shas) == {os.path.join('src', 'main.py'), os.path.join('src', 'new.py')}
+        assert shas[os.path.join('src', 'main.py')] != committed[os.path.join('src', 'main.py')]
+        assert shas[os.path.join('src', 'new.py')] == self.github_service.compute_blob_sha(b'x = 1\n')
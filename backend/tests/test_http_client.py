@@ -0,0 +1,84 @@
+import time
+import pytest
+import requests
+from src.services.http_client import HttpClient, RateLimitExceeded
+
+class TestHttpClient:
+    """连接池HTTP客户端测试类"""
+
+    def setup_method(self):
+        """记录退避等待时间，不真正休眠"""
+        self.sleeps = []
+        self.client = HttpClient(headers={'User-Agent': 'test'}, max_retries=3, max_retry_wait=30,
+                                 sleep=self.sleeps.append)
+
+    def test_reuses_connection(self, http_stub):
+        """测试多次请求复用同一个keep-alive连接，并带上默认请求头"""
+        for _ in range(3):
+            assert self.client.get(f'{http_stub.url}/ping').status_code == 200
+
+        assert len({request['port'] for request in http_stub.requests}) == 1
+        assert http_stub.requests[0]['headers']['User-Agent'] == 'test'
+
+    def test_retries_server_errors_with_backoff(self, http_stub):
+        """测试5xx错误按抖动退避重试"""
+        http_stub.responses.extend([(503, {}, {}), (502, {}, {}), (200, {}, {'ok': True})])
+
+        response = self.client.get(f'{http_stub.url}/flaky')
+
+        assert response.json() == {'ok': True}
+        assert len(http_stub.requests) == 3
+        assert len(self.sleeps) == 2
+        assert 0 <= self.sleeps[0] <= 0.5 and 0 <= self.sleeps[1] <= 1.0
+        assert self.client.get_stats()['retries'] == 2
+
+    def test_gives_up_after_max_retries(self, http_stub):
+        """测试重试次数用完后返回最后的错误响应，客户端错误不重试"""
+        http_stub.responses.extend([(500, {}, {})] * 4)
+        assert self.client.get(f'{http_stub.url}/down').status_code == 500
+        assert len(http_stub.requests) == 4
+
+        http_stub.responses.append((404, {}, {}))
+        assert self.client.get(f'{http_stub.url}/missing').status_code == 404
+        assert len(http_stub.requests) == 5
+
+    def test_honours_retry_after(self, http_stub):
+        """测试429和二级限流（403）按Retry-After等待后重试"""
+        http_stub.responses.extend([
+            (429, {'Retry-After': '2'}, {}),
+            (403, {'Retry-After': '3'}, {'message': 'You have exceeded a secondary rate limit'}),
+            (200, {}, {})
+        ])
+
+        assert self.client.get(f'{http_stub.url}/limited').status_code == 200
+        assert self.sleeps == [2.0, 3.0]
+
+    def test_long_retry_after_not_waited(self, http_stub):
+        """测试Retry-After超过允许等待的时长时直接返回响应"""
+        http_stub.responses.append((429, {'Retry-After': '120'}, {}))
+
+        assert self.client.get(f'{http_stub.url}/limited').status_code == 429
+        assert self.sleeps == []
+
+    def test_rate_limit_remaining(self, http_stub):
+        """测试剩余次数为0时，之后的请求等到限额恢复；恢复时间太远则直接失败"""
+        reset = time.time() + 5
+        http_stub.responses.append((200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)}, {}))
+        self.client.get(f'{http_stub.url}/a')
+        self.client.get(f'{http_stub.url}/b')
+        assert len(self.sleeps) == 1 and 4 < self.sleeps[0] <= 5
+        assert self.client.get_stats()['rate_limit_waits'] == 1
+
+        far_reset = time.time() + 3600
+        http_stub.responses.append((403, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(far_reset)}, {}))
+        assert self.client.get(f'{http_stub.url}/c').status_code == 403
+        with pytest.raises(RateLimitExceeded) as error:
+            self.client.get(f'{http_stub.url}/d')
+        assert error.value.retry_after > 3500
+        assert len(http_stub.requests) == 3
+
+    def test_connection_errors_retried(self):
+        """测试连接失败时重试，用完后抛出原始异常"""
+        with pytest.raises(requests.ConnectionError):
+            self.client.get('http://127.0.0.1:1/unreachable')
+        assert len(self.sleeps) == 3
@@ -0,0 +1,112 @@
+import os
+import pytest
+from src.models.project import CodeFile
+from src.services.ingest_service import FileIngestService
+
+class TestFileIngestService:
+    """文件批量入库服务测试类"""
+    
+    def setup_method(self):
+        """测试前的设置"""
+        self.ingest_service = FileIngestService(batch_size=2)
+    
+    def _files(self):
+        return {f.file_path: f for f in CodeFile.query.filter_by(project_id=1).all()}
+    
+    def test_initial_scan_inserts_in_batches(self, app, git_repo):
+        """测试首次扫描批量插入所有代码文件"""
+        root = git_repo.working_tree_dir
+        with open(os.path.join(root, 'app.js'), 'w') as f:
+            f.write('console.log(1);\n')
+        with open(os.path.join(root, 'notes.txt'), 'w') as f:
+            f.write('ignored\n')
+        
+        result = self.ingest_service.scan_project_files(1, root)
+        
+        assert result == {
+            'success': True,
+            'files_added': 3,
+            'files_updated': 0,
+            'files_removed': 0,
+            'files_unchanged': 0
+        }
+        files = self._files()
+        assert set(files) == {os.path.join('src', 'main.py'), os.path.join('src', 'utils.py'), 'app.js'}
+        assert files['app.js'].content == 'console.log(1);\n'
+        assert files['app.js'].file_type == '.js'
+        assert files[os.path.join('src', 'main.py')].blob_sha == git_repo.git.hash_object('src/main.py')
+    
+    def test_rescan_updates_and_removes(self, app, git_repo):
+        """测试重新扫描时批量更新和删除"""
+        root = git_repo.working_tree_dir
+        self.ingest_service.scan_project_files(1, root)
+        
+        with open(os.path.join(root, 'src', 'main.py'), 'w') as f:
+            f.write('def main():\n    return 2\n')
+        os.remove(os.path.join(root, 'src', 'utils.py'))
+        
+        result = self.ingest_service.scan_project_files(1, root)
+        
+        assert result['files_updated'] == 1
+        assert result['files_removed'] == 1
+        assert result['files_added'] == 0
+        files = self._files()
+        assert list(files) == [os.path.join('src', 'main.py')]
+        assert files[os.path.join('src', 'main.py')].content == 'def main():\n    return 2\n'
+    
+    def test_unchanged_files_are_skipped(self, app, git_repo):
+        """测试未变化的文件不会被重新读取"""
+        root = git_repo.working_tree_dir
+        self.ingest_service.scan_project_files(1, root)
+        
+        result = self.ingest_service.scan_project_files(1, root)
+        
+        assert result['files_unchanged'] == 2
+        assert result['files_added'] == result['files_updated'] == result['files_removed'] == 0
+    
+    def test_scan_without_git(self, app, temp_dir):
+        """测试非git目录全量扫描"""
+        with open(os.path.join(temp_dir, 'main.go'), 'w') as f:
+            f.write('package main\n')
+        
+        result = self.ingest_service.scan_project_files(1, temp_dir)
+        
+        assert result['files_added'] == 1
+        assert self._files()['main.go'].blob_sha is None
+    
+    def test_rescan_without_git_skips_unchanged_content(self, app, temp_dir):
+        """测试非git目录按内容哈希跳过未变化的文件，只更新内容变化的文件"""
+        for name in ('main.go', 'util.go'):
+            with open(os.path.join(temp_dir, name), 'w') as f:
+                f.write(f'package {name[:-3]}\n')
+        self.ingest_service.scan_project_files(1, temp_dir)
+        with open(os.path.join(temp_dir, 'util.go'), 'w') as f:
+            f.write('package util\n\nfunc F() {}\n')
+        
+        result = self.ingest_service.scan_project_files(1, temp_dir)
+        
+        assert result['files_unchanged'] == 1
+        assert result['files_updated'] == 1
+        assert result['files_added'] == result['files_removed'] == 0
+    
+    def test_contents_stored_in_blob_store(self, app, git_repo):
+        """测试扫描时文件内容按哈希去重写入blob存储，更新后清理旧内容"""
+        from src.models.project import FileBlob
+        root = git_repo.working_tree_dir
+        with open(os.path.join(root, 'copy.py'), 'w') as f:
+            with open(os.path.join(root, 'src', 'utils.py')) as source:
+                f.write(source.read())
+        
+        self.ingest_service.scan_project_files(1, root)
+        files = self._files()
+        assert files['copy.py'].content_hash == files[os.path.join('src', 'utils.py')].content_hash
+        assert FileBlob.query.count() == 2
+        
+        old_hash = files[os.path.join('src', 'main.py')].content_hash
+        with open(os.path.join(root, 'src', 'main.py'), 'w') as f:
+            f.write('def main():\n    return 2\n')
+        self.ingest_service.scan_project_files(1, root)
+        
+        hashes = {blob.hash for blob in FileBlob.query.all()}
+        assert old_hash not in hashes
+        assert len(hashes) == 2
@@ -0,0 +1,153 @@
+import json
+import threading
+import pytest
+from src.models.user import db
+from src.models.project import AnalysisTask
+from src.services.job_service import JobService, JobQueueFull
+
+class FakeSocketIO:
+    """记录emit调用的Socket.IO替身"""
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, data, room=None):
+        self.events.append((event, data, room))
+
+class TestJobService:
+    """后台任务服务测试类"""
+
+    @pytest.fixture(autouse=True)
+    def setup_service(self, app):
+        """每个测试使用独立的单线程工作池"""
+        self.app = app
+        self.socketio = FakeSocketIO()
+        self.job_service = JobService(max_workers=1, max_pending=2)
+        self.job_service.init_app(app, self.socketio)
+        yield
+        self.job_service.shutdown()
+
+    def _wait(self, task_id):
+        """等待任务结束并返回最新的任务记录"""
+        future, _ = self.job_service._jobs.get(task_id, (None, None))
+        if future is not None:
+            future.result(timeout=10)
+        db.session.expire_all()
+        return db.session.get(AnalysisTask, task_id)
+
+    def test_init_app_registers_extension(self):
+        """测试init_app注册到应用扩展"""
+        assert self.app.extensions['job_service'] is self.job_service
+
+    def test_init_app_fails_interrupted_tasks(self):
+        """测试启动时把上次进程遗留的排队中和运行中任务标记为失败，已结束的任务不变"""
+        for status in ('pending', 'running', 'completed'):
+            db.session.add(AnalysisTask(task_type='clone', status=status, project_id=1))
+        db.session.commit()
+
+        JobService(max_workers=1).init_app(self.app)
+
+        db.session.expire_all()
+        tasks = AnalysisTask.query.order_by(AnalysisTask.id).all()
+        assert [task.status for task in tasks] == ['failed', 'failed', 'completed']
+        assert json.loads(tasks[0].output_data)['error'] == 'Task interrupted by a server restart'
+        assert tasks[1].completed_at is not None and tasks[2].output_data is None
+
+    def test_submit_completes_task(self):
+        """测试任务完成后写入结果并推送进度"""
+        def handler(job, input_data):
+            job.progress(50, 'Halfway')
+            return {'success': True, 'value': input_data['value'] * 2}
+
+        task = self.job_service.submit('clone', 1, handler, input_data={'value': 21})
+        assert task.status == 'pending'
+
+        task = self._wait(task.id)
+        assert task.status == 'completed'
+        assert json.loads(task.output_data) == {'success': True, 'value': 42}
+        assert task.completed_at is not None
+
+        statuses = [data['status'] for event, data, _ in self.socketio.events]
+        assert statuses == ['pending', 'running', 'running', 'completed']
+        assert all(event == 'analysis_update' for event, _, _ in self.socketio.events)
+        assert all(room == 'project_1' for _, _, room in self.socketio.events)
+        assert self.socketio.events[2][1]['progress'] == 50
+        assert self.socketio.events[-1][1]['result']['value'] == 42
+
+    def test_failed_handler_marks_task_failed(self):
+        """测试处理函数抛出异常时任务标记为失败"""
+        def handler(job, input_data):
+            raise RuntimeError('boom')
+
+        task = self.job_service.submit('clone', 1, handler)
+        task = self._wait(task.id)
+
+        assert task.status == 'failed'
+        assert json.loads(task.output_data)['error'] == 'boom'
+
+    def test_cancel_running_task(self):
+        """测试运行中的任务在检查点被取消"""
+        started = threading.Event()
+        release = threading.Event()
+
+        def handler(job, input_data):
+            started.set()
+            release.wait(5)
+            job.progress(90, 'Never reported')
+            return {'success': True}
+
+        task = self.job_service.submit('clone', 1, handler)
+        future, _ = self.job_service._jobs[task.id]
+        assert started.wait(5)
+
+        assert self.job_service.cancel(task.id) is True
+        release.set()
+        future.result(timeout=10)
+
+        db.session.expire_all()
+        task = db.session.get(AnalysisTask, task.id)
+        assert task.status == 'cancelled'
+        assert all(data['progress'] != 90 for _, data, _ in self.socketio.events)
+
+    def test_cancel_queued_task(self):
+        """测试排队中的任务被直接取消"""
+        release = threading.Event()
+
+        def blocking(job, input_data):
+            release.wait(5)
+            return {'success': True}
+
+        def never_runs(job, input_data):
+            raise AssertionError('should not run')
+
+        first = self.job_service.submit('clone', 1, blocking)
+        second = self.job_service.submit('clone', 1, never_runs)
+
+        assert self.job_service.cancel(second.id) is True
+        release.set()
+        self._wait(first.id)
+
+        db.session.expire_all()
+        assert db.session.get(AnalysisTask, second.id).status == 'cancelled'
+
+    def test_queue_full(self):
+        """测试排队任务超过上限时拒绝提交"""
+        release = threading.Event()
+
+        def blocking(job, input_data):
+            release.wait(5)
+            return {'success': True}
+
+        first = self.job_service.submit('clone', 1, blocking)
+        self.job_service.submit('clone', 1, blocking)
+
+        with pytest.raises(JobQueueFull):
+            self.job_service.submit('clone', 1, blocking)
+
+        assert self.job_service.get_stats()['max_pending'] == 2
+        release.set()
+        self._wait(first.id)
+
+    def test_cancel_unknown_task(self):
+        """测试取消不存在的任务"""
+        assert self.job_service.cancel(9999) is False
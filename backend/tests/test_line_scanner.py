@@ -0,0 +1,103 @@
+import io
+from src.services.line_scanner import LineScanner, LineRule, LineCounter, line_scanner
+
+class TestLineScanner:
+    """单遍行扫描器测试类"""
+    
+    def test_line_stats_match_split(self):
+        """测试行统计与split('\\n')的结果一致"""
+        content = "# comment\nx = 1\n\n   \ndef f():\n    return x\n"
+        basic, _ = line_scanner.scan(content, 'python')
+        
+        assert basic['total_lines'] == len(content.split('\n'))
+        assert basic['comment_lines'] == 1
+        assert basic['code_lines'] == 3
+        assert basic['blank_lines'] == 3
+        assert basic['max_line_length'] == len('    return x')
+        assert basic['functions_count'] == 1
+    
+    def test_empty_content(self):
+        """测试空文本"""
+        basic, quality = line_scanner.scan('', 'python')
+        
+        assert basic['total_lines'] == 1
+        assert basic['blank_lines'] == 1
+        assert basic['avg_line_length'] == 0
+        assert quality['issues'] == []
+        assert quality['quality_score'] == 100
+    
+    def test_python_issues_in_line_order(self):
+        """测试Python问题按行和规则顺序报告"""
+        content = "from os import *\nprint('x')  \n# todo: fix\nvalue = 1\n"
+        _, quality = line_scanner.scan(content, 'python')
+        
+        issues = [(issue['line'], issue['type']) for issue in quality['issues']]
+        assert issues == [
+            (1, 'wildcard_import'),
+            (2, 'trailing_whitespace'),
+            (2, 'debug_print'),
+            (3, 'todo_comment')
+        ]
+        assert quality['issues_by_severity'] == {'error': 0, 'warning': 1, 'info': 3}
+        assert quality['quality_score'] == 92
+    
+    def test_javascript_rules_and_counts(self):
+        """测试JavaScript规则和函数、类计数"""
+        content = "var a = 1;\nclass A {}\nconst f = () => {\n  console.log(a);\n};\nfunction g() {}\n"
+        basic, quality = line_scanner.scan(content, 'javascript')
+        
+        assert basic['functions_count'] == 2
+        assert basic['classes_count'] == 1
+        assert [issue['type'] for issue in quality['issues']] == ['var_declaration', 'debug_console']
+    
+    def test_long_line(self):
+        """测试行长度检查"""
+        _, quality = line_scanner.scan('x = ' + 'a' * 130, 'go')
+        
+        assert quality['issues'][0]['type'] == 'line_length'
+        assert quality['issues'][0]['message'] == 'Line too long (134 characters)'
+    
+    def test_register_custom_rule(self):
+        """测试注册自定义规则不影响其他语言"""
+        scanner = LineScanner()
+        scanner.register_rule(LineRule(
+            'no_goto', 'error', lambda line, stripped: 'goto found' if 'goto ' in stripped else None,
+            needles=['goto'], languages=['c']
+        ))
+        scanner.register_counter(LineCounter(
+            'functions_count', lambda line: 1 if line.startswith('int ') else 0, ['int '], ['c']
+        ))
+        content = "int main() {\n  goto end;\n}\n"
+        
+        basic, quality = scanner.scan(content, 'c')
+        assert basic['functions_count'] == 1
+        assert quality['issues'][0]['type'] == 'no_goto'
+        assert quality['issues_by_severity']['error'] == 1
+        
+        _, quality = scanner.scan(content, 'python')
+        assert quality['issues'] == []
+    
+    def test_rule_without_needles_runs_on_every_line(self):
+        """测试未声明needle的规则每行都会检查"""
+        seen = []
+        scanner = LineScanner()
+        scanner.register_rule(LineRule('any', 'info', lambda line, stripped: seen.append(line)))
+        
+        scanner.scan("a\nb\n\nc", 'python')
+        assert seen == ['a', 'b', 'c']
+    
+    def test_scan_lines_from_file_object(self):
+        """测试直接扫描文件对象，CRLF保留在行内"""
+        stream = io.StringIO("x = 1\r\ny = 2", newline='\n')
+        basic, _ = line_scanner.scan_lines(stream, 'python')
+        
+        assert basic['total_lines'] == 2
+        assert basic['max_line_length'] == len('x = 1\r')
+    
+    def test_bare_carriage_return_is_not_a_line_break(self):
+        """测试单独的\\r不分行，行数与split('\\n')一致"""
+        content = "x = 1\ry = 2\r\nz = 3\n"
+        basic, _ = line_scanner.scan(content, 'python')
+        
+        assert basic['total_lines'] == len(content.split('\n')) == 3
+        assert basic['max_line_length'] == len('x = 1\ry = 2\r')
@@ -0,0 +1,110 @@
+import time
+import pytest
+from src.services.http_client import HttpClient
+from src.services.metadata_cache import MetadataCache
+
+REPO = {'name': 'repo', 'default_branch': 'main'}
+
+class TestMetadataCache:
+    """GitHub元数据缓存测试类"""
+
+    @pytest.fixture(autouse=True)
+    def setup_cache(self, tmp_path):
+        """使用临时数据库和不重试的HTTP客户端"""
+        self.db_path = str(tmp_path / 'github_cache.db')
+        self.cache = MetadataCache(db_path=self.db_path, ttl=60)
+        self.http = HttpClient(headers={'Authorization': 'token a'}, max_retries=0)
+
+    def _expire(self, cache=None):
+        """让缓存条目过期"""
+        conn = (cache or self.cache)._get_conn()
+        conn.execute('UPDATE metadata_cache SET expires_at = ?', (time.time() - 1,))
+        conn.commit()
+
+    def test_hit_within_ttl(self, http_stub):
+        """测试TTL内直接命中，不发送请求"""
+        http_stub.responses.append((200, {'ETag': '"v1"', 'Link': '<next>; rel="next"'}, REPO))
+        url = f'{http_stub.url}/repos/owner/repo'
+
+        first = self.cache.fetch(self.http, url)
+        second = self.cache.fetch(self.http, url)
+
+        assert first.json() == second.json() == REPO
+        assert second.cache_status == 'hit'
+        assert second.headers['Link'] == '<next>; rel="next"'
+        assert len(http_stub.requests) == 1
+        stats = self.cache.get_stats()
+        assert (stats['misses'], stats['hits'], stats['revalidations']) == (1, 1, 0)
+
+    def test_revalidate_with_etag(self, http_stub):
+        """测试过期后带If-None-Match重新验证，304时返回缓存内容并刷新TTL"""
+        url = f'{http_stub.url}/repos/owner/repo'
+        http_stub.responses.extend([
+            (200, {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}, REPO),
+            (304, {'ETag': '"v1"'}, None)
+        ])
+        self.cache.fetch(self.http, url)
+        self._expire()
+
+        response = self.cache.fetch(self.http, url)
+
+        assert response.status_code == 200
+        assert response.cache_status == 'revalidated'
+        assert response.json() == REPO
+        assert http_stub.requests[1]['headers']['If-None-Match'] == '"v1"'
+        assert http_stub.requests[1]['headers']['If-Modified-Since'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+        assert self.cache.fetch(self.http, url).cache_status == 'hit'
+        assert self.cache.get_stats()['revalidations'] == 1
+
+    def test_changed_resource_replaces_entry(self, http_stub):
+        """测试资源变化时保存新的内容和ETag"""
+        url = f'{http_stub.url}/repos/owner/repo/branches'
+        http_stub.responses.extend([
+            (200, {'ETag': '"v1"'}, [{'name': 'main'}]),
+            (200, {'ETag': '"v2"'}, [{'name': 'main'}, {'name': 'dev'}]),
+            (304, {}, None)
+        ])
+        self.cache.fetch(self.http, url)
+        self._expire()
+        assert len(self.cache.fetch(self.http, url).json()) == 2
+        self._expire()
+
+        assert len(self.cache.fetch(self.http, url).json()) == 2
+        assert http_stub.requests[2]['headers']['If-None-Match'] == '"v2"'
+
+    def test_errors_not_cached_and_stale_served(self, http_stub):
+        """测试错误响应不缓存；已有缓存时服务端错误返回过期内容"""
+        url = f'{http_stub.url}/repos/owner/missing'
+        http_stub.responses.extend([(404, {}, {'message': 'Not Found'}), (404, {}, {'message': 'Not Found'})])
+        assert self.cache.fetch(self.http, url).status_code == 404
+        assert self.cache.fetch(self.http, url).status_code == 404
+
+        url = f'{http_stub.url}/repos/owner/repo'
+        http_stub.responses.extend([(200, {'ETag': '"v1"'}, REPO), (503, {}, {})])
+        self.cache.fetch(self.http, url)
+        self._expire()
+        response = self.cache.fetch(self.http, url)
+        assert response.cache_status == 'stale'
+        assert response.json() == REPO
+
+    def test_shared_between_instances_and_keyed_by_token(self, http_stub):
+        """测试多个实例（工作进程）共享同一个数据库，不同token互不共享"""
+        url = f'{http_stub.url}/repos/owner/repo'
+        http_stub.responses.extend([(200, {}, REPO), (200, {}, REPO)])
+        self.cache.fetch(self.http, url)
+
+        other_worker = MetadataCache(db_path=self.db_path, ttl=60)
+        assert other_worker.fetch(self.http, url).cache_status == 'hit'
+
+        other_token = HttpClient(headers={'Authorization': 'token b'}, max_retries=0)
+        assert other_worker.fetch(other_token, url).cache_status == 'miss'
+        assert len(http_stub.requests) == 2
+
+    def test_disabled(self, http_stub):
+        """测试关闭缓存时直接请求"""
+        cache = MetadataCache(db_path=self.db_path, enabled=False)
+        url = f'{http_stub.url}/repos/owner/repo'
+        cache.fetch(self.http, url)
+        cache.fetch(self.http, url)
+        assert len(http_stub.requests) == 2
+        assert cache.get_stats()['bypassed'] == 2
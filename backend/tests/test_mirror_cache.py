@@ -0,0 +1,129 @@
+import os
+import git
+import threading
+from src.services.mirror_cache import MirrorCache
+
+class TestMirrorCache:
+    """仓库镜像缓存测试类"""
+    
+    def _checkout(self, cache, url, tmp_path, name, **kwargs):
+        """检出worktree到tmp_path下的指定目录"""
+        return cache.checkout(url, str(tmp_path / name), **kwargs)
+    
+    def test_make_key_normalizes_url(self):
+        """测试URL规范化后得到相同的缓存键"""
+        key = MirrorCache.make_key('https://github.com/user/repo')
+        assert MirrorCache.make_key('https://github.com/user/repo.git') == key
+        assert MirrorCache.make_key('https://github.com/user/repo/') == key
+        assert MirrorCache.make_key('https://github.com/user/other') != key
+    
+    def test_first_checkout_creates_mirror(self, bare_repo_url, tmp_path):
+        """测试首次检出时创建镜像"""
+        cache = MirrorCache(cache_dir=str(tmp_path / 'mirrors'))
+        result = self._checkout(cache, bare_repo_url, tmp_path, 'wt1')
+        
+        assert result['success'] is True
+        assert result['cache_hit'] is False
+        assert result['branch'] == 'main'
+        assert os.path.exists(os.path.join(result['local_path'], 'src', 'main.py'))
+        assert cache.get_stats()['mirrors'] == 1
+        
+        cache.release(result['local_path'])
+        assert not os.path.exists(result['local_path'])
+    
+    def test_second_checkout_fetches_incrementally(self, bare_repo_url, git_repo, tmp_path):
+        """测试再次检出时复用镜像并拉取新提交"""
+        cache = MirrorCache(cache_dir=str(tmp_path / 'mirrors'))
+        first = self._checkout(cache, bare_repo_url, tmp_path, 'wt1')
+        cache.release(first['local_path'])
+        
+        # 向远程推送一个新提交
+        with open(os.path.join(git_repo.working_tree_dir, 'new.py'), 'w') as f:
+            f.write('x = 1\n')
+        git_repo.index.add(['new.py'])
+        git_repo.index.commit('Add new file')
+        git_repo.git.push(bare_repo_url, 'main')
+        
+        second = self._checkout(cache, bare_repo_url, tmp_path, 'wt2')
+        assert second['success'] is True
+        assert second['cache_hit'] is True
+        assert second['commit_hash'] != first['commit_hash']
+        assert os.path.exists(os.path.join(second['local_path'], 'new.py'))
+        
+        stats = cache.get_stats()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+        assert stats['fetches'] == 1
+        cache.release(second['local_path'])
+    
+    def test_checkout_branch_and_sparse_paths(self, bare_repo_url, tmp_path):
+        """测试检出指定分支和稀疏路径"""
+        cache = MirrorCache(cache_dir=str(tmp_path / 'mirrors'))
+        sparse = self._checkout(cache, bare_repo_url, tmp_path, 'sparse', branch='feature', sparse_paths=['src/'])
+        full = self._checkout(cache, bare_repo_url, tmp_path, 'full')
+        
+        assert sparse['success'] is True
+        assert sparse['branch'] == 'feature'
+        assert os.path.exists(os.path.join(sparse['local_path'], 'src', 'main.py'))
+        assert not os.path.exists(os.path.join(sparse['local_path'], 'docs'))
+        # 稀疏设置不影响同一镜像的其他worktree
+        assert os.path.exists(os.path.join(full['local_path'], 'docs', 'guide.md'))
+        
+        cache.release(sparse['local_path'])
+        cache.release(full['local_path'])
+    
+    def test_concurrent_checkouts_share_fetch(self, bare_repo_url, tmp_path):
+        """测试并发请求同一仓库时共享一次fetch"""
+        cache = MirrorCache(cache_dir=str(tmp_path / 'mirrors'))
+        cache.release(self._checkout(cache, bare_repo_url, tmp_path, 'warm')['local_path'])
+        
+        results = []
+        lock = cache._get_repo_lock(MirrorCache.make_key(bare_repo_url))
+        with lock:
+            threads = [
+                threading.Thread(target=lambda name=name: results.append(
+                    self._checkout(cache, bare_repo_url, tmp_path, name)
+                ))
+                for name in ['a', 'b', 'c']
+            ]
+            for thread in threads:
+                thread.start()
+            # 等待所有线程都在锁上排队
+            while sum(cache._in_use.values()) < 3:
+                threading.Event().wait(0.01)
+        for thread in threads:
+            thread.join(30)
+        
+        assert all(result['success'] for result in results)
+        stats = cache.get_stats()
+        assert stats['fetches'] == 1
+        assert stats['shared_fetches'] == 2
+        for result in results:
+            cache.release(result['local_path'])
+    
+    def test_lru_eviction_by_size(self, bare_repo_url, tmp_path):
+        """测试超过磁盘上限时淘汰最久未使用的镜像"""
+        other_path = str(tmp_path / 'other.git')
+        git.Repo.clone_from(bare_repo_url, other_path, bare=True)
+        other_url = f'file://{other_path}'
+        
+        cache = MirrorCache(cache_dir=str(tmp_path / 'mirrors'), max_bytes=1)
+        first = self._checkout(cache, bare_repo_url, tmp_path, 'first')
+        cache.release(first['local_path'])
+        second = self._checkout(cache, other_url, tmp_path, 'second')
+        
+        assert second['success'] is True
+        stats = cache.get_stats()
+        assert stats['evictions'] == 1
+        assert stats['mirrors'] == 1
+        assert not os.path.exists(cache._mirror_path(MirrorCache.make_key(bare_repo_url)))
+        cache.release(second['local_path'])
+    
+    def test_checkout_invalid_url(self, tmp_path):
+        """测试仓库不存在时返回错误"""
+        cache = MirrorCache(cache_dir=str(tmp_path / 'mirrors'))
+        result = self._checkout(cache, f'file://{tmp_path}/missing.git', tmp_path, 'wt')
+        
+        assert result['success'] is False
+        assert 'error' in result
+        assert cache._in_use[MirrorCache.make_key(f'file://{tmp_path}/missing.git')] == 0
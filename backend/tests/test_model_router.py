@@ -0,0 +1,180 @@
+import time
+import pytest
+from src.services.model_router import ModelRouter, CircuitBreaker, ProviderUnavailable, AllModelsFailed
+from src.services.rate_limiter import ProviderBusy
+
+class TestModelRouter:
+    """模型路由测试类"""
+
+    def _router(self, dispatch, **kwargs):
+        """创建开启备用链的路由器"""
+        kwargs.setdefault('fallback_enabled', True)
+        kwargs.setdefault('hedge_enabled', False)
+        return ModelRouter(dispatch, **kwargs)
+
+    def test_circuit_breaker_states(self):
+        """测试熔断器连续失败后打开，冷却后半开只放行一个试探请求"""
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=lambda: now[0])
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert breaker.state == 'open' and not breaker.allow()
+
+        now[0] = 10
+        assert breaker.state == 'half_open'
+        assert breaker.allow() and not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == 'open'
+
+        now[0] = 20
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == 'closed' and breaker.allow()
+
+    def test_open_circuit_skips_provider(self):
+        """测试提供商熔断后直接走备用模型，不再请求"""
+        calls = []
+
+        def dispatch(model, prompt):
+            calls.append(model)
+            if model.startswith('claude'):
+                raise Exception('overloaded')
+            return model
+
+        router = self._router(dispatch, failure_threshold=2)
+        for _ in range(3):
+            assert router.call(['claude-3.7-sonnet', 'gpt-4.1-mini'], 'p') == ('gpt-4.1-mini', 'gpt-4.1-mini')
+
+        assert calls.count('claude-3.7-sonnet') == 2
+        stats = router.get_stats()
+        assert stats['skipped_open'] == 1
+        assert stats['providers']['anthropic']['circuit'] == 'open'
+
+    def test_unconfigured_provider_not_counted(self):
+        """测试未配置的提供商被跳过但不触发熔断；全部失败时抛出AllModelsFailed"""
+        def dispatch(model, prompt):
+            raise ProviderUnavailable(f'{model} not configured')
+
+        router = self._router(dispatch, failure_threshold=1)
+        with pytest.raises(AllModelsFailed) as error:
+            router.call(['claude-3.7-sonnet', 'gemini-2.5-flash'], 'p')
+        assert [model for model, _ in error.value.errors] == ['claude-3.7-sonnet', 'gemini-2.5-flash']
+        assert router.get_stats()['providers']['anthropic']['circuit'] == 'closed'
+
+    def test_busy_probe_releases_half_open(self):
+        """测试半开试探请求因本地限流排队超时失败时不计失败，熔断器继续放行下一个试探请求"""
+        now = [0.0]
+        errors = [Exception('overloaded'), ProviderBusy('queue timeout')]
+
+        def dispatch(model, prompt):
+            if errors:
+                raise errors.pop(0)
+            return model
+
+        router = self._router(dispatch)
+        breaker = router._breakers['anthropic'] = CircuitBreaker(failure_threshold=1, reset_timeout=10,
+                                                                 clock=lambda: now[0])
+        with pytest.raises(Exception):
+            router.call(['claude-3.7-sonnet'], 'p')
+        assert breaker.state == 'open'
+
+        now[0] = 10
+        with pytest.raises(ProviderBusy):
+            router.call(['claude-3.7-sonnet'], 'p')
+        assert breaker.state == 'half_open'
+        assert router.call(['claude-3.7-sonnet'], 'p') == ('claude-3.7-sonnet', 'claude-3.7-sonnet')
+        assert breaker.state == 'closed'
+
+    def test_hedged_request_takes_first_result(self):
+        """测试主模型超过对冲延迟仍未返回时请求备用模型，采用先返回的结果"""
+        def dispatch(model, prompt):
+            time.sleep(1.0 if model.startswith('claude') else 0.01)
+            return model
+
+        router = self._router(dispatch, hedge_enabled=True, hedge_delay=0.05)
+        start = time.monotonic()
+        result = router.call(['claude-3.7-sonnet', 'gpt-4.1-mini'], 'p')
+
+        assert result == ('gpt-4.1-mini', 'gpt-4.1-mini')
+        assert time.monotonic() - start < 0.5
+        stats = router.get_stats()
+        assert stats['hedges'] == 1 and stats['hedge_wins'] == 1
+
+    def test_hedge_not_fired_for_fast_primary(self):
+        """测试主模型在p95耗时内返回时不发出对冲请求"""
+        calls = []
+
+        def dispatch(model, prompt):
+            calls.append(model)
+            time.sleep(0.01)
+            return model
+
+        router = self._router(dispatch, hedge_enabled=True, hedge_delay=5, hedge_min_samples=3)
+        for _ in range(3):
+            router.call(['claude-3.7-sonnet', 'gpt-4.1-mini'], 'p')
+
+        assert calls == ['claude-3.7-sonnet'] * 3
+        assert router.get_stats()['providers']['anthropic']['hedge_delay_ms'] < 100
+
+    def test_hedged_falls_back_after_failure(self):
+        """测试对冲模式下主模型失败时立即改用备用模型"""
+        def dispatch(model, prompt):
+            if model.startswith('claude'):
+                raise Exception('boom')
+            return model
+
+        router = self._router(dispatch, hedge_enabled=True, hedge_delay=5)
+        start = time.monotonic()
+        assert router.call(['claude-3.7-sonnet', 'deepseek-r1'], 'p') == ('deepseek-r1', 'deepseek-r1')
+        assert time.monotonic() - start < 1
+        assert router.get_stats()['fallbacks'] == 1
+
+    def test_deadline_stops_fallbacks(self):
+        """测试超过备用链总时限后不再尝试后续模型"""
+        calls = []
+
+        def dispatch(model, prompt):
+            calls.append(model)
+            time.sleep(0.1)
+            raise Exception('stalled')
+
+        router = self._router(dispatch, deadline=0.05)
+        with pytest.raises(AllModelsFailed, match='deadline'):
+            router.call(['claude-3.7-sonnet', 'gpt-4.1-mini', 'deepseek-r1'], 'p')
+
+        assert calls == ['claude-3.7-sonnet']
+        assert router.get_stats()['deadline_exceeded'] == 1
+
+    def test_hedged_call_returns_at_deadline(self):
+        """测试对冲模式下所有在途请求都未返回时在总时限处结束"""
+        def dispatch(model, prompt):
+            time.sleep(1.0)
+            return model
+
+        router = self._router(dispatch, hedge_enabled=True, hedge_delay=0.05, deadline=0.2)
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            router.call(['claude-3.7-sonnet', 'gpt-4.1-mini'], 'p')
+
+        assert time.monotonic() - start < 0.5
+        assert router.get_stats()['hedges'] == 1
+
+    def test_stream_falls_back_before_first_chunk(self):
+        """测试流式调用在输出前失败时切换模型，输出开始后的错误直接抛出"""
+        def stream(model, prompt):
+            if model.startswith('claude'):
+                raise Exception('overloaded')
+            yield 'hello '
+            if prompt == 'break':
+                raise Exception('connection reset')
+            yield model
+
+        router = ModelRouter(lambda model, prompt: '', stream=stream, fallback_enabled=True)
+        assert list(router.stream(['claude-3.7-sonnet', 'gpt-4.1-mini'], 'p')) == ['hello ', 'gpt-4.1-mini']
+
+        chunks = []
+        with pytest.raises(Exception, match='connection reset'):
+            for chunk in router.stream(['gpt-4.1-mini', 'deepseek-r1'], 'break'):
+                chunks.append(chunk)
+        assert chunks == ['hello ']
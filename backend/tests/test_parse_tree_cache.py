@@ -0,0 +1,145 @@
+import pytest
+from src.services.code_analysis_service import CodeAnalysisService
+from src.services.parse_tree_cache import ParseTreeCache
+
+pytest.importorskip('tree_sitter_python')
+
+SOURCE = (
+    "import os\n"
+    "\n"
+    "def foo(a):\n"
+    "    return a\n"
+    "\n"
+    "class Bar:\n"
+    "    def baz(self):\n"
+    "        return 1\n"
+)
+
+class TestParseTreeCache:
+    """语法树缓存与增量重解析测试类"""
+
+    def setup_method(self):
+        """每个测试使用独立的缓存"""
+        self.service = CodeAnalysisService()
+        self.cache = ParseTreeCache(max_files=2, analysis_service=self.service)
+
+    def _assert_tree_fresh(self, file_path='a.py'):
+        """增量解析的结果应与从头解析完全一致"""
+        entry = self.cache._files[(1, file_path)]
+        assert entry.source == entry.text.encode('utf-8')
+        fresh = self.service.parser_registry.get_parser('python').parse(entry.source)
+        assert str(entry.tree.root_node) == str(fresh.root_node)
+
+    def test_open_reports_whole_file(self):
+        """测试打开文件时返回整个文件的诊断"""
+        result = self.cache.open(1, 'a.py', SOURCE, version=1)
+
+        assert result['success'] is True
+        assert result['incremental'] is False
+        assert result['version'] == 1
+        assert result['changed_lines'] == {'start': 1, 'end': 9}
+        assert [f['name'] for f in result['functions']] == ['foo', 'baz']
+        assert [c['name'] for c in result['classes']] == ['Bar']
+        assert result['parse_errors'] == []
+
+    def test_open_unsupported_file(self):
+        """测试不支持的文件类型"""
+        result = self.cache.open(1, 'archive.bin', 'hello')
+        assert result['success'] is False
+        assert self.cache.get_stats()['open_files'] == 0
+
+    def test_edit_reports_changed_region_only(self):
+        """测试编辑后只返回变更区域的问题和定义"""
+        self.cache.open(1, 'a.py', SOURCE)
+        offset = SOURCE.index('return a') + len('return a')
+
+        result = self.cache.apply_edits(1, 'a.py', [{'offset': offset, 'length': 0, 'text': ' + 1  # TODO'}], 2)
+
+        assert result['incremental'] is True
+        assert result['version'] == 2
+        assert result['changed_lines'] == {'start': 4, 'end': 4}
+        assert [issue['type'] for issue in result['issues']] == ['todo_comment']
+        assert result['issues'][0]['line'] == 4
+        assert [f['name'] for f in result['functions']] == ['foo']
+        assert result['classes'] == []
+        self._assert_tree_fresh()
+
+    def test_syntax_error_introduced_and_fixed(self):
+        """测试引入和修复语法错误"""
+        self.cache.open(1, 'a.py', SOURCE)
+        offset = SOURCE.index('(a)') + 1
+
+        broken = self.cache.apply_edits(1, 'a.py', [{'offset': offset, 'length': 2, 'text': ''}])
+        assert broken['parse_errors']
+        self._assert_tree_fresh()
+
+        fixed = self.cache.apply_edits(1, 'a.py', [{'offset': offset, 'length': 0, 'text': 'a)'}])
+        assert fixed['parse_errors'] == []
+        assert self.cache._files[(1, 'a.py')].text == SOURCE
+        self._assert_tree_fresh()
+
+    def test_multiple_edits_applied_in_order(self):
+        """测试一次发送的多个编辑按顺序应用，变更区域随之平移"""
+        self.cache.open(1, 'a.py', SOURCE)
+        edits = [
+            {'offset': 0, 'length': 0, 'text': '# header\n# more\n'},
+            {'offset': len('# header\n# more\n') + SOURCE.index('return 1'), 'length': 8, 'text': 'return 2'}
+        ]
+
+        result = self.cache.apply_edits(1, 'a.py', edits)
+
+        text = self.cache._files[(1, 'a.py')].text
+        assert text == '# header\n# more\n' + SOURCE.replace('return 1', 'return 2')
+        assert result['changed_lines'] == {'start': 1, 'end': 10}
+        self._assert_tree_fresh()
+
+    def test_utf16_offsets(self):
+        """测试UTF-16偏移（代理对字符占两个码元）和多字节字符"""
+        content = "s = '😀é'\nx = 1\n"
+        self.cache.open(1, 'a.py', content)
+        # Monaco中'x'的偏移：😀占两个码元
+        offset = len("s = '") + 2 + 1 + len("'\n")
+
+        self.cache.apply_edits(1, 'a.py', [{'offset': offset, 'length': 1, 'text': 'y'}])
+
+        assert self.cache._files[(1, 'a.py')].text == "s = '😀é'\ny = 1\n"
+        self._assert_tree_fresh()
+
+    def test_update_content_uses_single_edit(self):
+        """测试保存时用完整内容更新已打开的文件"""
+        self.cache.open(1, 'a.py', SOURCE)
+        content = SOURCE.replace('return 1', 'print(1)')
+
+        result = self.cache.update_content(1, 'a.py', content)
+
+        assert result['incremental'] is True
+        assert result['changed_lines'] == {'start': 8, 'end': 8}
+        assert [issue['type'] for issue in result['issues']] == ['debug_print']
+        assert self.cache.update_content(1, 'a.py', content) is None
+        assert self.cache.update_content(1, 'other.py', content) is None
+        self._assert_tree_fresh()
+
+    def test_edit_requires_open_file(self):
+        """测试未打开或内容不一致时要求客户端重新同步"""
+        result = self.cache.apply_edits(1, 'a.py', [{'offset': 0, 'length': 0, 'text': 'x'}])
+        assert result['success'] is False
+        assert result['resync'] is True
+
+        self.cache.open(1, 'a.py', SOURCE)
+        result = self.cache.apply_edits(1, 'a.py', [{'offset': len(SOURCE) + 10, 'length': 0, 'text': 'x'}])
+        assert result['resync'] is True
+        assert self.cache.close(1, 'a.py') is False
+
+    def test_lru_eviction(self):
+        """测试超过上限时淘汰最久未使用的文件"""
+        self.cache.open(1, 'a.py', SOURCE)
+        self.cache.open(1, 'b.py', SOURCE)
+        self.cache.apply_edits(1, 'a.py', [{'offset': 0, 'length': 0, 'text': '\n'}])
+        self.cache.open(1, 'c.py', SOURCE)
+
+        assert (1, 'b.py') not in self.cache._files
+        assert (1, 'a.py') in self.cache._files
+        stats = self.cache.get_stats()
+        assert stats['evictions'] == 1
+        assert stats['incremental_parses'] == 1
+        assert stats['full_parses'] == 3
@@ -0,0 +1,151 @@
+import threading
+import pytest
+from src.services.parser_registry import ParserRegistry, LANGUAGE_SPECS
+from src.services.code_analysis_service import CodeAnalysisService
+
+class TestParserRegistry:
+    """Tree-sitter解析器注册表测试类"""
+    
+    def setup_method(self):
+        """测试前的设置"""
+        self.registry = ParserRegistry()
+    
+    def test_grammars_load_lazily(self):
+        """测试语法在首次使用时才加载"""
+        assert self.registry.get_stats()['loaded'] == []
+        
+        assert self.registry.supports('python') is True
+        assert self.registry.get_stats()['loaded'] == ['tree_sitter_python.language']
+    
+    def test_unknown_language(self):
+        """测试未配置的语言"""
+        assert self.registry.supports('cobol') is False
+        assert self.registry.get_parser('cobol') is None
+    
+    def test_missing_grammar_is_recorded(self):
+        """测试语法包缺失时记录失败且不重复尝试"""
+        registry = ParserRegistry({'fake': dict(LANGUAGE_SPECS['python'], grammar=('tree_sitter_missing', 'language'))})
+        
+        assert registry.supports('fake') is False
+        assert registry.get_parser('fake') is None
+        assert 'tree_sitter_missing.language' in registry.get_stats()['failed']
+    
+    def test_parser_cached_per_thread(self):
+        """测试Parser按线程缓存，Language跨线程共享"""
+        main_parser = self.registry.get_parser('python')
+        assert self.registry.get_parser('python') is main_parser
+        
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.registry.get_parser('python')))
+        thread.start()
+        thread.join()
+        
+        assert other[0] is not main_parser
+        assert other[0].language == main_parser.language
+    
+    def test_grammar_by_extension(self):
+        """测试按扩展名选择语法（.tsx使用TSX语法）"""
+        pytest.importorskip('tree_sitter_typescript')
+        
+        assert self.registry.get_parser('typescript', '.tsx') is not self.registry.get_parser('typescript', '.ts')
+
+class TestMultiLanguageSyntaxAnalysis:
+    """多语言语法分析测试类"""
+    
+    def setup_method(self):
+        """测试前的设置"""
+        self.service = CodeAnalysisService()
+    
+    def teardown_method(self):
+        """测试后的清理"""
+        self.service.shutdown()
+    
+    def _analyze(self, module_name, file_name, content):
+        pytest.importorskip(module_name)
+        result = self.service.analyze_file(file_name, content)
+        assert result['success'] is True
+        syntax = result['syntax_analysis']
+        assert syntax['parse_errors'] == []
+        return syntax
+    
+    def test_javascript(self):
+        """测试JavaScript结构提取"""
+        syntax = self._analyze('tree_sitter_javascript', 'app.js', (
+            "import React, { useState as useLocal } from 'react';\n"
+            "class Widget extends React.Component {\n"
+            "  render() { const row = () => 1; return [1].map(x => x); }\n"
+            "}\n"
+            "function helper() {}\n"
+        ))
+        
+        assert [(f['name'], f['depth']) for f in syntax['functions']] == [('render', 1), ('row', 2), ('helper', 0)]
+        assert [c['name'] for c in syntax['classes']] == ['Widget']
+        assert syntax['imports'] == [{'module': 'react', 'names': ['React', 'useState'], 'line': 1}]
+    
+    def test_tsx(self):
+        """测试TSX结构提取"""
+        syntax = self._analyze('tree_sitter_typescript', 'view.tsx', (
+            "import { Props } from './types';\n"
+            "interface State { open: boolean }\n"
+            "export const View = (props: Props) => <div onClick={() => props.close()}>hi</div>;\n"
+        ))
+        
+        assert [f['name'] for f in syntax['functions']] == ['View']
+        assert [c['name'] for c in syntax['classes']] == ['State']
+        assert syntax['imports'][0]['module'] == './types'
+    
+    def test_go(self):
+        """测试Go结构提取"""
+        syntax = self._analyze('tree_sitter_go', 'main.go', (
+            'package main\n'
+            'import (\n'
+            '    "fmt"\n'
+            '    m "math"\n'
+            ')\n'
+            'type Server struct{}\n'
+            'func (s *Server) Start() {}\n'
+            'func main() { fmt.Println(m.Pi) }\n'
+        ))
+        
+        assert [f['name'] for f in syntax['functions']] == ['Start', 'main']
+        assert [c['name'] for c in syntax['classes']] == ['Server']
+        assert [(i['module'], i['line']) for i in syntax['imports']] == [('fmt', 3), ('math', 4)]
+    
+    def test_rust(self):
+        """测试Rust结构提取"""
+        syntax = self._analyze('tree_sitter_rust', 'lib.rs', (
+            'use std::io::{self, Read};\n'
+            'struct Reader;\n'
+            'impl Reader { fn read(&self) {} }\n'
+            'fn main() {}\n'
+        ))
+        
+        assert [(f['name'], f['depth']) for f in syntax['functions']] == [('read', 1), ('main', 0)]
+        assert [c['name'] for c in syntax['classes']] == ['Reader', 'Reader']
+        assert syntax['imports'] == [{'module': 'std::io', 'names': ['self', 'Read'], 'line': 1}]
+    
+    def test_java(self):
+        """测试Java结构提取"""
+        syntax = self._analyze('tree_sitter_java', 'App.java', (
+            'import java.util.*;\n'
+            'public class App {\n'
+            '    public App() {}\n'
+            '    void run() {}\n'
+            '}\n'
+        ))
+        
+        assert [(f['name'], f['depth']) for f in syntax['functions']] == [('App', 1), ('run', 1)]
+        assert syntax['imports'] == [{'module': 'java.util', 'names': ['*'], 'line': 1}]
+    
+    def test_c(self):
+        """测试C结构提取（忽略struct前置引用）"""
+        syntax = self._analyze('tree_sitter_c', 'main.c', (
+            '#include <stdio.h>\n'
+            'struct point { int x; };\n'
+            'struct point *origin;\n'
+            'static int *make(int a) { return 0; }\n'
+        ))
+        
+        assert [f['name'] for f in syntax['functions']] == ['make']
+        assert [c['name'] for c in syntax['classes']] == ['point']
+        assert syntax['imports'] == [{'module': 'stdio.h', 'names': [], 'line': 1}]
@@ -0,0 +1,234 @@
+import os
+import json
+import shutil
+import socket
+import subprocess
+import importlib.util
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.project import JSONText
+from src.services.bulk_insert import copy_rows, _copy_value
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+def _load_migrate():
+    """按文件路径加载迁移工具（migrations目录不是包）"""
+    spec = importlib.util.spec_from_file_location('migrate', os.path.join(MIGRATIONS_DIR, 'migrate.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture(scope='module')
+def postgres_server(tmp_path_factory):
+    """PostgreSQL连接URL：优先使用 TEST_POSTGRES_URL，否则用PATH中的initdb/pg_ctl启动临时实例"""
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        pytest.skip('psycopg2 is not installed')
+
+    url = os.getenv('TEST_POSTGRES_URL')
+    if url:
+        yield url
+        return
+
+    if not shutil.which('initdb') or not shutil.which('pg_ctl'):
+        pytest.skip('PostgreSQL server binaries are not available')
+    data_dir = tmp_path_factory.mktemp('pgdata')
+    port = _free_port()
+    try:
+        subprocess.run(['initdb', '-D', str(data_dir), '-U', 'postgres', '--auth=trust'],
+                       check=True, capture_output=True)
+        subprocess.run(['pg_ctl', '-D', str(data_dir), '-w', '-l', str(data_dir / 'server.log'),
+                        '-o', f"-p {port} -k {data_dir} -c listen_addresses=127.0.0.1", 'start'],
+                       check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        pytest.skip(f'Could not start a temporary PostgreSQL server: {e.stderr.decode(errors="replace")}')
+    yield f'postgresql://postgres@127.0.0.1:{port}/postgres'
+    subprocess.run(['pg_ctl', '-D', str(data_dir), '-m', 'fast', 'stop'], capture_output=True)
+
+@pytest.fixture
+def pg_url(postgres_server, monkeypatch):
+    """清空public schema后通过迁移工具建表"""
+    engine = create_engine(postgres_server)
+    with engine.begin() as conn:
+        conn.exec_driver_sql('DROP SCHEMA public CASCADE; CREATE SCHEMA public')
+    engine.dispose()
+    monkeypatch.setenv('DATABASE_URL', postgres_server)
+    _load_migrate().main(['--auto'])
+    return postgres_server
+
+@pytest.fixture
+def pg_app(pg_url):
+    """使用PostgreSQL的Flask应用，预置一个用户和项目"""
+    from flask import Flask
+    from src.models.user import db, User
+    from src.models.project import Project
+    from src.services.db_profile import DatabaseProfile
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = pg_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    DatabaseProfile().init_app(app, db)
+
+    with app.app_context():
+        db.session.add(User(username='tester', email='tester@example.com'))
+        db.session.flush()
+        db.session.add(Project(name='test-project', user_id=1))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+class FakeCursor:
+    """记录copy_expert调用的psycopg2风格游标"""
+
+    def __init__(self):
+        self.sql = None
+        self.data = None
+        self.closed = False
+
+    def copy_expert(self, sql, buffer):
+        self.sql, self.data = sql, buffer.read()
+
+    def close(self):
+        self.closed = True
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self.dialect = postgresql.dialect()
+        self.connection = type('Proxy', (), {'dbapi_connection': type('Raw', (), {'cursor': lambda _: cursor})()})()
+
+class TestCopyFormat:
+    """COPY text格式转换测试类"""
+
+    def test_copy_value_escaping(self):
+        """测试NULL、转义字符、bytea、日期、布尔和JSON值的转换"""
+        assert _copy_value(None) == '\\N'
+        assert _copy_value('a\tb\nc\\d\r') == 'a\\tb\\nc\\\\d\\r'
+        assert _copy_value(b'\x00\xff') == '\\\\x00ff'
+        assert _copy_value(datetime(2026, 1, 2, 3, 4, 5)) == '2026-01-02 03:04:05'
+        assert _copy_value(True) == 't' and _copy_value(False) == 'f'
+        assert _copy_value(12) == '12'
+        assert json.loads(_copy_value({'a': '中文'})) == {'a': '中文'}
+
+    def test_copy_rows_builds_statement(self):
+        """测试COPY语句引用表名和列名，每行一条记录"""
+        from src.models.project import FileBlob
+        cursor = FakeCursor()
+        copy_rows(FakeConnection(cursor), FileBlob.__table__, [
+            {'hash': 'h1', 'codec': 'none', 'size': 2, 'data': b'hi'},
+            {'hash': 'h2', 'codec': 'zlib', 'size': 0, 'data': None}
+        ])
+        assert cursor.sql == 'COPY file_blob (hash, codec, size, data) FROM STDIN'
+        assert cursor.data == 'h1\tnone\t2\t\\\\x6869\nh2\tzlib\t0\t\\N\n'
+        assert cursor.closed
+
+class TestJSONText:
+    """JSON列类型测试类"""
+
+    def test_postgresql_uses_jsonb(self):
+        """测试PostgreSQL上使用JSONB，写入时解析JSON字符串，读取时序列化为字符串"""
+        column_type = JSONText()
+        dialect = postgresql.dialect()
+        assert isinstance(column_type.dialect_impl(dialect).impl, postgresql.JSONB)
+        assert column_type.process_bind_param('{"score": 1}', dialect) == {'score': 1}
+        assert column_type.process_bind_param('not json', dialect) == 'not json'
+        assert json.loads(column_type.process_result_value({'score': 1}, dialect)) == {'score': 1}
+        assert column_type.process_result_value(None, dialect) is None
+
+    def test_sqlite_passthrough(self):
+        """测试SQLite上按原样保存文本"""
+        column_type = JSONText()
+        dialect = sqlite.dialect()
+        assert column_type.process_bind_param('{"score": 1}', dialect) == '{"score": 1}'
+        assert column_type.process_result_value('{"score": 1}', dialect) == '{"score": 1}'
+
+class TestMigrations:
+    """迁移工具测试类"""
+
+    def test_dialect_specific_files(self, tmp_path):
+        """测试方言文件替代同编号的通用迁移，只有方言文件的迁移只在该数据库执行"""
+        migrate = _load_migrate()
+        for name in ['001_init.sql', '001_init.postgresql.sql', '002_index.sql', '003_jsonb.postgresql.sql', 'notes.txt']:
+            (tmp_path / name).write_text('')
+
+        assert migrate.get_pending_migrations(str(tmp_path), [], 'sqlite') == [
+            ('001_init.sql', '001_init.sql'), ('002_index.sql', '002_index.sql')
+        ]
+        assert migrate.get_pending_migrations(str(tmp_path), ['001_init.sql'], 'postgresql') == [
+            ('002_index.sql', '002_index.sql'), ('003_jsonb.sql', '003_jsonb.postgresql.sql')
+        ]
+
+    def test_auto_migrate_sqlite(self, tmp_path, monkeypatch, capsys):
+        """测试按DATABASE_URL在SQLite上应用所有迁移，重复运行时没有待应用的迁移"""
+        db_path = tmp_path / 'nested' / 'app.db'
+        monkeypatch.setenv('DATABASE_URL', f'sqlite:///{db_path}')
+        migrate = _load_migrate()
+        migrate.main(['--auto'])
+
+        engine = create_engine(f'sqlite:///{db_path}')
+        try:
+            inspector = inspect(engine)
+            assert {'user', 'project', 'code_file', 'file_blob', 'migrations'} <= set(inspector.get_table_names())
+            assert 'content_hash' in {column['name'] for column in inspector.get_columns('code_file')}
+            with engine.connect() as conn:
+                applied = [row[0] for row in conn.execute(text('SELECT filename FROM migrations ORDER BY id'))]
+        finally:
+            engine.dispose()
+        assert applied and '005_jsonb_columns.sql' not in applied
+
+        migrate.main(['--auto'])
+        assert 'No pending migrations.' in capsys.readouterr().out
+
+class TestPostgres:
+    """PostgreSQL后端测试类（需要PostgreSQL和psycopg2）"""
+
+    def test_migrations_create_jsonb_columns(self, pg_url):
+        """测试迁移在PostgreSQL上建表，分析结果和任务输出为JSONB列"""
+        engine = create_engine(pg_url)
+        try:
+            columns = {column['name']: column['type'] for column in inspect(engine).get_columns('code_file')}
+            task_columns = {column['name']: column['type'] for column in inspect(engine).get_columns('analysis_task')}
+        finally:
+            engine.dispose()
+        assert 'content' not in columns and 'content_hash' in columns
+        assert isinstance(columns['analysis_result'], postgresql.JSONB)
+        assert isinstance(task_columns['output_data'], postgresql.JSONB)
+
+    def test_copy_ingest_and_listing(self, pg_app, git_repo):
+        """测试文件导入通过COPY写入，内容和文件列表与SQLite一致"""
+        from src.models.project import CodeFile
+        from src.routes.project import project_bp, _project_index_files
+        from src.services.ingest_service import FileIngestService
+
+        result = FileIngestService(batch_size=1).scan_project_files(1, git_repo.working_tree_dir)
+        assert result['success'] and result['files_added'] == 2
+
+        files = {f.file_path: f for f in CodeFile.query.filter_by(project_id=1)}
+        assert files[os.path.join('src', 'main.py')].content == 'def main():\n    print("Hello")\n'
+        assert {f['path'] for f in _project_index_files(1)} == set(files)
+
+        pg_app.register_blueprint(project_bp, url_prefix='/api')
+        data = pg_app.test_client().get('/api/projects/1/files?limit=1').get_json()
+        assert len(data['files']) == 1 and data['next_cursor']
+
+    def test_jsonb_round_trip(self, pg_app):
+        """测试JSON字符串保存为JSONB，读取时仍是JSON字符串"""
+        from src.models.user import db
+        from src.models.project import CodeFile
+
+        db.session.add(CodeFile(file_path='a.py', file_name='a.py', content='x = 1\n',
+                                analysis_result='{"issues": [1, 2]}', project_id=1))
+        db.session.commit()
+        db.session.expunge_all()
+
+        assert json.loads(CodeFile.query.one().analysis_result) == {'issues': [1, 2]}
+        kind = db.session.execute(text("SELECT jsonb_typeof(analysis_result -> 'issues') FROM code_file")).scalar()
+        assert kind == 'array'
@@ -0,0 +1,84 @@
+import pytest
+from datetime import datetime
+from src.models.user import db
+from src.models.project import CodeFile, AnalysisTask
+from src.routes.listing import ListingError, decode_cursor, encode_cursor, parse_fields, parse_limit
+
+@pytest.fixture
+def client(app):
+    """注册项目蓝图并预置文件和任务"""
+    from src.routes.project import project_bp
+    app.register_blueprint(project_bp, url_prefix='/api')
+    for i in range(5):
+        db.session.add(CodeFile(file_path=f'src/m{i}.py', file_name=f'm{i}.py', file_type='.py',
+                                content=f'x = {i}\n', analysis_result='{"big": true}', project_id=1))
+    # 前三个任务创建时间相同，验证按id打破并列
+    created = datetime(2026, 1, 1)
+    for i in range(4):
+        db.session.add(AnalysisTask(task_type='analyze', input_data='{"prompt": "..."}', output_data='{}',
+                                    created_at=created if i < 3 else datetime(2026, 1, 2), project_id=1))
+    db.session.commit()
+    db.session.expunge_all()
+    return app.test_client()
+
+class TestProjectListing:
+    """项目列表字段投影和keyset分页测试类"""
+
+    def _pages(self, client, url):
+        """按游标取完所有页"""
+        pages, cursor = [], None
+        while True:
+            data = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+            pages.append(data)
+            cursor = data['next_cursor']
+            if not cursor:
+                return pages
+
+    def test_files_keyset_pagination(self, client):
+        """测试文件列表按路径分页，每页大小固定，翻页不重复不遗漏"""
+        pages = self._pages(client, '/api/projects/1/files?limit=2')
+        assert [len(page['files']) for page in pages] == [2, 2, 1]
+        paths = [file['file_path'] for page in pages for file in page['files']]
+        assert paths == [f'src/m{i}.py' for i in range(5)]
+
+    def test_files_summary_and_projection(self, client):
+        """测试默认返回摘要字段，fields=只返回指定字段，content按需批量加载"""
+        file = client.get('/api/projects/1/files').get_json()['files'][0]
+        assert 'analysis_result' not in file and 'content' not in file
+        assert file['file_path'] == 'src/m0.py' and file['last_modified'] is None
+
+        files = client.get('/api/projects/1/files?fields=file_path,content&limit=1').get_json()['files']
+        assert files == [{'file_path': 'src/m0.py', 'content': 'x = 0\n'}]
+
+        full = client.get('/api/projects/1/files?view=full&limit=1').get_json()['files'][0]
+        assert full['analysis_result'] == '{"big": true}' and full['content'] == 'x = 0\n'
+
+    def test_tasks_newest_first_with_ties(self, client):
+        """测试任务按创建时间倒序分页，创建时间相同的任务按id排序"""
+        pages = self._pages(client, '/api/projects/1/tasks?limit=1&fields=id,created_at')
+        assert [task['id'] for page in pages for task in page['tasks']] == [4, 3, 2, 1]
+        assert pages[0]['tasks'][0] == {'id': 4, 'created_at': '2026-01-02T00:00:00'}
+
+    def test_project_detail_is_bounded(self, client):
+        """测试项目详情只包含第一页摘要和总数"""
+        project = client.get('/api/projects/1?limit=3').get_json()['project']
+        assert len(project['code_files']) == 3 and project['file_count'] == 5
+        assert project['code_files_next_cursor']
+        assert len(project['analysis_tasks']) == 3 and project['task_count'] == 4
+        assert 'input_data' not in project['analysis_tasks'][0]
+
+    def test_invalid_parameters(self, client):
+        """测试未知字段、无效游标和limit返回400"""
+        assert client.get('/api/projects/1/files?fields=secret').status_code == 400
+        assert client.get('/api/projects/1/files?cursor=bogus').status_code == 400
+        assert client.get('/api/projects/1/tasks?limit=0').status_code == 400
+        assert client.get('/api/projects/1?view=everything').status_code == 400
+
+    def test_helpers(self):
+        """测试游标编码和参数解析"""
+        values = ['src/a.py', 7, datetime(2026, 1, 1, 12, 30)]
+        assert decode_cursor(encode_cursor(values)) == values
+        assert parse_limit('100000') == 1000
+        assert parse_fields(None, 'full', ['a', 'b'], ['a']) == ['a', 'b']
+        with pytest.raises(ListingError):
+            parse_limit('abc')
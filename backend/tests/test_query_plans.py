@@ -0,0 +1,122 @@
+import os
+import re
+import pytest
+from sqlalchemy import event
+from src.models.user import db
+from src.models.project import CodeFile, AnalysisTask
+
+# 需要保证按索引访问的表
+HOT_TABLES = ('code_file', 'analysis_task', 'file_blob')
+FULL_SCAN = re.compile(r'^SCAN (%s)\b' % '|'.join(HOT_TABLES))
+
+class QueryPlanRecorder:
+    """记录执行的SQL，对每条语句运行EXPLAIN QUERY PLAN"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        # 批量写入（executemany）按主键执行，不需要检查
+        if not executemany and statement.lstrip().split(' ', 1)[0] in ('SELECT', 'UPDATE', 'DELETE'):
+            self.statements.append((statement, parameters))
+
+    def plans(self):
+        """返回 [(SQL, [计划步骤])]"""
+        cursor = db.session.connection().connection.cursor()
+        result = []
+        for statement, parameters in self.statements:
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            result.append((statement, [row[3] for row in cursor.fetchall()]))
+        return result
+
+    def assert_indexed(self):
+        """热点表上不允许全表扫描，也不允许为排序建立临时B树"""
+        checked = 0
+        for statement, steps in self.plans():
+            if not any(table in statement for table in HOT_TABLES):
+                continue
+            checked += 1
+            for step in steps:
+                assert not FULL_SCAN.match(step), f'Full table scan: {step}\n{statement}'
+                assert 'TEMP B-TREE' not in step, f'Sort without index: {step}\n{statement}'
+        assert checked, 'No queries on hot tables were recorded'
+
+@pytest.fixture
+def recorder(app):
+    from src.routes.project import project_bp
+    app.register_blueprint(project_bp, url_prefix='/api')
+    return QueryPlanRecorder(db.engine)
+
+class TestQueryPlans:
+    """热点查询的执行计划回归测试类"""
+
+    def _seed(self):
+        for i in range(3):
+            db.session.add(CodeFile(file_path=f'm{i}.py', file_name=f'm{i}.py', content=f'x = {i}\n', project_id=1))
+            db.session.add(AnalysisTask(task_type='analyze', status='completed', project_id=1))
+        db.session.commit()
+
+    def test_listing_endpoints_use_indexes(self, app, recorder):
+        """测试项目详情、文件和任务列表（含翻页和状态过滤）都按索引访问"""
+        self._seed()
+        client = app.test_client()
+        with recorder:
+            client.get('/api/projects/1?limit=2')
+            cursor = client.get('/api/projects/1/files?limit=1&include_content=true').get_json()['next_cursor']
+            client.get(f'/api/projects/1/files?limit=1&cursor={cursor}')
+            cursor = client.get('/api/projects/1/tasks?limit=1').get_json()['next_cursor']
+            client.get(f'/api/projects/1/tasks?limit=1&cursor={cursor}')
+            client.get('/api/projects/1/tasks?status=running')
+        recorder.assert_indexed()
+
+    def test_file_lookup_and_blob_queries_use_indexes(self, app, recorder):
+        """测试按 (项目, 路径) 查找文件和内容存储的查询按索引访问"""
+        from src.services.blob_store import blob_store
+        self._seed()
+        with recorder:
+            code_file = CodeFile.query.filter_by(project_id=1, file_path='m1.py').first()
+            stale_hash = code_file.content_hash
+            code_file.content = 'x = 42\n'
+            db.session.flush()
+            blob_store.discard([stale_hash])
+            db.session.commit()
+        recorder.assert_indexed()
+
+    def test_rescan_uses_indexes(self, app, git_repo, recorder):
+        """测试增量扫描（更新、删除文件并清理内容）按索引访问"""
+        from src.services.ingest_service import FileIngestService
+        root = git_repo.working_tree_dir
+        service = FileIngestService(batch_size=2)
+        service.scan_project_files(1, root)
+
+        with open(os.path.join(root, 'src', 'main.py'), 'w') as f:
+            f.write('def main():\n    return 2\n')
+        os.remove(os.path.join(root, 'src', 'utils.py'))
+        with recorder:
+            assert service.scan_project_files(1, root)['success']
+        recorder.assert_indexed()
+
+    def test_detects_full_scan(self, app):
+        """测试缺少索引的查询会被检出"""
+        recorder = QueryPlanRecorder(db.engine)
+        with recorder:
+            CodeFile.query.filter_by(file_name='m1.py').all()
+        with pytest.raises(AssertionError, match='Full table scan'):
+            recorder.assert_indexed()
+
+    def test_duplicate_path_rejected(self, app):
+        """测试同一项目内文件路径唯一"""
+        from sqlalchemy.exc import IntegrityError
+        db.session.add(CodeFile(file_path='a.py', file_name='a.py', project_id=1))
+        db.session.add(CodeFile(file_path='a.py', file_name='a.py', project_id=1))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
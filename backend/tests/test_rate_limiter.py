@@ -0,0 +1,173 @@
+import time
+import threading
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock
+from src.services.rate_limiter import ProviderLimiter, ProviderBusy, parse_reset, parse_retry_after
+
+class TestProviderLimiter:
+    """AI提供商限流器测试类"""
+
+    def test_concurrency_limit(self):
+        """测试同时执行的请求数不超过并发上限，多余的请求排队"""
+        limiter = ProviderLimiter('test', max_concurrency=2, max_wait=5)
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def work():
+            with limiter.acquire():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.05)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = limiter.get_stats()
+        assert peak[0] == 2
+        assert stats['admitted'] == 6
+        assert stats['max_queue_depth'] >= 3
+        assert stats['in_flight'] == 0 and stats['queue_depth'] == 0
+
+    def test_request_bucket_bounded_wait(self):
+        """测试每分钟请求数用完后，等待超过上限时抛出ProviderBusy"""
+        limiter = ProviderLimiter('test', requests_per_minute=2, max_wait=0.1)
+        for _ in range(2):
+            with limiter.acquire():
+                pass
+
+        start = time.monotonic()
+        with pytest.raises(ProviderBusy) as error:
+            with limiter.acquire():
+                pass
+        assert 0.09 <= time.monotonic() - start < 1
+        assert error.value.retry_after >= 1
+        assert limiter.get_stats()['rejected'] == 1
+
+    def test_token_bucket_refunds_actual_usage(self):
+        """测试token桶按预估扣减，成功后按实际用量退回"""
+        limiter = ProviderLimiter('test', tokens_per_minute=1000, max_wait=0.05)
+        with limiter.acquire(800):
+            pass
+        with pytest.raises(ProviderBusy):
+            with limiter.acquire(800):
+                pass
+
+        limiter.record_success(800, used_tokens=100)
+        with limiter.acquire(800):
+            pass
+
+    def test_rate_limited_pauses_and_backs_off(self):
+        """测试429后按Retry-After暂停并把速率减半，冷却后逐步恢复"""
+        limiter = ProviderLimiter('test', max_concurrency=8, requests_per_minute=600, max_wait=5)
+        limiter.record_rate_limited({'Retry-After': '0.2'})
+
+        stats = limiter.get_stats()
+        assert stats['rate_limited'] == 1
+        assert stats['rate_factor'] == 0.5
+        assert stats['max_concurrency'] == 4
+        assert stats['requests_per_minute'] == 300
+
+        start = time.monotonic()
+        with limiter.acquire():
+            pass
+        assert time.monotonic() - start >= 0.15
+
+        # 同一轮的其他429不再减速；刚被限流时成功也不立即恢复
+        limiter.record_rate_limited({'Retry-After': '0'})
+        limiter.record_success()
+        assert limiter.get_stats()['rate_factor'] == 0.5
+
+        # 冷却结束后每个成功请求恢复 1/(配置并发数 x 当前并发数)
+        limiter._holdoff_until = 0
+        limiter.record_success()
+        assert limiter.get_stats()['rate_factor'] == round(0.5 + 1 / 32, 3)
+
+    def test_exhausted_headers_pause_until_reset(self):
+        """测试限额头显示剩余为0时暂停到重置时间"""
+        limiter = ProviderLimiter('test', requests_per_minute=600, max_wait=0.05)
+        limiter.update_from_headers({'x-ratelimit-remaining-requests': '0', 'x-ratelimit-reset-requests': '30s'})
+
+        assert limiter.get_stats()['paused_for'] > 29
+        with pytest.raises(ProviderBusy) as error:
+            with limiter.acquire():
+                pass
+        assert error.value.retry_after > 29
+
+    def test_queue_full_rejected_immediately(self):
+        """测试排队数达到上限时直接拒绝"""
+        limiter = ProviderLimiter('test', max_concurrency=1, max_queue=1, max_wait=5)
+        release = threading.Event()
+
+        def hold():
+            with limiter.acquire():
+                release.wait()
+
+        threads = [threading.Thread(target=hold) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while limiter.get_stats()['queue_depth'] < 1:
+            time.sleep(0.005)
+
+        with pytest.raises(ProviderBusy, match='queue is full'):
+            with limiter.acquire():
+                pass
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert limiter.get_stats()['admitted'] == 2
+
+    def test_parse_headers(self):
+        """测试解析OpenAI和Anthropic的重置时间格式"""
+        assert parse_reset('6m0s') == 360
+        assert parse_reset('20ms') == pytest.approx(0.02)
+        assert parse_reset('1.5s') == 1.5
+        assert 9 < parse_reset(time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() + 10))) <= 10
+        assert parse_reset('soon') is None
+        assert parse_retry_after({'retry-after-ms': '250', 'retry-after': '1'}) == 0.25
+        assert parse_retry_after({'Retry-After': '3'}) == 3.0
+
+    def test_ai_service_requeues_rate_limited_calls(self):
+        """测试AIService遇到429时暂停后重新排队，成功后返回结果"""
+        from src.services.ai_service import AIService
+
+        class RateLimitError(Exception):
+            status_code = 429
+            response = SimpleNamespace(headers={'retry-after-ms': '50'})
+
+        service = AIService()
+        service.anthropic_client = Mock()
+        reply = SimpleNamespace(content=[SimpleNamespace(text='ok')],
+                                usage=SimpleNamespace(input_tokens=10, output_tokens=5))
+        create = service.anthropic_client.messages.with_raw_response.create
+        create.side_effect = [RateLimitError('429'), reply]
+
+        assert service._call_claude('hello', 'claude-3.7-sonnet') == 'ok'
+        assert create.call_count == 2
+        stats = service.get_rate_limit_stats()['anthropic']
+        assert stats['rate_limited'] == 1
+        assert stats['admitted'] == 2
+
+    def test_ai_service_calibrates_from_response_headers(self):
+        """测试AIService按成功响应的限额头校准额度：剩余请求数为0时暂停到重置时间"""
+        from src.services.ai_service import AIService
+
+        class RawResponse:
+            headers = {'x-ratelimit-remaining-requests': '0', 'x-ratelimit-reset-requests': '30s'}
+
+            def parse(self):
+                return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='ok'))],
+                                       usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+
+        service = AIService()
+        service.openai_client = Mock()
+        service.openai_client.chat.completions.with_raw_response.create.return_value = RawResponse()
+
+        assert service._call_openai('hello', 'gpt-4.1-mini') == 'ok'
+        assert service.get_rate_limit_stats()['openai']['paused_for'] > 29
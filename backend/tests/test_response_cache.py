@@ -0,0 +1,85 @@
+import os
+import time
+import pytest
+from src.services.response_cache import ResponseCache
+
+class TestResponseCache:
+    """AI响应缓存测试类"""
+    
+    def setup_method(self):
+        """测试前的设置"""
+        self.db_path = os.environ['AI_CACHE_DB_PATH']
+        self.cache = ResponseCache(db_path=self.db_path, max_entries=2, max_disk_entries=3, ttl=60)
+    
+    def test_make_key_depends_on_all_parameters(self):
+        """测试缓存键包含所有请求参数"""
+        base = ResponseCache.make_key('claude-3.7-sonnet', 'system', 'prompt', 0.1, 4000)
+        
+        assert base == ResponseCache.make_key('claude-3.7-sonnet', 'system', 'prompt', 0.1, 4000)
+        assert base != ResponseCache.make_key('deepseek-r1', 'system', 'prompt', 0.1, 4000)
+        assert base != ResponseCache.make_key('claude-3.7-sonnet', 'other', 'prompt', 0.1, 4000)
+        assert base != ResponseCache.make_key('claude-3.7-sonnet', 'system', 'prompt', 0.2, 4000)
+        assert base != ResponseCache.make_key('claude-3.7-sonnet', 'system', 'prompt', 0.1, 2000)
+    
+    def test_memory_hit_and_miss_counters(self):
+        """测试内存命中与未命中计数"""
+        assert self.cache.get('a') is None
+        self.cache.set('a', 'response-a')
+        
+        assert self.cache.get('a') == 'response-a'
+        
+        stats = self.cache.get_stats()
+        assert stats['misses'] == 1
+        assert stats['memory_hits'] == 1
+        assert stats['hit_rate'] == 0.5
+    
+    def test_disk_tier_survives_new_instance(self):
+        """测试磁盘缓存在新实例中仍可命中"""
+        self.cache.set('a', 'response-a')
+        
+        other = ResponseCache(db_path=self.db_path)
+        assert other.get('a') == 'response-a'
+        assert other.get_stats()['disk_hits'] == 1
+        
+        # 磁盘命中后回填到内存
+        assert other.get('a') == 'response-a'
+        assert other.get_stats()['memory_hits'] == 1
+    
+    def test_lru_eviction_in_memory(self):
+        """测试内存LRU淘汰"""
+        self.cache.set('a', '1')
+        self.cache.set('b', '2')
+        self.cache.get('a')
+        self.cache.set('c', '3')
+        
+        assert list(self.cache._memory.keys()) == ['a', 'c']
+    
+    def test_disk_size_eviction(self):
+        """测试磁盘条目数上限"""
+        for key in ['a', 'b', 'c', 'd', 'e']:
+            self.cache.set(key, key)
+        
+        count = self.cache._get_conn().execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+        assert count == 3
+    
+    def test_ttl_expiry(self):
+        """测试过期条目不会命中"""
+        self.cache.set('a', 'response-a', ttl=-1)
+        
+        assert self.cache.get('a') is None
+        assert self.cache.get_stats()['misses'] == 1
+    
+    def test_disabled_cache(self):
+        """测试关闭缓存"""
+        cache = ResponseCache(db_path=self.db_path, enabled=False)
+        cache.set('a', 'response-a')
+        
+        assert cache.get('a') is None
+        assert not os.path.exists(self.db_path)
+    
+    def test_clear(self):
+        """测试清空缓存"""
+        self.cache.set('a', 'response-a')
+        self.cache.clear()
+        
+        assert self.cache.get('a') is None
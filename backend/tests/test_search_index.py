@@ -0,0 +1,149 @@
+import os
+import numpy as np
+import pytest
+import src.services.search_index as search_index
+from src.services.ingest_service import FileIngestService
+from src.services.search_index import SearchIndexService, file_trigrams, query_trigrams
+
+FILES = {
+    'src/auth/login.py': (
+        'class LoginForm:\n'
+        '    def validate(self):\n'
+        '        return check_password(self.password)\n'
+        '\n'
+        'def check_password(password):\n'
+        '    # TODO: use a constant time comparison\n'
+        '    return password == SECRET\n'
+    ),
+    'src/utils.js': 'function formatDate(value) {\n    return value.toISOString();\n}\n',
+    'README.py': 'print("password reset")\n'
+}
+
+class TestSearchIndex:
+    """代码检索索引测试类"""
+
+    @pytest.fixture(autouse=True)
+    def setup_index(self, tmp_path):
+        """在临时目录中写入项目文件并建立索引"""
+        self.root = str(tmp_path / 'project')
+        for path, content in FILES.items():
+            full_path = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        self.index_dir = str(tmp_path / 'index')
+        self.service = SearchIndexService(index_dir=self.index_dir)
+        self.service.update_files(1, FILES)
+
+    def test_query_trigrams(self):
+        """测试从正则中提取必须出现的字面量三元组"""
+        assert np.array_equal(file_trigrams('ABCd'), file_trigrams('abcd'))
+        assert len(file_trigrams('abcd')) == 2
+        assert [len(grams) for grams in query_trigrams(r'def\s+check_pass')] == [9]
+        assert len(query_trigrams('(login|logout)_user')) == 2
+        assert query_trigrams('(foo)?bar') is not None
+        assert query_trigrams('a.b') is None
+        assert query_trigrams('ab|xyz') is None
+
+    def test_term_matches(self):
+        """测试按三元组统计文件可能包含的检索词，不读取文件"""
+        counts = self.service.term_matches(1, ['password', 'secret', 'formatdate', 'ab'])
+        assert counts == {'src/auth/login.py': 2, 'README.py': 1, 'src/utils.js': 1}
+        assert self.service.term_matches(1, []) == {}
+
+    def test_content_search(self):
+        """测试内容检索返回行号、列号和所在的定义"""
+        result = self.service.search(1, self.root, 'check_password')
+
+        assert [(hit['file_path'], hit['line']) for hit in result['results']] == [
+            ('src/auth/login.py', 3), ('src/auth/login.py', 5)
+        ]
+        assert result['results'][0]['column'] == 16
+        assert result['results'][0]['symbol'] == 'validate'
+        assert result['results'][1]['text'] == 'def check_password(password):'
+        # 三元组过滤后只读取了一个候选文件
+        assert result['candidates'] == 1
+
+    def test_regex_and_filters(self):
+        """测试正则、大小写、路径前缀和定义类型过滤"""
+        regex = self.service.search(1, self.root, r'TODO:?\s+\w+', regex=True)
+        assert [hit['line'] for hit in regex['results']] == [6]
+
+        # 同一行的多处匹配只返回一次
+        assert len(self.service.search(1, self.root, 'PASSWORD')['results']) == 4
+        assert self.service.search(1, self.root, 'PASSWORD', case_sensitive=True)['results'] == []
+
+        scoped = self.service.search(1, self.root, 'password', path_prefix='src/')
+        assert {hit['file_path'] for hit in scoped['results']} == {'src/auth/login.py'}
+
+        in_functions = self.service.search(1, self.root, 'password', kind='function')
+        assert {hit['symbol'] for hit in in_functions['results']} == {'validate', 'check_password'}
+
+        with pytest.raises(ValueError):
+            self.service.search(1, self.root, 'a.b', regex=True)
+        with pytest.raises(ValueError):
+            self.service.search(1, self.root, '(unclosed', regex=True)
+
+    def test_symbol_search(self):
+        """测试符号检索：完全匹配优先，支持类型过滤和正则"""
+        pytest.importorskip('tree_sitter_python')
+        result = self.service.search_symbols(1, 'check_password')
+        assert result['results'][0] == {
+            'name': 'check_password', 'kind': 'function', 'file_path': 'src/auth/login.py',
+            'start_line': 5, 'end_line': 7
+        }
+
+        assert [hit['name'] for hit in self.service.search_symbols(1, 'login', kind='class')['results']] == ['LoginForm']
+        assert self.service.search_symbols(1, 'login', kind='function')['results'] == []
+        names = [hit['name'] for hit in self.service.search_symbols(1, '^(format|valid)', regex=True)['results']]
+        assert sorted(names) == ['formatDate', 'validate']
+
+    def test_incremental_update_and_merge(self, monkeypatch):
+        """测试增量段中的更新和删除，以及合并进主倒排表后结果一致"""
+        monkeypatch.setattr(search_index, 'DELTA_MERGE_MIN_FILES', 0)
+        self.service.update_files(1, {'src/new.py': 'def reset_token():\n    pass\n'})
+        stats = self.service.get_stats(1)
+        assert stats['delta_files'] == 0
+        assert stats['files'] == 4
+
+        # 修改后的文件不再匹配旧内容，删除的文件不再出现
+        monkeypatch.setattr(search_index, 'DELTA_MERGE_MIN_FILES', 100)
+        self._write('src/utils.js', 'function parseDate(value) {}\n')
+        self.service.update_files(1, {'src/utils.js': 'function parseDate(value) {}\n'}, removed=['README.py'])
+        assert self.service.get_stats(1)['delta_files'] == 1
+        assert self.service.search(1, self.root, 'toISOString')['candidates'] == 0
+        assert self.service.search(1, self.root, 'parseDate')['candidates'] == 1
+        assert {hit['file_path'] for hit in self.service.search(1, self.root, 'password')['results']} == {'src/auth/login.py'}
+        assert self.service.search_symbols(1, 'formatDate')['results'] == []
+
+        # 重新加载后增量段仍然有效
+        reloaded = SearchIndexService(index_dir=self.index_dir)
+        assert reloaded.search(1, self.root, 'parseDate')['candidates'] == 1
+        assert reloaded.search(1, self.root, 'reset_token')['candidates'] == 1
+        assert reloaded.indexed_paths(1) == {'src/auth/login.py', 'src/utils.js', 'src/new.py'}
+
+        self.service.delete_project(1)
+        assert SearchIndexService(index_dir=self.index_dir).get_stats(1)['files'] == 0
+
+    def test_scan_builds_index(self, app, git_repo):
+        """测试扫描项目文件时建立索引，重新扫描时同步删除"""
+        root = git_repo.working_tree_dir
+        ingest_service = FileIngestService(batch_size=1, search_index=self.service)
+
+        ingest_service.scan_project_files(2, root)
+        assert self.service.indexed_paths(2) == {os.path.join('src', 'main.py'), os.path.join('src', 'utils.py')}
+        assert self.service.search(2, root, 'Hello')['results'][0]['line'] == 2
+
+        os.remove(os.path.join(root, 'src', 'utils.py'))
+        ingest_service.scan_project_files(2, root)
+        assert self.service.indexed_paths(2) == {os.path.join('src', 'main.py')}
+
+        # 索引丢失时，未变化的文件也会补建索引
+        self.service.delete_project(2)
+        ingest_service.scan_project_files(2, root)
+        assert self.service.indexed_paths(2) == {os.path.join('src', 'main.py')}
+
+    def _write(self, path, content):
+        """改写项目中的文件"""
+        with open(os.path.join(self.root, path), 'w', encoding='utf-8') as f:
+            f.write(content)
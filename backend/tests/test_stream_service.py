@@ -0,0 +1,70 @@
+import json
+import pytest
+from flask import Flask
+from src.services.stream_service import StreamService
+
+class FakeSocketIO:
+    """记录emit调用的Socket.IO替身"""
+    
+    def __init__(self):
+        self.events = []
+    
+    def emit(self, event, data, room=None):
+        self.events.append((event, data, room))
+    
+    def sleep(self, seconds):
+        pass
+
+class TestStreamService:
+    """流式输出服务测试类"""
+    
+    def setup_method(self):
+        """测试前的设置"""
+        self.stream_service = StreamService()
+        self.app = Flask(__name__)
+        self.socketio = FakeSocketIO()
+    
+    def test_emit_to_room_sends_chunks_in_order(self):
+        """测试分块按顺序推送到房间"""
+        completed = []
+        content = self.stream_service.emit_to_room(
+            self.socketio, self.app, iter(['Hel', 'lo']), 'project_1', 'abc',
+            meta={'model_used': 'claude-3.7-sonnet'}, on_complete=completed.append
+        )
+        
+        assert content == 'Hello'
+        assert completed == ['Hello']
+        
+        events = [event for event, _, _ in self.socketio.events]
+        assert events == ['ai_stream_start', 'ai_stream_chunk', 'ai_stream_chunk', 'ai_stream_end']
+        assert all(room == 'project_1' for _, _, room in self.socketio.events)
+        assert self.socketio.events[1][1] == {'stream_id': 'abc', 'index': 0, 'delta': 'Hel'}
+        assert self.socketio.events[-1][1]['content'] == 'Hello'
+    
+    def test_emit_to_room_reports_errors(self):
+        """测试提供商中途失败时推送错误事件"""
+        def failing_chunks():
+            yield 'partial'
+            raise RuntimeError('connection reset')
+        
+        completed = []
+        content = self.stream_service.emit_to_room(
+            self.socketio, self.app, failing_chunks(), 'project_1', 'abc', on_complete=completed.append
+        )
+        
+        assert content == 'partial'
+        assert completed == []
+        assert self.socketio.events[-1][0] == 'ai_stream_error'
+        assert 'connection reset' in self.socketio.events[-1][1]['error']
+    
+    def test_sse_response(self):
+        """测试SSE回退响应格式"""
+        with self.app.test_request_context():
+            response = self.stream_service.sse_response(iter(['a', 'b']), meta={'model_used': 'gpt-4.1-mini'})
+            body = response.get_data(as_text=True)
+        
+        assert response.mimetype == 'text/event-stream'
+        events = [block for block in body.split('\n\n') if block]
+        assert [e.split('\n')[0] for e in events] == ['event: start', 'event: chunk', 'event: chunk', 'event: end']
+        assert json.loads(events[1].split('data: ')[1]) == {'index': 0, 'delta': 'a'}
+        assert json.loads(events[-1].split('data: ')[1])['length'] == 2